@@ -0,0 +1,83 @@
+# Size and backup time of the main database before and after archiving old orders.
+#
+# Usage:
+#     python -m benchmarks.archive_benchmark [--size medium] [--keep-days 365]
+#
+# A generated shop (three years of orders for 'medium') is backed up, then the orders
+# older than 'keep-days' move to per-year archive databases (database/archive.py) and
+# the backup is timed again. The run also checks that the sales reports give the same
+# answers before and after: the monthly total (from rollups) and the full sales export
+# (which opens the archives).
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.generator import ShopSpec, generate_shop, PRESETS
+from database import crud
+from database.analytics import iter_sales_batches
+from database.archive import archive_orders
+from database.backup import backup_database
+from database.schema import ensure_schema
+
+
+def _backup_seconds(db_path: str, folder: str) -> float:
+    target = os.path.join(folder, 'backups')
+    os.makedirs(target, exist_ok=True)
+    started = time.perf_counter()
+    backup_database(db_path, target)
+    return time.perf_counter() - started
+
+
+def _report(session, since: datetime.date) -> dict:
+    lines = revenue = 0
+    for batch in iter_sales_batches(session):
+        lines += len(batch['line_id'])
+        revenue += sum(price * quantity for price, quantity in zip(batch['price'], batch['quantity']))
+    since_total = crud._sales_since(session, since)
+    return {'lines': lines, 'revenue': round(revenue, 2), 'since': round(since_total, 2)}
+
+
+def run(folder: str, spec: ShopSpec, keep_days: int) -> dict:
+    db_path = os.path.join(folder, 'shop.db')
+    engine = create_engine(f'sqlite:///{db_path}')
+    counts = generate_shop(engine, spec)
+    ensure_schema(engine)
+    session = sessionmaker(bind=engine)()
+    cutoff = spec.end_date - datetime.timedelta(days=keep_days)
+    # Reaches back before the cutoff, so it needs the rollups.
+    since = cutoff - datetime.timedelta(days=30)
+
+    before = {'size': os.path.getsize(db_path), 'backup': _backup_seconds(db_path, folder), 'report': _report(session, since)}
+    started = time.perf_counter()
+    archived = archive_orders(session, cutoff)
+    archive_seconds = time.perf_counter() - started
+    after = {'size': os.path.getsize(db_path), 'backup': _backup_seconds(db_path, folder), 'report': _report(session, since)}
+    session.close()
+    engine.dispose()
+    return {'orders': counts['order'], 'archived': archived, 'archive_seconds': archive_seconds, 'before': before, 'after': after}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Main database size and backup time before and after archiving')
+    parser.add_argument('--size', default='medium', choices=tuple(PRESETS))
+    parser.add_argument('--keep-days', type=int, default=365)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as folder:
+        result = run(folder, ShopSpec.preset(args.size), args.keep_days)
+    before, after = result['before'], result['after']
+    print(f"archived {result['archived']['orders']} of {result['orders']} orders "
+          f"({result['archived']['lines']} lines, years {result['archived']['years']}) in {result['archive_seconds']:.2f}s")
+    print(f"{'':<10}{'size':>12}{'backup':>10}")
+    for name, row in (('before', before), ('after', after)):
+        print(f"{name:<10}{row['size'] / 1024 / 1024:>10.1f}MB{row['backup'] * 1000:>8.1f}ms")
+    print(f"reports before {before['report']}, after {after['report']}")
+
+
+if __name__ == '__main__':
+    main()
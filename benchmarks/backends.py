@@ -0,0 +1,100 @@
+# Compares the throughput of the crud hot paths on different database backends.
+#
+# Usage:
+#     python -m benchmarks.backends [--url postgresql+psycopg2://shop@localhost/bench] [--threads 1,4,8]
+#                                   [--seconds 5] [--size small]
+#
+# Every backend gets the same generated shop (its tables are dropped first, so only
+# point --url at a scratch database). A SQLite file in a temporary directory is always
+# included. For each thread count the writers sell one tire at a time while the readers
+# load the catalog and a customer's history; the run reports operations per second.
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.generator import ShopSpec, generate_shop, PRESETS
+from database import crud
+from database.connection import Base, make_engine
+from database.schema import ensure_schema, forget_schema_check, _version_table
+from database.models import Product
+from database.Exeptions import InsufficientStockException, StockConflictException
+
+
+def _worker(Session, counts: dict, deadline: float, seed: int, results: list, lock: threading.Lock):
+    rng = random.Random(seed)
+    session = Session()
+    reads = writes = 0
+    while time.perf_counter() < deadline:
+        if rng.random() < 0.5:
+            product = session.get(Product, rng.randrange(1, counts['product'] + 1))
+            customer = crud.get_customer_by_id(session, rng.randrange(1, counts['customer'] + 1))
+            try:
+                crud.create_order(session, customer, product, 1)
+            except (InsufficientStockException, StockConflictException):
+                pass
+            writes += 1
+        else:
+            crud.get_product_by_id_json(session, rng.randrange(1, counts['product'] + 1))
+            len(crud.get_customer_by_id(session, rng.randrange(1, counts['customer'] + 1)).orders)
+            reads += 1
+        session.expire_all()
+    session.close()
+    with lock:
+        results.append((reads, writes))
+
+
+def measure(url: str, size: str, thread_counts: list[int], seconds: float) -> list[dict]:
+    engine = make_engine(url, pool_size=max(thread_counts), max_overflow=0)
+    Base.metadata.drop_all(engine)
+    _version_table.drop(engine, checkfirst=True)
+    counts = generate_shop(engine, ShopSpec(**PRESETS[size]))
+    forget_schema_check(engine)
+    ensure_schema(engine)
+    Session = sessionmaker(bind=engine)
+
+    rows = []
+    for threads in thread_counts:
+        results = []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+        workers = [threading.Thread(target=_worker, args=(Session, counts, deadline, seed, results, lock))
+                   for seed in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        reads = sum(r for r, _ in results)
+        writes = sum(w for _, w in results)
+        rows.append({'backend': engine.dialect.name, 'threads': threads, 'reads': reads / elapsed, 'writes': writes / elapsed})
+    engine.dispose()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Throughput of the crud hot paths per database backend')
+    parser.add_argument('--url', action='append', default=[], help='extra database URL (repeatable)')
+    parser.add_argument('--threads', default='1,4,8', help='comma-separated thread counts')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--size', default='small', choices=tuple(PRESETS))
+    args = parser.parse_args(argv)
+    thread_counts = [int(t) for t in args.threads.split(',')]
+
+    rows = []
+    with tempfile.TemporaryDirectory() as folder:
+        for url in [f"sqlite:///{os.path.join(folder, 'bench.db')}"] + args.url:
+            rows.extend(measure(url, args.size, thread_counts, args.seconds))
+
+    print(f"{'backend':<12}{'threads':>8}{'reads/s':>10}{'sales/s':>10}")
+    for row in rows:
+        print(f"{row['backend']:<12}{row['threads']:>8}{row['reads']:>10.0f}{row['writes']:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# Several processes (the shop's counter PCs) sell the same product at the same time.
+#
+# Usage:
+#     python -m benchmarks.contention [--terminals 4] [--sales 25] [--stock 60]
+#
+# Every terminal tries to sell one unit 'sales' times through crud.create_order,
+# so together they ask for more than is in stock. The run reports how many sales
+# succeeded, how many were refused for lack of stock or for repeated conflicts,
+# the final stock and the throughput, and checks that nothing was oversold.
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from database.connection import Base
+from database import crud
+from database.models import Product, ProductsOrder, StockMovement
+from database.Exeptions import InsufficientStockException, StockConflictException
+
+
+def _terminal(db_url: str, product_id: int, customer_id: int, sales: int, start, results):
+    engine = create_engine(db_url)
+    session = sessionmaker(bind=engine)()
+    sold = refused = conflicts = 0
+    start.wait()
+    for _ in range(sales):
+        try:
+            product = session.get(Product, product_id)
+            crud.create_order(session, crud.get_customer_by_id(session, customer_id), product, 1)
+            sold += 1
+        except InsufficientStockException:
+            refused += 1
+        except StockConflictException:
+            conflicts += 1
+    session.close()
+    engine.dispose()
+    results.put((sold, refused, conflicts))
+
+
+def run(db_path: str, terminals: int, sales: int, stock: int) -> dict:
+    db_url = f"sqlite:///{db_path}"
+    engine = create_engine(db_url)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    product = crud.create_product(session, 'Michelin', 100.0, stock, 205, 55, 16)
+    customer = crud.get_or_create_customer(session, 'bench', 'bench street', '0900', '9000000000')
+    product_id, customer_id = product.id, customer.id
+
+    # 'spawn' behaves the same on Windows (where the shop runs) and Linux.
+    context = multiprocessing.get_context('spawn')
+    start = context.Event()
+    results = context.Queue()
+    workers = [context.Process(target=_terminal, args=(db_url, product_id, customer_id, sales, start, results))
+               for _ in range(terminals)]
+    for worker in workers:
+        worker.start()
+    started = time.perf_counter()
+    start.set()
+    totals = [results.get() for _ in workers]
+    elapsed = time.perf_counter() - started
+    for worker in workers:
+        worker.join()
+
+    session.expire_all()
+    report = {
+        'terminals': terminals,
+        'attempts': terminals * sales,
+        'sold': sum(t[0] for t in totals),
+        'refused': sum(t[1] for t in totals),
+        'conflicts': sum(t[2] for t in totals),
+        'initial_stock': stock,
+        'final_stock': session.execute(select(Product.quantity).where(Product.id == product_id)).scalar(),
+        'lines': session.execute(select(func.coalesce(func.sum(ProductsOrder.quantity), 0))).scalar(),
+        'ledger': session.execute(select(func.sum(StockMovement.change)).where(StockMovement.product_id == product_id)).scalar(),
+        'seconds': elapsed,
+    }
+    report['sales_per_second'] = report['sold'] / elapsed if elapsed else 0.0
+    session.close()
+    engine.dispose()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Concurrent checkout from several processes')
+    parser.add_argument('--terminals', type=int, default=4)
+    parser.add_argument('--sales', type=int, default=25, help='sales attempted per terminal')
+    parser.add_argument('--stock', type=int, default=60)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as folder:
+        report = run(os.path.join(folder, 'shop.db'), args.terminals, args.sales, args.stock)
+    print(f"{report['terminals']} terminals, {report['attempts']} attempts on {report['initial_stock']} in stock")
+    print(f"sold {report['sold']}, refused {report['refused']}, gave up after conflicts {report['conflicts']}")
+    print(f"final stock {report['final_stock']} (ledger {report['ledger']}), sold lines {report['lines']}")
+    print(f"{report['sales_per_second']:.0f} sales/s under contention ({report['seconds']:.2f}s)")
+    oversold = report['final_stock'] < 0 or report['sold'] != report['initial_stock'] - report['final_stock']
+    print('OVERSOLD' if oversold else 'no oversell')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# Measures the streaming table export on a large order history.
+#
+# Usage:
+#     python -m benchmarks.export_benchmark [--rows 1000000] [--format csv] [--ceiling-mb 32]
+#
+# A temporary SQLite database is filled with the requested number of order
+# lines, which are then exported while tracemalloc tracks the peak memory.
+# The run fails if the peak goes over the ceiling.
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from database.connection import Base
+from database.models import Customer, Order, ProductsOrder
+from database.utilities import export_table_to_file
+
+
+LINES_PER_ORDER = 4
+INSERT_CHUNK = 50000
+
+
+def fill_order_lines(engine, rows: int):
+    """Bulk inserts one customer, rows / LINES_PER_ORDER orders and 'rows' order lines."""
+    orders = max(rows // LINES_PER_ORDER, 1)
+    start = datetime.date(2020, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Customer), [{"name": "bench", "phone": "0", "address": "-", "national_number": "0"}])
+        for first in range(1, orders + 1, INSERT_CHUNK):
+            last = min(first + INSERT_CHUNK, orders + 1)
+            conn.execute(insert(Order), [{"id": i, "customer_id": 1, "date": start + datetime.timedelta(days=i % 1500)} for i in range(first, last)])
+        for first in range(0, rows, INSERT_CHUNK):
+            last = min(first + INSERT_CHUNK, rows)
+            conn.execute(insert(ProductsOrder), [
+                {"order_id": i // LINES_PER_ORDER + 1, "brand": "Brand%d" % (i % 40), "price": 1000.0 + i % 500,
+                 "width": 185 + (i % 8) * 10, "ratio": 45 + (i % 5) * 5, "rim": 14 + i % 6, "quantity": 1 + i % 4}
+                for i in range(first, last)
+            ])
+
+
+def run(rows: int, file_format: str, ceiling_mb: float) -> bool:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+
+        started = time.perf_counter()
+        fill_order_lines(engine, rows)
+        print(f"filled {rows} order lines in {time.perf_counter() - started:.1f}s")
+
+        session = sessionmaker(bind=engine)()
+        tracemalloc.start()
+        started = time.perf_counter()
+        count = export_table_to_file(session, tmp, f"products_order.{file_format}", ProductsOrder, file_format)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        session.close()
+        engine.dispose()
+
+    peak_mb = peak / (1024 * 1024)
+    print(f"exported {count} rows as {file_format} in {elapsed:.1f}s ({count / elapsed:,.0f} rows/s), peak memory {peak_mb:.1f} MB")
+    if peak_mb > ceiling_mb:
+        print(f"FAIL: peak memory is above the {ceiling_mb} MB ceiling")
+        return False
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Streaming export benchmark')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--format', default='csv', choices=('csv', 'jsonl', 'sqlite'))
+    parser.add_argument('--ceiling-mb', type=float, default=32)
+    args = parser.parse_args()
+    sys.exit(0 if run(args.rows, args.format, args.ceiling_mb) else 1)
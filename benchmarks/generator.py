@@ -0,0 +1,168 @@
+# Deterministic synthetic shop data for benchmarks.
+#
+# generate_shop() fills an empty database with brands, sizes, products, staff,
+# customers and a history of orders using bulk inserts. The same seed and
+# settings always produce the same data, so timings are comparable across commits.
+import datetime
+import random
+
+from sqlalchemy import insert, text
+
+from database.connection import Base
+from database.models import Brand, Size, Product, Customer, Order, ProductsOrder, User
+from database.branches import ensure_default_branch
+from utilities import hashing
+
+BRAND_NAMES = ('Michelin', 'Goodyear', 'Bridgestone', 'Pirelli', 'Continental', 'Hankook', 'Kumho', 'Yokohama',
+               'Nexen', 'Barez', 'Kavir', 'Dunlop', 'Toyo', 'Falken', 'Maxxis', 'Nokian', 'Firestone', 'Cooper',
+               'BFGoodrich', 'Sumitomo')
+
+# Ready-made shop sizes; any field can be overridden with keyword arguments.
+PRESETS = {
+    'small': dict(brands=10, sizes=60, products=300, employees=5, customers=300, years=1, orders_per_day=10),
+    'medium': dict(brands=20, sizes=200, products=2000, employees=20, customers=3000, years=3, orders_per_day=40),
+    'large': dict(brands=40, sizes=600, products=10000, employees=60, customers=20000, years=5, orders_per_day=120),
+}
+
+INSERT_CHUNK = 20000
+
+
+class ShopSpec:
+    """The size of a generated shop."""
+
+    def __init__(self, brands=10, sizes=60, products=300, employees=5, customers=300, years=1, orders_per_day=10,
+                 max_lines_per_order=3, seed=1, end_date: datetime.date = None):
+        self.brands = brands
+        self.sizes = sizes
+        self.products = min(products, brands * sizes)
+        self.employees = employees
+        self.customers = customers
+        self.years = years
+        self.orders_per_day = orders_per_day
+        self.max_lines_per_order = max_lines_per_order
+        self.seed = seed
+        self.end_date = end_date or datetime.date(2025, 1, 1)
+
+    @classmethod
+    def preset(cls, name: str, **overrides) -> 'ShopSpec':
+        return cls(**dict(PRESETS[name], **overrides))
+
+    def to_dict(self) -> dict:
+        data = dict(vars(self))
+        data['end_date'] = self.end_date.isoformat()
+        return data
+
+
+def _insert_chunked(conn, model, rows):
+    """Inserts an iterable of row dicts with executemany, INSERT_CHUNK rows at a time."""
+    count = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= INSERT_CHUNK:
+            conn.execute(insert(model), chunk)
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        conn.execute(insert(model), chunk)
+        count += len(chunk)
+    return count
+
+
+def _brand_name(index: int) -> str:
+    base = BRAND_NAMES[index % len(BRAND_NAMES)]
+    return base if index < len(BRAND_NAMES) else f'{base} {index // len(BRAND_NAMES) + 1}'
+
+
+def generate_shop(engine, spec: ShopSpec) -> dict:
+    """
+    Creates the schema on the engine and fills it with a synthetic shop.
+
+    Returns:
+        A dictionary with the number of rows generated per table.
+    """
+    Base.metadata.create_all(engine)
+    rng = random.Random(spec.seed)
+    counts = {}
+
+    sizes = []
+    widths = range(135, 345, 10)
+    ratios = range(25, 90, 5)
+    rims = range(12, 23)
+    for width in widths:
+        for ratio in ratios:
+            for rim in rims:
+                sizes.append((width, ratio, rim))
+    rng.shuffle(sizes)
+    sizes = sizes[:spec.sizes]
+
+    pairs = [(b, s) for b in range(spec.brands) for s in range(len(sizes))]
+    rng.shuffle(pairs)
+    pairs = pairs[:spec.products]
+    catalog = []
+    for brand_index, size_index in pairs:
+        catalog.append((brand_index, size_index, float(rng.randrange(800, 12000, 50))))
+
+    with engine.begin() as conn:
+        counts['brand'] = _insert_chunked(conn, Brand, ({'id': i + 1, 'name': _brand_name(i)} for i in range(spec.brands)))
+        counts['size'] = _insert_chunked(conn, Size, ({'id': i + 1, 'width': w, 'ratio': r, 'rim': rim} for i, (w, r, rim) in enumerate(sizes)))
+        counts['product'] = _insert_chunked(conn, Product, (
+            {'id': i + 1, 'brand_id': b + 1, 'size_id': s + 1, 'price': price, 'quantity': rng.randrange(0, 60)}
+            for i, (b, s, price) in enumerate(catalog)
+        ))
+
+        password = hashing('password123')
+        start_date = spec.end_date - datetime.timedelta(days=365 * spec.years)
+        counts['user'] = _insert_chunked(conn, User.__table__, (
+            {'name': f'staff{i}', 'lastname': 'bench', 'phone': f'0912{i:07d}', 'national_number': f'{i:010d}',
+             'user_name': f'staff{i}', 'hashed_passwd': password,
+             'type': 'manager' if i % 5 == 0 else 'employee',
+             'start_date': start_date + datetime.timedelta(days=rng.randrange(0, 365 * spec.years))}
+            for i in range(spec.employees)
+        ))
+        counts['customer'] = _insert_chunked(conn, Customer, (
+            {'id': i + 1, 'name': f'customer{i}', 'phone': f'0935{i:07d}', 'address': f'street {i % 500}',
+             'national_number': f'{i + 5000000000:010d}'}
+            for i in range(spec.customers)
+        ))
+
+        days = (spec.end_date - start_date).days
+        orders = []
+        lines = []
+        order_id = 0
+        for day in range(days):
+            date = start_date + datetime.timedelta(days=day)
+            for _ in range(rng.randrange(0, spec.orders_per_day * 2 + 1)):
+                order_id += 1
+                orders.append({'id': order_id, 'customer_id': rng.randrange(1, spec.customers + 1), 'date': date})
+                for _ in range(rng.randrange(1, spec.max_lines_per_order + 1)):
+                    brand_index, size_index, price = catalog[rng.randrange(len(catalog))]
+                    width, ratio, rim = sizes[size_index]
+                    lines.append({'order_id': order_id, 'brand': _brand_name(brand_index), 'price': price,
+                                  'width': width, 'ratio': ratio, 'rim': rim, 'quantity': rng.randrange(1, 5)})
+            if len(lines) >= INSERT_CHUNK:
+                _insert_chunked(conn, Order, orders)
+                _insert_chunked(conn, ProductsOrder, lines)
+                counts['order'] = counts.get('order', 0) + len(orders)
+                counts['products_order'] = counts.get('products_order', 0) + len(lines)
+                orders, lines = [], []
+        _insert_chunked(conn, Order, orders)
+        _insert_chunked(conn, ProductsOrder, lines)
+        counts['order'] = counts.get('order', 0) + len(orders)
+        counts['products_order'] = counts.get('products_order', 0) + len(lines)
+        _reset_sequences(conn, (Brand, Size, Product, Customer, Order))
+        # All generated stock belongs to the main branch.
+        ensure_default_branch(conn)
+
+    return counts
+
+
+def _reset_sequences(conn, models):
+    # The rows above were inserted with explicit ids; PostgreSQL's id sequences do not
+    # notice that, so move them past the largest id before the application inserts rows.
+    if conn.dialect.name != 'postgresql':
+        return
+    for model in models:
+        table = model.__table__.name
+        conn.execute(text(f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+                          f"COALESCE((SELECT MAX(id) FROM \"{table}\"), 0) + 1, false)"))
@@ -0,0 +1,69 @@
+# Measures the bulk price list importer.
+#
+# Usage:
+#     python -m benchmarks.import_benchmark [--rows 20000]
+#
+# A supplier CSV with the requested number of distinct tire SKUs is imported
+# into an empty temporary database, then imported again with changed prices
+# (the update path), and finally checked with a dry run.
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from database.connection import Base
+from database.models import Product
+from database.catalog_import import import_price_list
+
+BRANDS = ('Michelin', 'Goodyear', 'Bridgestone', 'Pirelli', 'Continental', 'Hankook', 'Kumho', 'Yokohama', 'Nexen', 'Barez')
+
+
+def write_price_list(file_path: str, rows: int, price_offset: float = 0.0):
+    """Writes 'rows' distinct SKUs, spread over 10 brands and rows / 10 sizes."""
+    with open(file_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Brand', 'Size', 'Price', 'Qty'])
+        for i in range(rows):
+            size_index = i // len(BRANDS)
+            width = 135 + (size_index % 30) * 10
+            ratio = 25 + (size_index // 30 % 14) * 5
+            rim = 12 + size_index // 420
+            writer.writerow([BRANDS[i % len(BRANDS)], f'{width}/{ratio}R{rim}', 1000 + i % 900 + price_offset, i % 12])
+
+
+def timed(label: str, func):
+    started = time.perf_counter()
+    report = func()
+    elapsed = time.perf_counter() - started
+    print(f"{label}: {elapsed:.2f}s - {report.summary()}")
+    return report
+
+
+def run(rows: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+
+        first = os.path.join(tmp, 'first.csv')
+        second = os.path.join(tmp, 'second.csv')
+        write_price_list(first, rows)
+        write_price_list(second, rows, price_offset=50)
+
+        timed(f"import {rows} new rows", lambda: import_price_list(session, first))
+        timed(f"import {rows} price changes", lambda: import_price_list(session, second))
+        timed(f"dry run {rows} rows", lambda: import_price_list(session, first, dry_run=True))
+        print("products in database:", session.execute(select(func.count(Product.id))).scalar())
+        session.close()
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Price list import benchmark')
+    parser.add_argument('--rows', type=int, default=20000)
+    args = parser.parse_args()
+    run(args.rows)
@@ -0,0 +1,112 @@
+# Memory of the list screens' data: ORM objects turned into dictionaries against the
+# compact rows of database/rows.py.
+#
+# Usage:
+#     python -m benchmarks.row_memory [--rows 100000]
+#
+# A temporary SQLite database gets 'rows' products, customers, staff members and
+# order lines. Each list is loaded the old way (ORM entities, then to_dict) and as
+# rows (get_*_rows), with tracemalloc measuring the memory the result keeps, the peak
+# while it is built and the time taken. The *_json adapters must give exactly the
+# dictionaries of the old way.
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from database import crud
+from database.connection import Base
+from database.models import Brand, Size, Product, Customer, User, Employee, Manager, ProductsOrder
+from benchmarks.export_benchmark import fill_order_lines, INSERT_CHUNK
+
+
+def _fill(engine, rows: int):
+    widths, ratios, rims = range(155, 355, 10), range(30, 80, 5), range(12, 22)
+    sizes = [(w, r, rim) for w in widths for r in ratios for rim in rims]
+    brands = -(-rows // len(sizes))
+    with engine.begin() as conn:
+        conn.execute(insert(Brand), [{'id': i + 1, 'name': f'Brand{i}'} for i in range(brands)])
+        conn.execute(insert(Size), [{'id': i + 1, 'width': w, 'ratio': r, 'rim': rim} for i, (w, r, rim) in enumerate(sizes)])
+        for first in range(0, rows, INSERT_CHUNK):
+            last = min(first + INSERT_CHUNK, rows)
+            conn.execute(insert(Product), [
+                {'brand_id': i // len(sizes) + 1, 'size_id': i % len(sizes) + 1, 'price': 1000.0 + i % 700, 'quantity': i % 30}
+                for i in range(first, last)])
+            conn.execute(insert(Customer), [
+                {'name': f'customer{i}', 'phone': f'0912{i:07d}', 'address': f'street {i % 900}', 'national_number': f'{i:010d}'}
+                for i in range(first, last)])
+            conn.execute(insert(User), [
+                {'name': f'name{i}', 'lastname': f'lastname{i}', 'phone': f'0935{i:07d}', 'national_number': f'{i:010d}',
+                 'user_name': f'user{i}', 'hashed_passwd': '0' * 64, 'type': 'manager' if i % 10 == 0 else 'employee'}
+                for i in range(first, last)])
+    fill_order_lines(engine, rows)
+
+
+# Each list: (the old way, the new rows, the *_json adapter of the rows).
+LISTS = {
+    'products': (lambda session: [product.to_dict() for product in session.query(Product).all()],
+                 crud.get_product_rows.uncached, crud.get_all_products_json),
+    'customers': (lambda session: [customer.to_dict() for customer in session.query(Customer).all()],
+                  crud.get_customer_rows.uncached, crud.get_all_customers_json),
+    'staff': (lambda session: sorted((user.to_dict() for user in session.query(Employee).all() + session.query(Manager).all()),
+                                     key=lambda user: user['id']),
+              lambda session: crud.get_staff_rows.uncached(session, crud.STAFF_TYPES), crud.get_all_employee_and_manager_json),
+    'order_lines': (lambda session: [line.to_dict() for line in session.query(ProductsOrder).all()],
+                    crud.get_order_line_rows, lambda session: [line.to_dict() for line in crud.get_order_line_rows(session)]),
+}
+
+
+def _measure(session, load) -> tuple[dict, list]:
+    session.expunge_all()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    result = load(session)
+    elapsed = time.perf_counter() - started
+    # Entities the session no longer needs are released, as after a screen refresh.
+    session.expunge_all()
+    gc.collect()
+    kept, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': elapsed, 'kept': kept - before, 'peak': peak - before,
+            'per_row': (kept - before) / max(len(result), 1)}, result
+
+
+def run(folder: str, rows: int = 100000) -> dict:
+    """Returns for each list the 'orm' and 'rows' measurements, and whether the adapter matches ('same')."""
+    engine = create_engine(f"sqlite:///{os.path.join(folder, 'rows.db')}")
+    Base.metadata.create_all(engine)
+    _fill(engine, rows)
+    session = sessionmaker(bind=engine)()
+    results = {}
+    try:
+        for name, (orm, compact, adapter) in LISTS.items():
+            orm_stats, orm_dicts = _measure(session, orm)
+            row_stats, _ = _measure(session, compact)
+            results[name] = {'orm': orm_stats, 'rows': row_stats, 'same': adapter(session) == orm_dicts}
+            del orm_dicts
+    finally:
+        session.close()
+        engine.dispose()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Memory of ORM dictionaries against compact rows for the list screens')
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        report = run(tmp, args.rows)
+    print(f"{'list':<12}{'way':<6}{'kept MB':>10}{'bytes/row':>11}{'peak MB':>10}{'seconds':>9}")
+    for name, result in report.items():
+        for way in ('orm', 'rows'):
+            entry = result[way]
+            print(f"{name:<12}{way:<6}{entry['kept'] / 2 ** 20:>10.1f}{entry['per_row']:>11.0f}"
+                  f"{entry['peak'] / 2 ** 20:>10.1f}{entry['seconds']:>9.2f}")
+        print(f"{'':<12}adapter output {'matches' if result['same'] else 'DIFFERS from'} to_dict")
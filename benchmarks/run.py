@@ -0,0 +1,195 @@
+# Runs the benchmark scenarios against a generated shop and stores the results as JSON.
+#
+# Usage:
+#     python -m benchmarks.run [--size small|medium|large] [--rounds 5] [--output results.json]
+#                              [--compare previous.json] [--only catalog_load,checkout]
+#
+# Each scenario is timed over several rounds (after one warm-up round) and reported
+# with min / mean / median / stddev, in the spirit of pytest-benchmark. Passing
+# --compare prints the change of each median against an earlier results file.
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.generator import ShopSpec, generate_shop, PRESETS
+from database import crud
+from database.backup import backup_database
+from database.utilities import export_table_to_file
+from database.models import ProductsOrder
+
+# Registered scenarios: name -> function(context). Each function performs one round.
+SCENARIOS = {}
+
+
+def scenario(func):
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+class Context:
+    """Shared state for the scenarios: the database, a session and a scratch directory."""
+
+    def __init__(self, db_path: str, scratch: str):
+        self.db_path = db_path
+        self.scratch = scratch
+        self.engine = create_engine(f"sqlite:///{db_path}")
+        self.session = sessionmaker(bind=self.engine)()
+        self.counter = 0
+
+    def close(self):
+        self.session.close()
+        self.engine.dispose()
+
+
+@scenario
+def catalog_load(ctx: Context):
+    # get_all_products_json without the read cache, which would answer every round after the warm-up.
+    [row.to_dict() for row in crud.get_product_rows.uncached(ctx.session)]
+    ctx.session.expunge_all()
+
+
+@scenario
+def catalog_load_cached(ctx: Context):
+    # The same read as the UI makes it, served from the read cache (see database/cache.py).
+    crud.get_all_products_json(ctx.session)
+
+
+@scenario
+def checkout(ctx: Context):
+    ctx.counter += 1
+    customer = crud.get_or_create_customer(ctx.session, 'bench', 'bench street', '0900', f'9{ctx.counter:09d}')
+    product = crud.get_product_by_id(ctx.session, 1 + ctx.counter % 50)
+    # Keep the product in stock so every round can sell it.
+    product.quantity = 1000
+    ctx.session.commit()
+    crud.create_order(ctx.session, customer, product, 1)
+
+
+@scenario
+def dashboard(ctx: Context):
+    crud.get_employees_count(ctx.session)
+    crud.get_daily_sales(ctx.session)
+    crud.get_monthly_sales(ctx.session)
+    crud.get_customers_count(ctx.session)
+    crud.get_total_product_quantity(ctx.session)
+    crud.get_sizes_count(ctx.session)
+    crud.get_brands_count(ctx.session)
+
+
+@scenario
+def customer_report(ctx: Context):
+    # Mirrors ManagerReportPanel.customer_report_action for a handful of customers.
+    for customer_id in range(1, 21):
+        customer = crud.get_customer_by_id(ctx.session, customer_id)
+        total = 0
+        for order in customer.orders:
+            total += sum(line.price * line.quantity for line in order.products)
+    ctx.session.expunge_all()
+
+
+@scenario
+def backup(ctx: Context):
+    target = os.path.join(ctx.scratch, 'backups')
+    os.makedirs(target, exist_ok=True)
+    backup_database(ctx.db_path, target)
+
+
+@scenario
+def export(ctx: Context):
+    export_table_to_file(ctx.session, ctx.scratch, 'products_order.csv', ProductsOrder)
+
+
+def measure(func, ctx: Context, rounds: int) -> dict:
+    func(ctx)  # warm-up round
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func(ctx)
+        timings.append(time.perf_counter() - started)
+    return {
+        'rounds': rounds,
+        'min': min(timings),
+        'max': max(timings),
+        'mean': statistics.mean(timings),
+        'median': statistics.median(timings),
+        'stddev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(spec: ShopSpec, rounds: int, only=None) -> dict:
+    results = {
+        'commit': _git_commit(),
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'shop': spec.to_dict(),
+        'scenarios': {},
+    }
+    with tempfile.TemporaryDirectory() as scratch:
+        db_path = os.path.join(scratch, 'shop.db')
+        engine = create_engine(f"sqlite:///{db_path}")
+        started = time.perf_counter()
+        results['rows'] = generate_shop(engine, spec)
+        results['generate_seconds'] = time.perf_counter() - started
+        engine.dispose()
+
+        ctx = Context(db_path, scratch)
+        try:
+            for name, func in SCENARIOS.items():
+                if only and name not in only:
+                    continue
+                results['scenarios'][name] = measure(func, ctx, rounds)
+        finally:
+            ctx.close()
+    return results
+
+
+def print_results(results: dict, previous: dict = None):
+    print(f"shop: {results['rows']} (generated in {results['generate_seconds']:.1f}s)")
+    print(f"{'scenario':<18}{'min':>10}{'median':>10}{'mean':>10}{'stddev':>10}  change")
+    for name, stats in results['scenarios'].items():
+        change = ''
+        if previous and name in previous.get('scenarios', {}):
+            old = previous['scenarios'][name]['median']
+            change = f"{(stats['median'] - old) / old * 100:+.1f}% vs {previous.get('commit', '?')}"
+        print(f"{name:<18}{stats['min'] * 1000:>9.1f}ms{stats['median'] * 1000:>8.1f}ms{stats['mean'] * 1000:>8.1f}ms"
+              f"{stats['stddev'] * 1000:>8.1f}ms  {change}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tire shop benchmark suite')
+    parser.add_argument('--size', default='small', choices=tuple(PRESETS))
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', default=None, help='an earlier results file to compare against')
+    parser.add_argument('--only', default=None, help='comma separated scenario names')
+    args = parser.parse_args()
+
+    only = set(args.only.split(',')) if args.only else None
+    results = run(ShopSpec.preset(args.size, seed=args.seed), args.rounds, only)
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+    print_results(results, previous)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}")
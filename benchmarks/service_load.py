@@ -0,0 +1,121 @@
+# Load test for the shared inventory service (server.py) with simulated counter terminals.
+#
+# Usage:
+#     python -m benchmarks.service_load [--size small] [--terminals 8] [--seconds 10] [--workers 8]
+#
+# The service runs in this process on a generated shop; every terminal is a thread with
+# its own ServiceClient that loops over a typical counter workload: open the catalog,
+# look up a product and a customer, sell one tire, and refresh the dashboard (as one
+# batch). The run reports requests per second and latency percentiles per operation,
+# plus the cost of the dashboard as a batch against eight separate calls.
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy import create_engine
+
+from benchmarks.generator import ShopSpec, generate_shop, PRESETS
+from database.remote import ServiceClient
+from database.service import ShopService, DEFAULT_WORKERS
+from database.Exeptions import InsufficientStockException, StockConflictException
+
+DASHBOARD = ('get_total_product_quantity', 'get_brands_count', 'get_sizes_count', 'get_customers_count',
+             'get_employees_count', 'get_monthly_sales', 'get_daily_sales', 'get_all_customers_json')
+
+
+def _terminal(url: str, token: str, counts: dict, deadline: float, seed: int, timings: dict, lock: threading.Lock):
+    rng = random.Random(seed)
+    client = ServiceClient(url, token=token)
+    local = defaultdict(list)
+
+    def timed(name, func, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            local[name].append(time.perf_counter() - started)
+
+    while time.perf_counter() < deadline:
+        timed('catalog', client.call, 'get_all_products_json')
+        product = timed('product', client.call, 'get_product_by_id', rng.randrange(1, counts['product'] + 1))
+        customer = timed('customer', client.call, 'get_customer_by_national_id', f"{rng.randrange(counts['customer']) + 5000000000:010d}")
+        try:
+            timed('checkout', client.call, 'create_order', customer, product, 1)
+        except (InsufficientStockException, StockConflictException):
+            pass
+        timed('dashboard_batch', client.batch, [(op,) for op in DASHBOARD])
+    client.close()
+
+    with lock:
+        for name, values in local.items():
+            timings[name].extend(values)
+
+
+def dashboard_round_trips(url: str, token: str, rounds: int = 50) -> tuple[float, float]:
+    client = ServiceClient(url, token=token)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for op in DASHBOARD:
+            client.call(op)
+    separate = (time.perf_counter() - started) / rounds
+    started = time.perf_counter()
+    for _ in range(rounds):
+        client.batch([(op,) for op in DASHBOARD])
+    batched = (time.perf_counter() - started) / rounds
+    client.close()
+    return separate, batched
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test for the shared inventory service')
+    parser.add_argument('--size', default='small', choices=tuple(PRESETS))
+    parser.add_argument('--terminals', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as folder:
+        url = f"sqlite:///{os.path.join(folder, 'shop.db')}"
+        engine = create_engine(url)
+        counts = generate_shop(engine, ShopSpec(**PRESETS[args.size]))
+        engine.dispose()
+
+        service = ShopService(('127.0.0.1', 0), url, args.workers)
+        server = threading.Thread(target=service.serve_forever, args=(0.05,), daemon=True)
+        server.start()
+        try:
+            separate, batched = dashboard_round_trips(service.url, service.token)
+
+            timings = defaultdict(list)
+            lock = threading.Lock()
+            deadline = time.perf_counter() + args.seconds
+            terminals = [threading.Thread(target=_terminal, args=(service.url, service.token, counts, deadline, seed, timings, lock))
+                         for seed in range(args.terminals)]
+            started = time.perf_counter()
+            for terminal in terminals:
+                terminal.start()
+            for terminal in terminals:
+                terminal.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            service.shutdown()
+            service.server_close()
+
+    requests = sum(len(values) for values in timings.values())
+    print(f"{args.terminals} terminals, {args.workers} workers, {args.size} shop, {elapsed:.1f}s")
+    print(f"{requests} requests, {requests / elapsed:.0f} requests/s")
+    print(f"{'operation':<18}{'count':>8}{'p50':>10}{'p95':>10}{'max':>10}")
+    for name, values in timings.items():
+        values.sort()
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        print(f"{name:<18}{len(values):>8}{statistics.median(values) * 1000:>8.1f}ms{p95 * 1000:>8.1f}ms{values[-1] * 1000:>8.1f}ms")
+    print(f"dashboard: {len(DASHBOARD)} calls {separate * 1000:.1f}ms, one batch {batched * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
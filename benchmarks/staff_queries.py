@@ -0,0 +1,99 @@
+# The staff list queries against a long staff history: the old ORM queries (one per
+# user type, concatenated) against the set-based ones on User.type IN (...).
+#
+# Usage:
+#     python -m benchmarks.staff_queries [--users 200000] [--repeat 5]
+#
+# A temporary SQLite database gets 'users' accounts, mostly employees with a manager
+# every twentieth and a few administrators. Each lookup is timed the old way and the
+# new way (uncached, so every call reaches the database) and both must give the same
+# answer. The plan of the employee query shows whether ix_user_type is used.
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert, select, text
+from sqlalchemy.orm import sessionmaker
+
+from database import crud
+from database.schema import ensure_schema
+from database.models import User, Employee, Manager
+from benchmarks.export_benchmark import INSERT_CHUNK
+
+
+def _fill(engine, users: int):
+    with engine.begin() as conn:
+        for first in range(0, users, INSERT_CHUNK):
+            conn.execute(insert(User), [
+                {'name': f'name{i}', 'lastname': f'lastname{i}', 'phone': f'0935{i:07d}', 'national_number': f'{i:010d}',
+                 'user_name': f'user{i}', 'hashed_passwd': '0' * 64,
+                 'type': 'admin' if i % 5000 == 0 else 'manager' if i % 20 == 0 else 'employee'}
+                for i in range(first, min(first + INSERT_CHUNK, users))])
+
+
+# Each lookup: (the old way, the new way).
+LOOKUPS = {
+    'employee_usernames': (lambda session: [employee.user_name for employee in session.query(Employee).all()],
+                           lambda session: crud.get_staff_usernames.uncached(session, ('employee',))),
+    'staff_usernames': (lambda session: sorted(
+                            [user.user_name for user in session.query(Employee).all() + session.query(Manager).all()],
+                            key=lambda name: int(name[4:])),
+                        lambda session: crud.get_staff_usernames.uncached(session, crud.STAFF_TYPES)),
+    'staff_list': (lambda session: sorted((user.to_dict() for user in session.query(Employee).all() + session.query(Manager).all()),
+                                          key=lambda user: user['id']),
+                   lambda session: [row.to_dict() for row in crud.get_staff_rows.uncached(session)]),
+    'employee_count': (lambda session: session.query(Employee).count(), crud.get_employees_count),
+}
+
+
+def _time(session, load, repeat: int) -> tuple[float, object]:
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        session.expunge_all()
+        started = time.perf_counter()
+        result = load(session)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def run(folder: str, users: int = 200000, repeat: int = 5) -> dict:
+    """
+    Returns for each lookup the best 'old' and 'new' seconds and whether both agree ('same'),
+    and under 'uses_index' whether the employee query is planned on ix_user_type.
+    """
+    engine = create_engine(f"sqlite:///{os.path.join(folder, 'staff.db')}")
+    ensure_schema(engine)
+    _fill(engine, users)
+    session = sessionmaker(bind=engine)()
+    results = {}
+    try:
+        with engine.connect() as conn:
+            conn.execute(text('ANALYZE'))
+            sql = str(select(User.user_name).where(User.type.in_(['manager'])).compile(
+                engine, compile_kwargs={'literal_binds': True}))
+            plan = ' '.join(str(row[-1]) for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}'))
+        for name, (old, new) in LOOKUPS.items():
+            old_seconds, old_result = _time(session, old, repeat)
+            new_seconds, new_result = _time(session, new, repeat)
+            results[name] = {'old': old_seconds, 'new': new_seconds, 'same': old_result == new_result}
+        results['uses_index'] = 'ix_user_type' in plan
+    finally:
+        session.close()
+        engine.dispose()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Staff list queries: per-type ORM queries against User.type IN (...)')
+    parser.add_argument('--users', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        report = run(tmp, args.users, args.repeat)
+    uses_index = report.pop('uses_index')
+    print(f"{'lookup':<20}{'old ms':>10}{'new ms':>10}{'speedup':>9}  same")
+    for name, result in report.items():
+        print(f"{name:<20}{result['old'] * 1000:>10.1f}{result['new'] * 1000:>10.1f}"
+              f"{result['old'] / max(result['new'], 1e-9):>8.1f}x  {'yes' if result['same'] else 'NO'}")
+    print(f"manager lookup uses ix_user_type: {'yes' if uses_index else 'no'}")
@@ -0,0 +1,83 @@
+# Measures how long the application takes from launch to the first painted login frame.
+#
+# Usage:
+#     python -m benchmarks.startup [--runs 5] [--output startup.json]
+#
+# Every run starts main.py in a fresh interpreter (so module imports are not cached
+# in memory) and reports three moments, measured from the process launch:
+#   imports      the root window is being created (everything main.py imports is loaded)
+#   ready        the login page is built and the event loop starts
+#   first_frame  the first idle pass has finished, i.e. the login page has been drawn
+# Needs a display, like the application itself.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs main.py, but closes the window right after the first frame and prints the timings.
+CHILD = r'''
+import json, runpy, sys, time, tkinter
+
+launched = float(sys.argv[1])
+timings = {}
+original_init = tkinter.Tk.__init__
+original_mainloop = tkinter.Misc.mainloop
+
+def __init__(self, *args, **kwargs):
+    timings.setdefault('imports', time.monotonic() - launched)
+    original_init(self, *args, **kwargs)
+
+def mainloop(self, n=0):
+    timings['ready'] = time.monotonic() - launched
+    def painted():
+        timings['first_frame'] = time.monotonic() - launched
+        print(json.dumps(timings))
+        self.destroy()
+    self.after_idle(painted)
+    original_mainloop(self, n)
+
+tkinter.Tk.__init__ = __init__
+tkinter.Misc.mainloop = mainloop
+sys.argv = ['main.py']
+runpy.run_path('main.py', run_name='__main__')
+'''
+
+PHASES = ('imports', 'ready', 'first_frame')
+
+
+def launch() -> dict:
+    env = dict(os.environ)
+    env.pop('TIRESHOP_PROFILE', None)
+    completed = subprocess.run([sys.executable, '-c', CHILD, repr(time.monotonic())], cwd=ROOT, env=env,
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"main.py failed to start:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time from launch to the first painted login frame')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', default=None, help='write the raw timings to this JSON file')
+    args = parser.parse_args(argv)
+
+    launch()  # warm-up run: fills the OS file cache and writes the .pyc files
+    runs = [launch() for _ in range(args.runs)]
+
+    print(f"{'phase':<14}{'min':>10}{'median':>10}{'max':>10}")
+    for phase in PHASES:
+        values = [run[phase] for run in runs]
+        print(f"{phase:<14}{min(values) * 1000:>8.0f}ms{statistics.median(values) * 1000:>8.0f}ms{max(values) * 1000:>8.0f}ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'runs': runs}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# Measures the cost of restyling ttk tables on every panel build.
+#
+# Usage:
+#     python -m benchmarks.styles_benchmark [--widgets 300] [--tables 20]
+#
+# Before the shared style registry, every table build called ttk.Style(),
+# theme_use() and reconfigured 'Custom1.Treeview', which makes Tk restyle every
+# existing ttk widget. This builds the same tables both ways next to a number of
+# existing widgets (standing in for the rest of the window) and prints the times.
+# Needs a display, like the application itself.
+import argparse
+import time
+from tkinter import Tk, ttk
+
+from interface.styles import register_styles, TABLE_STYLE
+
+
+def restyle(root):
+    # What each panel used to do before creating its table.
+    style = ttk.Style(root)
+    style.theme_use('clam')
+    style.configure(TABLE_STYLE, background="#494A5F", foreground="black", fieldbackground="#393A4E", rowheight=50, borderwidth=0)
+    style.configure(f"{TABLE_STYLE}.Heading", background="#5B5D76", foreground="white", font=("Helvetica", 10, "bold"), relief='flat')
+    style.map(f"{TABLE_STYLE}.Heading", background=[("active", "#6b6d87")], foreground=[("active", "white")])
+
+
+def build_tables(root, tables: int, restyle_each: bool) -> float:
+    started = time.perf_counter()
+    built = []
+    for _ in range(tables):
+        if restyle_each:
+            restyle(root)
+        table = ttk.Treeview(root, style=TABLE_STYLE, columns=("id", "name", "size", "price", "quantity"), show="headings")
+        table.pack()
+        built.append(table)
+    root.update()
+    elapsed = time.perf_counter() - started
+    for table in built:
+        table.destroy()
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ttk style registry benchmark')
+    parser.add_argument('--widgets', type=int, default=300, help='existing ttk widgets in the window')
+    parser.add_argument('--tables', type=int, default=20, help='tables built per measurement')
+    args = parser.parse_args(argv)
+
+    root = Tk()
+    try:
+        register_styles(root)
+        for i in range(args.widgets):
+            ttk.Button(root, text=str(i)).place(x=0, y=0)
+        root.update()
+
+        per_build = build_tables(root, args.tables, restyle_each=True)
+        registry = build_tables(root, args.tables, restyle_each=False)
+        print(f"{args.tables} tables next to {args.widgets} widgets:")
+        print(f"  restyled on every build  {per_build * 1000:8.1f}ms")
+        print(f"  shared style registry    {registry * 1000:8.1f}ms")
+    finally:
+        root.destroy()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+# Throughput of the branch to head office sync (database/sync.py).
+#
+# Usage:
+#     python -m benchmarks.sync_throughput [--changes 100000] [--transport directory|pipe] [--batch-size 20000]
+#
+# A branch database gets 'changes' captured changes (new customers, and orders with one
+# line each), which are exported as compressed batches through a directory or an OS pipe
+# and applied to a head office database. The run reports changes per second for export
+# and apply, the shipped bytes against the size of the same rows as uncompressed JSON,
+# and checks that the head office ends up with every row.
+import argparse
+import datetime
+import json
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Customer, Order, ProductsOrder, ChangeLog
+from database.schema import ensure_schema
+from database.sync import export_changes, apply_changes, decode_batch, DirectoryTransport, StreamTransport, hq_tables, SYNC_BATCH_SIZE
+
+
+class _CountingTransport:
+    # Wraps a transport to count the shipped batches and bytes.
+    def __init__(self, transport):
+        self.transport = transport
+        self.batches = 0
+        self.bytes = 0
+        self.raw_bytes = 0
+
+    def send(self, data: bytes, name: str):
+        self.batches += 1
+        self.bytes += len(data)
+        self.raw_bytes += len(json.dumps(decode_batch(data), separators=(',', ':')))
+        self.transport.send(data, name)
+
+
+def _fill(engine, changes: int):
+    customers = changes // 2
+    orders = (changes - customers) // 2
+    today = datetime.date.today()
+    with engine.begin() as conn:
+        conn.execute(Customer.__table__.insert(), [
+            {'id': i + 1, 'name': f'customer{i}', 'phone': f'0935{i:07d}', 'address': f'street {i % 500}',
+             'national_number': f'{i + 5000000000:010d}'}
+            for i in range(customers)
+        ])
+        conn.execute(Order.__table__.insert(), [
+            {'id': i + 1, 'customer_id': i % customers + 1, 'date': today - datetime.timedelta(days=i % 365)}
+            for i in range(orders)
+        ])
+        conn.execute(ProductsOrder.__table__.insert(), [
+            {'order_id': i + 1, 'brand': 'Michelin', 'price': 100.0, 'width': 205, 'ratio': 55, 'rim': 16, 'quantity': 1}
+            for i in range(changes - customers - orders)
+        ])
+
+
+def run(folder: str, changes: int = 100000, transport: str = 'directory', batch_size: int = SYNC_BATCH_SIZE) -> dict:
+    branch = create_engine(f"sqlite:///{os.path.join(folder, 'branch.db')}")
+    hq = create_engine(f"sqlite:///{os.path.join(folder, 'hq.db')}")
+    ensure_schema(branch)
+    _fill(branch, changes)
+    with branch.connect() as conn:
+        # Schema creation logs the default branch too.
+        captured = conn.execute(select(func.count()).select_from(ChangeLog)).scalar()
+
+    branch_session = sessionmaker(bind=branch)()
+    hq_session = sessionmaker(bind=hq)()
+    applied = {}
+    if transport == 'directory':
+        outbox = DirectoryTransport(os.path.join(folder, 'outbox'))
+        counting = _CountingTransport(outbox)
+        started = time.perf_counter()
+        export_changes(branch_session, counting, 'north', batch_size=batch_size)
+        export_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        applied['batches'] = apply_changes(hq_session, outbox)
+        apply_seconds = time.perf_counter() - started
+        total_seconds = export_seconds + apply_seconds
+    else:
+        read_fd, write_fd = os.pipe()
+        with os.fdopen(read_fd, 'rb') as reader, os.fdopen(write_fd, 'wb') as writer:
+            counting = _CountingTransport(StreamTransport(writer))
+
+            def head_office():
+                applied['batches'] = apply_changes(hq_session, StreamTransport(reader))
+
+            receiver = threading.Thread(target=head_office)
+            started = time.perf_counter()
+            receiver.start()
+            export_changes(branch_session, counting, 'north', batch_size=batch_size)
+            export_seconds = time.perf_counter() - started
+            writer.close()
+            receiver.join()
+            total_seconds = time.perf_counter() - started
+            apply_seconds = total_seconds - export_seconds
+
+    hq_rows = {name: hq_session.execute(select(func.count()).select_from(hq_tables[name])).scalar()
+               for name in ('customer', 'order', 'products_order')}
+    remaining = branch_session.execute(select(func.count()).select_from(ChangeLog)).scalar()
+    branch_session.close()
+    hq_session.close()
+    branch.dispose()
+    hq.dispose()
+    return {
+        'changes': captured,
+        'batches': counting.batches,
+        'applied_batches': applied['batches'],
+        'bytes': counting.bytes,
+        'raw_bytes': counting.raw_bytes,
+        'export_seconds': export_seconds,
+        'apply_seconds': apply_seconds,
+        'changes_per_second': captured / total_seconds,
+        'hq_rows': hq_rows,
+        'remaining_log': remaining,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Throughput of the branch to head office sync')
+    parser.add_argument('--changes', type=int, default=100000)
+    parser.add_argument('--transport', default='directory', choices=('directory', 'pipe'))
+    parser.add_argument('--batch-size', type=int, default=SYNC_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as folder:
+        report = run(folder, args.changes, args.transport, args.batch_size)
+    print(f"{report['changes']} changes in {report['batches']} batches over a {args.transport}")
+    print(f"export {report['export_seconds']:.2f}s, apply {report['apply_seconds']:.2f}s, "
+          f"{report['changes_per_second']:.0f} changes/s")
+    print(f"shipped {report['bytes'] / 1024:.0f} KiB ({report['raw_bytes'] / 1024:.0f} KiB as plain JSON)")
+    print(f"head office rows: {report['hq_rows']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# Measures how much the Item_button geometry cache saves when pages are built.
+#
+# Usage:
+#     python -m benchmarks.widgets_benchmark [--buttons 6] [--rounds 50]
+#
+# A "page" is a frame with the navigation buttons of a role page (290x64 with two
+# rounded corners). Each round builds and destroys one page, once with the cache
+# cleared before every button (the old behaviour) and once with the cache kept.
+# Needs a display, like the application itself.
+import argparse
+import statistics
+import time
+
+from customtkinter import CTk, CTkFrame
+from interface.widgets import Item_button
+
+
+def build_page(root, buttons: int, cached: bool) -> float:
+    started = time.perf_counter()
+    frame = CTkFrame(root)
+    for row in range(buttons):
+        if not cached:
+            Item_button.clear_geometry_cache()
+        button = Item_button(frame, 290, 64, rtopleft=15, rbottomleft=15)
+        button.set_text('Item', fill='#FFFFFF', font_size=20)
+        button.grid(row=row, column=0)
+    root.update_idletasks()
+    elapsed = time.perf_counter() - started
+    frame.destroy()
+    return elapsed
+
+
+def geometry_only(rounds: int, cached: bool) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        if not cached:
+            Item_button.clear_geometry_cache()
+        Item_button.rounded_box_points(0, 0, 290, 64, 15, 0, 15, 0)
+    return (time.perf_counter() - started) / rounds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Item_button geometry cache benchmark')
+    parser.add_argument('--buttons', type=int, default=6, help='buttons per page')
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    print(f"polygon points: uncached {geometry_only(2000, False) * 1e6:.1f}us, cached {geometry_only(2000, True) * 1e6:.1f}us")
+
+    root = CTk()
+    root.withdraw()
+    try:
+        for cached in (False, True):
+            build_page(root, args.buttons, cached)  # warm-up
+            timings = [build_page(root, args.buttons, cached) for _ in range(args.rounds)]
+            label = 'cached' if cached else 'uncached'
+            print(f"page with {args.buttons} buttons, {label:<9} median {statistics.median(timings) * 1000:.2f}ms"
+                  f"  min {min(timings) * 1000:.2f}ms")
+    finally:
+        root.destroy()
+
+
+if __name__ == '__main__':
+    main()
@@ -34,4 +34,43 @@ class ProductNotExistsException(Exception):
 # Raised when a customer is queried by an ID that does not exist in the database.
 class CustomerNotExistsException(Exception):
     def __init__(self, customer_id):
-        super().__init__(f"Customer with ID '{customer_id}' does not exist in the database.")
\ No newline at end of file
+        super().__init__(f"Customer with ID '{customer_id}' does not exist in the database.")
+
+# Raised when a product was changed by another terminal between reading and writing it
+# (its version no longer matches), or when retrying such a write gave up.
+class StockConflictException(Exception):
+    def __init__(self, product_id):
+        self.product_id = product_id
+        super().__init__(f"Product '{product_id}' was changed by another user, please try again.")
+
+# Raised when a sale or stock change would take a product's stock below zero.
+# It is a ValueError so callers that caught the old ValueError keep working.
+class InsufficientStockException(ValueError):
+    def __init__(self, product_id, available: int, requested: int):
+        self.product_id = product_id
+        self.available = available
+        self.requested = requested
+        super().__init__(f"Not enough product quantity available (product {product_id}: {available} in stock, {requested} requested).")
+
+# Raised by the thin client (database/remote.py) when the shared service cannot be reached,
+# answers with an unexpected error, or is asked for an operation it does not offer.
+class ServiceError(Exception):
+    def __init__(self, message: str):
+        super().__init__(message)
+
+# Raised by the shared service when a request does not carry the installation's token,
+# a staff operation is called without the login it needs, or logins failed too often.
+class AccessDeniedException(ServiceError):
+    def __init__(self, message: str):
+        super().__init__(message)
+
+# Raised when a branch is referenced by an ID that does not exist in the database.
+class BranchNotExistsException(Exception):
+    def __init__(self, branch_id):
+        super().__init__(f"Branch with ID '{branch_id}' does not exist in the database.")
+
+# Raised when a sync batch starts after the last change the head office has applied from its branch,
+# i.e. an earlier batch is missing.
+class SyncGapException(Exception):
+    def __init__(self, source, applied, first):
+        super().__init__(f"Changes of '{source}' after {applied} are missing; the next batch starts at {first}.")
@@ -1,13 +1,39 @@
-from .crud import login_permission, get_all_employees, get_all_employees_json, user_by_username_pass
+from .crud import login_permission, get_all_employees, get_all_employees_json, user_by_username_pass, user_by_national_id_phone
 from .crud import create_new_user, user_by_username,remove_user_by_username, update_user_by_username, get_all_username
 from .crud import create_product, get_all_products_json, delete_product_by_name_and_size, update_product_by_id, get_product_by_id, get_product_by_id_json
 from .crud import get_all_employee_usernames, get_all_employee_and_manager_usernames, get_all_employee_and_manager_json, get_all_customers, get_all_customers_json, get_customer_by_id
-from .crud import create_order, get_or_create_customer, get_customer_by_national_id, check_customer_equal, get_all_orders
+from .crud import create_order, get_or_create_customer, get_customer_by_national_id, check_customer_equal, get_all_orders, get_all_orders_json
 from .crud import get_total_product_quantity, get_brands_count, get_sizes_count, get_customers_count, get_employees_count, get_monthly_sales, get_daily_sales
-from .crud import admin_exists
+from .crud import admin_exists, reset_password
+from .crud import bulk_update_products, count_products_for_bulk_update
+from .crud import get_product_rows, get_product_row, get_customer_rows, get_staff_rows, get_order_line_rows, STAFF_TYPES
+from .crud import get_employee_rows, get_staff_usernames
+from .crud import get_all_products, get_all_employee_and_manager
+from .rows import ProductRow, CustomerRow, StaffRow, OrderLineRow, Page
+from .pagination import iter_pages, FILTER_OPERATORS
 from .backup import backup_database, restore_database
+from .archive import archive_orders, archived_years
+from .analytics import export_sales_history, analytics_file_name
+from .catalog_import import import_price_list, ImportReport
+from .instrumentation import stats as query_stats, instrument_engine
+from .cache import read_cache
 from .connection import session
+from .schema import ensure_schema, SCHEMA_VERSION
+from .migrations import plan_migrations
+from .maintenance import start_scheduler as start_maintenance_scheduler, get_maintenance_runs, run_task as run_maintenance_task
+from .branches import create_branch, get_all_branches, get_branch_quantity, get_branch_stock, transfer_stock, get_size_availability, rebuild_availability
+from .sync import export_changes, apply_changes, get_hq_sales, DirectoryTransport, StreamTransport
+from .stock import record_stock_movement, get_stock_movements, stock_at, take_stock_snapshot, take_stock_snapshot_if_due, MOVEMENT_KINDS
 from utilities import hashing
 from .utilities import is_admin, is_manager, is_employee
+from .utilities import export_table_to_file, export_database_to_files
 
-from .Exeptions import NationalNumberAlreadyExistsException, UsernameAlreadyExistsException, CustomerNotExistsException,ProductNotExistsException, ProductAlreadyExistsException, UsernameNotExistsException, NoDataFoundError
\ No newline at end of file
+from .Exeptions import NationalNumberAlreadyExistsException, UsernameAlreadyExistsException, CustomerNotExistsException,ProductNotExistsException, ProductAlreadyExistsException, UsernameNotExistsException, NoDataFoundError, InsufficientStockException, StockConflictException, BranchNotExistsException, SyncGapException, ServiceError, AccessDeniedException
+from .service import ShopService, OPERATIONS
+from .remote import ServiceClient, remote_server_url, remote_functions
+
+# Thin client mode (see server.py): with TIRESHOP_SERVER set, the functions above that the
+# service offers are replaced by ones that send the call to the shared inventory.
+REMOTE_SERVER = remote_server_url()
+if REMOTE_SERVER:
+    globals().update(remote_functions(ServiceClient(REMOTE_SERVER)))
@@ -0,0 +1,286 @@
+from .models import Order, ProductsOrder
+from .archive import archived_years, open_archive
+import os
+import json
+import zipfile
+import datetime
+import argparse
+import importlib.util
+from array import array
+from sqlalchemy.orm import Session
+from sqlalchemy import select
+
+# pyarrow is optional. When it is installed the sales history is written as
+# Parquet (or Arrow IPC); otherwise the built-in columnar format below is used.
+# It takes a while to import, so it is only loaded by the first export that needs it.
+PYARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+pyarrow = None
+
+
+def _load_pyarrow():
+    global pyarrow
+    if pyarrow is None:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.ipc
+    return pyarrow
+
+
+# The supported columnar formats and the file extension used for each one.
+ANALYTICS_FORMATS = {'parquet': '.parquet', 'arrow': '.arrow', 'columnar': '.tsc'}
+
+# Number of order lines read and written per batch (one row group per batch).
+ANALYTICS_BATCH_SIZE = 50000
+
+# The denormalized sales history: one row per order line, with the order's date and customer.
+# Each column has a type code used by the built-in columnar format:
+#   'q' 64-bit integer, 'd' 64-bit float, 'date' days since 1970-01-01 (32-bit), 'str' dictionary-encoded text.
+SALES_COLUMNS = (
+    ('line_id', 'q'),
+    ('order_id', 'q'),
+    ('customer_id', 'q'),
+    ('date', 'date'),
+    ('brand', 'str'),
+    ('width', 'q'),
+    ('ratio', 'q'),
+    ('rim', 'q'),
+    ('price', 'd'),
+    ('quantity', 'q'),
+)
+
+_EPOCH = datetime.date(1970, 1, 1)
+
+
+def default_analytics_format() -> str:
+    """Returns 'parquet' when pyarrow is installed, otherwise the built-in 'columnar' format."""
+    return 'parquet' if PYARROW_AVAILABLE else 'columnar'
+
+
+def analytics_file_name(stem: str, file_format: str = None) -> str:
+    """Appends the extension of the given (or default) analytics format to a file name stem."""
+    return stem + ANALYTICS_FORMATS[file_format or default_analytics_format()]
+
+
+def _sales_statement(start_date: datetime.date = None, end_date: datetime.date = None):
+    stmt = (
+        select(
+            ProductsOrder.id, ProductsOrder.order_id, Order.customer_id, Order.date, ProductsOrder.brand,
+            ProductsOrder.width, ProductsOrder.ratio, ProductsOrder.rim, ProductsOrder.price, ProductsOrder.quantity,
+        )
+        .join(Order, ProductsOrder.order_id == Order.id)
+        .order_by(ProductsOrder.id)
+    )
+    return _in_range(stmt, start_date, end_date)
+
+
+def _in_range(stmt, start_date: datetime.date = None, end_date: datetime.date = None):
+    if start_date is not None:
+        stmt = stmt.where(Order.date >= start_date)
+    if end_date is not None:
+        stmt = stmt.where(Order.date <= end_date)
+    return stmt
+
+
+def sales_brands(session: Session, start_date: datetime.date = None, end_date: datetime.date = None) -> list[str]:
+    """Returns the distinct brands sold in the date range (archives included), sorted."""
+    stmt = _in_range(select(ProductsOrder.brand).distinct().join(Order, ProductsOrder.order_id == Order.id),
+                     start_date, end_date)
+    brands = set()
+    for year in archived_years(session, start_date, end_date):
+        with open_archive(session, year) as conn:
+            brands.update(conn.execute(stmt).scalars())
+    brands.update(session.execute(stmt).scalars())
+    brands.discard(None)
+    return sorted(brands)
+
+
+def _column_batches(result):
+    try:
+        for partition in result.partitions():
+            # Transpose the row tuples of this batch into one list per column.
+            columns = [list(values) for values in zip(*partition)]
+            yield {name: values for (name, _), values in zip(SALES_COLUMNS, columns)}
+    finally:
+        result.close()
+
+
+def iter_sales_batches(session: Session, start_date: datetime.date = None, end_date: datetime.date = None, batch_size: int = ANALYTICS_BATCH_SIZE):
+    """
+    Streams the sales history as column batches, including archived orders
+    (see database/archive.py) whose year falls in the date range.
+
+    Yields:
+        A dictionary mapping each column name in SALES_COLUMNS to a list holding
+        at most 'batch_size' values.
+    """
+    stmt = _sales_statement(start_date, end_date)
+    for year in archived_years(session, start_date, end_date):
+        with open_archive(session, year) as conn:
+            yield from _column_batches(conn.execute(stmt, execution_options={"yield_per": batch_size}))
+    yield from _column_batches(session.execute(stmt, execution_options={"yield_per": batch_size}))
+
+
+# --- pyarrow writers ---
+
+def _arrow_schema():
+    types = {'q': pyarrow.int64(), 'd': pyarrow.float64(), 'date': pyarrow.date32(), 'str': pyarrow.dictionary(pyarrow.int32(), pyarrow.string())}
+    return pyarrow.schema([(name, types[code]) for name, code in SALES_COLUMNS])
+
+
+def _arrow_batch(schema, batch: dict, dictionary, codes: dict):
+    arrays = []
+    for field in schema:
+        values = batch[field.name]
+        if pyarrow.types.is_dictionary(field.type):
+            # Every batch is encoded against the same dictionary: the IPC file format
+            # does not allow a dictionary to change between batches.
+            indices = pyarrow.array([codes.get(value) for value in values], type=pyarrow.int32())
+            arrays.append(pyarrow.DictionaryArray.from_arrays(indices, dictionary))
+        else:
+            arrays.append(pyarrow.array(values, type=field.type))
+    return pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _write_with_pyarrow(full_path: str, file_format: str, batches, brands: list[str], compression: str) -> int:
+    _load_pyarrow()
+    schema = _arrow_schema()
+    dictionary = pyarrow.array(brands, type=pyarrow.string())
+    codes = {brand: index for index, brand in enumerate(brands)}
+    count = 0
+    if file_format == 'parquet':
+        writer = pyarrow.parquet.ParquetWriter(full_path, schema, compression=compression)
+    else:
+        writer = pyarrow.ipc.new_file(full_path, schema, options=pyarrow.ipc.IpcWriteOptions(compression=compression))
+    try:
+        for batch in batches:
+            record_batch = _arrow_batch(schema, batch, dictionary, codes)
+            if file_format == 'parquet':
+                writer.write_batch(record_batch)
+            else:
+                writer.write(record_batch)
+            count += record_batch.num_rows
+    finally:
+        writer.close()
+    return count
+
+
+# --- Built-in columnar format ---
+#
+# A zip archive (deflate-compressed) with one member per column and row group:
+#   'rg00000/price' holds the raw bytes of an array('d') and so on.
+# Text columns are dictionary encoded: the member holds array('i') codes and the
+# dictionary itself is stored in 'schema.json' together with the column types
+# and the number of rows in each row group.
+
+def _write_columnar(full_path: str, batches) -> int:
+    dictionaries = {name: {} for name, code in SALES_COLUMNS if code == 'str'}
+    row_groups = []
+    with zipfile.ZipFile(full_path, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for index, batch in enumerate(batches):
+            rows = 0
+            for name, code in SALES_COLUMNS:
+                values = batch[name]
+                rows = len(values)
+                if code == 'str':
+                    lookup = dictionaries[name]
+                    data = array('i', (lookup.setdefault(value, len(lookup)) for value in values))
+                elif code == 'date':
+                    data = array('i', ((value - _EPOCH).days for value in values))
+                else:
+                    data = array(code, values)
+                archive.writestr(f'rg{index:05d}/{name}', data.tobytes())
+            row_groups.append(rows)
+
+        schema = {
+            'columns': [[name, code] for name, code in SALES_COLUMNS],
+            'row_groups': row_groups,
+            'dictionaries': {name: list(lookup) for name, lookup in dictionaries.items()},
+        }
+        archive.writestr('schema.json', json.dumps(schema, ensure_ascii=False))
+    return sum(row_groups)
+
+
+def read_columnar(full_path: str) -> dict:
+    """
+    Loads a file written in the built-in columnar format.
+
+    Returns:
+        A dictionary mapping each column name to a list of its values.
+    """
+    with zipfile.ZipFile(full_path) as archive:
+        schema = json.loads(archive.read('schema.json'))
+        columns = {name: [] for name, _ in schema['columns']}
+        for index in range(len(schema['row_groups'])):
+            for name, code in schema['columns']:
+                data = array(code if code in ('q', 'd') else 'i')
+                data.frombytes(archive.read(f'rg{index:05d}/{name}'))
+                if code == 'str':
+                    words = schema['dictionaries'][name]
+                    columns[name].extend(words[i] for i in data)
+                elif code == 'date':
+                    columns[name].extend(_EPOCH + datetime.timedelta(days=i) for i in data)
+                else:
+                    columns[name].extend(data)
+    return columns
+
+
+def export_sales_history(session: Session, path: str, file_name: str = None, file_format: str = None,
+                         start_date: datetime.date = None, end_date: datetime.date = None,
+                         batch_size: int = ANALYTICS_BATCH_SIZE, compression: str = 'zstd') -> str:
+    """
+    Exports the sales history (order lines joined with their orders) as a typed, compressed columnar file.
+
+    Args:
+        session: The SQLAlchemy session object for database interaction.
+        path: The directory path where the file will be saved.
+        file_name: The name of the output file. Defaults to 'sales' plus the format's extension.
+        file_format: 'parquet', 'arrow' or 'columnar'. Defaults to the best available format.
+        start_date: If given, only orders made on or after this day are exported.
+        end_date: If given, only orders made on or before this day are exported.
+        batch_size: The number of order lines per batch / row group.
+        compression: The codec used by pyarrow for 'parquet' and 'arrow' files.
+
+    Raises:
+        ValueError: If the format is unknown, or needs pyarrow and pyarrow is not installed.
+
+    Returns:
+        The full path of the written file.
+    """
+    file_format = file_format or default_analytics_format()
+    if file_format not in ANALYTICS_FORMATS:
+        raise ValueError(f"Unsupported analytics format '{file_format}'. Expected one of {tuple(ANALYTICS_FORMATS)}.")
+    if file_format != 'columnar' and not PYARROW_AVAILABLE:
+        raise ValueError(f"The '{file_format}' format requires pyarrow to be installed.")
+
+    os.makedirs(path, exist_ok=True)
+    full_path = os.path.join(path, file_name or analytics_file_name('sales', file_format))
+
+    batches = iter_sales_batches(session, start_date, end_date, batch_size)
+    if file_format == 'columnar':
+        _write_columnar(full_path, batches)
+    else:
+        brands = sales_brands(session, start_date, end_date)
+        _write_with_pyarrow(full_path, file_format, batches, brands, compression)
+    return full_path
+
+
+def _parse_date(value: str) -> datetime.date:
+    return datetime.date.fromisoformat(value)
+
+
+# Command-line entry point, used by export_sales.py in the project root.
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export the sales history as a columnar file.')
+    parser.add_argument('--out', default='.', help='directory the file is written to')
+    parser.add_argument('--name', default=None, help='output file name')
+    parser.add_argument('--format', default=None, choices=tuple(ANALYTICS_FORMATS))
+    parser.add_argument('--from', dest='start_date', type=_parse_date, default=None, help='first day (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='end_date', type=_parse_date, default=None, help='last day (YYYY-MM-DD)')
+    args = parser.parse_args(argv)
+
+    from .connection import session
+    from .schema import ensure_schema
+    ensure_schema(session.bind)
+    full_path = export_sales_history(session, args.out, args.name, args.format, args.start_date, args.end_date)
+    print(f"Sales history exported to {full_path}")
+
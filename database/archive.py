@@ -0,0 +1,202 @@
+import argparse
+import datetime
+import os
+import re
+from contextlib import contextmanager, ExitStack
+from sqlalchemy import MetaData, create_engine, select, func, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from .connection import Base, make_engine
+from .models import Order, ProductsOrder
+
+# Archives live in this folder next to the database file, one file per year.
+ARCHIVE_FOLDER = 'archive'
+_ARCHIVE_FILE = re.compile(r'^orders_(\d{4})\.db$')
+
+
+def archive_directory(session: Session) -> str:
+    """
+    Returns the folder of the archive databases of the session's database.
+
+    Raises:
+        ValueError: If the database is not a SQLite file (archives are attached SQLite files).
+    """
+    url = session.get_bind().url
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        raise ValueError("Order archives need a SQLite database file.")
+    return os.path.join(os.path.dirname(os.path.abspath(url.database)), ARCHIVE_FOLDER)
+
+
+def archive_path(directory: str, year: int) -> str:
+    return os.path.join(directory, f'orders_{year}.db')
+
+
+def archived_years(session: Session, start_date: datetime.date = None, end_date: datetime.date = None) -> list[int]:
+    """Returns the years with an archive database that overlap the date range, oldest first."""
+    try:
+        directory = archive_directory(session)
+    except ValueError:
+        return []
+    if not os.path.isdir(directory):
+        return []
+    years = sorted(int(match.group(1)) for match in map(_ARCHIVE_FILE.match, os.listdir(directory)) if match)
+    return [year for year in years
+            if (start_date is None or year >= start_date.year) and (end_date is None or year <= end_date.year)]
+
+
+@contextmanager
+def attached(conn, path: str, alias: str):
+    """
+    Attaches a SQLite database file to a connection for the duration of the block.
+
+    The connection must not be in a transaction: SQLite refuses to attach or detach
+    within one. Whatever the block leaves uncommitted is rolled back.
+    """
+    conn.exec_driver_sql(f'ATTACH DATABASE ? AS {alias}', (path,))
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        conn.exec_driver_sql(f'DETACH DATABASE {alias}')
+
+
+@contextmanager
+def open_archive(session: Session, year: int):
+    """
+    Yields a connection on which statements read the archive of a year: their tables
+    are looked up in the archive, which only has the order and order line tables.
+    """
+    alias = f'archive_{year}'
+    with session.get_bind().connect() as conn:
+        with attached(conn, archive_path(archive_directory(session), year), alias):
+            yield conn.execution_options(schema_translate_map={None: alias})
+
+
+@contextmanager
+def open_archives(session: Session, years: list[int]):
+    """
+    Yields a connection to the main database with the archives of the years attached,
+    for statements that combine live and archived rows (see archive_table).
+    """
+    directory = archive_directory(session)
+    with session.get_bind().connect() as conn, ExitStack() as stack:
+        for year in years:
+            stack.enter_context(attached(conn, archive_path(directory, year), f'archive_{year}'))
+        yield conn
+
+
+def archive_table(table, year: int):
+    """Returns a copy of an order table that names the table of a year's attached archive."""
+    return table.to_metadata(MetaData(), schema=f'archive_{year}')
+
+
+def _column_list(table) -> str:
+    return ', '.join(f'"{column.name}"' for column in table.columns)
+
+
+def _create_archive(path: str):
+    engine = create_engine(f'sqlite:///{path}')
+    try:
+        Base.metadata.create_all(engine, tables=[Order.__table__, ProductsOrder.__table__])
+    finally:
+        engine.dispose()
+
+
+def archive_orders(session: Session, cutoff: datetime.date, directory: str = None, compact: bool = True) -> dict:
+    """
+    Moves the orders made before 'cutoff' (and their lines) into per-year archive databases.
+
+    For every archived day and branch a row of sales_rollup keeps the totals, so sales
+    reports stay complete without opening the archives. Each year is moved in one
+    transaction over the main database and its archive; running the job again after an
+    interruption finishes the work. Deleting archived orders is not shipped to the head
+    office (database/sync.py), so sync before archiving.
+
+    Args:
+        session: The session of the main database. Pending changes are committed first.
+        cutoff: The first day that stays in the main database.
+        directory: The archive folder. Defaults to archive_directory(session).
+        compact: If True, the database file is compacted (VACUUM) afterwards so it shrinks.
+
+    Raises:
+        ValueError: If the database is not a SQLite file.
+
+    Returns:
+        A dictionary with the number of archived 'orders' and 'lines' and the 'years' touched.
+    """
+    directory = directory or archive_directory(session)
+    os.makedirs(directory, exist_ok=True)
+    session.commit()
+    order, line = Order.__table__, ProductsOrder.__table__
+    report = {'orders': 0, 'lines': 0, 'years': []}
+
+    with session.get_bind().connect() as conn:
+        oldest = conn.execute(select(func.min(order.c.date)).where(order.c.date < cutoff)).scalar()
+        # SQLite reuses the largest id once it is deleted; the newest order stays so
+        # new orders never get the id of an archived one.
+        newest = conn.execute(select(func.max(order.c.id))).scalar()
+        conn.rollback()
+        if oldest is None:
+            return report
+
+        for year in range(oldest.year, cutoff.year + 1):
+            start, end = datetime.date(year, 1, 1), min(datetime.date(year + 1, 1, 1), cutoff)
+            params = {'start': start.isoformat(), 'end': end.isoformat(), 'newest': newest}
+            moved = 'SELECT id FROM main."order" WHERE date >= :start AND date < :end AND id < :newest'
+            found = conn.execute(text(f'SELECT EXISTS ({moved})'), params).scalar()
+            conn.rollback()
+            if not found:
+                continue
+            path = archive_path(directory, year)
+            if not os.path.exists(path):
+                _create_archive(path)
+            alias = f'archive_{year}'
+            with attached(conn, path, alias):
+                orders = conn.execute(text(
+                    f'INSERT OR REPLACE INTO {alias}."order" ({_column_list(order)}) '
+                    f'SELECT {_column_list(order)} FROM main."order" WHERE id IN ({moved})'), params).rowcount
+                lines = conn.execute(text(
+                    f'INSERT OR REPLACE INTO {alias}.products_order ({_column_list(line)}) '
+                    f'SELECT {_column_list(line)} FROM main.products_order WHERE order_id IN ({moved})'), params).rowcount
+                conn.execute(text(
+                    'INSERT INTO main.sales_rollup (day, branch_id, orders, lines, tires, revenue) '
+                    'SELECT o.date, o.branch_id, COUNT(DISTINCT o.id), COUNT(l.id), '
+                    '       COALESCE(SUM(l.quantity), 0), COALESCE(SUM(l.price * l.quantity), 0) '
+                    f'FROM main."order" o LEFT JOIN main.products_order l ON l.order_id = o.id WHERE o.id IN ({moved}) '
+                    'GROUP BY o.date, o.branch_id '
+                    'ON CONFLICT (day, branch_id) DO UPDATE SET orders = orders + excluded.orders, '
+                    'lines = lines + excluded.lines, tires = tires + excluded.tires, revenue = revenue + excluded.revenue'
+                ), params)
+                last_change = conn.execute(text('SELECT COALESCE(MAX(id), 0) FROM main.change_log')).scalar()
+                conn.execute(text(f'DELETE FROM main.products_order WHERE order_id IN ({moved})'), params)
+                conn.execute(text(f'DELETE FROM main."order" WHERE id IN ({moved})'), params)
+                # The rows still exist (in the archive); the head office keeps them.
+                conn.execute(text("DELETE FROM main.change_log WHERE id > :last AND operation = 'd'"), {'last': last_change})
+                conn.commit()
+            report['orders'] += orders
+            report['lines'] += lines
+            report['years'].append(year)
+
+        if compact and report['orders']:
+            conn.exec_driver_sql('VACUUM')
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Move old orders into per-year archive databases.')
+    parser.add_argument('--keep-days', type=int, default=730, help='days of orders that stay in the main database')
+    parser.add_argument('--database', default=None, help='database URL (default: TIRESHOP_DATABASE_URL or the local file)')
+    args = parser.parse_args(argv)
+
+    engine = make_engine(args.database)
+    session = sessionmaker(bind=engine)()
+    try:
+        report = archive_orders(session, datetime.date.today() - datetime.timedelta(days=args.keep_days))
+    finally:
+        session.close()
+        engine.dispose()
+    print(f"Archived {report['orders']} orders ({report['lines']} lines) of {report['years'] or 'no years'}.")
+
+
+if __name__ == '__main__':
+    main()
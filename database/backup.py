@@ -1,5 +1,8 @@
 import shutil
 import os
+from .resolver import resolver
+from .cache import read_cache
+from .schema import forget_schema_check
 
 
 def backup_database(source_db_path: str, backup_db_path: str) -> None:
@@ -43,4 +46,8 @@ def restore_database(backup_db_path: str, target_db_path: str) -> None:
         raise FileNotFoundError(f"Target database directory does not exist: {os.path.dirname(target_db_path)}")
     
     # Copy the backup file to the target path, overwriting if it exists.
-    shutil.copy(backup_db_path, target_db_path)
\ No newline at end of file
+    shutil.copy(backup_db_path, target_db_path)
+    # Cached brand and size ids, cached reads and the schema check belong to the replaced database.
+    resolver.clear()
+    read_cache.clear()
+    forget_schema_check()
\ No newline at end of file
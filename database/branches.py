@@ -0,0 +1,158 @@
+from .models import Branch, BranchStock, StockAvailability, Product, Brand, Size, DEFAULT_BRANCH_ID
+from .stock import move_stock
+from .Exeptions import BranchNotExistsException
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, delete, func, literal, false
+
+
+# The name of the branch created with a new database (and for databases from before branches).
+DEFAULT_BRANCH_NAME = 'Main'
+
+
+def create_branch(session: Session, name: str) -> dict:
+    """
+    Adds a branch to the chain. Its stock starts empty.
+
+    Raises:
+        ValueError: If a branch with this name already exists.
+
+    Returns:
+        The new branch as a dictionary.
+    """
+    if session.execute(select(Branch.id).where(Branch.name == name)).first():
+        raise ValueError(f"Branch '{name}' already exists.")
+    branch = Branch(name=name)
+    session.add(branch)
+    session.commit()
+    return branch.to_dict()
+
+
+def get_all_branches(session: Session) -> list[dict]:
+    return [branch.to_dict() for branch in session.execute(select(Branch).order_by(Branch.id)).scalars()]
+
+
+def _check_branch(session: Session, branch_id: int) -> int:
+    branch_id = int(branch_id)
+    if session.get(Branch, branch_id) is None:
+        raise BranchNotExistsException(branch_id)
+    return branch_id
+
+
+def get_branch_quantity(session: Session, branch_id: int, product_id: int) -> int:
+    """Returns a product's stock in one branch (0 if the branch never had it)."""
+    quantity = session.execute(select(BranchStock.quantity).where(
+        BranchStock.branch_id == int(branch_id), BranchStock.product_id == int(product_id))).scalar()
+    return quantity or 0
+
+
+def get_branch_stock(session: Session, branch_id: int, in_stock_only: bool = False) -> list[dict]:
+    """
+    Returns the products a branch has stock records for, in the shape of Product.to_dict
+    but with the branch's quantity.
+
+    The query starts from the branch's rows of branch_stock (its primary key begins
+    with the branch), so the cost depends on the branch's assortment, not the chain's.
+    """
+    stmt = (
+        select(Product.id, Product.brand_id, Product.size_id, Brand.name, Size.width, Size.ratio, Size.rim,
+               Product.price, BranchStock.quantity)
+        .select_from(BranchStock)
+        .join(Product, Product.id == BranchStock.product_id)
+        .join(Brand, Product.brand_id == Brand.id)
+        .join(Size, Product.size_id == Size.id)
+        .where(BranchStock.branch_id == int(branch_id), Product.deleted == false())
+        .order_by(Product.id)
+    )
+    if in_stock_only:
+        stmt = stmt.where(BranchStock.quantity > 0)
+    return [
+        {'id': row.id, 'brand_id': row.brand_id, 'size_id': row.size_id, 'brand': row.name,
+         'size': {'width': row.width, 'ratio': row.ratio, 'rim': row.rim},
+         'price': row.price, 'quantity': row.quantity}
+        for row in session.execute(stmt)
+    ]
+
+
+def transfer_stock(session: Session, product_id: int, from_branch_id: int, to_branch_id: int, quantity: int,
+                   note: str = None) -> None:
+    """
+    Moves stock of a product from one branch to another in a single transaction.
+
+    Raises:
+        ValueError: If the quantity is not positive or both branches are the same.
+        BranchNotExistsException: If a branch does not exist.
+        InsufficientStockException: If the source branch has less than 'quantity' units.
+    """
+    quantity = int(quantity)
+    if quantity <= 0:
+        raise ValueError("The quantity to transfer must be positive.")
+    if int(from_branch_id) == int(to_branch_id):
+        raise ValueError("A transfer needs two different branches.")
+    try:
+        from_branch_id = _check_branch(session, from_branch_id)
+        to_branch_id = _check_branch(session, to_branch_id)
+        move_stock(session, product_id, 'transfer', -quantity, note=note or f"to branch {to_branch_id}", branch_id=from_branch_id)
+        move_stock(session, product_id, 'transfer', quantity, note=note or f"from branch {from_branch_id}", branch_id=to_branch_id)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+
+def get_size_availability(session: Session, width: int, ratio: int, rim: int, min_quantity: int = 1) -> list[dict]:
+    """
+    Answers "who has 205/55R16 in stock": the branches with at least 'min_quantity'
+    tires of the size (over all brands), most stock first.
+
+    Reads the precomputed availability index (one row per size and branch), so the
+    lookup never touches the products or the branch stock.
+    """
+    size_id = session.execute(select(Size.id).where(Size.width == width, Size.ratio == ratio, Size.rim == rim)).scalar()
+    if size_id is None:
+        return []
+    rows = session.execute(
+        select(StockAvailability.branch_id, Branch.name, StockAvailability.quantity)
+        .outerjoin(Branch, Branch.id == StockAvailability.branch_id)
+        .where(StockAvailability.size_id == size_id, StockAvailability.quantity >= min_quantity)
+        .order_by(StockAvailability.quantity.desc(), StockAvailability.branch_id)
+    )
+    return [{'branch_id': branch_id, 'branch': name, 'quantity': quantity} for branch_id, name, quantity in rows]
+
+
+def _availability_from_branch_stock():
+    # One row per size and branch: the branch's stock of all products of that size.
+    return (select(Product.size_id, BranchStock.branch_id, func.sum(BranchStock.quantity))
+            .join(Product, Product.id == BranchStock.product_id)
+            .group_by(Product.size_id, BranchStock.branch_id))
+
+
+def rebuild_availability(session: Session) -> int:
+    """
+    Recomputes the availability index from the branch stock, e.g. after repairing data by hand.
+
+    Returns:
+        The number of index rows.
+    """
+    count = refill_availability(session)
+    session.commit()
+    return count
+
+
+def refill_availability(conn) -> int:
+    """Recomputes the availability index on a connection or session, without committing."""
+    conn.execute(delete(StockAvailability))
+    return conn.execute(insert(StockAvailability).from_select(
+        ['size_id', 'branch_id', 'quantity'], _availability_from_branch_stock())).rowcount
+
+
+def ensure_default_branch(conn) -> None:
+    """Creates the default branch and moves all existing stock into it (schema upgrade to branches)."""
+    if conn.execute(select(func.count()).select_from(Branch)).scalar() == 0:
+        # The first row gets id 1 (DEFAULT_BRANCH_ID) from the id sequence on every backend.
+        conn.execute(insert(Branch).values(name=DEFAULT_BRANCH_NAME))
+    if conn.execute(select(func.count()).select_from(BranchStock)).scalar() == 0:
+        conn.execute(insert(BranchStock).from_select(
+            ['branch_id', 'product_id', 'quantity'],
+            select(literal(DEFAULT_BRANCH_ID), Product.id, Product.quantity)
+        ))
+        refill_availability(conn)
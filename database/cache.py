@@ -0,0 +1,267 @@
+import os
+import re
+import sys
+import time
+import threading
+import weakref
+import functools
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+from sqlalchemy.orm import Session
+
+
+# Seconds a cached read is served. Writes made by this process drop the affected entries
+# at once; the limit bounds how long a write of another terminal can go unseen.
+# TIRESHOP_CACHE_TTL=0 turns the cache off.
+CACHE_TTL = float(os.environ.get('TIRESHOP_CACHE_TTL') or 30)
+
+# About how much memory the cached values of one database may take.
+CACHE_MAX_BYTES = int(float(os.environ.get('TIRESHOP_CACHE_MB') or 32) * 1024 * 1024)
+
+# Most entries kept per database (e.g. one per product looked up by id).
+CACHE_MAX_ENTRIES = 2000
+
+# The tables the cached reads of each namespace depend on. A committed write to one of
+# them drops the namespace's entries.
+NAMESPACES = {
+    'products': ('product', 'brand', 'size'),
+    'customers': ('customer',),
+    'users': ('user',),
+}
+
+# Raw SQL (text() or exec_driver_sql) that writes; its table is not known, so it drops everything.
+_RAW_WRITE = re.compile(r'\s*(INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+
+
+def _size_of(value) -> int:
+    """Roughly the memory taken by a cached value (lists and dictionaries are followed)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_size_of(key) + _size_of(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_size_of(item) for item in value)
+    return size
+
+
+class _Entry:
+    __slots__ = ('value', 'expires', 'size', 'namespace')
+
+    def __init__(self, value, expires: float, size: int, namespace: str):
+        self.value = value
+        self.expires = expires
+        self.size = size
+        self.namespace = namespace
+
+
+class _Store:
+    """The entries of one database, least recently used first."""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.size = 0
+        # namespace -> number of invalidations; a read that overlapped one is not stored.
+        self.generations = dict.fromkeys(NAMESPACES, 0)
+
+
+# A process-wide read-through cache for the list and lookup reads the UI repeats on
+# every view change (see the @cached functions in database/crud.py).
+#
+# Like the brand/size resolver, entries are kept per engine. Every statement that writes
+# to a table is noted on its connection, and when that connection commits or rolls back,
+# the namespaces depending on the table are dropped. Cached values are shared between
+# callers and must not be modified.
+class ReadCache:
+    def __init__(self, ttl: float = CACHE_TTL, max_bytes: int = CACHE_MAX_BYTES, max_entries: int = CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stores = weakref.WeakKeyDictionary()
+        self.reset_stats()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def reset_stats(self):
+        with self._lock:
+            # namespace -> {'hits', 'misses', 'evictions', 'invalidations'}
+            self.counters = {namespace: dict.fromkeys(('hits', 'misses', 'evictions', 'invalidations'), 0)
+                             for namespace in NAMESPACES}
+
+    def _store(self, engine: Engine) -> _Store:
+        store = self._stores.get(engine)
+        if store is None:
+            store = self._stores[engine] = _Store()
+        return store
+
+    def _drop(self, store: _Store, key):
+        entry = store.entries.pop(key)
+        store.size -= entry.size
+        return entry
+
+    def get(self, engine: Engine, namespace: str, key, load):
+        """Returns the cached value of 'key', or calls load() and caches what it returns."""
+        key = (namespace, key)
+        with self._lock:
+            store = self._store(engine)
+            entry = store.entries.get(key)
+            if entry is not None:
+                if entry.expires > time.monotonic():
+                    store.entries.move_to_end(key)
+                    self.counters[namespace]['hits'] += 1
+                    return entry.value
+                self._drop(store, key)
+            self.counters[namespace]['misses'] += 1
+            generation = store.generations[namespace]
+
+        value = load()
+        size = _size_of(value)
+        with self._lock:
+            # Too big to keep, or a write was committed while loading: the value may be stale.
+            if size > self.max_bytes or store.generations[namespace] != generation:
+                return value
+            if key in store.entries:
+                self._drop(store, key)
+            store.entries[key] = _Entry(value, time.monotonic() + self.ttl, size, namespace)
+            store.size += size
+            while store.size > self.max_bytes or len(store.entries) > self.max_entries:
+                evicted = self._drop(store, next(iter(store.entries)))
+                self.counters[evicted.namespace]['evictions'] += 1
+        return value
+
+    def invalidate(self, engine: Engine, namespaces) -> None:
+        """Drops the entries of the namespaces for the engine's database."""
+        with self._lock:
+            store = self._stores.get(engine)
+            if store is None:
+                return
+            for namespace in namespaces:
+                store.generations[namespace] += 1
+                self.counters[namespace]['invalidations'] += 1
+            for key in [key for key in store.entries if key[0] in namespaces]:
+                self._drop(store, key)
+
+    def invalidate_tables(self, engine: Engine, tables) -> None:
+        """Drops the namespaces that depend on any of the tables ('*' stands for every table)."""
+        namespaces = [namespace for namespace, depends_on in NAMESPACES.items()
+                      if '*' in tables or not tables.isdisjoint(depends_on)]
+        if namespaces:
+            self.invalidate(engine, namespaces)
+
+    def clear(self):
+        """Drops every entry, e.g. after the database file has been restored from a backup."""
+        with self._lock:
+            for store in self._stores.values():
+                for namespace in store.generations:
+                    store.generations[namespace] += 1
+                store.entries.clear()
+                store.size = 0
+
+    def stats(self) -> list[dict]:
+        """
+        Returns the metrics of each namespace: 'hits', 'misses', 'hit_rate', 'evictions',
+        'invalidations', and the 'entries' and 'bytes' currently cached (over all databases).
+        """
+        with self._lock:
+            result = []
+            for namespace, counters in self.counters.items():
+                entries = [entry for store in self._stores.values() for entry in store.entries.values()
+                           if entry.namespace == namespace]
+                reads = counters['hits'] + counters['misses']
+                result.append({'namespace': namespace, **counters, 'hit_rate': counters['hits'] / reads if reads else 0.0,
+                               'entries': len(entries), 'bytes': sum(entry.size for entry in entries)})
+            return result
+
+
+read_cache = ReadCache()
+
+
+def _writes_pending(session: Session, namespace: str) -> bool:
+    # A session sees its own uncommitted writes; the cache must not serve (or keep) other data to it.
+    if session.new or session.dirty or session.deleted:
+        return True
+    if not session.in_transaction():
+        return False
+    written = session.connection().info.get('cache_written')
+    return bool(written) and ('*' in written or not written.isdisjoint(NAMESPACES[namespace]))
+
+
+def _freeze(value):
+    # Arguments become part of the key, so lists and dictionaries (e.g. filters) are made hashable.
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def cached(namespace: str):
+    """
+    Serves a read function of the form function(session, *args) from read_cache.
+
+    The function's result must only depend on the namespace's tables (see NAMESPACES).
+    The original function stays available as 'function.uncached'.
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(session: Session, *args, **kwargs):
+            if not read_cache.enabled or _writes_pending(session, namespace):
+                return function(session, *args, **kwargs)
+            key = (function.__name__, _freeze(args), _freeze(kwargs))
+            return read_cache.get(session.get_bind(), namespace, key, lambda: function(session, *args, **kwargs))
+        wrapper.uncached = function
+        return wrapper
+    return decorate
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _note_write(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and (context.isinsert or context.isupdate or context.isdelete):
+        table = getattr(getattr(context.compiled, 'statement', None), 'table', None)
+        name = getattr(table, 'name', None) or '*'
+    elif _RAW_WRITE.match(statement):
+        name = '*'
+    else:
+        return
+    conn.info.setdefault('cache_written', set()).add(name)
+
+
+# Readers on other connections cannot see the write before the commit (SQLite even
+# makes them wait for it), but the 'commit' event comes before the database commits:
+# a read in between would still load the old rows. So the entries are dropped as the
+# commit starts, and dropped again once it is done, i.e. when the connection begins its
+# next transaction or goes back to the pool; a read under way at either point is not
+# stored (see the generations in ReadCache.get).
+@event.listens_for(Engine, 'commit')
+def _committing(conn):
+    written = conn.info.pop('cache_written', None)
+    if written:
+        read_cache.invalidate_tables(conn.engine, written)
+        conn.info['cache_committed'] = (conn.engine, written)
+
+
+@event.listens_for(Engine, 'rollback')
+def _rolled_back(conn):
+    written = conn.info.pop('cache_written', None)
+    if written:
+        read_cache.invalidate_tables(conn.engine, written)
+
+
+def _committed(info: dict):
+    committed = info.pop('cache_committed', None)
+    if committed:
+        read_cache.invalidate_tables(*committed)
+
+
+@event.listens_for(Engine, 'begin')
+def _next_transaction(conn):
+    _committed(conn.info)
+
+
+@event.listens_for(Pool, 'checkin')
+def _checked_in(dbapi_connection, connection_record):
+    if connection_record is not None:
+        _committed(connection_record.info)
@@ -0,0 +1,392 @@
+from .models import Product, Size, Brand, StockMovement, BranchStock, DEFAULT_BRANCH_ID
+from .stock import last_movement_id, apply_movements_to_branches, move_stock
+from .Exeptions import StockConflictException
+import datetime
+from .resolver import insert_ignore
+import os
+import csv
+import re
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, bindparam
+
+
+# Number of price list rows written per transaction.
+IMPORT_CHUNK_SIZE = 1000
+
+# How many times a product's quantity is set when a sale at another terminal keeps changing it meanwhile.
+IMPORT_ATTEMPTS = 5
+
+# Accepted spellings of each column header in supplier files (compared in lower case).
+HEADER_ALIASES = {
+    'brand': ('brand', 'brand_name', 'manufacturer', 'برند'),
+    'size': ('size', 'tire_size', 'سایز'),
+    'width': ('width', 'پهنا'),
+    'ratio': ('ratio', 'aspect', 'aspect_ratio', 'profile', 'نسبت'),
+    'rim': ('rim', 'diameter', 'رینگ'),
+    'price': ('price', 'unit_price', 'قیمت'),
+    'quantity': ('quantity', 'qty', 'stock', 'تعداد'),
+}
+
+# Matches sizes written as '205/55R16', '205/55 R16' or '205/55/16'.
+SIZE_PATTERN = re.compile(r'^\s*(\d+)\s*/\s*(\d+)\s*(?:Z?R|/|-)?\s*(\d+)\s*$', re.IGNORECASE)
+
+
+class ImportReport:
+    """The outcome of a price list import: counters, the diff and the rejected rows."""
+
+    def __init__(self, dry_run: bool):
+        self.dry_run = dry_run
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.new_brands = 0
+        self.new_sizes = 0
+        # Human-readable change lines, e.g. '+ Michelin 205/55/16 price=120.0 quantity=4'.
+        self.diff: list[str] = []
+        # (line number, reason) for every row that could not be imported.
+        self.skipped: list[tuple[int, str]] = []
+
+    def summary(self) -> str:
+        prefix = 'Dry run: ' if self.dry_run else ''
+        return (f"{prefix}{self.created} created, {self.updated} updated, {self.unchanged} unchanged, "
+                f"{len(self.skipped)} skipped ({self.new_brands} new brands, {self.new_sizes} new sizes)")
+
+    def format(self) -> str:
+        lines = list(self.diff)
+        lines.extend(f"! line {line}: {reason}" for line, reason in self.skipped)
+        lines.append(self.summary())
+        return '\n'.join(lines)
+
+
+def _normalize_headers(headers) -> dict:
+    """Maps each known field to the index of its column in the file."""
+    positions = {}
+    for index, header in enumerate(headers):
+        header = str(header or '').strip().lower()
+        for field, aliases in HEADER_ALIASES.items():
+            if header in aliases and field not in positions:
+                positions[field] = index
+    if 'brand' not in positions or 'price' not in positions:
+        raise ValueError("The price list must have at least a 'brand' and a 'price' column.")
+    if 'size' not in positions and not {'width', 'ratio', 'rim'} <= positions.keys():
+        raise ValueError("The price list must have a 'size' column or 'width', 'ratio' and 'rim' columns.")
+    return positions
+
+
+def _iter_raw_rows(file_path: str):
+    """Yields the rows of a CSV or Excel file as lists of cell values, header first."""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        # openpyxl is optional, only needed for Excel price lists and slow to import,
+        # so it is imported here rather than when the application starts.
+        try:
+            import openpyxl
+        except ImportError:
+            raise ValueError("Reading Excel price lists requires openpyxl to be installed.")
+        # read_only mode streams the sheet instead of loading the whole workbook.
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            workbook.close()
+    else:
+        # 'utf-8-sig' also accepts files saved by Excel with a byte order mark.
+        with open(file_path, newline='', encoding='utf-8-sig') as f:
+            sample = f.read(4096)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+            except csv.Error:
+                dialect = csv.excel
+            yield from csv.reader(f, dialect)
+
+
+def iter_price_list(file_path: str):
+    """
+    Streams a supplier price list.
+
+    Yields:
+        (line number, row) pairs. 'row' is a dict with the keys brand, width, ratio,
+        rim, price and quantity (None when the file has no quantity column), or a
+        string describing why the row is invalid.
+    """
+    rows = _iter_raw_rows(file_path)
+    header = next(rows, None)
+    if header is None:
+        return
+    positions = _normalize_headers(header)
+
+    def cell(values, field):
+        index = positions.get(field)
+        if index is None or index >= len(values) or values[index] is None:
+            return ''
+        return str(values[index]).strip()
+
+    for line, values in enumerate(rows, start=2):
+        if not any(str(value or '').strip() for value in values):
+            continue
+        brand = cell(values, 'brand')
+        if not brand:
+            yield line, "missing brand"
+            continue
+        try:
+            if 'size' in positions and cell(values, 'size'):
+                match = SIZE_PATTERN.match(cell(values, 'size'))
+                if not match:
+                    yield line, f"invalid size '{cell(values, 'size')}'"
+                    continue
+                width, ratio, rim = (int(group) for group in match.groups())
+            else:
+                width, ratio, rim = (int(float(cell(values, field))) for field in ('width', 'ratio', 'rim'))
+            price = float(cell(values, 'price').replace(',', ''))
+            quantity = cell(values, 'quantity')
+            quantity = int(float(quantity)) if quantity else None
+        except ValueError:
+            yield line, "invalid number"
+            continue
+        if price < 0 or (quantity is not None and quantity < 0):
+            yield line, "negative price or quantity"
+            continue
+        yield line, {'brand': brand, 'width': width, 'ratio': ratio, 'rim': rim, 'price': price, 'quantity': quantity}
+
+
+def _chunks(iterable, size: int):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _resolve_brands(session: Session, brands: dict, names: set) -> int:
+    """Inserts the missing brand names in one statement and adds their ids to the map."""
+    missing = [name for name in names if name not in brands]
+    if missing:
+        session.execute(insert_ignore(session, Brand), [{'name': name} for name in missing])
+        for brand_id, name in session.execute(select(Brand.id, Brand.name).where(Brand.name.in_(missing))):
+            brands[name] = brand_id
+    return len(missing)
+
+
+def _resolve_sizes(session: Session, sizes: dict, keys: set) -> int:
+    """Inserts the missing (width, ratio, rim) sizes in one statement and adds their ids to the map."""
+    missing = [key for key in keys if key not in sizes]
+    if missing:
+        session.execute(insert_ignore(session, Size), [{'width': w, 'ratio': r, 'rim': rim} for w, r, rim in missing])
+        widths = {w for w, _, _ in missing}
+        # Oldest first, like the resolver, in case a size is stored twice.
+        rows = session.execute(select(Size.id, Size.width, Size.ratio, Size.rim).where(Size.width.in_(widths)).order_by(Size.id))
+        for size_id, w, r, rim in rows:
+            sizes.setdefault((w, r, rim), size_id)
+    return len(missing)
+
+
+def _set_quantity(session: Session, product_id: int, quantity: int, current: int, version: int):
+    """
+    Books the difference between 'quantity' and the product's stock as an adjustment.
+
+    The change is only applied while the product still has 'version' (the one 'current'
+    was read with); after a sale at another terminal the stock is read again and the
+    difference computed anew, so the sale is neither lost nor booked twice.
+    """
+    for _ in range(IMPORT_ATTEMPTS):
+        if quantity == current:
+            return
+        try:
+            move_stock(session, product_id, 'adjustment', quantity - current, note='price list import', expected_version=version)
+            return
+        except StockConflictException:
+            # Nothing was written (the conditional UPDATE matched no row); read it again.
+            current, version = session.execute(
+                select(Product.quantity, Product.version).where(Product.id == product_id)).one()
+    raise StockConflictException(product_id)
+
+
+def import_price_list(session: Session, file_path: str, dry_run: bool = False, add_quantity: bool = False,
+                      chunk_size: int = IMPORT_CHUNK_SIZE) -> ImportReport:
+    """
+    Creates or updates products from a supplier price list (CSV or Excel).
+
+    The file is streamed in chunks. Brands, sizes and existing products are looked
+    up in in-memory maps loaded once, and every chunk is written with a few
+    executemany statements in a single transaction. Stock changes go through the
+    stock ledger (move_stock) against the products as they are at that moment, so
+    sales made during the import are kept.
+
+    Args:
+        session: The database session object.
+        file_path: The path of the .csv or .xlsx file.
+        dry_run: If True, nothing is written and the report only describes the changes.
+        add_quantity: If True, quantities in the file are added to the current stock
+            instead of replacing it. Either way the change is booked on the main branch,
+            so a quantity replacing the stock of a product other branches hold is
+            skipped (its price is still updated).
+        chunk_size: The number of rows written per transaction.
+
+    Raises:
+        ValueError: If the file is missing required columns or cannot be read.
+
+    Returns:
+        An ImportReport describing the created, updated and skipped rows.
+    """
+    report = ImportReport(dry_run)
+
+    brands = dict((name, brand_id) for brand_id, name in session.execute(select(Brand.id, Brand.name)))
+    sizes = dict(((w, r, rim), size_id) for size_id, w, r, rim in session.execute(select(Size.id, Size.width, Size.ratio, Size.rim)))
+    # Existing products keyed by (brand name, width, ratio, rim) -> [id, price, quantity, version].
+    # Deleted products are included: a price list carrying one again brings it back.
+    products = {}
+    deleted = set()
+    stmt = (
+        select(Product.id, Brand.name, Size.width, Size.ratio, Size.rim, Product.price, Product.quantity, Product.version,
+               Product.deleted)
+        .join(Brand, Product.brand_id == Brand.id)
+        .join(Size, Product.size_id == Size.id)
+    )
+    for product_id, name, w, r, rim, price, quantity, version, is_deleted in session.execute(stmt):
+        products[(name, w, r, rim)] = [product_id, price, quantity, version]
+        if is_deleted:
+            deleted.add(product_id)
+    by_id = {entry[0]: entry for entry in products.values()}
+
+    product_table = Product.__table__
+    price_stmt = (
+        product_table.update()
+        .where(product_table.c.id == bindparam('product_id'))
+        .values(price=bindparam('new_price'), deleted=False, version=product_table.c.version + 1)
+    )
+
+    for chunk in _chunks(iter_price_list(file_path), chunk_size):
+        # Later rows for the same product win over earlier ones in the same chunk.
+        pending = {}
+        for line, row in chunk:
+            if isinstance(row, str):
+                report.skipped.append((line, row))
+                continue
+            pending[(row['brand'], row['width'], row['ratio'], row['rim'])] = (line, row)
+
+        # The chunk's products as they are now: sales may have changed them since the maps were loaded.
+        known = [products[key][0] for key in pending if key in products and products[key][0] is not None]
+        if known:
+            for product_id, price, quantity, version in session.execute(
+                    select(Product.id, Product.price, Product.quantity, Product.version).where(Product.id.in_(known))):
+                by_id[product_id][1:] = [price, quantity, version]
+        # Quantity changes are booked on the main branch; these products have stock in other branches too.
+        elsewhere = set()
+        if known:
+            elsewhere.update(session.execute(
+                select(BranchStock.product_id)
+                .where(BranchStock.product_id.in_(known), BranchStock.branch_id != DEFAULT_BRANCH_ID, BranchStock.quantity != 0)
+            ).scalars())
+
+        new_rows = []
+        changed = 0
+        price_rows = []
+        # (product id, quantity in the file, stock and version it was compared with) of changed stock.
+        quantity_rows = []
+        # (product id, movement kind, signed change) for the stock ledger of new products.
+        stock_changes = []
+        for key, (line, row) in pending.items():
+            label = f"{key[0]} {key[1]}/{key[2]}/{key[3]}"
+            existing = products.get(key)
+            if existing is None:
+                quantity = row['quantity'] or 0
+                new_rows.append((key, row['price'], quantity))
+                report.diff.append(f"+ {label} price={row['price']} quantity={quantity}")
+                continue
+
+            product_id, old_price, old_quantity, version = existing
+            if row['quantity'] is None:
+                quantity = old_quantity
+            elif add_quantity:
+                quantity = old_quantity + row['quantity']
+            else:
+                quantity = row['quantity']
+            # The file's quantity is the chain-wide stock, which the main branch alone cannot be set to.
+            refused = quantity != old_quantity and not add_quantity and product_id in elsewhere
+            if refused:
+                report.skipped.append((line, f"{label}: quantity not changed, other branches hold stock of it"))
+                quantity = old_quantity
+            restored = product_id in deleted
+            if row['price'] == old_price and quantity == old_quantity and not restored:
+                if not refused:
+                    report.unchanged += 1
+                continue
+            changes = ['restored'] if restored else []
+            if row['price'] != old_price:
+                changes.append(f"price {old_price} -> {row['price']}")
+            if quantity != old_quantity:
+                changes.append(f"quantity {old_quantity} -> {quantity}")
+            report.diff.append(f"~ {label} " + ', '.join(changes))
+            changed += 1
+            if row['price'] != old_price or restored:
+                price_rows.append({'product_id': product_id, 'new_price': row['price']})
+                deleted.discard(product_id)
+            if quantity != old_quantity:
+                quantity_rows.append((product_id, row['quantity'], old_quantity, version))
+            existing[1], existing[2] = row['price'], quantity
+
+        report.created += len(new_rows)
+        report.updated += changed
+
+        if dry_run:
+            # Remember the would-be products so duplicates in later chunks are reported as updates.
+            for key, price, quantity in new_rows:
+                products[key] = [None, price, quantity, None]
+                if key[0] not in brands:
+                    brands[key[0]] = None
+                    report.new_brands += 1
+                if key[1:] not in sizes:
+                    sizes[key[1:]] = None
+                    report.new_sizes += 1
+            continue
+
+        try:
+            report.new_brands += _resolve_brands(session, brands, {key[0] for key, _, _ in new_rows})
+            report.new_sizes += _resolve_sizes(session, sizes, {key[1:] for key, _, _ in new_rows})
+            if new_rows:
+                session.execute(insert(Product), [
+                    {'brand_id': brands[key[0]], 'size_id': sizes[key[1:]], 'price': price, 'quantity': quantity}
+                    for key, price, quantity in new_rows
+                ])
+            # The stock first: a price change bumps the version the adjustments are checked against.
+            for product_id, quantity, current, version in quantity_rows:
+                if add_quantity:
+                    move_stock(session, product_id, 'restock', quantity, note='price list import')
+                else:
+                    _set_quantity(session, product_id, quantity, current, version)
+            if price_rows:
+                session.execute(price_stmt, price_rows)
+            if new_rows:
+                created_ids = session.execute(
+                    select(Product.id, Product.brand_id, Product.size_id)
+                    .where(Product.brand_id.in_({brands[key[0]] for key, _, _ in new_rows}))
+                    .where(Product.size_id.in_({sizes[key[1:]] for key, _, _ in new_rows}))
+                )
+                ids = {(brand_id, size_id): product_id for product_id, brand_id, size_id in created_ids}
+                for key, price, quantity in new_rows:
+                    product_id = ids.get((brands[key[0]], sizes[key[1:]]))
+                    products[key] = by_id[product_id] = [product_id, price, quantity, 1]
+                    if quantity:
+                        stock_changes.append((product_id, 'restock', quantity))
+            # The first stock of the new products goes into the stock ledger (as a change of
+            # the main branch) in the same transaction.
+            if stock_changes:
+                now = datetime.datetime.now()
+                before = last_movement_id(session)
+                session.execute(insert(StockMovement), [
+                    {'product_id': product_id, 'branch_id': DEFAULT_BRANCH_ID, 'kind': kind, 'change': change,
+                     'created_at': now, 'note': 'price list import'}
+                    for product_id, kind, change in stock_changes
+                ])
+                apply_movements_to_branches(session, before)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+    return report
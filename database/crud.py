@@ -1,10 +1,30 @@
-from .models import User,Employee,Admin,Manager,Order,Customer,Product,Size,Brand, ProductsOrder
-from sqlalchemy.orm import Session, InstrumentedAttribute
-from sqlalchemy import select, exists, func
+from .models import User,Employee,Admin,Manager,Order,Customer,Product,Size,Brand, ProductsOrder, StockMovement
+from .models import BranchStock, SalesRollup, DEFAULT_BRANCH_ID
+from sqlalchemy.orm import Session, InstrumentedAttribute, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import select, exists, func, update, case, insert, literal, union_all, false
+from sqlalchemy.exc import OperationalError
 from .connection import session
+from .resolver import resolver
+from .cache import cached
+from .rows import ProductRow, CustomerRow, StaffRow, OrderLineRow
+from .pagination import fetch_page
+from .archive import archived_years, open_archive, open_archives, archive_table
+from .stock import move_stock, last_movement_id, apply_movements_to_branches, change_product_size
+from .branches import _check_branch, get_branch_quantity
 from utilities import hashing
 from .Exeptions import NationalNumberAlreadyExistsException, UsernameAlreadyExistsException, UsernameNotExistsException, ProductAlreadyExistsException, ProductNotExistsException, CustomerNotExistsException
+from .Exeptions import InsufficientStockException, StockConflictException
 from datetime import datetime, timedelta
+from time import sleep
+from operator import itemgetter
+import random
+
+# How many times a sale is attempted when another terminal changes the same product at the same time.
+CHECKOUT_ATTEMPTS = 8
+
+# Seconds to wait before the second attempt; doubled after every failed attempt.
+CHECKOUT_BACKOFF = 0.01
 
 # A generic function to check if a record with a specific value in a specific column exists.
 def exist_check(session:Session, by:InstrumentedAttribute, pat):
@@ -91,6 +111,18 @@ def user_by_national_id_phone(session:Session, national_id:str, phone:str) -> Us
     except Exception as e:
         raise e
 
+# Sets a new password for the user identified by national ID and phone (the forgotten password window).
+def reset_password(session: Session, national_id: str, phone: str, passwd: str) -> bool:
+    """
+    Returns True if a user with this national ID and phone number exists and got the new password.
+    """
+    user = user_by_national_id_phone(session, national_id, phone)
+    if user is None:
+        return False
+    user.hashed_passwd = hashing(passwd)
+    session.commit()
+    return True
+
 # Creates a new user (Admin, Manager, or Employee) in the database.
 def create_new_user(session: Session, name:str, lastname:str, phone:str, national_number:str, level_type:str, username:str, passwd:str) -> User:
     """
@@ -162,18 +194,55 @@ def login_permission(session, username, passwd) -> bool:
         return False
     
     
+# The fields the staff lists can be filtered and ordered by (see database/pagination.py).
+STAFF_COLUMNS = {'id': User.id, 'name': User.name, 'lastname': User.lastname, 'phone': User.phone,
+                 'national_number': User.national_number, 'username': User.user_name, 'type': User.type}
+
+# Every list function (get_all_* and get_*_rows) takes the same optional arguments:
+#   after_key  the next_key of the previous page
+#   limit      the page size; with it a Page(items, next_key) is returned instead of a list
+#   order_by   a field of the list, '-field' for descending (default 'id')
+#   filters    e.g. {'brand': 'Michelin', 'price__lte': 1500}, see pagination.FILTER_OPERATORS
+
 # Retrieves all records from the Employee table.
-def get_all_employees(session:Session):
+def get_all_employees(session:Session, after_key=None, limit: int = None, order_by: str = None, filters: dict = None):
     """
     Fetches all employee records from the database.
 
     Returns:
-        A list of Row objects, where each row contains an Employee object.
+        A list of Row objects, where each row contains an Employee object
+        (a Page of them if 'limit' is given).
     """
     stmt = select(Employee)
-    
-    content = session.execute(stmt).fetchall()
-    return content
+    return fetch_page(session, stmt, STAFF_COLUMNS, tuple, after_key, limit, order_by, filters)
+
+# The staff types shown in the staff lists (administrators are left out).
+STAFF_TYPES = ('employee', 'manager')
+
+# Retrieves the staff of some types as compact rows.
+@cached('users')
+def get_staff_rows(session: Session, types: tuple = STAFF_TYPES, after_key=None, limit: int = None, order_by: str = None,
+                   filters: dict = None) -> list[StaffRow]:
+    """
+    Fetches the users of the given types (e.g. ('employee',)) in one query.
+
+    Returns:
+        A list of StaffRow tuples, ordered by id (a Page of them if 'limit' is given).
+    """
+    stmt = (select(User.id, User.name, User.lastname, User.phone, User.national_number, User.user_name, User.type)
+            .where(User.type.in_(tuple(types))))
+    return fetch_page(session, stmt, STAFF_COLUMNS, StaffRow._make, after_key, limit, order_by, filters)
+
+# Retrieves the employees as compact rows.
+def get_employee_rows(session: Session) -> list[StaffRow]:
+    """
+    Picks the employees out of the cached staff list, so the administrator's and the
+    manager's employee panels share one query (and one cache entry).
+
+    Returns:
+        A list of StaffRow tuples, ordered by id.
+    """
+    return [row for row in get_staff_rows(session) if row.type == 'employee']
 
 # Retrieves all employees and formats them as a list of dictionaries.
 def get_all_employees_json(session:Session):
@@ -183,14 +252,7 @@ def get_all_employees_json(session:Session):
     Returns:
         A list of dictionaries, where each dictionary represents an employee.
     """
-    rows = get_all_employees(session)
-    json = []
-    
-    # Iterate through the rows and call the to_dict() method on each Employee object.
-    for row in rows:
-        json.append(row[0].to_dict())
-    
-    return json
+    return [row.to_dict() for row in get_employee_rows(session)]
 
 def remove_user_by_username(db:Session, username:str):
     user = user_by_username(db, username)
@@ -242,47 +304,44 @@ def update_user_by_username(
     return user
 
 def get_all_username(session=Session):
-    
-    users = get_all_employees_json(session)
-    
-    return [user['username'] for user in users]
+    return get_all_employee_usernames(session)
 
 
-def create_product(session: Session, brand_name: str, price: float, quantity: int, width: int, ratio: int, rim: int) -> Product:
-    is_new_product = False
-    # Find or create brand
-    brand = session.query(Brand).filter_by(name=brand_name).first()
-    if not brand:
-        brand = Brand(name=brand_name)
-        session.add(brand)
-        session.commit()  # Get the brand ID
-        is_new_product = True
+def create_product(session: Session, brand_name: str, price: float, quantity: int, width: int, ratio: int, rim: int,
+                   branch_id: int = None) -> Product:
+    # Brand and size ids come from the process-wide resolver cache; missing rows are
+    # inserted in the same transaction as the product, so there is a single commit.
+    brand_id = resolver.brand_id(session, brand_name)
+    size_id = resolver.size_id(session, width, ratio, rim)
 
-    # Find or create size
-    size = session.query(Size).filter_by(width=width, ratio=ratio, rim=rim).first()
-    if not size:
-        size = Size(width=width, ratio=ratio, rim=rim)
-        session.add(size)
-        session.commit()  # Get the size ID
-        is_new_product = True
-
-    # Create product
-    if not is_new_product:
+    # No rollback here: the brand and size of an existing product existed already, so nothing
+    # was added above, and other pending work on the session is the caller's to keep or drop.
+    product = session.execute(select(Product).where(Product.brand_id == brand_id, Product.size_id == size_id)).scalar()
+    if product is not None and not product.deleted:
         raise ProductAlreadyExistsException(f"Product with brand '{brand_name}' and size '{width}/{ratio}/{rim}' already exists.")
+
+    if product is not None:
+        # A deleted product comes back (with its ledger), so a brand and size stay one product.
+        product.deleted = False
+        product.price = price
     else:
         product = Product(
-            brand_id=brand.id,
-            size_id=size.id,
+            brand_id=brand_id,
+            size_id=size_id,
             price=price,
-            quantity=quantity
+            quantity=0
         )
         session.add(product)
-        session.commit()  # Get the product ID
+    if int(quantity or 0):
+        session.flush()  # Get the product ID
+        # The opening stock (of the given branch) is the first entry of the product's stock ledger.
+        move_stock(session, product.id, 'restock', int(quantity), note='initial stock', branch_id=branch_id)
+    session.commit()
 
     return product
 
 def search_product_by_size(session: Session, width: int = None, ratio: int = None, rim: int = None):
-    query = session.query(Product).join(Size, Product.size_id == Size.id)
+    query = session.query(Product).join(Size, Product.size_id == Size.id).filter(Product.deleted == false())
     if width is not None:
         query = query.filter(Size.width == width)
     if ratio is not None:
@@ -292,7 +351,7 @@ def search_product_by_size(session: Session, width: int = None, ratio: int = Non
     return query.all()
 
 def search_product_by_brand(session: Session, brand_name: str):
-    query = session.query(Product).join(Brand, Product.brand_id == Brand.id).filter(Brand.name == brand_name)
+    query = session.query(Product).join(Brand, Product.brand_id == Brand.id).filter(Brand.name == brand_name, Product.deleted == false())
     return query.all()
 
 def search_product_by_size_json(session: Session, width: int = None, ratio: int = None, rim: int = None):
@@ -309,103 +368,274 @@ def search_product_by_brand_json(session: Session, brand_name: str):
         result.append(product.to_dict())
     return result
 
-def get_all_products(session: Session):
-    return session.query(Product).all()
+# The fields the product lists can be filtered and ordered by.
+PRODUCT_COLUMNS = {'id': Product.id, 'brand_id': Product.brand_id, 'size_id': Product.size_id, 'brand': Brand.name,
+                   'width': Size.width, 'ratio': Size.ratio, 'rim': Size.rim, 'price': Product.price, 'quantity': Product.quantity}
+
+def _with_brand_and_size(stmt):
+    return (stmt.outerjoin(Brand, Product.brand_id == Brand.id).outerjoin(Size, Product.size_id == Size.id)
+            .where(Product.deleted == false()))
+
+def _product_rows_query():
+    return _with_brand_and_size(select(Product.id, Product.brand_id, Product.size_id, Brand.name, Size.width, Size.ratio,
+                                       Size.rim, Product.price, Product.quantity))
+
+def get_all_products(session: Session, after_key=None, limit: int = None, order_by: str = None, filters: dict = None):
+    stmt = _with_brand_and_size(select(Product))
+    return fetch_page(session, stmt, PRODUCT_COLUMNS, itemgetter(0), after_key, limit, order_by, filters)
+
+@cached('products')
+def get_product_rows(session: Session, after_key=None, limit: int = None, order_by: str = None,
+                     filters: dict = None) -> list[ProductRow]:
+    """Returns the catalog as ProductRow tuples (brand and size included), ordered by id (a Page if 'limit' is given)."""
+    return fetch_page(session, _product_rows_query(), PRODUCT_COLUMNS, ProductRow._make, after_key, limit, order_by, filters)
+
+@cached('products')
+def get_product_row(session: Session, product_id: int) -> ProductRow:
+    row = session.execute(_product_rows_query().where(Product.id == int(product_id))).first()
+    if row is None:
+        raise ProductNotExistsException(product_id)
+    return ProductRow(*row)
 
 def get_all_products_json(session: Session):
-    products = get_all_products(session)
-    return [product.to_dict() for product in products]
+    return [row.to_dict() for row in get_product_rows(session)]
 
 def get_product_by_id(session: Session, product_id: int) -> Product:
-    product = session.query(Product).filter_by(id=product_id).first()
+    product = session.query(Product).filter_by(id=product_id, deleted=False).first()
     if not product:
         raise ProductNotExistsException(product_id)
     return product
 def get_product_by_id_json(session: Session, product_id: int) -> dict:
-    product = get_product_by_id(session, product_id)
-    return product.to_dict()
+    return get_product_row(session, product_id).to_dict()
 
 def delete_product_by_name_and_size(session: Session, brand_name: str, width: int, ratio: int, rim: int) -> bool:
     brand = session.query(Brand).filter_by(name=brand_name).first()
     size = session.query(Size).filter_by(width=width, ratio=ratio, rim=rim).first()
     if not brand or not size:
         return False
-    product = session.query(Product).filter_by(brand_id=brand.id, size_id=size.id).first()
+    product = session.query(Product).filter_by(brand_id=brand.id, size_id=size.id, deleted=False).first()
     if not product:
         return False
-    session.delete(product)
-    session.commit()
+    # The stock ledger is append-only, so the product is only marked deleted: its remaining
+    # stock in every branch is written off with an adjustment, and its history stays.
+    try:
+        stock = session.execute(select(BranchStock.branch_id, BranchStock.quantity)
+                                .where(BranchStock.product_id == product.id, BranchStock.quantity != 0)).all()
+        for branch_id, quantity in stock:
+            move_stock(session, product.id, 'adjustment', -quantity, note='deleted', allow_negative=True, branch_id=branch_id)
+        product.deleted = True
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
     return True
 
-def update_product_by_id(session: Session, product_id: int, new_brand_name: str, new_width: int, new_ratio: int, new_rim: int, new_quantity: int, new_price: float) -> Product:
+def update_product_by_id(session: Session, product_id: int, new_brand_name: str, new_width: int, new_ratio: int, new_rim: int, new_quantity: int, new_price: float,
+                         branch_id: int = None) -> Product:
+    """
+    Changes a product's brand, size, price and stock.
+
+    With a branch, new_quantity is the product's stock in that branch. Without one it is
+    the chain-wide total, which can only be edited while no branch but the main one holds
+    the product: the difference is booked on the main branch.
+
+    Raises:
+        ProductNotExistsException: If the product does not exist.
+        BranchNotExistsException: If the branch does not exist.
+        ValueError: If the total is edited while other branches hold stock of the product.
+        InsufficientStockException: If the new quantity is negative.
+    """
     # Find the product by ID
-    product = session.query(Product).filter_by(id=product_id).first()
-    if not product:
+    product = session.get(Product, int(product_id))
+    if not product or product.deleted:
         raise ProductNotExistsException(f"Product with id '{product_id}' does not exist.")
 
-    # Find or create the new brand
-    brand = session.query(Brand).filter_by(name=new_brand_name).first()
-    if not brand:
-        brand = Brand(name=new_brand_name)
-        session.add(brand)
-        session.commit()
-
-    # Find or create the new size
-    size = session.query(Size).filter_by(width=new_width, ratio=new_ratio, rim=new_rim).first()
-    if not size:
-        size = Size(width=new_width, ratio=new_ratio, rim=new_rim)
-        session.add(size)
-        session.commit()
+    # The quantity being edited: the branch's stock, or the total as long as it is all in the main branch.
+    if branch_id is not None:
+        branch_id = _check_branch(session, branch_id)
+        current = get_branch_quantity(session, branch_id, product.id)
+    else:
+        elsewhere = session.execute(select(exists().where(
+            BranchStock.product_id == product.id, BranchStock.branch_id != DEFAULT_BRANCH_ID, BranchStock.quantity != 0))).scalar()
+        if elsewhere and int(new_quantity) != product.quantity:
+            raise ValueError(f"Product {product.id} is stocked in several branches; choose the branch whose quantity to change.")
+        current = session.execute(select(Product.quantity).where(Product.id == product.id)).scalar()
 
-    # Update product's price and quantity
+    # Update product's price
     product.price = new_price
-    product.quantity = new_quantity
     
-    # Update product's brand and size
-    product.brand_id = brand.id
-    product.size_id = size.id
+    # Update product's brand and size (created in the same transaction if they are new)
+    old_size_id = product.size_id
+    product.brand_id = resolver.brand_id(session, new_brand_name)
+    product.size_id = resolver.size_id(session, new_width, new_ratio, new_rim)
 
-    session.commit()
-    session.refresh(product)
+    # A changed quantity is recorded as an adjustment of the branch in the stock ledger.
+    try:
+        change_product_size(session, product.id, old_size_id, product.size_id)
+        if int(new_quantity) != current:
+            move_stock(session, product.id, 'adjustment', int(new_quantity) - current, note='edited', branch_id=branch_id)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
     return product
 
+def _bulk_product_filter(brand_name: str = None, width_range: tuple = None, ratio_range: tuple = None, rim_range: tuple = None) -> list:
+    """
+    Builds the WHERE conditions selecting the products a bulk update applies to.
+
+    Each range is a (minimum, maximum) tuple; either bound may be None to leave it open.
+    """
+    conditions = [Product.deleted == false()]
+    if brand_name:
+        conditions.append(Product.brand_id.in_(select(Brand.id).where(Brand.name == brand_name)))
+
+    size_conditions = []
+    for column, bounds in ((Size.width, width_range), (Size.ratio, ratio_range), (Size.rim, rim_range)):
+        if not bounds:
+            continue
+        low, high = bounds
+        if low is not None:
+            size_conditions.append(column >= low)
+        if high is not None:
+            size_conditions.append(column <= high)
+    if size_conditions:
+        conditions.append(Product.size_id.in_(select(Size.id).where(*size_conditions)))
+    return conditions
+
+def count_products_for_bulk_update(session: Session, brand_name: str = None, width_range: tuple = None, ratio_range: tuple = None, rim_range: tuple = None) -> int:
+    """Returns how many products a bulk update with the same filters would change."""
+    conditions = _bulk_product_filter(brand_name, width_range, ratio_range, rim_range)
+    return session.execute(select(func.count(Product.id)).where(*conditions)).scalar()
+
+def bulk_update_products(session: Session, brand_name: str = None, width_range: tuple = None, ratio_range: tuple = None, rim_range: tuple = None,
+                         price_percent: float = None, price_amount: float = None, quantity_amount: int = None) -> int:
+    """
+    Changes the price and/or stock of every product matching the filters with a single UPDATE.
+
+    Args:
+        session: The database session object.
+        brand_name: Only products of this brand are changed.
+        width_range, ratio_range, rim_range: (minimum, maximum) size bounds; None leaves a bound open.
+        price_percent: Percentage added to the price (e.g. 10 or -5).
+        price_amount: Fixed amount added to the price. Cannot be combined with price_percent.
+        quantity_amount: Amount added to the stock of the main branch. Stock never goes below zero.
+
+    Raises:
+        ValueError: If no change is requested, or both price changes are given.
+
+    Returns:
+        The number of updated products.
+    """
+    if price_percent is not None and price_amount is not None:
+        raise ValueError("Use either a percentage or an absolute price change, not both.")
+
+    values = {}
+    if price_percent is not None:
+        new_price = func.round(Product.price * (1 + price_percent / 100), 2)
+        values['price'] = case((new_price < 0, 0), else_=new_price)
+    elif price_amount is not None:
+        values['price'] = case((Product.price + price_amount < 0, 0), else_=Product.price + price_amount)
+    if price_percent is None and price_amount is None and quantity_amount is None:
+        raise ValueError("No price or stock change was given.")
+
+    conditions = _bulk_product_filter(brand_name, width_range, ratio_range, rim_range)
+    if quantity_amount is not None:
+        # Record the change of every matching product in the stock ledger first, clamped so
+        # the main branch's stock does not go below zero; the balances follow from the ledger.
+        before = last_movement_id(session)
+        stock = func.coalesce(BranchStock.quantity, 0)
+        change = case((stock + quantity_amount < 0, -stock), else_=quantity_amount)
+        session.execute(insert(StockMovement).from_select(
+            ['product_id', 'branch_id', 'kind', 'change', 'created_at', 'note'],
+            select(Product.id, literal(DEFAULT_BRANCH_ID), literal('adjustment'), change,
+                   literal(datetime.now(), StockMovement.created_at.type), literal('bulk update'))
+            .outerjoin(BranchStock, (BranchStock.product_id == Product.id) & (BranchStock.branch_id == DEFAULT_BRANCH_ID))
+            .where(*conditions).where(change != 0)
+        ))
+        moved = (select(func.coalesce(func.sum(StockMovement.change), 0))
+                 .where(StockMovement.id > before, StockMovement.product_id == Product.id).scalar_subquery())
+        values['quantity'] = Product.quantity + moved
+        apply_movements_to_branches(session, before)
+    values['version'] = Product.version + 1
+    stmt = update(Product).where(*conditions).values(**values).execution_options(synchronize_session=False)
+    result = session.execute(stmt)
+    session.commit()
+    return result.rowcount
+
+
+# Retrieves only the usernames of the staff of some types (one indexed query on User.type).
+@cached('users')
+def get_staff_usernames(session: Session, types: tuple = STAFF_TYPES) -> list[str]:
+    stmt = select(User.user_name).where(User.type.in_(tuple(types))).order_by(User.id)
+    return list(session.scalars(stmt))
 
 def get_all_employee_usernames(session: Session):
-    employees = session.query(Employee).all()
-    return [employee.user_name for employee in employees]
+    return get_staff_usernames(session, ('employee',))
 
 def get_all_employee_and_manager_usernames(session: Session):
-    employees = session.query(Employee).all()
-    managers = session.query(Manager).all()
-    usernames = [employee.user_name for employee in employees] + [manager.user_name for manager in managers]
-    return usernames
+    return get_staff_usernames(session, STAFF_TYPES)
 
-def get_all_employee_and_manager(session: Session):
-    employees = session.query(Employee).all()
-    managers = session.query(Manager).all()
-    return employees + managers
+def get_all_employee_and_manager(session: Session, after_key=None, limit: int = None, order_by: str = None, filters: dict = None):
+    # One polymorphic query; each row comes back as an Employee or a Manager.
+    stmt = select(User).where(User.type.in_(STAFF_TYPES))
+    return fetch_page(session, stmt, STAFF_COLUMNS, itemgetter(0), after_key, limit, order_by, filters)
 
 def get_all_employee_and_manager_json(session: Session):
-    users = get_all_employee_and_manager(session)
-    return [user.to_dict() for user in users]
+    return [row.to_dict() for row in get_staff_rows(session)]
+
 
 
+# The fields the customer lists can be filtered and ordered by.
+CUSTOMER_COLUMNS = {'id': Customer.id, 'name': Customer.name, 'phone': Customer.phone, 'address': Customer.address,
+                    'national_number': Customer.national_number}
 
-def get_all_customers(session: Session):
-    return session.query(Customer).all()
+def get_all_customers(session: Session, after_key=None, limit: int = None, order_by: str = None, filters: dict = None):
+    return fetch_page(session, select(Customer), CUSTOMER_COLUMNS, itemgetter(0), after_key, limit, order_by, filters)
+
+@cached('customers')
+def get_customer_rows(session: Session, after_key=None, limit: int = None, order_by: str = None,
+                      filters: dict = None) -> list[CustomerRow]:
+    """Returns every customer as a CustomerRow tuple, ordered by id (a Page if 'limit' is given)."""
+    stmt = select(Customer.id, Customer.name, Customer.phone, Customer.address, Customer.national_number)
+    return fetch_page(session, stmt, CUSTOMER_COLUMNS, CustomerRow._make, after_key, limit, order_by, filters)
 
 def get_all_customers_json(session: Session):
-    customers = get_all_customers(session)
-    return [customer.to_dict() for customer in customers]
+    return [row.to_dict() for row in get_customer_rows(session)]
+
+def get_customer_by_id(session: Session, customer_id: int, archived: bool = True) -> Customer:
+    """
+    Returns a customer with their orders.
 
-def get_customer_by_id(session: Session, customer_id: int) -> Customer:
+    With 'archived', the orders moved into the archives (see database/archive.py) are part
+    of customer.orders as well, oldest first; they are read-only copies outside the session.
+    """
     customer = session.query(Customer).filter_by(id=customer_id).first()
     if not customer:
         raise CustomerNotExistsException(customer_id)
+    # The collection may still hold the archived copies of an earlier call.
+    session.expire(customer, ['orders'])
+    if archived:
+        older = _archived_orders(session, customer)
+        if older:
+            set_committed_value(customer, 'orders', older + list(customer.orders))
     return customer
 
+def _archived_orders(session: Session, customer: Customer) -> list[Order]:
+    orders = []
+    for year in archived_years(session):
+        with open_archive(session, year) as conn, Session(bind=conn) as archive:
+            stmt = (select(Order).where(Order.customer_id == customer.id)
+                    .options(selectinload(Order.products)).order_by(Order.id))
+            orders += archive.scalars(stmt).all()
+    for order in orders:
+        set_committed_value(order, 'customer', customer)
+    return orders
+
+@cached('customers')
 def get_customer_by_id_json(session: Session, customer_id: int) -> dict:
-    customer = get_customer_by_id(session, customer_id)
+    # Only the contact details are returned, so the archived orders are not read.
+    customer = get_customer_by_id(session, customer_id, archived=False)
     return customer.to_dict()
 
 
@@ -430,7 +660,22 @@ def create_customer(session: Session, name: str, address: str, phone: str, natio
     session.refresh(new_customer)
     
 
-def create_order(session: Session, customer: Customer, product: Product, quantity: int) -> Order:
+def create_order(session: Session, customer: Customer, product: Product, quantity: int, branch_id: int = None) -> Order:
+    """
+    Sells 'quantity' units of a product to a customer from a branch's stock
+    (default: DEFAULT_BRANCH_ID).
+
+    Several counter PCs may sell the same product at once. Each attempt reads the
+    product's current price, stock and version, and the stock is only decreased if
+    the version is unchanged; if another terminal got there first (or the database
+    is locked by its write), the attempt is rolled back and retried, at most
+    CHECKOUT_ATTEMPTS times.
+
+    Raises:
+        ValueError: If the customer or product is missing.
+        InsufficientStockException: If the branch has less than 'quantity' units in stock (a ValueError).
+        StockConflictException: If every attempt collided with another terminal.
+    """
     # Check if customer exists
     if not customer:
         raise ValueError("Customer does not exist.")
@@ -439,46 +684,92 @@ def create_order(session: Session, customer: Customer, product: Product, quantit
     if not product:
         raise ValueError("Product does not exist.")
 
+    product_id = product.id
+    branch_id = DEFAULT_BRANCH_ID if branch_id is None else int(branch_id)
+    for attempt in range(CHECKOUT_ATTEMPTS):
+        try:
+            return _place_order(session, customer, product_id, int(quantity), branch_id)
+        except (StockConflictException, OperationalError) as e:
+            session.rollback()
+            if isinstance(e, OperationalError) and not _is_transient(e):
+                raise
+            if attempt == CHECKOUT_ATTEMPTS - 1:
+                raise StockConflictException(product_id) from e
+            # Back off (with jitter) so the competing terminals do not collide again.
+            sleep(CHECKOUT_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+        except Exception:
+            session.rollback()
+            raise
+
+
+def _is_transient(error: OperationalError) -> bool:
+    # SQLite reports a competing writer as a locked database, PostgreSQL as a deadlock
+    # or a serialization failure; all of them succeed when retried.
+    message = str(error).lower()
+    return 'locked' in message or 'deadlock' in message or 'could not serialize' in message
+
+
+def _place_order(session: Session, customer: Customer, product_id: int, quantity: int, branch_id: int) -> Order:
+    # The order, its line and the stock movement are written in one transaction,
+    # so a sale that fails leaves no empty order behind.
+    current = session.execute(
+        select(Product.price, func.coalesce(BranchStock.quantity, 0).label('quantity'), Product.version,
+               Brand.name, Size.width, Size.ratio, Size.rim)
+        .join(Brand, Product.brand_id == Brand.id)
+        .join(Size, Product.size_id == Size.id)
+        .outerjoin(BranchStock, (BranchStock.product_id == Product.id) & (BranchStock.branch_id == branch_id))
+        .where(Product.id == product_id)
+    ).first()
+    if current is None:
+        raise ProductNotExistsException(product_id)
+    if current.quantity < quantity:
+        raise InsufficientStockException(product_id, current.quantity, quantity)
+
     # Create new order
     new_order = Order(
         customer=customer,
+        branch_id=branch_id,
     )
-
     session.add(new_order)
-    session.commit()
-    session.refresh(new_order)
+    session.flush()
 
     # Create ProductsOrder association
     products_order = ProductsOrder(
         order_id=new_order.id,
-        price=product.price,
-        width=product.size.width,
-        ratio=product.size.ratio,
-        rim=product.size.rim,
-        brand=product.brand.name,
+        price=current.price,
+        width=current.width,
+        ratio=current.ratio,
+        rim=current.rim,
+        brand=current.name,
         quantity=quantity
     )
-    decrease_product_quantity(session, product.id, quantity)  # Decrease product quantity
-
     session.add(products_order)
+    # Only applied if nobody changed the product since it was read above.
+    move_stock(session, product_id, 'sale', -quantity, order_id=new_order.id, expected_version=current.version,
+               branch_id=branch_id)
     session.commit()
-
     return new_order
 
 
-def decrease_product_quantity(session: Session, product_id: int, quantity: int) -> Product:
-    product = session.query(Product).filter_by(id=product_id).first()
-    if not product:
-        raise ProductNotExistsException(product_id)
-    
-    if product.quantity < quantity:
-        raise ValueError("Not enough product quantity available.")
-    
-    product.quantity -= quantity
-    session.commit()
-    session.refresh(product)
-    
-    return product
+def decrease_product_quantity(session: Session, product_id: int, quantity: int, order_id: int = None, commit: bool = True,
+                              branch_id: int = None) -> Product:
+    """
+    Records the sale of 'quantity' units in the stock ledger.
+
+    Raises:
+        ProductNotExistsException: If the product does not exist.
+        InsufficientStockException: If the branch has less than 'quantity' units in stock (a ValueError).
+    """
+    if not commit:
+        move_stock(session, product_id, 'sale', -int(quantity), order_id=order_id, branch_id=branch_id)
+        return session.get(Product, int(product_id))
+    try:
+        move_stock(session, product_id, 'sale', -int(quantity), order_id=order_id, branch_id=branch_id)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return session.get(Product, int(product_id))
 
 def check_customer_equal(customer: Customer, name: str, phone: str, national_number: str) -> bool:
     return (customer.name == name and
@@ -504,13 +795,77 @@ def get_or_create_customer(session: Session, name: str, address: str, phone: str
         create_customer(session, name, address, phone, national_number)
         return get_customer_by_national_id(session, national_number)
 
-def get_all_orders(session: Session):
-    return session.query(Order).all()
+# The fields the order list can be filtered and ordered by.
+ORDER_COLUMNS = {'id': Order.id, 'date': Order.date, 'branch_id': Order.branch_id, 'customer_id': Order.customer_id}
 
-def get_all_orders_json(session: Session):
-    orders = get_all_orders(session)
+def get_all_orders(session: Session, branch_id: int = None, after_key=None, limit: int = None, order_by: str = None,
+                   filters: dict = None):
+    stmt = select(Order)
+    if branch_id is not None:
+        stmt = stmt.where(Order.branch_id == branch_id)
+    return fetch_page(session, stmt, ORDER_COLUMNS, itemgetter(0), after_key, limit, order_by, filters)
+
+def get_all_orders_json(session: Session, branch_id: int = None):
+    orders = get_all_orders(session, branch_id)
     return [order.to_dict() for order in orders]
 
+# The fields the order line list can be filtered and ordered by.
+ORDER_LINE_COLUMNS = {'id': ProductsOrder.id, 'order_id': Order.id, 'date': Order.date, 'branch_id': Order.branch_id,
+                      'customer_id': Order.customer_id, 'customer_name': Customer.name, 'brand': ProductsOrder.brand,
+                      'width': ProductsOrder.width, 'ratio': ProductsOrder.ratio, 'rim': ProductsOrder.rim,
+                      'price': ProductsOrder.price, 'quantity': ProductsOrder.quantity}
+
+def _order_line_select(order, line, branch_id: int = None):
+    # The columns of ORDER_LINE_COLUMNS, over the given order tables (live or archived).
+    stmt = (select(line.c.id, order.c.id.label('order_id'), order.c.date, order.c.branch_id, order.c.customer_id,
+                   Customer.name.label('customer_name'), line.c.brand, line.c.width, line.c.ratio, line.c.rim,
+                   line.c.price, line.c.quantity)
+            .select_from(line)
+            .join(order, line.c.order_id == order.c.id)
+            .outerjoin(Customer, order.c.customer_id == Customer.id))
+    if branch_id is not None:
+        stmt = stmt.where(order.c.branch_id == branch_id)
+    return stmt
+
+def _filter_dates(filters: dict = None) -> tuple:
+    # The (first, last) day a filter dictionary allows; None where it is open.
+    start = end = None
+    for key, value in (filters or {}).items():
+        field, _, name = key.partition('__')
+        if field != 'date':
+            continue
+        values = [value] if name != 'in' else list(value)
+        days = [datetime.fromisoformat(day).date() if isinstance(day, str) else day for day in values]
+        if not days:
+            continue
+        if name in ('', 'eq', 'in', 'gt', 'gte'):
+            start = min(days) if start is None else max(start, min(days))
+        if name in ('', 'eq', 'in', 'lt', 'lte'):
+            end = max(days) if end is None else min(end, max(days))
+    return start, end
+
+def get_order_line_rows(session: Session, branch_id: int = None, after_key=None, limit: int = None, order_by: str = None,
+                        filters: dict = None) -> list[OrderLineRow]:
+    """
+    Returns every order line with its order's date, branch and customer name in one query,
+    ordered by line id (a Page if 'limit' is given).
+
+    Lines of archived orders (see database/archive.py) are included from the archives of
+    the years the 'date' filters allow, in the same query.
+    """
+    years = archived_years(session, *_filter_dates(filters))
+    if not years:
+        stmt = _order_line_select(Order.__table__, ProductsOrder.__table__, branch_id)
+        return fetch_page(session, stmt, ORDER_LINE_COLUMNS, OrderLineRow._make, after_key, limit, order_by, filters)
+
+    selects = [_order_line_select(Order.__table__, ProductsOrder.__table__, branch_id)]
+    selects += [_order_line_select(archive_table(Order.__table__, year), archive_table(ProductsOrder.__table__, year), branch_id)
+                for year in years]
+    lines = union_all(*selects).subquery('order_line')
+    columns = {name: lines.c[name] for name in ORDER_LINE_COLUMNS}
+    with open_archives(session, years) as conn:
+        return fetch_page(conn, select(lines), columns, OrderLineRow._make, after_key, limit, order_by, filters)
+
 def get_customers_count(session: Session) -> int:
     return session.query(Customer).count()
 
@@ -524,29 +879,28 @@ def get_total_product_quantity(session: Session) -> int:
     return session.query(Product).with_entities(func.sum(Product.quantity)).scalar() or 0
 
 def get_employees_count(session: Session) -> int:
-    return session.query(Employee).count()
+    return session.execute(select(func.count()).select_from(User).where(User.type == 'employee')).scalar()
 
-def get_monthly_sales(session: Session) -> float:
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-    
-    total_sales = session.query(
-        func.sum(ProductsOrder.price * ProductsOrder.quantity)
-    ).join(Order).filter(
-        Order.date >= thirty_days_ago
-    ).scalar()
-    
-    return total_sales or 0.0
-
-def get_daily_sales(session: Session) -> float:
-    today = datetime.now().date()
-    
-    total_sales = session.query(
+def _sales_since(session: Session, first_day, branch_id: int = None) -> float:
+    query = session.query(
         func.sum(ProductsOrder.price * ProductsOrder.quantity)
-    ).join(Order).filter(
-        func.date(Order.date) == today
-    ).scalar()
-    
-    return total_sales or 0.0
+    ).join(Order)
+    # Archived orders (see database/archive.py) count through their daily rollups.
+    archived = session.query(func.sum(SalesRollup.revenue))
+    # The branch comes first, matching the (branch_id, date) index.
+    if branch_id is not None:
+        query = query.filter(Order.branch_id == branch_id)
+        archived = archived.filter(SalesRollup.branch_id == branch_id)
+    live = query.filter(Order.date >= first_day).scalar() or 0.0
+    return live + (archived.filter(SalesRollup.day >= first_day).scalar() or 0.0)
+
+def get_monthly_sales(session: Session, branch_id: int = None) -> float:
+    # Order.date is a Date, so compare it with a date (not a datetime) on every backend.
+    thirty_days_ago = (datetime.now() - timedelta(days=30)).date()
+    return _sales_since(session, thirty_days_ago, branch_id)
+
+def get_daily_sales(session: Session, branch_id: int = None) -> float:
+    return _sales_since(session, datetime.now().date(), branch_id)
 
 
 def admin_exists(session: Session) -> bool:
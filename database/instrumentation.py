@@ -0,0 +1,158 @@
+import sys
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Statements slower than this (in seconds) are logged and kept in the slow query list.
+SLOW_QUERY_THRESHOLD = 0.1
+
+# How many slow queries are kept for the diagnostics view.
+SLOW_QUERY_HISTORY = 50
+
+logger = logging.getLogger('tireshop.sql')
+
+
+def _qualname(frame) -> str:
+    code = frame.f_code
+    # co_qualname (Python 3.11+) includes the class name, e.g. 'ManagerProductPanel.toggle_view'.
+    return f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _attribute(frame) -> tuple:
+    """
+    Walks up the call stack and returns (crud function, UI action) responsible for a statement.
+
+    The crud function is the outermost frame in database.crud (so helpers such as
+    exist_check are attributed to the function that called them), and the UI action
+    is the innermost frame inside the interface package.
+    """
+    crud_function = None
+    ui_action = None
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module == 'database.crud':
+            crud_function = _qualname(frame)
+        elif module.startswith('interface.') and ui_action is None:
+            ui_action = _qualname(frame)
+            break
+        frame = frame.f_back
+    return crud_function or '(outside crud)', ui_action or '(no UI action)'
+
+
+class QueryStats:
+    """Statement counts and timings, grouped by crud function and by UI action."""
+
+    def __init__(self, slow_threshold: float = SLOW_QUERY_THRESHOLD):
+        self._lock = threading.Lock()
+        self.slow_threshold = slow_threshold
+        # time.monotonic() of the last statement; background jobs wait for a quiet database.
+        self.last_statement_at = time.monotonic()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # name -> [statement count, total seconds, slowest seconds]
+            self.by_function = {}
+            self.by_action = {}
+            self.slow_queries = deque(maxlen=SLOW_QUERY_HISTORY)
+            self.total_count = 0
+            self.total_time = 0.0
+
+    @staticmethod
+    def _add(table: dict, key: str, elapsed: float):
+        entry = table.get(key)
+        if entry is None:
+            table[key] = [1, elapsed, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+            if elapsed > entry[2]:
+                entry[2] = elapsed
+
+    def record(self, statement: str, elapsed: float, crud_function: str, ui_action: str):
+        with self._lock:
+            if not getattr(self._local, 'background', False):
+                self.last_statement_at = time.monotonic()
+            self.total_count += 1
+            self.total_time += elapsed
+            self._add(self.by_function, crud_function, elapsed)
+            self._add(self.by_action, ui_action, elapsed)
+            if elapsed >= self.slow_threshold:
+                self.slow_queries.append((time.time(), elapsed, crud_function, ui_action, statement))
+        if elapsed >= self.slow_threshold:
+            logger.warning("Slow query (%.1f ms) in %s via %s: %s", elapsed * 1000, crud_function, ui_action, statement)
+
+    @contextmanager
+    def background(self):
+        """Statements of this thread inside the block do not count as activity for idle_seconds."""
+        self._local.background = True
+        try:
+            yield
+        finally:
+            self._local.background = False
+
+    def idle_seconds(self) -> float:
+        """Returns how long no statement has run through an instrumented engine."""
+        return time.monotonic() - self.last_statement_at
+
+    def top(self, by: str = 'function', limit: int = 10, key: str = 'total') -> list:
+        """
+        Returns the heaviest entries as (name, count, total seconds, mean seconds, slowest seconds) tuples.
+
+        Args:
+            by: 'function' for crud functions or 'action' for UI actions.
+            key: Sort by 'total' time, 'count' of statements or 'max' (slowest statement).
+        """
+        with self._lock:
+            table = self.by_function if by == 'function' else self.by_action
+            rows = [(name, count, total, total / count, slowest) for name, (count, total, slowest) in table.items()]
+        index = {'count': 1, 'total': 2, 'max': 4}[key]
+        rows.sort(key=lambda row: row[index], reverse=True)
+        return rows[:limit]
+
+
+stats = QueryStats()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Start from the caller of this hook; the walk stops at the first UI frame.
+    crud_function, ui_action = _attribute(sys._getframe(1))
+    conn.info.setdefault('query_started', []).append((time.perf_counter(), crud_function, ui_action))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started, crud_function, ui_action = conn.info['query_started'].pop()
+    stats.record(statement, time.perf_counter() - started, crud_function, ui_action)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute, so drop its start entry here.
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('query_started'):
+        conn.info['query_started'].pop()
+
+
+_LISTENERS = (
+    ('before_cursor_execute', _before_cursor_execute),
+    ('after_cursor_execute', _after_cursor_execute),
+    ('handle_error', _handle_error),
+)
+
+
+def instrument_engine(engine: Engine):
+    """Starts recording statement counts and timings for every query run through the engine."""
+    for name, listener in _LISTENERS:
+        if not event.contains(engine, name, listener):
+            event.listen(engine, name, listener)
+
+
+def uninstrument_engine(engine: Engine):
+    for name, listener in _LISTENERS:
+        if event.contains(engine, name, listener):
+            event.remove(engine, name, listener)
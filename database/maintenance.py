@@ -0,0 +1,199 @@
+import datetime
+import logging
+import threading
+import time
+from sqlalchemy import select, insert, func
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .instrumentation import stats
+from .models import MaintenanceRun
+
+logger = logging.getLogger('tireshop.maintenance')
+
+# The scheduler only starts a task after the database has been quiet this many seconds.
+IDLE_AFTER = 60
+
+# Seconds between the scheduler's checks.
+POLL_INTERVAL = 30
+
+# Free pages returned to the file system per incremental vacuum run, so one run stays short.
+VACUUM_PAGES = 5000
+
+
+def _sqlite(conn) -> bool:
+    return conn.dialect.name == 'sqlite'
+
+
+def optimize(conn) -> tuple[str, str]:
+    """Refreshes the query planner's statistics."""
+    if not _sqlite(conn):
+        conn.exec_driver_sql('ANALYZE')
+        return 'ok', 'analyzed'
+    has_statistics = conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").first()
+    if has_statistics is None:
+        # PRAGMA optimize only refreshes statistics that exist; the first time, gather them all.
+        conn.exec_driver_sql('ANALYZE')
+        return 'ok', 'analyzed all tables'
+    conn.exec_driver_sql('PRAGMA optimize')
+    return 'ok', 'optimized'
+
+
+def incremental_vacuum(conn, max_pages: int = VACUUM_PAGES) -> tuple[str, str]:
+    """
+    Returns free pages (left by deletes) to the file system.
+
+    A database created without incremental auto-vacuum is switched over once, which
+    takes a full VACUUM; after that every run frees at most 'max_pages' pages.
+    """
+    if not _sqlite(conn):
+        return 'skipped', 'the database server vacuums by itself'
+    free = conn.exec_driver_sql('PRAGMA freelist_count').scalar()
+    if conn.exec_driver_sql('PRAGMA auto_vacuum').scalar() != 2:
+        conn.exec_driver_sql('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.exec_driver_sql('VACUUM')
+        return 'ok', f'switched to incremental auto-vacuum, {free} free pages reclaimed'
+    if free == 0:
+        return 'ok', 'no free pages'
+    # The pragma frees one page per step, and the driver's execute() only takes the first
+    # step; executescript runs it to the end.
+    conn.connection.driver_connection.executescript(f'PRAGMA incremental_vacuum({int(max_pages)})')
+    left = conn.exec_driver_sql('PRAGMA freelist_count').scalar()
+    return 'ok', f'freed {free - left} of {free} free pages'
+
+
+def quick_check(conn) -> tuple[str, str]:
+    """Checks the database file for damage (without the slower index cross-check of integrity_check)."""
+    if not _sqlite(conn):
+        return 'skipped', 'not available on this database'
+    problems = [row[0] for row in conn.exec_driver_sql('PRAGMA quick_check')]
+    if problems == ['ok']:
+        return 'ok', 'ok'
+    return 'problems', '; '.join(problems[:5])[:200]
+
+
+# Every task with how often it is due.
+TASKS = {
+    'optimize': (optimize, datetime.timedelta(days=1)),
+    'vacuum': (incremental_vacuum, datetime.timedelta(days=1)),
+    'quick_check': (quick_check, datetime.timedelta(days=1)),
+}
+
+
+def run_task(engine: Engine, name: str) -> dict:
+    """
+    Runs one maintenance task and records the run in maintenance_run.
+
+    Failures are recorded (and logged) instead of raised; a locked database simply
+    makes the task due again at the next idle window.
+
+    Returns:
+        The run as a dictionary (see get_maintenance_runs).
+    """
+    task, _ = TASKS[name]
+    started_at = datetime.datetime.now()
+    started = time.perf_counter()
+    try:
+        # VACUUM cannot run inside a transaction.
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            status, detail = task(conn)
+    except Exception as error:
+        status, detail = 'failed', str(error).splitlines()[0][:200]
+    run = {'task': name, 'started_at': started_at, 'duration': time.perf_counter() - started,
+           'status': status, 'detail': detail}
+
+    level = logging.INFO if status in ('ok', 'skipped') else logging.WARNING
+    logger.log(level, "Maintenance %s: %s (%s) in %.2fs", name, status, detail, run['duration'])
+    try:
+        with engine.begin() as conn:
+            conn.execute(insert(MaintenanceRun).values(**run))
+    except Exception as error:
+        # Usually the same lock that made the task fail; the log line above remains.
+        logger.warning("Could not record the maintenance run: %s", error)
+    return run
+
+
+def due_tasks(engine: Engine, now: datetime.datetime = None) -> list[str]:
+    """Returns the tasks whose interval has passed since they last ran."""
+    now = now or datetime.datetime.now()
+    with engine.connect() as conn:
+        last = dict(conn.execute(select(MaintenanceRun.task, func.max(MaintenanceRun.started_at)).group_by(MaintenanceRun.task)).all())
+    return [name for name, (_, interval) in TASKS.items() if name not in last or now - last[name] >= interval]
+
+
+def get_maintenance_runs(session: Session, limit: int = 50) -> list[dict]:
+    """Returns the latest maintenance runs, newest first."""
+    runs = session.execute(select(MaintenanceRun).order_by(MaintenanceRun.id.desc()).limit(limit)).scalars()
+    return [{'task': run.task, 'started_at': run.started_at, 'duration': run.duration, 'status': run.status,
+             'detail': run.detail} for run in runs]
+
+
+class MaintenanceScheduler:
+    """
+    Runs the due maintenance tasks on a background thread whenever the database has
+    been idle for a while, one task at a time, so the UI thread never waits for them.
+    """
+
+    def __init__(self, engine: Engine, idle_after: float = IDLE_AFTER, poll_interval: float = POLL_INTERVAL):
+        self.engine = engine
+        self.idle_after = idle_after
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stopped = False
+        self._forced = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='database-maintenance', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_now(self):
+        """Runs every task at once, without waiting for them to be due or for an idle database."""
+        self._forced = True
+        self._wake.set()
+
+    def _idle(self) -> bool:
+        return stats.idle_seconds() >= self.idle_after
+
+    def _loop(self):
+        while not self._stopped:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if self._stopped:
+                break
+            forced, self._forced = self._forced, False
+            try:
+                # The tasks' own statements do not end the idle window.
+                with stats.background():
+                    names = list(TASKS) if forced else (due_tasks(self.engine) if self._idle() else [])
+                    for name in names:
+                        # Give way as soon as someone uses the database again.
+                        if self._stopped or not (forced or self._idle()):
+                            break
+                        run_task(self.engine, name)
+            except Exception:
+                logger.exception("Database maintenance failed")
+
+
+_scheduler = None
+
+
+def start_scheduler(engine: Engine, **options) -> MaintenanceScheduler:
+    """Starts the maintenance scheduler of this process (once) and returns it."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = MaintenanceScheduler(engine, **options)
+        _scheduler.start()
+    return _scheduler
+
+
+def current_scheduler() -> MaintenanceScheduler | None:
+    return _scheduler
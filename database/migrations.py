@@ -0,0 +1,161 @@
+import argparse
+import logging
+import time
+from sqlalchemy import inspect, select, func
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex as CreateIndexDDL
+
+logger = logging.getLogger('tireshop.schema')
+
+# Rows per transaction of a backfill. Between chunks the write lock is released, so
+# the counters (and other terminals) can keep selling while a large table is migrated.
+BACKFILL_CHUNK = 5000
+
+# Seconds a backfill waits between chunks for writers queued behind it.
+BACKFILL_PAUSE = 0.005
+
+# Throughput assumed by the dry-run estimate, measured on a laptop with SQLite.
+INDEX_ROWS_PER_SECOND = 400000
+BACKFILL_ROWS_PER_SECOND = 150000
+# Estimate for steps that do not depend on the data.
+QUICK_STEP_SECONDS = 0.01
+
+
+def _count(conn, table_name: str) -> int:
+    if not inspect(conn).has_table(table_name):
+        return 0
+    from .connection import Base
+    return conn.execute(select(func.count()).select_from(Base.metadata.tables[table_name])).scalar()
+
+
+class Step:
+    """One idempotent part of a migration. Running it again after an interruption is safe."""
+    description = ''
+
+    def estimate(self, conn) -> tuple[int, float]:
+        """Returns the rows the step will touch and the estimated seconds."""
+        return 0, QUICK_STEP_SECONDS
+
+    def run(self, engine: Engine, progress) -> None:
+        raise NotImplementedError
+
+
+class Run(Step):
+    """A quick change made in one transaction by a function of the connection."""
+
+    def __init__(self, function, description: str):
+        self.function = function
+        self.description = description
+
+    def run(self, engine: Engine, progress) -> None:
+        with engine.begin() as conn:
+            self.function(conn)
+        progress(self.description, 1, 1)
+
+
+class CreateIndex(Step):
+    """
+    Builds a missing index. PostgreSQL builds it concurrently, without blocking writes;
+    SQLite builds it in one short transaction of its own (it cannot build in pieces).
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.description = f'index {index.name} on {index.table.name}'
+
+    def estimate(self, conn) -> tuple[int, float]:
+        rows = _count(conn, self.index.table.name)
+        return rows, QUICK_STEP_SECONDS + rows / INDEX_ROWS_PER_SECOND
+
+    def run(self, engine: Engine, progress) -> None:
+        if engine.dialect.name == 'postgresql':
+            ddl = str(CreateIndexDDL(self.index, if_not_exists=True).compile(dialect=engine.dialect))
+            with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.exec_driver_sql(ddl.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1))
+        else:
+            with engine.begin() as conn:
+                self.index.create(conn, checkfirst=True)
+        progress(self.description, 1, 1)
+
+
+class Backfill(Step):
+    """
+    Fills or rewrites rows of a table in id ranges, one transaction per chunk.
+
+    'chunk' is called as chunk(conn, first_id, end_id) and handles the rows with
+    first_id <= id < end_id; running it twice for a range must do no harm.
+    """
+
+    def __init__(self, table_name: str, chunk, description: str, chunk_size: int = None):
+        self.table_name = table_name
+        self.chunk = chunk
+        self.description = description
+        self.chunk_size = chunk_size or BACKFILL_CHUNK
+
+    def estimate(self, conn) -> tuple[int, float]:
+        rows = _count(conn, self.table_name)
+        return rows, QUICK_STEP_SECONDS + rows / BACKFILL_ROWS_PER_SECOND
+
+    def run(self, engine: Engine, progress) -> None:
+        from .connection import Base
+        table = Base.metadata.tables[self.table_name]
+        with engine.connect() as conn:
+            first, last, total = conn.execute(select(func.min(table.c.id), func.max(table.c.id), func.count())).one()
+        if total == 0:
+            progress(self.description, 0, 0)
+            return
+        span = last - first + 1
+        for start in range(first, last + 1, self.chunk_size):
+            with engine.begin() as conn:
+                self.chunk(conn, start, start + self.chunk_size)
+            # Ids are spread about evenly, so the share of the id range done is the share of rows.
+            progress(self.description, min(total, (start + self.chunk_size - first) * total // span), total)
+            time.sleep(BACKFILL_PAUSE)
+
+
+def log_progress(step: str, done: int, total: int):
+    """The default progress report: a log line per finished step, and per chunk at debug level."""
+    logger.log(logging.INFO if done >= total else logging.DEBUG, "Migrating: %s (%d/%d)", step, done, total)
+
+
+def plan_migrations(engine: Engine) -> list[dict]:
+    """
+    Dry run: the steps ensure_schema would run on this database, with the rows each
+    touches and an estimate of its duration from the table sizes. Nothing is changed.
+    """
+    from .schema import pending_migrations
+    plan = []
+    with engine.connect() as conn:
+        for version, steps in pending_migrations(conn):
+            for step in steps:
+                rows, seconds = step.estimate(conn)
+                plan.append({'version': version, 'step': step.description, 'rows': rows, 'seconds': seconds})
+    return plan
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Upgrade the database schema, or show what an upgrade would do.')
+    parser.add_argument('--dry-run', action='store_true', help='only list the steps with a time estimate')
+    parser.add_argument('--database', default=None, help='database URL (default: TIRESHOP_DATABASE_URL or the local file)')
+    args = parser.parse_args(argv)
+
+    from .connection import make_engine
+    from .schema import ensure_schema
+    engine = make_engine(args.database)
+    try:
+        if args.dry_run:
+            plan = plan_migrations(engine)
+            for entry in plan:
+                print(f"v{entry['version']:<4}{entry['step']:<60}{entry['rows']:>10} rows{entry['seconds']:>9.2f}s")
+            print(f"{len(plan)} steps, about {sum(entry['seconds'] for entry in plan):.1f}s")
+        else:
+            logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+            started = time.perf_counter()
+            changed = ensure_schema(engine)
+            print(f"{'Upgraded' if changed else 'Already current'} in {time.perf_counter() - started:.1f}s")
+    finally:
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 import datetime
-from sqlalchemy import Integer, String, Date, DateTime , ForeignKey
+from sqlalchemy import Integer, String, Date, DateTime , ForeignKey, Index, Boolean, false
+from sqlalchemy import PrimaryKeyConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .connection import Base, engine, session
@@ -19,10 +20,41 @@ class Customer(Base):
     # 'back_populates' links this relationship to the 'customer' relationship in the Order class.
     orders: Mapped[list['Order']] = relationship('Order', back_populates='customer')
 
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "phone": self.phone,
+            "address": self.address,
+            "national_number": self.national_number,
+        }
+
+
+# The branch whose stock is used when none is given (see database/branches.py).
+DEFAULT_BRANCH_ID = 1
+
+
+# Represents a shop of the chain. Stock is kept per branch (BranchStock); Product.quantity
+# is the total over all branches.
+class Branch(Base):
+    __tablename__ = 'branch'
+
+    id : Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    name : Mapped[str] = mapped_column(String(40), nullable=False, unique=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+        }
+
 
 # Represents a single order made by a customer.
 class Order(Base):
     __tablename__ = 'order'
+    # Branch reports filter by branch first, then by date; a customer's history by customer.
+    __table_args__ = (Index('ix_order_branch_date', 'branch_id', 'date'),
+                      Index('ix_order_customer', 'customer_id'))
     id : Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     # Defines a foreign key to link the order back to a specific customer.
     customer_id : Mapped[int] = mapped_column(ForeignKey("customer.id"))
@@ -31,14 +63,27 @@ class Order(Base):
 
 
     # The date the order was created, with the default value being the current date.
-    date: Mapped[datetime.date] = mapped_column(Date, default=datetime.datetime.now().date(), nullable=False)
+    date: Mapped[datetime.date] = mapped_column(Date, default=datetime.date.today, nullable=False)
+    # The branch that made the sale.
+    branch_id : Mapped[int] = mapped_column(ForeignKey('branch.id'), default=DEFAULT_BRANCH_ID, server_default=str(DEFAULT_BRANCH_ID), nullable=False)
     # Defines a one-to-many relationship to the line items (ProductsOrder) within this order.
     products: Mapped[list['ProductsOrder']] = relationship('ProductsOrder', backref='order')
 
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "customer_id": self.customer_id,
+            "branch_id": self.branch_id,
+            "date": self.date,
+            "products": [line.to_dict() for line in self.products],
+        }
+
 # Represents a line item in an order (an association between an order and product details).
 # This table stores a snapshot of product details at the time of purchase.
 class ProductsOrder(Base):
     __tablename__ = 'products_order'
+    # Loading an order's lines looks them up by order.
+    __table_args__ = (Index('ix_products_order_order', 'order_id'),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     order_id: Mapped[int] = mapped_column(ForeignKey('order.id'))
     
@@ -50,6 +95,16 @@ class ProductsOrder(Base):
     rim: Mapped[int] = mapped_column(nullable=False)
     quantity: Mapped[int] = mapped_column(Integer, default=1)
 
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "order_id": self.order_id,
+            "brand": self.brand,
+            "price": self.price,
+            "size": {"width": self.width, "ratio": self.ratio, "rim": self.rim},
+            "quantity": self.quantity,
+        }
+
 # Represents a physical product (a tire) in the inventory.
 class Product(Base):
     __tablename__ = 'product'
@@ -60,12 +115,21 @@ class Product(Base):
     
     price : Mapped[float] = mapped_column(nullable=False)
     quantity : Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # Incremented by every write, so concurrent terminals can detect that the row
+    # changed since they read it (optimistic concurrency). ORM flushes check it
+    # automatically; the Core UPDATEs in stock.py, crud.py and catalog_import.py bump it.
+    version : Mapped[int] = mapped_column(Integer, default=1, server_default='1', nullable=False)
+    # Set when the product is deleted. The row stays, so its stock ledger and snapshots keep
+    # their history; deleted products are left out of the catalog lists and lookups.
+    deleted : Mapped[bool] = mapped_column(Boolean, default=False, server_default=false(), nullable=False)
     # --- Relationships ---
     # Defines a many-to-one relationship from Product to Brand.
     brand : Mapped['Brand'] = relationship(back_populates='products')
     # Defines a many-to-one relationship from Product to Size.
     size : Mapped['Size'] = relationship(back_populates='products')
 
+    __mapper_args__ = {"version_id_col": version}
+
     # A method to serialize the Product object into a dictionary.
     def to_dict(self):
         return {
@@ -84,6 +148,121 @@ class Product(Base):
         }
 
 
+# An append-only record of every change to a product's stock (the stock ledger).
+# Product.quantity is the cached running balance and is changed in the same
+# transaction as each movement (see database/stock.py); rows are never updated or deleted.
+class StockMovement(Base):
+    __tablename__ = 'stock_movement'
+    __table_args__ = (Index('ix_stock_movement_product_created', 'product_id', 'created_at'),
+                      Index('ix_stock_movement_branch_created', 'branch_id', 'created_at'))
+
+    id : Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    product_id : Mapped[int] = mapped_column(ForeignKey('product.id'), nullable=False)
+    # The branch whose stock changed.
+    branch_id : Mapped[int] = mapped_column(ForeignKey('branch.id'), default=DEFAULT_BRANCH_ID, server_default=str(DEFAULT_BRANCH_ID), nullable=False)
+    # One of 'sale', 'restock', 'adjustment' or 'return'.
+    kind : Mapped[str] = mapped_column(String(10), nullable=False)
+    # The signed change to the stock, e.g. -2 for a sale of two tires.
+    change : Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at : Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.now, nullable=False, index=True)
+    # The order of a sale or return, if any.
+    order_id : Mapped[int | None] = mapped_column(ForeignKey('order.id'), nullable=True)
+    note : Mapped[str | None] = mapped_column(String(100), nullable=True)
+
+
+# The stock of every product at a moment in time. Point-in-time stock queries start
+# from the latest snapshot and only add the movements recorded after it.
+class StockSnapshot(Base):
+    __tablename__ = 'stock_snapshot'
+    __table_args__ = (Index('ix_stock_snapshot_taken_product', 'taken_at', 'product_id'),)
+
+    id : Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    taken_at : Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
+    product_id : Mapped[int] = mapped_column(ForeignKey('product.id'), nullable=False)
+    quantity : Mapped[int] = mapped_column(Integer, nullable=False)
+    # The last movement included in this snapshot.
+    last_movement_id : Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+# The stock of a product in one branch. The primary key starts with the branch, so
+# every per-branch query is a range scan of one branch's rows.
+class BranchStock(Base):
+    __tablename__ = 'branch_stock'
+    __table_args__ = (PrimaryKeyConstraint('branch_id', 'product_id'),)
+
+    branch_id : Mapped[int] = mapped_column(ForeignKey('branch.id'))
+    product_id : Mapped[int] = mapped_column(ForeignKey('product.id'))
+    quantity : Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+# How many tires of a size each branch has, over all brands: one row per size and
+# branch, kept up to date with every stock change. Answers "who has 205/55R16"
+# without scanning the products.
+class StockAvailability(Base):
+    __tablename__ = 'stock_availability'
+    __table_args__ = (PrimaryKeyConstraint('size_id', 'branch_id'),)
+
+    size_id : Mapped[int] = mapped_column(ForeignKey('size.id'))
+    branch_id : Mapped[int] = mapped_column(ForeignKey('branch.id'))
+    quantity : Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+# The sales of one day in one branch whose orders were moved to an archive database
+# (see database/archive.py). Sales reports add these up instead of opening the archives.
+class SalesRollup(Base):
+    __tablename__ = 'sales_rollup'
+    __table_args__ = (PrimaryKeyConstraint('day', 'branch_id'),)
+
+    day : Mapped[datetime.date] = mapped_column(Date)
+    branch_id : Mapped[int] = mapped_column(ForeignKey('branch.id'))
+    orders : Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    lines : Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Tires sold and their total price.
+    tires : Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    revenue : Mapped[float] = mapped_column(nullable=False, default=0.0)
+
+
+# One run of a database maintenance task (see database/maintenance.py), shown to the
+# administrator in the diagnostics panel.
+class MaintenanceRun(Base):
+    __tablename__ = 'maintenance_run'
+    __table_args__ = (Index('ix_maintenance_run_task_started', 'task', 'started_at'),)
+
+    id : Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # One of the names in maintenance.TASKS.
+    task : Mapped[str] = mapped_column(String(20), nullable=False)
+    started_at : Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
+    # Seconds.
+    duration : Mapped[float] = mapped_column(nullable=False)
+    # 'ok', 'problems' (the integrity check found damage), 'failed' or 'skipped'.
+    status : Mapped[str] = mapped_column(String(10), nullable=False)
+    detail : Mapped[str] = mapped_column(String(200), nullable=False, default='')
+
+
+# One row per insert, update or delete of a synchronised table, written by database
+# triggers (see database/sync.py). The id is the sync watermark: a head office has
+# received every change up to the watermark stored for it in SyncWatermark.
+class ChangeLog(Base):
+    __tablename__ = 'change_log'
+    # Shipped rows are deleted; SQLite must not hand out their ids again.
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id : Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    table_name : Mapped[str] = mapped_column(String(30), nullable=False)
+    row_id : Mapped[int] = mapped_column(Integer, nullable=False)
+    # 'u' for an insert or update, 'd' for a delete.
+    operation : Mapped[str] = mapped_column(String(1), nullable=False)
+
+
+# The last change shipped to each sync target (normally just the head office).
+class SyncWatermark(Base):
+    __tablename__ = 'sync_watermark'
+
+    target : Mapped[str] = mapped_column(String(40), primary_key=True)
+    watermark : Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    synced_at : Mapped[datetime.datetime | None] = mapped_column(DateTime, nullable=True)
+
+
 # Represents a product brand (e.g., Michelin, Goodyear).
 class Brand(Base):
     __tablename__ = 'brand'
@@ -101,6 +280,9 @@ class Brand(Base):
 # Represents the dimensions of a tire (width, aspect ratio, rim diameter).
 class Size(Base):
     __tablename__ = 'size'
+    # Each tire size is stored once, so brand/size lookups can rely on INSERT ... ON CONFLICT.
+    # A unique index rather than a constraint, so older databases can get it (schema version 10).
+    __table_args__ = (Index('uq_size_dimensions', 'width', 'ratio', 'rim', unique=True),)
     
     id : Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     # Defines a one-to-many relationship from Size to its associated Products.
@@ -125,6 +307,8 @@ class Size(Base):
 # This class uses a single-table inheritance strategy.
 class User(Base):
     __tablename__ = 'user'
+    # The staff lists select by type (employees, managers) out of every account ever created.
+    __table_args__ = (Index('ix_user_type', 'type'),)
     id : Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     name : Mapped[str] = mapped_column(String(20), nullable=False)
     lastname : Mapped[str] = mapped_column(String(20), nullable=False)
@@ -132,7 +316,8 @@ class User(Base):
     national_number : Mapped[str] = mapped_column(nullable=False)
     
     user_name : Mapped[str] = mapped_column(String(20), nullable=False, unique=True)
-    hashed_passwd : Mapped[str] = mapped_column(String(20), nullable=False)
+    # A sha256 hex digest (see utilities.hashing).
+    hashed_passwd : Mapped[str] = mapped_column(String(64), nullable=False)
     
     # This is the discriminator column, which determines the specific subclass (Admin, Manager, etc.).
     type : Mapped[str]
@@ -154,7 +339,7 @@ class User(Base):
 # Represents an Administrator, inheriting from the base User class.
 class Admin(User):
     
-    start_date = mapped_column(Date ,default=datetime.datetime.now().date(), use_existing_column=True)
+    start_date = mapped_column(Date ,default=datetime.date.today, use_existing_column=True)
     
     # Sets the value for the 'type' column when an Admin is created.
     __mapper_args__ = {
@@ -163,7 +348,7 @@ class Admin(User):
     
 # Represents a Manager, inheriting from the base User class.
 class Manager(User):
-    start_date = mapped_column(Date, default=datetime.datetime.now().date(), use_existing_column=True)
+    start_date = mapped_column(Date, default=datetime.date.today, use_existing_column=True)
     
     # Sets the value for the 'type' column when a Manager is created.
     __mapper_args__ = {
@@ -173,13 +358,10 @@ class Manager(User):
 # Represents an Employee, inheriting from the base User class.
 class Employee(User):
     
-    start_date = mapped_column(Date ,default=datetime.datetime.now().date(), use_existing_column=True)
+    start_date = mapped_column(Date ,default=datetime.date.today, use_existing_column=True)
     
     # Sets the value for the 'type' column when an Employee is created.
     __mapper_args__ = {
         "polymorphic_identity": "employee",
     }
         
-    
-# This line connects to the database and creates all the defined tables if they do not already exist.
-Base.metadata.create_all(engine)
\ No newline at end of file
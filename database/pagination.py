@@ -0,0 +1,131 @@
+import datetime
+import operator
+from sqlalchemy import Date, DateTime, tuple_
+from sqlalchemy.orm import Session
+
+from .rows import Page
+
+
+# The operators of the filter DSL. A filter is written as {'<field>__<operator>': value},
+# e.g. {'brand': 'Michelin', 'price__lte': 1500, 'rim__in': [15, 16]}; a field alone
+# means equality. The fields are those of the list's rows (see the crud list functions).
+FILTER_OPERATORS = {
+    'eq': operator.eq,
+    'ne': operator.ne,
+    'lt': operator.lt,
+    'lte': operator.le,
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'in': lambda column, value: column.in_(list(value)),
+    'contains': lambda column, value: column.contains(value, autoescape=True),
+    'startswith': lambda column, value: column.startswith(value, autoescape=True),
+}
+
+
+def _coerce(column, value):
+    # Dates arrive as ISO strings from thin clients (cursors and filters travel as JSON).
+    if isinstance(value, str):
+        if isinstance(column.type, DateTime):
+            return datetime.datetime.fromisoformat(value)
+        if isinstance(column.type, Date):
+            return datetime.date.fromisoformat(value)
+    return value
+
+
+def _column(columns: dict, field: str):
+    column = columns.get(field)
+    if column is None:
+        raise ValueError(f"Unknown field '{field}'; use one of {', '.join(columns)}.")
+    return column
+
+
+def apply_filters(stmt, columns: dict, filters: dict = None):
+    """
+    Adds the conditions of a filter dictionary (see FILTER_OPERATORS) to a select().
+
+    Raises:
+        ValueError: If a field or an operator is unknown.
+    """
+    for key, value in (filters or {}).items():
+        field, _, name = key.partition('__')
+        column = _column(columns, field)
+        condition = FILTER_OPERATORS.get(name or 'eq')
+        if condition is None:
+            raise ValueError(f"Unknown filter operator '{name}'; use one of {', '.join(FILTER_OPERATORS)}.")
+        if name == 'in':
+            value = [_coerce(column, item) for item in value]
+        else:
+            value = _coerce(column, value)
+        stmt = stmt.where(condition(column, value))
+    return stmt
+
+
+def fetch_page(session: Session, stmt, columns: dict, make, after_key=None, limit: int = None,
+               order_by: str = None, filters: dict = None):
+    """
+    Runs a list query with filters, ordering and keyset (seek) pagination.
+
+    The rows are ordered by the 'order_by' field ('-price' for descending; default 'id'),
+    with the id breaking ties (in the same direction). A page continues after the key of the previous page's last
+    row with a WHERE on the ordering columns instead of an OFFSET, so every page costs
+    the same however deep it is, and rows added or removed meanwhile do not shift it.
+    The ordering field should not be NULL.
+
+    Args:
+        session: The database session object.
+        stmt: The select() of the list, without ORDER BY or LIMIT.
+        columns: The fields of the list by name, including 'id' (the unique key).
+        make: Turns a result row into an item of the list.
+        after_key: The 'next_key' of the previous page; None starts at the beginning.
+        limit: The page size. Without it every row (after 'after_key') is returned as a list.
+        order_by: The field to order by.
+        filters: A filter dictionary (see FILTER_OPERATORS).
+
+    Raises:
+        ValueError: If a field, an operator, the key or the limit is not valid.
+
+    Returns:
+        A Page of at most 'limit' items whose 'next_key' continues the list (None on the
+        last page), or a plain list if no limit was given.
+    """
+    if limit is not None:
+        limit = int(limit)
+        if limit < 1:
+            raise ValueError(f"The page size must be at least 1, not {limit}.")
+    stmt = apply_filters(stmt, columns, filters)
+    field = (order_by or 'id').lstrip('-')
+    descending = (order_by or '').startswith('-')
+    keys = [columns['id']] if field == 'id' else [_column(columns, field), columns['id']]
+    stmt = stmt.order_by(*(key.desc() if descending else key for key in keys))
+
+    if after_key is not None:
+        after = tuple(after_key) if isinstance(after_key, (list, tuple)) else (after_key,)
+        if len(after) != len(keys):
+            raise ValueError(f"The key must have {len(keys)} values when ordering by '{field}'.")
+        after = [_coerce(key, value) for key, value in zip(keys, after)]
+        left, right = (keys[0], after[0]) if len(keys) == 1 else (tuple_(*keys), tuple_(*after))
+        stmt = stmt.where(left < right if descending else left > right)
+
+    if limit is None:
+        return [make(row) for row in session.execute(stmt)]
+    # One row more than asked tells whether another page follows.
+    rows = session.execute(stmt.add_columns(*keys).limit(limit + 1)).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    items = [make(row[:-len(keys)]) for row in rows]
+    next_key = None
+    if more:
+        last = tuple(rows[-1][-len(keys):])
+        next_key = last[0] if len(keys) == 1 else last
+    return Page(items, next_key)
+
+
+def iter_pages(function, session: Session, page_size: int = 1000, **options):
+    """Yields every item of a paginated list function, one page (query) at a time."""
+    after_key = None
+    while True:
+        page = function(session, after_key=after_key, limit=page_size, **options)
+        yield from page.items
+        if page.next_key is None:
+            return
+        after_key = page.next_key
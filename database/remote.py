@@ -0,0 +1,238 @@
+import datetime
+import functools
+import http.client
+import json
+import os
+import threading
+from urllib.parse import urlsplit
+from sqlalchemy import Date, DateTime, inspect
+
+from . import Exeptions
+from .connection import Base
+from .rows import ROW_TYPES
+from .service import OPERATIONS, STAFF_OPERATIONS, TOKEN_ENV, TOKEN_HEADER, SESSION_HEADER, operation_function
+from .Exeptions import ServiceError
+
+
+# The address of the shared service (see server.py), e.g. http://192.168.1.10:8765.
+# When it is set, the terminal runs in thin client mode.
+SERVER_ENV = 'TIRESHOP_SERVER'
+
+# Operations that work on files of the machine they run on, so a terminal cannot
+# run them against the shared inventory; they have to be run on the server itself.
+LOCAL_ONLY = ('import_price_list', 'backup_database', 'restore_database', 'export_sales_history', 'archive_orders')
+
+
+def remote_server_url() -> str | None:
+    """Returns the address of the shared service, or None if this terminal uses its own database."""
+    return os.environ.get(SERVER_ENV) or None
+
+
+def _encode_argument(value):
+    # Model objects (e.g. the customer and product passed to create_order) are sent as references.
+    if isinstance(value, Base):
+        return {'__model__': type(value).__name__, 'id': value.id}
+    if isinstance(value, (list, tuple)):
+        return [_encode_argument(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _encode_argument(item) for key, item in value.items()}
+    return value
+
+
+@functools.lru_cache(maxsize=None)
+def _model_fields(model) -> tuple[dict, frozenset]:
+    mapper = inspect(model)
+    dates = {}
+    for attr in mapper.column_attrs:
+        column_type = attr.columns[0].type
+        if isinstance(column_type, DateTime):
+            dates[attr.key] = datetime.datetime.fromisoformat
+        elif isinstance(column_type, Date):
+            dates[attr.key] = datetime.date.fromisoformat
+    return dates, frozenset(mapper.relationships.keys())
+
+
+@functools.lru_cache(maxsize=None)
+def _row_dates(row_type) -> tuple:
+    # The positions of the date fields of a row type.
+    return tuple(index for index, field in enumerate(row_type._fields)
+                 if row_type.__annotations__[field] in (datetime.date, datetime.datetime))
+
+
+def _decode_row(value: dict, models: dict):
+    row_type = ROW_TYPES[value['__row__']]
+    values = [decode(item, models) for item in value['values']]
+    for index in _row_dates(row_type):
+        if isinstance(values[index], str):
+            parse = row_type.__annotations__[row_type._fields[index]].fromisoformat
+            values[index] = parse(values[index])
+    return row_type(*values)
+
+
+def decode(value, models: dict = None):
+    """
+    Turns a service result back into the objects the crud function would have returned.
+
+    Models come back as transient (session-less) objects, so the UI code can use
+    them exactly as before, including checks such as is_admin(user).
+    """
+    if models is None:
+        models = {mapper.class_.__name__: mapper.class_ for mapper in Base.registry.mappers}
+    if isinstance(value, list):
+        return [decode(item, models) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if '__row__' in value:
+        return _decode_row(value, models)
+    if '__model__' not in value:
+        return {key: decode(item, models) for key, item in value.items()}
+
+    model = models[value['__model__']]
+    dates, relationships = _model_fields(model)
+    fields = {}
+    for key, item in value.items():
+        if key == '__model__':
+            continue
+        if key in relationships:
+            fields[key] = decode(item, models)
+        elif key in dates and isinstance(item, str):
+            fields[key] = dates[key](item)
+        else:
+            fields[key] = item
+    return model(**fields)
+
+
+def _decode_error(error: dict) -> Exception:
+    # Raise the same exception the crud function raised on the server.
+    name = error.get('type')
+    if name == 'ValueError':
+        exception_type = ValueError
+    else:
+        exception_type = getattr(Exeptions, name, None)
+        if not (isinstance(exception_type, type) and issubclass(exception_type, Exception)):
+            exception_type = ServiceError
+    exception = exception_type.__new__(exception_type)
+    Exception.__init__(exception, error.get('message', ''))
+    exception.__dict__.update(error.get('details') or {})
+    return exception
+
+
+class ServiceClient:
+    """
+    A thin client for the shared service.
+
+    Every thread keeps its own keep-alive connection, so the UI thread and any
+    background threads can call the service at the same time. Requests carry the
+    installation's token (default: TIRESHOP_SERVICE_TOKEN) and, after a login, the
+    session id the service answered it with.
+    """
+
+    def __init__(self, url: str, timeout: float = 10, token: str = None):
+        parts = urlsplit(url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.token = token if token is not None else os.environ.get(TOKEN_ENV, '')
+        self.session_id = None
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def _request(self, method: str, path: str, payload: dict = None) -> dict:
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        headers[TOKEN_HEADER] = self.token
+        if self.session_id:
+            headers[SESSION_HEADER] = self.session_id
+        # A keep-alive connection the server closed while idle is opened again once.
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                return json.loads(response.read())
+            except (http.client.HTTPException, ConnectionError) as e:
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise ServiceError(f"The service at {self.host}:{self.port} is not reachable: {e}") from e
+            except OSError as e:
+                connection.close()
+                self._local.connection = None
+                raise ServiceError(f"The service at {self.host}:{self.port} is not reachable: {e}") from e
+
+    def health(self) -> dict:
+        """Returns the service's status, schema version and operations."""
+        return self._request('GET', '/health')
+
+    def call(self, op: str, *args, **kwargs):
+        """Runs crud.<op>(session, *args, **kwargs) on the service and returns its result."""
+        response = self._request('POST', '/call', {'op': op, 'args': _encode_argument(args), 'kwargs': _encode_argument(kwargs)})
+        self._remember_login(op, response)
+        if 'error' in response:
+            raise _decode_error(response['error'])
+        return decode(response['result'])
+
+    def batch(self, calls: list[tuple]) -> list:
+        """
+        Runs several operations in one round trip.
+
+        Args:
+            calls: (op, args, kwargs) tuples; args and kwargs may be left out.
+
+        Returns:
+            The result of each call in order; a call that failed gives its exception instead.
+        """
+        payload = []
+        for op, *rest in calls:
+            args = rest[0] if len(rest) > 0 else ()
+            kwargs = rest[1] if len(rest) > 1 else {}
+            payload.append({'op': op, 'args': _encode_argument(args), 'kwargs': _encode_argument(kwargs)})
+        response = self._request('POST', '/batch', {'calls': payload})
+        if 'error' in response:
+            raise _decode_error(response['error'])
+        for (op, *_), item in zip(calls, response['results']):
+            self._remember_login(op, item)
+        return [_decode_error(item['error']) if 'error' in item else decode(item['result']) for item in response['results']]
+
+    def _remember_login(self, op: str, response: dict):
+        # Staff management is allowed by the login made at this terminal (see service.check_staff_permission).
+        if op == 'user_by_username_pass' and 'result' in response:
+            self.session_id = response.get('session')
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+def _remote_function(client: ServiceClient, name: str):
+    @functools.wraps(operation_function(name))
+    def call(session, *args, **kwargs):
+        return client.call(name, *args, **kwargs)
+    return call
+
+
+def _local_only_function(name: str):
+    def call(*args, **kwargs):
+        raise ServiceError(f"'{name}' is only available on the server of the shared inventory.")
+    call.__name__ = name
+    return call
+
+
+def remote_functions(client: ServiceClient) -> dict:
+    """
+    Returns replacements for the database functions that send them to the service.
+
+    The functions keep the crud signatures (the session argument is ignored), so
+    the panels work unchanged in thin client mode.
+    """
+    functions = {name: _remote_function(client, name) for name in (*OPERATIONS, *STAFF_OPERATIONS)}
+    functions.update({name: _local_only_function(name) for name in LOCAL_ONLY})
+    return functions
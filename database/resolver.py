@@ -0,0 +1,127 @@
+from .models import Brand, Size
+import threading
+import weakref
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+
+def insert_ignore(session: Session, model):
+    """
+    Returns an INSERT for the model that silently skips rows violating a unique constraint
+    ('INSERT ... ON CONFLICT DO NOTHING').
+    """
+    if session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model).on_conflict_do_nothing()
+
+
+# A process-wide cache of brand and size ids, used by the product write functions
+# so they do not have to look up (or commit) brands and sizes on every call.
+#
+# Ids are cached per engine, so sessions bound to different databases never share
+# entries. Rows inserted by the resolver only become visible in the cache once the
+# session commits; if the transaction is rolled back they are forgotten.
+class BrandSizeResolver:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # engine -> {'brands': {name: id}, 'sizes': {(width, ratio, rim): id}}
+        self._caches = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    def _cache_for(self, session: Session) -> dict:
+        engine = session.get_bind()
+        with self._lock:
+            cache = self._caches.get(engine)
+            if cache is None:
+                cache = {'brands': {}, 'sizes': {}}
+                self._caches[engine] = cache
+            return cache
+
+    def _remember(self, session: Session, cache: dict, kind: str, key, value: int, inserted: bool):
+        pending = session.info.setdefault('resolver_pending', {})
+        if inserted or (kind, key) in pending:
+            # Rows created in this transaction are only cached once it commits (see _promote_pending).
+            pending[(kind, key)] = value
+        else:
+            cache[kind][key] = value
+
+    def brand_id(self, session: Session, name: str) -> int:
+        """Returns the id of the brand with this name, inserting it if it does not exist yet."""
+        cache = self._cache_for(session)
+        brand_id = cache['brands'].get(name)
+        if brand_id is not None:
+            self.hits += 1
+            return brand_id
+
+        self.misses += 1
+        inserted = session.execute(insert_ignore(session, Brand).values(name=name)).rowcount
+        brand_id = session.execute(select(Brand.id).where(Brand.name == name)).scalar()
+        self._remember(session, cache, 'brands', name, brand_id, inserted)
+        return brand_id
+
+    def size_id(self, session: Session, width: int, ratio: int, rim: int) -> int:
+        """Returns the id of the (width, ratio, rim) size, inserting it if it does not exist yet."""
+        key = (int(width), int(ratio), int(rim))
+        cache = self._cache_for(session)
+        size_id = cache['sizes'].get(key)
+        if size_id is not None:
+            self.hits += 1
+            return size_id
+
+        self.misses += 1
+        inserted = session.execute(insert_ignore(session, Size).values(width=key[0], ratio=key[1], rim=key[2])).rowcount
+        size_id = session.execute(
+            select(Size.id).where(Size.width == key[0], Size.ratio == key[1], Size.rim == key[2]).order_by(Size.id).limit(1)
+        ).scalar()
+        self._remember(session, cache, 'sizes', key, size_id, inserted)
+        return size_id
+
+    def forget_brand(self, brand_id: int):
+        with self._lock:
+            for cache in self._caches.values():
+                for name, cached_id in list(cache['brands'].items()):
+                    if cached_id == brand_id:
+                        del cache['brands'][name]
+
+    def forget_size(self, size_id: int):
+        with self._lock:
+            for cache in self._caches.values():
+                for key, cached_id in list(cache['sizes'].items()):
+                    if cached_id == size_id:
+                        del cache['sizes'][key]
+
+    def clear(self):
+        """Drops every cached id, e.g. after the database file has been restored from a backup."""
+        with self._lock:
+            self._caches.clear()
+
+
+resolver = BrandSizeResolver()
+
+
+@event.listens_for(Session, 'after_commit')
+def _promote_pending(session: Session):
+    pending = session.info.pop('resolver_pending', None)
+    if pending:
+        cache = resolver._cache_for(session)
+        for (kind, key), value in pending.items():
+            cache[kind][key] = value
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_pending(session: Session):
+    session.info.pop('resolver_pending', None)
+
+
+# Deleting a brand or size through the ORM evicts it from the cache.
+@event.listens_for(Brand, 'after_delete')
+def _brand_deleted(mapper, connection, target: Brand):
+    resolver.forget_brand(target.id)
+
+
+@event.listens_for(Size, 'after_delete')
+def _size_deleted(mapper, connection, target: Size):
+    resolver.forget_size(target.id)
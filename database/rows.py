@@ -0,0 +1,109 @@
+import datetime
+from typing import NamedTuple
+
+
+# Compact, read-only rows for the list screens, filled straight from the columns of a
+# select() (see the get_*_rows functions in database/crud.py). A row is a plain tuple:
+# no ORM state, no per-row dictionary, and cached rows can be shared safely.
+# to_dict() gives the dictionary of the model's to_dict, for the *_json functions.
+
+# A product of the catalog with its brand name and size.
+class ProductRow(NamedTuple):
+    id: int
+    brand_id: int
+    size_id: int
+    brand: str | None
+    width: int | None
+    ratio: int | None
+    rim: int | None
+    price: float
+    quantity: int
+
+    @property
+    def size_label(self) -> str:
+        return f'{self.width}/{self.ratio}/{self.rim}'
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "brand_id": self.brand_id,
+            "size_id": self.size_id,
+            "brand": self.brand,
+            "size": {"width": self.width, "ratio": self.ratio, "rim": self.rim} if self.width is not None else None,
+            "price": self.price,
+            "quantity": self.quantity,
+        }
+
+
+# A customer.
+class CustomerRow(NamedTuple):
+    id: int
+    name: str
+    phone: str
+    address: str
+    national_number: str
+
+    def to_dict(self) -> dict:
+        return self._asdict()
+
+
+# A member of staff (employee, manager or admin); the password hash is never read.
+class StaffRow(NamedTuple):
+    id: int
+    name: str
+    lastname: str
+    phone: str
+    national_number: str
+    username: str
+    type: str
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "lastname": self.lastname,
+            "phone": self.phone,
+            "national_number": self.national_number,
+            "username": self.username,
+        }
+
+
+# A line of an order, with the order's date, branch and customer.
+class OrderLineRow(NamedTuple):
+    id: int
+    order_id: int
+    date: datetime.date
+    branch_id: int
+    customer_id: int
+    customer_name: str | None
+    brand: str
+    width: int
+    ratio: int
+    rim: int
+    price: float
+    quantity: int
+
+    @property
+    def size_label(self) -> str:
+        return f'{self.width}/{self.ratio}/{self.rim}'
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "order_id": self.order_id,
+            "brand": self.brand,
+            "price": self.price,
+            "size": {"width": self.width, "ratio": self.ratio, "rim": self.rim},
+            "quantity": self.quantity,
+        }
+
+
+# A page of a list (see database/pagination.py): its items, and the key to pass as
+# 'after_key' for the next page (None on the last page).
+class Page(NamedTuple):
+    items: list
+    next_key: object
+
+
+# The row types by name, for the service and its clients.
+ROW_TYPES = {row_type.__name__: row_type for row_type in (ProductRow, CustomerRow, StaffRow, OrderLineRow, Page)}
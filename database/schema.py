@@ -0,0 +1,219 @@
+import threading
+import weakref
+from sqlalchemy import text, inspect, select, insert, update, delete, bindparam, Table, Column, Integer, MetaData
+from sqlalchemy.engine import Engine
+
+from .connection import Base
+from .migrations import Step, Run, CreateIndex, Backfill, log_progress
+
+
+# Bump this whenever a model changes in a way that needs new tables, columns or indexes.
+#   1  initial schema
+#   2  stock ledger (stock_movement, stock_snapshot)
+#   3  product.version for optimistic concurrency
+#   4  branches (branch, branch_stock, stock_availability, order/stock_movement.branch_id)
+#   5  change capture for the head office sync (change_log, sync_watermark, triggers)
+#   6  daily sales rollups of archived orders (sales_rollup)
+#   7  maintenance log (maintenance_run)
+#   8  indexes on order.customer_id and products_order.order_id
+#   9  index on user.type
+#  10  unique index on size (width, ratio, rim), after merging duplicate sizes
+#  11  opening stock balances of the products from before the stock ledger
+#  12  product.deleted (deleted products keep their ledger)
+SCHEMA_VERSION = 12
+
+_lock = threading.Lock()
+# Engines whose schema has already been checked in this process.
+_checked = weakref.WeakSet()
+
+
+# Other databases keep the version in a one-row table. It is not part of Base.metadata,
+# so exports and create_all leave it alone.
+_version_table = Table('schema_version', MetaData(), Column('version', Integer, nullable=False))
+
+
+def _read_version(conn) -> int | None:
+    # SQLite keeps a free integer in the file header for exactly this purpose.
+    if conn.dialect.name == 'sqlite':
+        return conn.execute(text('PRAGMA user_version')).scalar()
+    if not inspect(conn).has_table(_version_table.name):
+        return None
+    return conn.execute(select(_version_table.c.version)).scalar()
+
+
+def _write_version(conn, version: int):
+    if conn.dialect.name == 'sqlite':
+        conn.execute(text(f'PRAGMA user_version = {int(version)}'))
+        return
+    _version_table.create(conn, checkfirst=True)
+    conn.execute(delete(_version_table))
+    conn.execute(insert(_version_table).values(version=int(version)))
+
+
+def _add_product_version(conn):
+    if 'version' not in {column['name'] for column in inspect(conn).get_columns('product')}:
+        conn.execute(text('ALTER TABLE product ADD COLUMN version INTEGER NOT NULL DEFAULT 1'))
+
+
+def _add_product_deleted(conn):
+    if 'deleted' not in {column['name'] for column in inspect(conn).get_columns('product')}:
+        conn.execute(text('ALTER TABLE product ADD COLUMN deleted BOOLEAN NOT NULL DEFAULT false'))
+
+
+def _add_branch_columns(conn):
+    from .models import Order, StockMovement, DEFAULT_BRANCH_ID
+    for table in (Order.__table__, StockMovement.__table__):
+        if 'branch_id' not in {column['name'] for column in inspect(conn).get_columns(table.name)}:
+            name = conn.dialect.identifier_preparer.quote(table.name)
+            conn.execute(text(f'ALTER TABLE {name} ADD COLUMN branch_id INTEGER NOT NULL DEFAULT {DEFAULT_BRANCH_ID}'))
+
+
+def _merge_duplicate_sizes(conn):
+    # Databases from before uq_size_dimensions may hold a size several times. The products
+    # of the copies move to the oldest row, the copies are deleted and the availability
+    # index, which is keyed by size, is recomputed.
+    from .models import Size, Product
+    from .branches import refill_availability
+    kept, merged = {}, []
+    for size_id, width, ratio, rim in conn.execute(select(Size.id, Size.width, Size.ratio, Size.rim).order_by(Size.id)):
+        first = kept.setdefault((width, ratio, rim), size_id)
+        if first != size_id:
+            merged.append({'old': size_id, 'new': first})
+    if not merged:
+        return
+    conn.execute(update(Product).where(Product.size_id == bindparam('old'))
+                 .values(size_id=bindparam('new'), version=Product.version + 1), merged)
+    conn.execute(delete(Size).where(Size.id.in_([pair['old'] for pair in merged])))
+    _merge_duplicate_products(conn)
+    refill_availability(conn)
+
+
+def _merge_duplicate_products(conn):
+    # A brand with a product on two copies of a size now has two products of the same
+    # brand and size. The newer one is merged into the oldest: its stock, ledger and
+    # snapshots move over and the quantities are added up.
+    from .models import Product, BranchStock, StockMovement, StockSnapshot
+    kept = {}
+    for product_id, brand_id, size_id, quantity in conn.execute(
+            select(Product.id, Product.brand_id, Product.size_id, Product.quantity).order_by(Product.id)):
+        first = kept.setdefault((brand_id, size_id), product_id)
+        if first == product_id:
+            continue
+        for branch_id, branch_quantity in conn.execute(
+                select(BranchStock.branch_id, BranchStock.quantity).where(BranchStock.product_id == product_id)).all():
+            if not conn.execute(update(BranchStock).where(BranchStock.branch_id == branch_id, BranchStock.product_id == first)
+                                .values(quantity=BranchStock.quantity + branch_quantity)).rowcount:
+                conn.execute(insert(BranchStock).values(branch_id=branch_id, product_id=first, quantity=branch_quantity))
+        conn.execute(delete(BranchStock).where(BranchStock.product_id == product_id))
+        conn.execute(update(StockMovement).where(StockMovement.product_id == product_id).values(product_id=first))
+        # Snapshots are taken of every product at once, so both usually have one at the same time.
+        for snapshot_id, taken_at, snapshot_quantity in conn.execute(
+                select(StockSnapshot.id, StockSnapshot.taken_at, StockSnapshot.quantity)
+                .where(StockSnapshot.product_id == product_id)).all():
+            if conn.execute(update(StockSnapshot).where(StockSnapshot.product_id == first, StockSnapshot.taken_at == taken_at)
+                            .values(quantity=StockSnapshot.quantity + snapshot_quantity)).rowcount:
+                conn.execute(delete(StockSnapshot).where(StockSnapshot.id == snapshot_id))
+            else:
+                conn.execute(update(StockSnapshot).where(StockSnapshot.id == snapshot_id).values(product_id=first))
+        conn.execute(update(Product).where(Product.id == first)
+                     .values(quantity=Product.quantity + quantity, version=Product.version + 1))
+        conn.execute(delete(Product).where(Product.id == product_id))
+
+
+def _upgrades() -> dict[int, list[Step]]:
+    """
+    Changes to existing tables that create_all cannot make (it only creates missing tables),
+    keyed by the schema version that introduced them. Large tables are changed in chunks
+    (Backfill) and indexes built on their own (CreateIndex), so an upgrade never holds
+    the write lock for long.
+    """
+    from .models import Order, ProductsOrder, StockMovement
+    from .branches import ensure_default_branch
+    from .sync import SYNC_TABLES, install_change_capture, log_existing_rows
+    from .stock import write_opening_balances
+    indexes = {index.name: index for table in Base.metadata.tables.values() for index in table.indexes}
+    return {
+        3: [Run(_add_product_version, 'product.version column')],
+        4: [Run(_add_branch_columns, 'branch_id columns on order and stock_movement'),
+            CreateIndex(indexes['ix_order_branch_date']),
+            CreateIndex(indexes['ix_stock_movement_branch_created']),
+            Run(ensure_default_branch, 'default branch and its stock')],
+        5: [Run(install_change_capture, 'change capture triggers')] +
+           [Backfill(table, log_existing_rows(table), f'change log of the existing {table} rows') for table in SYNC_TABLES],
+        8: [CreateIndex(indexes['ix_order_customer']),
+            CreateIndex(indexes['ix_products_order_order'])],
+        9: [CreateIndex(indexes['ix_user_type'])],
+        10: [Run(_merge_duplicate_sizes, 'merge duplicate sizes'),
+             CreateIndex(indexes['uq_size_dimensions'])],
+        11: [Run(write_opening_balances, 'opening stock balances')],
+        12: [Run(_add_product_deleted, 'product.deleted column')],
+    }
+
+
+def pending_migrations(conn) -> list[tuple[int, list[Step]]]:
+    """
+    Returns the migrations a database still needs, oldest first, as (version, steps).
+
+    Creating the missing tables comes first. A database at the current SCHEMA_VERSION
+    needs nothing; on a new one every step runs, quickly, over empty tables.
+    """
+    # Importing the models registers every table on Base.metadata.
+    from . import models  # noqa: F401
+    stored = _read_version(conn)
+    if stored == SCHEMA_VERSION:
+        return []
+    create = Run(Base.metadata.create_all, 'create missing tables')
+    migrations = [(version, steps) for version, steps in sorted(_upgrades().items()) if stored is None or version > stored]
+    if not migrations:
+        return [(SCHEMA_VERSION, [create])]
+    migrations[0] = (migrations[0][0], [create] + migrations[0][1])
+    return migrations
+
+
+def ensure_schema(engine: Engine, progress=None) -> bool:
+    """
+    Creates or upgrades the tables if the database is not at the current SCHEMA_VERSION.
+
+    When the stored version matches, the (comparatively slow) table-by-table check
+    of create_all is skipped entirely. The result is cached per engine, so calling
+    this again in the same process costs nothing.
+
+    Every step of an upgrade commits on its own, and the version is written after each
+    migration, so the application keeps working between steps and an interrupted
+    upgrade continues where it stopped. 'python -m database.migrations --dry-run'
+    shows what an upgrade will do and how long it should take.
+
+    Args:
+        engine: The engine of the database to prepare.
+        progress: Called as progress(step, done, total) while upgrading.
+            Defaults to a log line per step (database.migrations.log_progress).
+
+    Returns:
+        True if the schema was created or upgraded, False if it was already current.
+    """
+    if engine in _checked:
+        return False
+    with _lock:
+        if engine in _checked:
+            return False
+        with engine.connect() as conn:
+            migrations = pending_migrations(conn)
+        for version, steps in migrations:
+            for step in steps:
+                step.run(engine, progress or log_progress)
+            with engine.begin() as conn:
+                _write_version(conn, version)
+        if migrations:
+            with engine.begin() as conn:
+                _write_version(conn, SCHEMA_VERSION)
+        _checked.add(engine)
+        return bool(migrations)
+
+
+def forget_schema_check(engine: Engine = None):
+    """Makes the next ensure_schema call check the database (or every database) again, e.g. after a restore."""
+    with _lock:
+        if engine is None:
+            _checked.clear()
+        else:
+            _checked.discard(engine)
@@ -0,0 +1,500 @@
+import argparse
+import datetime
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from inspect import signature
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from sqlalchemy import inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import crud
+from . import branches
+from . import maintenance
+from . import Exeptions
+from . import connection
+from .connection import Base
+from .rows import ROW_TYPES
+from .schema import ensure_schema, SCHEMA_VERSION
+from .stock import take_stock_snapshot_if_due
+from .Exeptions import ServiceError, AccessDeniedException
+
+log = logging.getLogger(__name__)
+
+
+# The crud functions the service offers, each with the relationships of the returned
+# objects that are sent along (dotted paths reach further, e.g. 'orders.products').
+# Every function is called as crud.<name>(session, *args, **kwargs), or from the
+# branches or maintenance module for the operations listed under those.
+OPERATIONS = {
+    # Login and staff
+    'user_by_username_pass': (),
+    'user_by_national_id_phone': (),
+    'reset_password': (),
+    'user_by_username': (),
+    'admin_exists': (),
+    'get_all_employees_json': (),
+    'get_all_employee_usernames': (),
+    'get_all_employee_and_manager_json': (),
+    'get_all_employee_and_manager_usernames': (),
+    'get_staff_rows': (),
+    'get_employee_rows': (),
+    'get_staff_usernames': (),
+    # Catalog
+    'get_all_products': ('brand', 'size'),
+    'get_all_products_json': (),
+    'get_product_rows': (),
+    'get_product_row': (),
+    'get_product_by_id': ('brand', 'size'),
+    'get_product_by_id_json': (),
+    'create_product': ('brand', 'size'),
+    'update_product_by_id': ('brand', 'size'),
+    'delete_product_by_name_and_size': (),
+    'count_products_for_bulk_update': (),
+    'bulk_update_products': (),
+    # Customers and checkout
+    'get_all_customers': (),
+    'get_all_customers_json': (),
+    'get_customer_rows': (),
+    'get_customer_by_id': ('orders', 'orders.products'),
+    'get_customer_by_national_id': (),
+    'get_or_create_customer': (),
+    'create_order': ('products',),
+    # Reports
+    'get_all_orders': ('products',),
+    'get_all_orders_json': (),
+    'get_order_line_rows': (),
+    'get_total_product_quantity': (),
+    'get_brands_count': (),
+    'get_sizes_count': (),
+    'get_customers_count': (),
+    'get_employees_count': (),
+    'get_monthly_sales': (),
+    'get_daily_sales': (),
+    # Branches
+    'get_all_branches': (),
+    'create_branch': (),
+    'get_branch_quantity': (),
+    'get_branch_stock': (),
+    'transfer_stock': (),
+    'get_size_availability': (),
+    # Maintenance log of the server's database
+    'get_maintenance_runs': (),
+}
+
+# Staff management: only for a terminal logged in as an administrator, or as a manager
+# when the account concerned is an employee's (see check_staff_permission).
+STAFF_OPERATIONS = {
+    'create_new_user': (),
+    'update_user_by_username': (),
+    'remove_user_by_username': (),
+}
+
+# Every request must carry the installation's shared secret in this header (see service_token).
+TOKEN_HEADER = 'X-TireShop-Token'
+TOKEN_ENV = 'TIRESHOP_SERVICE_TOKEN'
+# Where serve() keeps a generated token when TIRESHOP_SERVICE_TOKEN is not set.
+TOKEN_FILE = os.path.join('database', 'service.token')
+
+# A successful login is answered with a session id, which the terminal sends back in this
+# header; it tells the service who is logged in at the terminal.
+SESSION_HEADER = 'X-TireShop-Session'
+# Seconds a login session stays valid.
+SESSION_TTL = 12 * 3600
+
+# Operations that check a password or identity. Failed attempts are counted per client
+# address, and after MAX_FAILED_LOGINS within LOGIN_WINDOW seconds further ones are refused.
+LOGIN_OPERATIONS = ('user_by_username_pass', 'user_by_national_id_phone', 'reset_password')
+MAX_FAILED_LOGINS = 5
+LOGIN_WINDOW = 300
+
+# Columns that never leave the server.
+HIDDEN_FIELDS = {'hashed_passwd'}
+
+# Worker threads (and pooled database connections) of the service.
+DEFAULT_WORKERS = 8
+
+# Seconds an idle keep-alive connection may hold a worker before it is closed.
+KEEP_ALIVE_TIMEOUT = 5
+
+# Errors a client caused, by HTTP status; anything else is a 500.
+_ERROR_STATUS = (
+    ((AccessDeniedException,), 403),
+    ((Exeptions.InsufficientStockException, Exeptions.StockConflictException), 409),
+    ((Exeptions.ProductNotExistsException, Exeptions.CustomerNotExistsException, Exeptions.UsernameNotExistsException,
+      Exeptions.NoDataFoundError, Exeptions.BranchNotExistsException), 404),
+    ((ServiceError, ValueError, Exeptions.UsernameAlreadyExistsException, Exeptions.NationalNumberAlreadyExistsException,
+      Exeptions.ProductAlreadyExistsException), 400),
+)
+
+
+def _models() -> dict:
+    return {mapper.class_.__name__: mapper.class_ for mapper in Base.registry.mappers}
+
+
+def encode(value, include=()):
+    """
+    Turns a crud result into JSON-ready data.
+
+    Model objects become dictionaries of their columns plus a '__model__' tag with
+    the class name; only the relationships named in 'include' are followed. Rows
+    (database/rows.py) become their values with a '__row__' tag.
+    """
+    if isinstance(value, Base):
+        state = inspect(value)
+        data = {'__model__': type(value).__name__}
+        # Some crud functions close the session; columns they did not load are left out.
+        skipped = HIDDEN_FIELDS | (state.unloaded if state.detached else set())
+        for attr in state.mapper.column_attrs:
+            if attr.key not in skipped:
+                data[attr.key] = encode(getattr(value, attr.key))
+        nested = {}
+        for path in include:
+            head, _, rest = path.partition('.')
+            nested.setdefault(head, []).extend([rest] if rest else [])
+        for key, paths in nested.items():
+            if key in state.mapper.relationships:
+                data[key] = encode(getattr(value, key), paths)
+        return data
+    if type(value).__name__ in ROW_TYPES and isinstance(value, tuple):
+        return {'__row__': type(value).__name__, 'values': [encode(item, include) for item in value]}
+    if isinstance(value, (list, tuple)):
+        return [encode(item, include) for item in value]
+    if isinstance(value, dict):
+        return {key: encode(item, include) for key, item in value.items()}
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def _resolve(session: Session, value, models: dict):
+    # Model objects are sent by the client as {'__model__': name, 'id': id} references.
+    if isinstance(value, dict):
+        if '__model__' in value:
+            model = models.get(value['__model__'])
+            if model is None:
+                raise ServiceError(f"Unknown model '{value['__model__']}'.")
+            return session.get(model, value['id'])
+        return {key: _resolve(session, item, models) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_resolve(session, item, models) for item in value]
+    return value
+
+
+def operation_function(name: str):
+    """Returns the database function behind an operation of OPERATIONS."""
+    for module in (crud, branches):
+        if hasattr(module, name):
+            return getattr(module, name)
+    return getattr(maintenance, name)
+
+
+def check_staff_permission(session: Session, op: str, args: list, kwargs: dict, user_type: str = None):
+    """
+    Raises AccessDeniedException unless a user of 'user_type' (None: nobody logged in) may
+    run the staff operation: administrators manage every account, managers the employees'.
+    """
+    if user_type == 'admin':
+        return
+    if user_type == 'manager':
+        try:
+            arguments = signature(operation_function(op)).bind(session, *args, **kwargs).arguments
+        except TypeError as e:
+            raise ServiceError(f"Invalid arguments for '{op}': {e}") from e
+        if op == 'create_new_user':
+            target = str(arguments.get('level_type', '')).lower()
+        else:
+            target = crud.user_by_username(session, arguments['username']).type
+        if target == 'employee':
+            return
+    raise AccessDeniedException(f"'{op}' needs an administrator's login.")
+
+
+def call_operation(session: Session, op: str, args: list = None, kwargs: dict = None, user_type: str = None):
+    """
+    Runs one crud operation for a client and returns its encoded result.
+
+    Args:
+        session: The database session object.
+        op: The name of the crud function, one of OPERATIONS or STAFF_OPERATIONS.
+        args: The positional arguments after the session.
+        kwargs: The keyword arguments.
+        user_type: The type of the user logged in at the terminal, if any.
+
+    Raises:
+        ServiceError: If the operation is not offered by the service.
+        AccessDeniedException: If the logged-in user may not run a staff operation.
+    """
+    include = OPERATIONS.get(op, STAFF_OPERATIONS.get(op)) if isinstance(op, str) else None
+    if include is None:
+        raise ServiceError(f"Unknown operation '{op}'.")
+    if not isinstance(args or [], list) or not isinstance(kwargs or {}, dict):
+        raise ServiceError("The 'args' of a call must be a list and its 'kwargs' an object.")
+    models = _models()
+    args = _resolve(session, list(args or ()), models)
+    kwargs = _resolve(session, dict(kwargs or {}), models)
+    try:
+        if op in STAFF_OPERATIONS:
+            check_staff_permission(session, op, args, kwargs, user_type)
+        return encode(operation_function(op)(session, *args, **kwargs), include)
+    except Exception:
+        session.rollback()
+        raise
+
+
+def encode_error(error: Exception) -> tuple[int, dict]:
+    """Returns the HTTP status and the JSON body describing an exception."""
+    for types, status in _ERROR_STATUS:
+        if isinstance(error, types):
+            break
+    else:
+        log.exception("Operation failed", exc_info=error)
+        return 500, {'type': 'ServiceError', 'message': f"{type(error).__name__}: {error}"}
+    # Extra attributes such as InsufficientStockException.available go along.
+    details = {key: value for key, value in vars(error).items() if isinstance(value, (str, int, float, bool, type(None)))}
+    return status, {'type': type(error).__name__, 'message': str(error), 'details': details}
+
+
+def service_token(path: str = TOKEN_FILE) -> str:
+    """
+    Returns the installation's shared secret: TIRESHOP_SERVICE_TOKEN if set, otherwise the
+    token kept in 'path', which is created (readable by its owner only) on first use.
+    """
+    token = os.environ.get(TOKEN_ENV)
+    if token:
+        return token
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            token = f.read().strip()
+        if token:
+            return token
+    token = secrets.token_urlsafe(32)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w', encoding='utf-8') as f:
+        f.write(token + '\n')
+    return token
+
+
+def create_service_engine(database_url: str = None, workers: int = DEFAULT_WORKERS):
+    """Creates the service's engine with a connection pool sized for its worker threads."""
+    url = database_url or connection.database_url()
+    connect_args = None
+    if make_url(url).get_backend_name() == 'sqlite':
+        # Pooled connections move between worker threads; writers wait for each other's locks.
+        connect_args = {'check_same_thread': False, 'timeout': 30}
+    return connection.make_engine(url, pool_size=workers, max_overflow=0, connect_args=connect_args)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """
+    The JSON API:
+
+        GET  /health  {"status": "ok", "schema": 3, "operations": [...]}
+        POST /call    {"op": name, "args": [...], "kwargs": {...}} -> {"result": ...} or {"error": ...}
+        POST /batch   {"calls": [call, ...]} -> {"results": [{"result": ...} or {"error": ...}, ...]}
+
+    A batch runs its calls in order, on one worker and one pooled connection,
+    so a terminal can fetch e.g. the whole dashboard in a single round trip.
+
+    Every request must send the service's token in the TOKEN_HEADER header; others get
+    a 401. A successful user_by_username_pass result also carries a "session" id, to be
+    sent in the SESSION_HEADER header by the calls that need the login.
+    """
+    protocol_version = 'HTTP/1.1'
+    server_version = 'TireShopService/1'
+    timeout = KEEP_ALIVE_TIMEOUT
+    # Headers and body are written separately; without this, small replies wait for a delayed ACK.
+    disable_nagle_algorithm = True
+
+    def _authorized(self) -> bool:
+        if self.server.authorized(self.headers.get(TOKEN_HEADER)):
+            return True
+        self._reply(401, {'error': {'type': 'AccessDeniedException',
+                                    'message': f"The request does not carry this installation's {TOKEN_HEADER}."}})
+        return False
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path == '/health':
+            self._reply(200, {'status': 'ok', 'schema': SCHEMA_VERSION, 'operations': sorted(OPERATIONS)})
+        else:
+            self._reply(404, {'error': {'type': 'ServiceError', 'message': f"Unknown path '{self.path}'."}})
+
+    def do_POST(self):
+        if not self._authorized():
+            # The body is left unread, so the connection cannot be reused.
+            self.close_connection = True
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._reply(400, {'error': {'type': 'ServiceError', 'message': 'The request is not valid JSON.'}})
+            return
+        calls = payload.get('calls', ()) if isinstance(payload, dict) else None
+        if not isinstance(payload, dict) or (self.path == '/batch' and not (
+                isinstance(calls, list) and all(isinstance(call, dict) for call in calls))):
+            self._reply(400, {'error': {'type': 'ServiceError', 'message': 'The request must be a JSON object, '
+                                        'and the calls of a batch a list of objects.'}})
+            return
+
+        if self.path == '/call':
+            with self.server.Session() as session:
+                status, body = self._call(session, payload)
+            self._reply(status, body)
+        elif self.path == '/batch':
+            with self.server.Session() as session:
+                results = [self._call(session, call)[1] for call in calls]
+            self._reply(200, {'results': results})
+        else:
+            self._reply(404, {'error': {'type': 'ServiceError', 'message': f"Unknown path '{self.path}'."}})
+
+    def _call(self, session: Session, payload: dict) -> tuple[int, dict]:
+        op = payload.get('op')
+        address = self.client_address[0]
+        try:
+            if op in LOGIN_OPERATIONS:
+                self.server.check_login_allowed(address)
+            user_type = self.server.session_user_type(self.headers.get(SESSION_HEADER))
+            result = call_operation(session, op, payload.get('args'), payload.get('kwargs'), user_type)
+        except Exception as e:
+            if op in LOGIN_OPERATIONS and not isinstance(e, AccessDeniedException):
+                self.server.record_login(address, False)
+            status, error = encode_error(e)
+            return status, {'error': error}
+        body = {'result': result}
+        if op in LOGIN_OPERATIONS:
+            self.server.record_login(address, bool(result))
+        if op == 'user_by_username_pass' and result:
+            body['session'] = self.server.open_session(result['user_name'], result['type'])
+        return 200, body
+
+    def _reply(self, status: int, body: dict):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        log.debug("%s %s", self.address_string(), format % args)
+
+
+class ShopService(HTTPServer):
+    """
+    The shared inventory service for several counter terminals (see server.py).
+
+    Requests are handled by a fixed pool of worker threads, each with a connection
+    from the engine's pool, so a burst of terminals cannot open unbounded threads or
+    database connections. A keep-alive connection holds its worker until it has been
+    idle for KEEP_ALIVE_TIMEOUT seconds.
+    """
+
+    def __init__(self, address: tuple, database_url: str = None, workers: int = DEFAULT_WORKERS, token: str = None):
+        # Without a token (tests, benchmarks) a random one is used; read it from .token.
+        self.token = token or secrets.token_urlsafe(32)
+        self._auth_lock = threading.Lock()
+        # session id -> (username, user type, expiry); client address -> times of failed logins
+        self._sessions = {}
+        self._failed_logins = {}
+        self.engine = create_service_engine(database_url, workers)
+        ensure_schema(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='shop-service')
+        super().__init__(address, ServiceHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def authorized(self, token: str | None) -> bool:
+        return token is not None and hmac.compare_digest(token.encode('utf-8'), self.token.encode('utf-8'))
+
+    def open_session(self, username: str, user_type: str) -> str:
+        session_id = secrets.token_urlsafe(32)
+        with self._auth_lock:
+            now = time.monotonic()
+            self._sessions = {key: value for key, value in self._sessions.items() if value[2] > now}
+            self._sessions[session_id] = (username, user_type, now + SESSION_TTL)
+        return session_id
+
+    def session_user_type(self, session_id: str | None) -> str | None:
+        """Returns the type of the user logged in with this session id, or None."""
+        with self._auth_lock:
+            entry = self._sessions.get(session_id) if session_id else None
+        if entry is None or entry[2] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def check_login_allowed(self, address: str):
+        with self._auth_lock:
+            since = time.monotonic() - LOGIN_WINDOW
+            failures = [moment for moment in self._failed_logins.get(address, ()) if moment > since]
+            self._failed_logins[address] = failures
+        if len(failures) >= MAX_FAILED_LOGINS:
+            raise AccessDeniedException('Too many failed attempts; try again in a few minutes.')
+
+    def record_login(self, address: str, succeeded: bool):
+        with self._auth_lock:
+            if succeeded:
+                self._failed_logins.pop(address, None)
+            else:
+                self._failed_logins.setdefault(address, []).append(time.monotonic())
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        # The same steps as socketserver.ThreadingMixIn, but on a pooled thread.
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+        self.engine.dispose()
+
+
+def serve(host: str, port: int, database_url: str = None, workers: int = DEFAULT_WORKERS, token: str = None):
+    """Runs the service until interrupted. The token defaults to service_token()."""
+    service = ShopService((host, port), database_url, workers, token or service_token())
+    # What main.py does on a standalone terminal: the default admin and the daily stock snapshot.
+    with service.Session() as session:
+        if not crud.admin_exists(session):
+            crud.create_new_user(session, "admin", "admin", "1234", "1234", "admin", "admin", "admin")
+        take_stock_snapshot_if_due(session)
+    maintenance.start_scheduler(service.engine)
+    log.info("Serving %s on %s with %d workers", service.engine.url, service.url, workers)
+    if not token and not os.environ.get(TOKEN_ENV):
+        log.info("Terminals need %s set to the token in %s", TOKEN_ENV, os.path.abspath(TOKEN_FILE))
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Share one inventory between several counter terminals.')
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on, e.g. the server's address in the shop network")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='worker threads and database connections')
+    parser.add_argument('--database', default=None, help='database URL (default: TIRESHOP_DATABASE_URL or the local file)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    serve(args.host, args.port, args.database, args.workers)
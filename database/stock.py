@@ -0,0 +1,298 @@
+from .models import Product, StockMovement, StockSnapshot, BranchStock, StockAvailability, DEFAULT_BRANCH_ID
+from .Exeptions import ProductNotExistsException, InsufficientStockException, StockConflictException
+from .resolver import insert_ignore
+import datetime
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import select, update, insert, func, literal, exists, text
+
+
+# The kinds of stock movement recorded in the ledger.
+MOVEMENT_KINDS = ('sale', 'restock', 'adjustment', 'return', 'transfer')
+
+# How often a new stock snapshot is taken (see take_stock_snapshot_if_due).
+SNAPSHOT_INTERVAL = datetime.timedelta(days=1)
+
+
+def _execute(session: Session, stmt) -> int:
+    return session.execute(stmt.execution_options(synchronize_session=False)).rowcount
+
+
+def change_branch_stock(session: Session, branch_id: int, product_id: int, change: int, guard: bool = True) -> bool:
+    """
+    Adds 'change' to a product's stock in a branch and to the branch's availability of its size.
+
+    With 'guard', a decrease is only applied if the branch has enough stock; returns
+    False (and changes nothing) otherwise. Used by move_stock; the product's total and
+    the ledger are not touched here.
+    """
+    stmt = (update(BranchStock)
+            .where(BranchStock.branch_id == branch_id, BranchStock.product_id == product_id)
+            .values(quantity=BranchStock.quantity + change))
+    if guard and change < 0:
+        stmt = stmt.where(BranchStock.quantity + change >= 0)
+    if _execute(session, stmt) == 0:
+        if guard and change < 0:
+            return False
+        # The first stock of this product in this branch.
+        session.execute(insert_ignore(session, BranchStock).values(branch_id=branch_id, product_id=product_id, quantity=0))
+        _execute(session, stmt)
+
+    size_id = session.execute(select(Product.size_id).where(Product.id == product_id)).scalar()
+    _add_availability(session, size_id, branch_id, change)
+    return True
+
+
+def change_product_size(session: Session, product_id: int, old_size_id: int, new_size_id: int):
+    """Moves a product's stock in every branch from one size to another in the availability index."""
+    if old_size_id == new_size_id:
+        return
+    rows = session.execute(select(BranchStock.branch_id, BranchStock.quantity).where(BranchStock.product_id == product_id)).all()
+    for branch_id, quantity in rows:
+        _add_availability(session, old_size_id, branch_id, -quantity)
+        _add_availability(session, new_size_id, branch_id, quantity)
+
+
+def _add_availability(session: Session, size_id: int, branch_id: int, change: int):
+    stmt = (update(StockAvailability)
+            .where(StockAvailability.size_id == size_id, StockAvailability.branch_id == branch_id)
+            .values(quantity=StockAvailability.quantity + change))
+    if _execute(session, stmt) == 0:
+        session.execute(insert_ignore(session, StockAvailability).values(size_id=size_id, branch_id=branch_id, quantity=0))
+        _execute(session, stmt)
+
+
+def apply_movements_to_branches(session: Session, after_movement_id: int):
+    """
+    Adds the ledger rows written after 'after_movement_id' to the branch stock and the
+    availability index, with a few set-based statements.
+
+    For the bulk writers (bulk price/stock updates, price list imports) that insert
+    their movements with INSERT ... SELECT or executemany instead of move_stock.
+    """
+    new = StockMovement.id > after_movement_id
+
+    # Rows for branch/product and size/branch pairs that have no stock yet.
+    pairs = select(StockMovement.branch_id, StockMovement.product_id).where(new).distinct().subquery()
+    session.execute(insert(BranchStock).from_select(
+        ['branch_id', 'product_id', 'quantity'],
+        select(pairs.c.branch_id, pairs.c.product_id, literal(0)).where(~exists().where(
+            BranchStock.branch_id == pairs.c.branch_id, BranchStock.product_id == pairs.c.product_id))))
+    sizes = (select(Product.size_id, StockMovement.branch_id)
+             .join(Product, Product.id == StockMovement.product_id).where(new).distinct().subquery())
+    session.execute(insert(StockAvailability).from_select(
+        ['size_id', 'branch_id', 'quantity'],
+        select(sizes.c.size_id, sizes.c.branch_id, literal(0)).where(~exists().where(
+            StockAvailability.size_id == sizes.c.size_id, StockAvailability.branch_id == sizes.c.branch_id))))
+
+    same_stock = (StockMovement.branch_id == BranchStock.branch_id, StockMovement.product_id == BranchStock.product_id)
+    delta = select(func.sum(StockMovement.change)).where(new, *same_stock).scalar_subquery()
+    _execute(session, update(BranchStock).where(exists().where(new, *same_stock))
+             .values(quantity=BranchStock.quantity + delta))
+
+    same_size = (StockMovement.branch_id == StockAvailability.branch_id, Product.size_id == StockAvailability.size_id)
+    moved = select(StockMovement.change).join(Product, Product.id == StockMovement.product_id).where(new, *same_size)
+    delta = select(func.sum(StockMovement.change)).join(Product, Product.id == StockMovement.product_id).where(new, *same_size)
+    _execute(session, update(StockAvailability).where(moved.exists())
+             .values(quantity=StockAvailability.quantity + delta.scalar_subquery()))
+
+
+def last_movement_id(session: Session) -> int:
+    """Returns the id of the newest ledger row (0 if the ledger is empty)."""
+    return session.execute(select(func.coalesce(func.max(StockMovement.id), 0))).scalar()
+
+
+def move_stock(session: Session, product_id: int, kind: str, change: int, order_id: int = None, note: str = None,
+               allow_negative: bool = False, expected_version: int = None, branch_id: int = None) -> int:
+    """
+    Records a stock movement and updates the product's cached balances in the caller's transaction.
+
+    The balances (the product's total and its stock in the branch) are changed with
+    conditional UPDATEs ('quantity = quantity + change'), so concurrent writers cannot
+    overwrite each other's changes, and a sale can never take the branch's stock below
+    zero. Nothing is committed here; after an exception the caller must roll back.
+
+    Args:
+        session: The database session object.
+        product_id: The id of the product.
+        kind: One of MOVEMENT_KINDS.
+        change: The signed change to the stock (negative for sales).
+        order_id: The order of a sale or return.
+        note: A short free-text reason, e.g. for adjustments.
+        allow_negative: If True, the stock may go below zero.
+        expected_version: If given, the movement is only applied while the product still
+            has this version, i.e. nobody changed it since the caller read it.
+        branch_id: The branch whose stock changes (default: DEFAULT_BRANCH_ID).
+
+    Raises:
+        ValueError: If the kind is unknown.
+        ProductNotExistsException: If the product does not exist.
+        InsufficientStockException: If the branch's stock would go below zero.
+        StockConflictException: If the product no longer has the expected version.
+
+    Returns:
+        The new stock of the product.
+    """
+    if kind not in MOVEMENT_KINDS:
+        raise ValueError(f"Unknown stock movement '{kind}'. Expected one of {MOVEMENT_KINDS}.")
+    product_id = int(product_id)
+    change = int(change)
+    branch_id = DEFAULT_BRANCH_ID if branch_id is None else int(branch_id)
+
+    stmt = update(Product).where(Product.id == product_id).values(quantity=Product.quantity + change, version=Product.version + 1)
+    if change < 0 and not allow_negative:
+        stmt = stmt.where(Product.quantity + change >= 0)
+    if expected_version is not None:
+        stmt = stmt.where(Product.version == expected_version)
+    if session.execute(stmt.execution_options(synchronize_session=False)).rowcount == 0:
+        current = session.execute(select(Product.quantity, Product.version).where(Product.id == product_id)).first()
+        if current is None:
+            raise ProductNotExistsException(product_id)
+        if expected_version is not None and current.version != expected_version:
+            raise StockConflictException(product_id)
+        raise InsufficientStockException(product_id, current.quantity, -change)
+    if not change_branch_stock(session, branch_id, product_id, change, guard=not allow_negative):
+        available = session.execute(select(BranchStock.quantity).where(
+            BranchStock.branch_id == branch_id, BranchStock.product_id == product_id)).scalar()
+        raise InsufficientStockException(product_id, available or 0, -change)
+
+    session.execute(insert(StockMovement).values(product_id=product_id, branch_id=branch_id, kind=kind, change=change,
+                                                  order_id=order_id, note=note, created_at=datetime.datetime.now()))
+    balance, version = session.execute(select(Product.quantity, Product.version).where(Product.id == product_id)).one()
+
+    # Keep an already loaded Product object in step with the new balance and version.
+    product = session.identity_map.get(session.identity_key(Product, product_id))
+    if product is not None:
+        set_committed_value(product, 'quantity', balance)
+        set_committed_value(product, 'version', version)
+    return balance
+
+
+def record_stock_movement(session: Session, product_id: int, kind: str, change: int, order_id: int = None,
+                          note: str = None, branch_id: int = None) -> int:
+    """Records a stock movement (see move_stock) and commits it. Returns the new total stock."""
+    try:
+        balance = move_stock(session, product_id, kind, change, order_id, note, branch_id=branch_id)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return balance
+
+
+def get_stock_movements(session: Session, product_id: int, limit: int = 50) -> list[dict]:
+    """Returns the most recent movements of a product, newest first."""
+    rows = session.execute(
+        select(StockMovement.id, StockMovement.kind, StockMovement.change, StockMovement.created_at,
+               StockMovement.order_id, StockMovement.note)
+        .where(StockMovement.product_id == int(product_id))
+        .order_by(StockMovement.id.desc())
+        .limit(limit)
+    )
+    return [row._asdict() for row in rows]
+
+
+def take_stock_snapshot(session: Session, now: datetime.datetime = None) -> int:
+    """
+    Stores the current stock of every product with a single INSERT ... SELECT.
+
+    The balances and the id of the newest movement they include are read by the same
+    statement, so a sale committing meanwhile is either in both or in neither. On
+    PostgreSQL the ledger is also locked against writes until the snapshot commits:
+    movement ids are handed out before their transaction commits, and a movement below
+    the stored id that was still uncommitted would be left out for good.
+
+    Returns:
+        The number of products in the snapshot.
+    """
+    now = now or datetime.datetime.now()
+    if session.get_bind().dialect.name == 'postgresql':
+        session.execute(text('LOCK TABLE stock_movement IN SHARE MODE'))
+    newest = select(func.coalesce(func.max(StockMovement.id), 0)).scalar_subquery()
+    result = session.execute(
+        insert(StockSnapshot).from_select(
+            ['taken_at', 'product_id', 'quantity', 'last_movement_id'],
+            select(literal(now, StockSnapshot.taken_at.type), Product.id, Product.quantity, newest),
+        )
+    )
+    session.commit()
+    return result.rowcount
+
+
+def write_opening_balances(conn) -> int:
+    """
+    Stores the stock that products had before their first ledger movement, as a snapshot
+    dated at the start of the ledger (schema upgrade; products from before the ledger
+    have no opening movement). Does nothing if a snapshot already covers that moment.
+
+    Returns:
+        The number of products with an opening balance.
+    """
+    start = conn.execute(select(func.min(StockMovement.created_at))).scalar() or datetime.datetime.now()
+    if conn.execute(exists().where(StockSnapshot.taken_at <= start).select()).scalar():
+        return 0
+    moved = (select(StockMovement.product_id, func.sum(StockMovement.change).label('change'))
+             .group_by(StockMovement.product_id).subquery())
+    opening = Product.quantity - func.coalesce(moved.c.change, 0)
+    return conn.execute(insert(StockSnapshot).from_select(
+        ['taken_at', 'product_id', 'quantity', 'last_movement_id'],
+        select(literal(start, StockSnapshot.taken_at.type), Product.id, opening, literal(0))
+        .outerjoin(moved, moved.c.product_id == Product.id)
+        .where(opening != 0),
+    )).rowcount
+
+
+def take_stock_snapshot_if_due(session: Session, interval: datetime.timedelta = SNAPSHOT_INTERVAL) -> bool:
+    """Takes a snapshot if none was taken within the interval. Returns True if one was taken."""
+    latest = session.execute(select(func.max(StockSnapshot.taken_at))).scalar()
+    if latest is not None and datetime.datetime.now() - latest < interval:
+        return False
+    take_stock_snapshot(session)
+    return True
+
+
+def stock_at(session: Session, when: datetime.datetime, product_id: int = None) -> dict[int, int] | int:
+    """
+    Returns the stock at a moment in the past.
+
+    The latest snapshot taken at or before 'when' is the starting point; only the
+    movements recorded after it (and not after 'when') are added, so the whole
+    ledger is never replayed. Products without a snapshot start from zero.
+
+    The stock of products from before the ledger comes from the opening balances
+    written when the database was upgraded (see write_opening_balances). Nothing is
+    known about the time before the ledger's first movement: it gives 0.
+
+    Args:
+        session: The database session object.
+        when: The moment to look at.
+        product_id: If given, only this product's stock is returned (as an int).
+
+    Returns:
+        A {product id: stock} dictionary, or the stock of the single product.
+    """
+    snapshot = session.execute(
+        select(StockSnapshot.taken_at, StockSnapshot.last_movement_id)
+        .where(StockSnapshot.taken_at <= when)
+        .order_by(StockSnapshot.taken_at.desc())
+        .limit(1)
+    ).first()
+
+    stock = {}
+    movements = select(StockMovement.product_id, func.sum(StockMovement.change)).where(StockMovement.created_at <= when)
+    if snapshot is not None:
+        taken_at, snapshot_movement_id = snapshot
+        base = select(StockSnapshot.product_id, StockSnapshot.quantity).where(StockSnapshot.taken_at == taken_at)
+        if product_id is not None:
+            base = base.where(StockSnapshot.product_id == int(product_id))
+        stock.update(session.execute(base).all())
+        movements = movements.where(StockMovement.id > snapshot_movement_id)
+    if product_id is not None:
+        movements = movements.where(StockMovement.product_id == int(product_id))
+
+    for movement_product_id, change in session.execute(movements.group_by(StockMovement.product_id)):
+        stock[movement_product_id] = stock.get(movement_product_id, 0) + change
+
+    if product_id is not None:
+        return stock.get(int(product_id), 0)
+    return stock
@@ -0,0 +1,420 @@
+import argparse
+import datetime
+import json
+import logging
+import os
+import struct
+import sys
+import zlib
+from sqlalchemy import Table, Column, MetaData, String, Integer, Date, DateTime, select, insert, delete, update, func, text, bindparam, literal, inspect
+from sqlalchemy.orm import Session, sessionmaker
+
+from .connection import Base, make_engine
+from .models import ChangeLog, SyncWatermark
+from .schema import ensure_schema
+from .Exeptions import SyncGapException
+
+log = logging.getLogger(__name__)
+
+
+# The tables whose changes are shipped to the head office, parents first.
+SYNC_TABLES = ('branch', 'brand', 'size', 'product', 'customer', 'order', 'products_order')
+
+# The default sync target of a branch database.
+HEAD_OFFICE = 'hq'
+
+# Change log rows per batch. Several changes of one row in a batch are shipped once.
+SYNC_BATCH_SIZE = 20000
+
+# Rows read or written per statement.
+_CHUNK = 500
+
+# Version of the batch format, stored in every batch.
+_FORMAT = 1
+
+
+# Change capture
+# --------------
+# Triggers write the change log, so every writer is captured: the ORM, the set-based
+# stock updates, the price-list import and changes made by hand in a database tool.
+
+_POSTGRES_FUNCTION = """
+CREATE OR REPLACE FUNCTION tireshop_capture_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO change_log (table_name, row_id, operation) VALUES (TG_TABLE_NAME, OLD.id, 'd');
+        RETURN OLD;
+    END IF;
+    INSERT INTO change_log (table_name, row_id, operation) VALUES (TG_TABLE_NAME, NEW.id, 'u');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def install_change_capture(conn) -> None:
+    """Creates the change capture triggers on the synchronised tables (schema upgrade to sync)."""
+    quote = conn.dialect.identifier_preparer.quote
+    if conn.dialect.name == 'sqlite':
+        for table in SYNC_TABLES:
+            for event, row, operation in (('INSERT', 'NEW', 'u'), ('UPDATE', 'NEW', 'u'), ('DELETE', 'OLD', 'd')):
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS change_log_{table}_{event.lower()} AFTER {event} ON {quote(table)} "
+                    f"BEGIN INSERT INTO change_log (table_name, row_id, operation) VALUES ('{table}', {row}.id, '{operation}'); END"
+                ))
+    elif conn.dialect.name == 'postgresql':
+        conn.execute(text(_POSTGRES_FUNCTION))
+        for table in SYNC_TABLES:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS change_log_capture ON {quote(table)}"))
+            conn.execute(text(f"CREATE TRIGGER change_log_capture AFTER INSERT OR UPDATE OR DELETE ON {quote(table)} "
+                              f"FOR EACH ROW EXECUTE FUNCTION tireshop_capture_change()"))
+    else:
+        log.warning("Change capture is not available on %s; this database cannot be synced.", conn.dialect.name)
+
+
+def log_existing_rows(table_name: str):
+    """
+    Returns a backfill chunk that logs the existing rows of a table once, so the first
+    sync ships the whole database. Logging a row twice is harmless: a batch ships every
+    row once.
+    """
+    source = Base.metadata.tables[table_name]
+
+    def chunk(conn, first_id: int, end_id: int):
+        conn.execute(insert(ChangeLog).from_select(
+            ['table_name', 'row_id', 'operation'],
+            select(literal(table_name), source.c.id, literal('u'))
+            .where(source.c.id >= first_id, source.c.id < end_id).order_by(source.c.id)
+        ))
+    return chunk
+
+
+# Batches
+# -------
+# A batch holds the current state of every row changed between two watermarks, one
+# column list per table and the rows as plain lists, as zlib-compressed JSON.
+
+def _encode_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot sync a value of type {type(value).__name__}.")
+
+
+def encode_batch(batch: dict) -> bytes:
+    return zlib.compress(json.dumps(batch, separators=(',', ':'), default=_encode_value).encode('utf-8'))
+
+
+def decode_batch(data: bytes) -> dict:
+    batch = json.loads(zlib.decompress(data))
+    if batch.get('format') != _FORMAT:
+        raise ValueError(f"Unsupported sync batch format {batch.get('format')!r}.")
+    return batch
+
+
+def _chunks(values: list):
+    for start in range(0, len(values), _CHUNK):
+        yield values[start:start + _CHUNK]
+
+
+def _read_batch(session: Session, source: str, first: int, last: int, changes: list) -> dict:
+    # The last operation on a row wins; rows gone by now are shipped as deleted.
+    latest = {}
+    for table_name, row_id, operation in changes:
+        latest[(table_name, row_id)] = operation
+    tables = {}
+    for name in SYNC_TABLES:
+        table = Base.metadata.tables[name]
+        changed = sorted(row_id for (table_name, row_id), operation in latest.items() if table_name == name and operation == 'u')
+        deleted = {row_id for (table_name, row_id), operation in latest.items() if table_name == name and operation == 'd'}
+        if not changed and not deleted:
+            continue
+        rows = []
+        for chunk in _chunks(changed):
+            rows.extend(list(row) for row in session.execute(select(table).where(table.c.id.in_(chunk))))
+        deleted.update(set(changed) - {row[0] for row in rows})
+        tables[name] = {'columns': [column.name for column in table.columns], 'rows': rows, 'deleted': sorted(deleted)}
+    return {'format': _FORMAT, 'source': source, 'first': first, 'last': last, 'tables': tables}
+
+
+def export_changes(session: Session, transport, source: str, target: str = HEAD_OFFICE,
+                   batch_size: int = SYNC_BATCH_SIZE) -> int:
+    """
+    Ships the changes since the target's watermark as batches through a transport.
+
+    After each batch is handed to the transport, the watermark moves past it and the
+    change log rows no target still needs are deleted. A batch that was sent but whose
+    watermark was not saved (e.g. a crash in between) is sent again next time; the head
+    office recognises and skips what it already has.
+
+    Args:
+        session: The session of the branch database.
+        transport: A DirectoryTransport or StreamTransport.
+        source: The name of this branch database at the head office; unique per branch.
+        target: The name of the receiving side.
+        batch_size: Change log rows per batch.
+
+    Returns:
+        The number of change log rows shipped.
+    """
+    shipped = 0
+    while True:
+        state = session.get(SyncWatermark, target)
+        if state is None:
+            state = SyncWatermark(target=target, watermark=0)
+            session.add(state)
+        changes = session.execute(
+            select(ChangeLog.id, ChangeLog.table_name, ChangeLog.row_id, ChangeLog.operation)
+            .where(ChangeLog.id > state.watermark).order_by(ChangeLog.id).limit(batch_size)
+        ).all()
+        if not changes:
+            session.commit()
+            return shipped
+        batch = _read_batch(session, source, state.watermark, changes[-1].id,
+                            [(table, row_id, operation) for _, table, row_id, operation in changes])
+        transport.send(encode_batch(batch), f"{source}-{batch['last']:012d}")
+
+        state.watermark = batch['last']
+        state.synced_at = datetime.datetime.now()
+        session.flush()
+        needed = session.execute(select(func.min(SyncWatermark.watermark))).scalar()
+        session.execute(delete(ChangeLog).where(ChangeLog.id <= needed))
+        session.commit()
+        shipped += len(changes)
+        log.info("Shipped %d changes of '%s' up to %d.", len(changes), source, batch['last'])
+
+
+# Head office
+# -----------
+# The head office keeps the rows of every branch side by side: each synchronised table
+# has a copy named hq_<table> whose primary key is (source, id), so the ids of different
+# branch databases never collide. These tables are not part of the shop schema.
+
+hq_metadata = MetaData()
+
+hq_sources = Table(
+    'hq_sync_source', hq_metadata,
+    Column('source', String(40), primary_key=True),
+    Column('watermark', Integer, nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def _copy_table(table: Table) -> Table:
+    return Table(
+        f'hq_{table.name}', hq_metadata,
+        Column('source', String(40), primary_key=True),
+        *(Column(column.name, column.type, primary_key=column.primary_key, autoincrement=False) for column in table.columns),
+    )
+
+
+# Importing the models (above) registered the shop tables.
+hq_tables = {name: _copy_table(Base.metadata.tables[name]) for name in SYNC_TABLES}
+
+
+def _create_hq_tables(conn):
+    # create_all only adds missing tables; the columns added to the shop tables since the
+    # head office created its copies (e.g. product.deleted) are added here.
+    hq_metadata.create_all(conn)
+    quote = conn.dialect.identifier_preparer.quote
+    inspector = inspect(conn)
+    for table in hq_tables.values():
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                conn.execute(text(f'ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} '
+                                  f'{column.type.compile(dialect=conn.dialect)}'))
+
+
+def _parsers(table: Table, columns: list) -> list:
+    # JSON has no dates; they arrive as ISO strings.
+    parsers = []
+    for name in columns:
+        column_type = table.c[name].type
+        if isinstance(column_type, DateTime):
+            parsers.append(datetime.datetime.fromisoformat)
+        elif isinstance(column_type, Date):
+            parsers.append(datetime.date.fromisoformat)
+        else:
+            parsers.append(None)
+    return parsers
+
+
+def _row(source: str, columns: list, parsers: list, row: list) -> dict:
+    values = {'source': source}
+    for name, parse, value in zip(columns, parsers, row):
+        values[name] = parse(value) if parse and value is not None else value
+    return values
+
+
+def apply_batch(session: Session, data: bytes) -> bool:
+    """
+    Applies one batch to the head office database in a single transaction.
+
+    Rows are replaced, not merged, so applying a batch twice leaves the same data.
+
+    Raises:
+        SyncGapException: If changes between the last applied batch and this one are missing.
+
+    Returns:
+        True if the batch was applied, False if everything in it had been applied before.
+    """
+    batch = decode_batch(data)
+    source = batch['source']
+    _create_hq_tables(session.connection())
+    applied = session.execute(select(hq_sources.c.watermark).where(hq_sources.c.source == source)).scalar() or 0
+    if batch['last'] <= applied:
+        return False
+    if batch['first'] > applied:
+        raise SyncGapException(source, applied, batch['first'])
+
+    try:
+        for name in reversed(SYNC_TABLES):
+            changes = batch['tables'].get(name)
+            if changes is None:
+                continue
+            table = hq_tables[name]
+            ids = [row[0] for row in changes['rows']] + changes['deleted']
+            if ids:
+                session.execute(
+                    delete(table).where(table.c.source == bindparam('b_source'), table.c.id == bindparam('b_id')),
+                    [{'b_source': source, 'b_id': row_id} for row_id in ids],
+                )
+        for name in SYNC_TABLES:
+            changes = batch['tables'].get(name)
+            if not changes or not changes['rows']:
+                continue
+            table = hq_tables[name]
+            columns = changes['columns']
+            parsers = _parsers(table, columns)
+            for chunk in _chunks(changes['rows']):
+                session.execute(insert(table), [_row(source, columns, parsers, row) for row in chunk])
+        values = {'watermark': batch['last'], 'applied_at': datetime.datetime.now()}
+        if session.execute(update(hq_sources).where(hq_sources.c.source == source).values(**values)).rowcount == 0:
+            session.execute(insert(hq_sources).values(source=source, **values))
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return True
+
+
+def apply_changes(session: Session, transport) -> int:
+    """
+    Applies every batch the transport has received, in order.
+
+    Returns:
+        The number of batches applied (batches applied before are skipped and not counted).
+    """
+    applied = 0
+    for data in transport.receive():
+        if apply_batch(session, data):
+            applied += 1
+    return applied
+
+
+def get_hq_sales(session: Session, since: datetime.date = None) -> dict:
+    """Returns the sales total of every branch database synced to the head office."""
+    orders = hq_tables['order']
+    lines = hq_tables['products_order']
+    hq_metadata.create_all(session.connection())
+    stmt = (
+        select(orders.c.source, func.sum(lines.c.price * lines.c.quantity))
+        .join(lines, (lines.c.source == orders.c.source) & (lines.c.order_id == orders.c.id))
+        .group_by(orders.c.source)
+    )
+    if since is not None:
+        stmt = stmt.where(orders.c.date >= since)
+    return {source: total for source, total in session.execute(stmt)}
+
+
+# Transports
+# ----------
+
+class DirectoryTransport:
+    """
+    Batches as files in a directory, e.g. a shared folder or one that is copied to the
+    head office. Files are renamed into place once complete and deleted once applied.
+    """
+    SUFFIX = '.delta'
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def send(self, data: bytes, name: str):
+        partial = os.path.join(self.path, name + '.partial')
+        with open(partial, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(partial, os.path.join(self.path, name + self.SUFFIX))
+
+    def receive(self):
+        # The names end in the zero-padded watermark, so they sort per branch in change order.
+        names = sorted((name for name in os.listdir(self.path) if name.endswith(self.SUFFIX)),
+                       key=lambda name: (name.rsplit('-', 1)[0], name))
+        for name in names:
+            path = os.path.join(self.path, name)
+            with open(path, 'rb') as file:
+                data = file.read()
+            yield data
+            # Only reached once the batch is applied.
+            os.remove(path)
+
+
+class StreamTransport:
+    """Batches as length-prefixed frames on a binary stream, e.g. a pipe or a socket file."""
+    _HEADER = struct.Struct('>I')
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def send(self, data: bytes, name: str = None):
+        self.stream.write(self._HEADER.pack(len(data)))
+        self.stream.write(data)
+        self.stream.flush()
+
+    def receive(self):
+        while True:
+            header = self.stream.read(self._HEADER.size)
+            if not header:
+                return
+            if len(header) < self._HEADER.size:
+                raise ValueError("The sync stream ended in the middle of a batch.")
+            (length,) = self._HEADER.unpack(header)
+            data = self.stream.read(length)
+            if len(data) < length:
+                raise ValueError("The sync stream ended in the middle of a batch.")
+            yield data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ship branch changes to the head office database.')
+    parser.add_argument('command', choices=('export', 'apply'))
+    parser.add_argument('--database', default=None, help='database URL (default: TIRESHOP_DATABASE_URL or the local file)')
+    parser.add_argument('--dir', default=None, help='batch directory (default: standard output/input)')
+    parser.add_argument('--source', default=None, help='name of this branch database (export)')
+    parser.add_argument('--batch-size', type=int, default=SYNC_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    # Standard output may carry the batches, so messages go to standard error.
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s', stream=sys.stderr)
+    engine = make_engine(args.database)
+    session = sessionmaker(bind=engine)()
+    try:
+        if args.command == 'export':
+            if not args.source:
+                parser.error('export needs --source')
+            ensure_schema(engine)
+            transport = DirectoryTransport(args.dir) if args.dir else StreamTransport(sys.stdout.buffer)
+            log.info("Shipped %d changes.", export_changes(session, transport, args.source, batch_size=args.batch_size))
+        else:
+            transport = DirectoryTransport(args.dir) if args.dir else StreamTransport(sys.stdin.buffer)
+            log.info("Applied %d batches.", apply_changes(session, transport))
+    finally:
+        session.close()
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
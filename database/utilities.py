@@ -1,6 +1,10 @@
-from .models import User, Admin, Manager, Employee, Product, Order
+from .models import User, Admin, Manager, Employee, Product, Order, ProductsOrder
+from .connection import Base
 import os
 import csv
+import json
+import sqlite3
+import datetime
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 
@@ -22,68 +26,200 @@ def is_employee(user:User):
 
 # --- Data Export Functions ---
 
-def export_table_to_file(session: Session, path: str, file_name: str, table):
+# The file formats supported by the export functions below.
+EXPORT_FORMATS = ('csv', 'jsonl', 'sqlite')
+
+# Number of rows fetched from the database cursor per round trip while exporting.
+EXPORT_BATCH_SIZE = 1000
+
+
+def _table_of(table):
+    """Returns the Core Table object for either an ORM model class or a Table."""
+    return getattr(table, '__table__', table)
+
+
+def _export_statement(table, start_date: datetime.date = None, end_date: datetime.date = None):
     """
-    Exports all data from a given SQLAlchemy table model to a CSV file.
+    Builds the SELECT used to export a table, optionally restricted to a date range.
+
+    Tables with their own 'date' column are filtered directly. Order lines
+    (products_order) have no date of their own, so they are filtered through
+    their parent order.
+    """
+    core_table = _table_of(table)
+    stmt = select(*core_table.columns)
+    if start_date is None and end_date is None:
+        return stmt
+
+    if 'date' in core_table.columns:
+        date_column = core_table.columns['date']
+    elif core_table is ProductsOrder.__table__:
+        stmt = stmt.join(Order.__table__, core_table.c.order_id == Order.__table__.c.id)
+        date_column = Order.__table__.c.date
+    else:
+        # Tables without any notion of a date are exported in full.
+        return stmt
+
+    if start_date is not None:
+        stmt = stmt.where(date_column >= start_date)
+    if end_date is not None:
+        stmt = stmt.where(date_column <= end_date)
+    return stmt
+
+
+def iter_table_rows(session: Session, table, start_date: datetime.date = None, end_date: datetime.date = None, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Streams the rows of a table as plain tuples without loading the whole table.
+
+    Rows are fetched from a server-side cursor 'batch_size' at a time, so memory
+    use stays constant no matter how large the table is.
 
     Args:
         session: The SQLAlchemy session object for database interaction.
-        path: The directory path where the file will be saved.
-        file_name: The name of the output CSV file.
-        table: The SQLAlchemy model class representing the table to export.
+        table: The SQLAlchemy model class (or Core Table) to read.
+        start_date: If given, only rows dated on or after this day are returned.
+        end_date: If given, only rows dated on or before this day are returned.
+        batch_size: The number of rows fetched per round trip.
+
+    Yields:
+        One tuple of column values per row.
     """
-    # Create the destination directory if it does not already exist.
-    # 'exist_ok=True' prevents an error if the directory is already there.
-    os.makedirs(path, exist_ok=True)
+    stmt = _export_statement(table, start_date, end_date)
+    result = session.execute(stmt, execution_options={"yield_per": batch_size})
+    try:
+        for row in result:
+            yield tuple(row)
+    finally:
+        result.close()
 
-    # Create the full, platform-independent path for the output file.
-    full_path = os.path.join(path, file_name)
 
-    # Create a query to select all records from the specified table.
-    stmt = select(table)
-    results = session.execute(stmt).all()
+def _json_default(value):
+    """Serializes values the json module does not handle natively (dates, decimals)."""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
 
-    # Gracefully handle cases where the table is empty.
-    if not results:
-        print("No data found in the table.")
-        return
 
-    # Open the file for writing. 'newline=""' is important to prevent extra blank rows in the CSV.
+def _write_csv(full_path: str, column_names: list, rows) -> int:
+    count = 0
+    # 'newline=""' is important to prevent extra blank rows in the CSV.
     with open(full_path, mode='w', newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
-
-        # Dynamically get the column names from the first result row.
-        # '_mapping.keys()' provides the names of the columns in the result set.
-        column_names = results[0]._mapping.keys()
-        # Write the column names as the header row of the CSV.
         writer.writerow(column_names)
-
-        # Write all data rows to the CSV file.
-        for row in results:
+        for row in rows:
             writer.writerow(row)
+            count += 1
+    return count
+
+
+def _write_jsonl(full_path: str, column_names: list, rows) -> int:
+    count = 0
+    with open(full_path, mode='w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(dict(zip(column_names, row)), ensure_ascii=False, default=_json_default))
+            f.write('\n')
+            count += 1
+    return count
+
+
+def _write_sqlite(full_path: str, table_name: str, column_names: list, rows, batch_size: int = EXPORT_BATCH_SIZE) -> int:
+    """Writes the rows into a table of a standalone SQLite file, replacing any previous copy."""
+    count = 0
+    columns = ', '.join(f'"{name}"' for name in column_names)
+    placeholders = ', '.join('?' for _ in column_names)
+    connection = sqlite3.connect(full_path)
+    try:
+        connection.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+        connection.execute(f'CREATE TABLE "{table_name}" ({columns})')
+        insert = f'INSERT INTO "{table_name}" ({columns}) VALUES ({placeholders})'
+        batch = []
+        for row in rows:
+            batch.append(tuple(_json_default(v) if isinstance(v, (datetime.date, datetime.datetime)) else v for v in row))
+            if len(batch) >= batch_size:
+                connection.executemany(insert, batch)
+                count += len(batch)
+                batch.clear()
+        if batch:
+            connection.executemany(insert, batch)
+            count += len(batch)
+        connection.commit()
+    finally:
+        connection.close()
+    return count
+
+
+def export_table_to_file(session: Session, path: str, file_name: str, table, file_format: str = 'csv',
+                         start_date: datetime.date = None, end_date: datetime.date = None, batch_size: int = EXPORT_BATCH_SIZE) -> int:
+    """
+    Exports the data of a given SQLAlchemy table model to a file.
 
-    print(f"Data exported to {full_path}")
+    Rows are streamed from the database in batches and written as they arrive,
+    so the table is never materialized in memory.
 
-def export_user_table_to_file(session: Session, path: str, file_name: str):
-    """
-    Intended as a convenience wrapper to export the User table.
-    NOTE: This function is currently implemented with infinite recursion
-    and will cause a RecursionError. It should call 'export_table_to_file' instead.
+    Args:
+        session: The SQLAlchemy session object for database interaction.
+        path: The directory path where the file will be saved.
+        file_name: The name of the output file.
+        table: The SQLAlchemy model class representing the table to export.
+        file_format: One of 'csv', 'jsonl' or 'sqlite'.
+        start_date: If given, only rows dated on or after this day are exported.
+        end_date: If given, only rows dated on or before this day are exported.
+        batch_size: The number of rows fetched from the database per round trip.
+
+    Raises:
+        ValueError: If the file format is not supported.
+
+    Returns:
+        The number of exported rows.
     """
-    export_user_table_to_file(session, path, file_name, User)
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{file_format}'. Expected one of {EXPORT_FORMATS}.")
+
+    # Create the destination directory if it does not already exist.
+    os.makedirs(path, exist_ok=True)
+    full_path = os.path.join(path, file_name)
+
+    core_table = _table_of(table)
+    column_names = [column.name for column in core_table.columns]
+    rows = iter_table_rows(session, core_table, start_date, end_date, batch_size)
+
+    if file_format == 'csv':
+        return _write_csv(full_path, column_names, rows)
+    elif file_format == 'jsonl':
+        return _write_jsonl(full_path, column_names, rows)
+    return _write_sqlite(full_path, core_table.name, column_names, rows, batch_size)
+
 
-def export_product_table_to_file(session: Session, path: str, file_name: str):
+def export_database_to_files(session: Session, path: str, file_format: str = 'csv', start_date: datetime.date = None,
+                             end_date: datetime.date = None, batch_size: int = EXPORT_BATCH_SIZE) -> dict:
     """
-    Intended as a convenience wrapper to export the Product table.
-    NOTE: This function is currently implemented with infinite recursion
-    and will cause a RecursionError. It should call 'export_table_to_file' instead.
+    Exports every table of the database.
+
+    For 'csv' and 'jsonl' one file per table is written (e.g. 'order.csv').
+    For 'sqlite' all tables are written into a single 'export.db' file.
+
+    Returns:
+        A dictionary mapping each table name to the number of exported rows.
     """
-    export_product_table_to_file(session, path, file_name, Product)
+    counts = {}
+    for core_table in Base.metadata.sorted_tables:
+        if file_format == 'sqlite':
+            file_name = 'export.db'
+        else:
+            file_name = f'{core_table.name}.{file_format}'
+        counts[core_table.name] = export_table_to_file(session, path, file_name, core_table, file_format, start_date, end_date, batch_size)
+    return counts
+
+
+def export_user_table_to_file(session: Session, path: str, file_name: str, file_format: str = 'csv') -> int:
+    """A convenience wrapper to export the User table."""
+    return export_table_to_file(session, path, file_name, User, file_format)
+
+def export_product_table_to_file(session: Session, path: str, file_name: str, file_format: str = 'csv') -> int:
+    """A convenience wrapper to export the Product table."""
+    return export_table_to_file(session, path, file_name, Product, file_format)
     
-def export_order_table_to_file(session: Session, path: str, file_name: str):
-    """
-    Intended as a convenience wrapper to export the Order table.
-    NOTE: This function is currently implemented with infinite recursion
-    and will cause a RecursionError. It should call 'export_table_to_file' instead.
-    """
-    export_order_table_to_file(session, path, file_name, Order)
\ No newline at end of file
+def export_order_table_to_file(session: Session, path: str, file_name: str, file_format: str = 'csv',
+                               start_date: datetime.date = None, end_date: datetime.date = None) -> int:
+    """A convenience wrapper to export the Order table, optionally within a date range."""
+    return export_table_to_file(session, path, file_name, Order, file_format, start_date, end_date)
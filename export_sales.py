@@ -0,0 +1,6 @@
+# Command-line entry point for exporting the sales history as a columnar file.
+# Example: python export_sales.py --out ~/TSBackup --from 2024-01-01 --to 2024-12-31
+from database.analytics import main
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+# Command-line entry point for importing a supplier price list (CSV or Excel).
+# Example: python import_price_list.py prices.csv --dry-run
+import argparse
+from database import session, import_price_list, ensure_schema
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Create or update products from a supplier price list.')
+    parser.add_argument('file', help='the .csv or .xlsx price list')
+    parser.add_argument('--dry-run', action='store_true', help='only print the changes, do not write them')
+    parser.add_argument('--add-quantity', action='store_true', help='add the quantities to the current stock instead of replacing it')
+    args = parser.parse_args()
+
+    ensure_schema(session.bind)
+    report = import_price_list(session, args.file, dry_run=args.dry_run, add_quantity=args.add_quantity)
+    print(report.format())
@@ -1,11 +1,30 @@
-from .manager.dashboard import ManagerDashboardPanel
-from .manager.product import ManagerProductPanel
-from .manager.employee import ManagerEmployeePanel
-from .manager.report import ManagerReportPanel
+# Panels are imported on first use, when their page navigates to them, so the
+# login window does not wait for every panel module (and what they import) to load.
+import importlib
 
-from .admin.employee import AdminEmployeePanel
-from .admin.backup import AdminBackupPanel
-from .admin.restore import AdminRestorePanel
+_PANEL_MODULES = {
+    'ManagerDashboardPanel': '.manager.dashboard',
+    'ManagerProductPanel': '.manager.product',
+    'ManagerEmployeePanel': '.manager.employee',
+    'ManagerReportPanel': '.manager.report',
 
-from .employee.report import EmployeeReportPanel
-from .employee.sell import EmployeeSellPanel
+    'AdminEmployeePanel': '.admin.employee',
+    'AdminBackupPanel': '.admin.backup',
+    'AdminRestorePanel': '.admin.restore',
+    'AdminDiagnosticsPanel': '.admin.diagnostics',
+
+    'EmployeeReportPanel': '.employee.report',
+    'EmployeeSellPanel': '.employee.sell',
+}
+
+__all__ = list(_PANEL_MODULES)
+
+
+def __getattr__(name):
+    module_name = _PANEL_MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    panel = getattr(importlib.import_module(module_name, __name__), name)
+    # Cache it so later lookups do not go through __getattr__ again.
+    globals()[name] = panel
+    return panel
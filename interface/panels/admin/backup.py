@@ -2,7 +2,7 @@ from customtkinter import *
 from ..panel import Panel
 from ...widgets import Input, Btn, render_text
 from database import session
-from database import backup_database
+from database import backup_database, export_sales_history, analytics_file_name
 from utilities import is_windows, get_current_datetime
 import os
 
@@ -53,6 +53,10 @@ class AdminBackupPanel(Panel):
         # The main button that triggers the backup process.
         self.operation_btn = Btn(self, text="ذخیره",width=160, height=45, command=self.handle_backup)
         self.operation_btn.grid(row=3, column=0, columnspan=4)
+
+        # A button that exports the sales history as a columnar file for offline analysis.
+        self.sales_export_btn = Btn(self, text="خروجی فروش",width=160, height=45, command=self.handle_sales_export)
+        self.sales_export_btn.grid(row=4, column=0, columnspan=4)
     
 
     # This method is executed when the 'Save' (ذخیره) button is clicked.
@@ -87,6 +91,23 @@ class AdminBackupPanel(Panel):
             # Display any errors that occur during the backup process.
             self.show_error_message(e)
             
+    # This method is executed when the 'Sales export' (خروجی فروش) button is clicked.
+    def handle_sales_export(self):
+        """
+        Writes the sales history into the backup directory as a compressed columnar file.
+        """
+        path = self.path_input.get()
+        if not path:
+            self.show_error_message("Path cannot be empty.")
+            return
+
+        try:
+            filename = analytics_file_name(self.get_backupfile_name() + '_sales')
+            fullpath = export_sales_history(session, path, filename)
+            self.show_success_message(f"Sales history saved to {fullpath}")
+        except Exception as e:
+            self.show_error_message(e)
+            
     # Determines a default backup directory based on the user's operating system.
     def default_path(self):
         """
@@ -0,0 +1,140 @@
+from customtkinter import *
+from ..panel import Panel
+from ...widgets import Btn, DropDown, render_text
+from ...styles import TABLE_STYLE
+from database.instrumentation import stats
+from database import session, get_maintenance_runs
+from database.maintenance import current_scheduler
+from database.cache import read_cache
+from tkinter import ttk
+from datetime import datetime
+
+
+# This class defines the UI panel that shows which database functions and
+# screens run the most (or the slowest) queries, how well the read cache works,
+# and the database maintenance log. Available to the administrator.
+class AdminDiagnosticsPanel(Panel):
+    # The options of the view dropdown, mapped to what the table shows.
+    VIEWS = {
+        render_text('توابع پایگاه داده'): 'function',
+        render_text('عملیات رابط کاربری'): 'action',
+        render_text('پرس‌وجوهای کند'): 'slow',
+        render_text('حافظه نهان'): 'cache',
+        render_text('نگهداری'): 'maintenance',
+    }
+    # The options of the sort dropdown, mapped to the key of stats.top.
+    SORTS = {
+        render_text('مجموع'): 'total',
+        render_text('تعداد'): 'count',
+        render_text('کندترین'): 'max',
+    }
+    COLUMNS = ("name", "count", "total", "mean", "max", "size")
+    # The column headings of each view; only the cache view shows the sixth (size) column.
+    HEADINGS = {
+        'slow': ('دستور', 'زمان', 'مدت (میلی‌ثانیه)', 'تابع پایگاه داده', 'عملیات رابط کاربری'),
+        'cache': ('بخش', 'یافت شده', 'یافت نشده', 'نرخ یافتن', 'تعداد', 'حجم (کیلوبایت)'),
+        'maintenance': ('نتیجه', 'شروع', 'مدت (میلی‌ثانیه)', 'کار', 'وضعیت'),
+        'function': ('نام', 'تعداد دستور', 'مجموع (میلی‌ثانیه)', 'میانگین (میلی‌ثانیه)', 'کندترین (میلی‌ثانیه)'),
+    }
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.pack(expand=True, fill="both")
+        self.configure(bg_color='transparent', fg_color="#5B5D76")
+        self.place(relheight=.9, relwidth=.8, relx=.02, rely=.05)
+
+        # --- Toolbar: view selection, sort order, refresh and reset ---
+        toolbar = CTkFrame(self, fg_color='transparent')
+        toolbar.place(relx=0, rely=0.02, relwidth=1, relheight=.1)
+        toolbar.columnconfigure((0, 1, 2, 3, 4, 5), weight=1)
+
+        self.view_dropdown = DropDown(toolbar, values=list(self.VIEWS), width=180, command=lambda _: self.refresh())
+        self.view_dropdown.set(self._view_name('function'))
+        self.view_dropdown.grid(row=0, column=5)
+
+        self.sort_dropdown = DropDown(toolbar, values=list(self.SORTS), width=100, command=lambda _: self.refresh())
+        self.sort_dropdown.set(next(iter(self.SORTS)))
+        self.sort_dropdown.grid(row=0, column=4)
+
+        refresh_btn = Btn(toolbar, 120, 35, text="بروزرسانی", command=self.refresh)
+        refresh_btn.grid(row=0, column=3)
+        reset_btn = Btn(toolbar, 120, 35, text="پاک کردن", command=self.reset)
+        reset_btn.grid(row=0, column=2)
+        # Starts the maintenance tasks on the scheduler's thread; the log fills in on refresh.
+        maintenance_btn = Btn(toolbar, 120, 35, text="نگهداری", command=self.run_maintenance)
+        maintenance_btn.grid(row=0, column=1)
+
+        # A summary of all recorded statements.
+        self.total_label = CTkLabel(toolbar, text='', text_color='white', font=(None, 13))
+        self.total_label.grid(row=0, column=0)
+
+        self.table = self.initialize_table(self)
+        self.refresh()
+
+    def initialize_table(self, window):
+        table = ttk.Treeview(window, style=TABLE_STYLE)
+        table.configure(columns=self.COLUMNS)
+        table.configure(show="headings", selectmode="none")
+
+        table.column("name", width=320, anchor="w")
+        table.column("count", width=80, anchor="center")
+        table.column("total", width=100, anchor="center")
+        table.column("mean", width=100, anchor="center")
+        table.column("max", width=100, anchor="center")
+        table.column("size", width=100, anchor="center")
+
+        table.place(relx=.02, rely=.14, relwidth=.96, relheight=.84)
+        return table
+
+    def _view_name(self, view: str) -> str:
+        return next(name for name, value in self.VIEWS.items() if value == view)
+
+    # Sets the column headings for the grouped statistics, the slow query list or the maintenance log.
+    def _set_headings(self, view: str):
+        headings = self.HEADINGS.get(view, self.HEADINGS['function'])
+        self.table.configure(displaycolumns=self.COLUMNS[:len(headings)])
+        for column, text in zip(self.COLUMNS, headings):
+            self.table.heading(column, text=render_text(text), anchor='center')
+
+    def refresh(self):
+        view = self.VIEWS.get(self.view_dropdown.get(), 'function')
+        self.table.delete(*self.table.get_children())
+        self._set_headings(view)
+
+        if view == 'cache':
+            for entry in read_cache.stats():
+                vals = (entry['namespace'], entry['hits'], entry['misses'], f"{entry['hit_rate']:.0%}",
+                        entry['entries'], f"{entry['bytes'] / 1024:.0f}")
+                self.table.insert(parent="", index="end", values=vals)
+        elif view == 'maintenance':
+            for run in get_maintenance_runs(session):
+                vals = (run['detail'], str(run['started_at'])[:16], f"{run['duration'] * 1000:.0f}", run['task'], run['status'])
+                self.table.insert(parent="", index="end", values=vals)
+        elif view == 'slow':
+            # Newest slow queries first.
+            for recorded_at, elapsed, crud_function, ui_action, statement in reversed(stats.slow_queries):
+                vals = (" ".join(statement.split())[:200], datetime.fromtimestamp(recorded_at).strftime('%H:%M:%S'),
+                        f"{elapsed * 1000:.1f}", crud_function, ui_action)
+                self.table.insert(parent="", index="end", values=vals)
+        else:
+            for name, count, total, mean, slowest in stats.top(view, limit=50, key=self.SORTS.get(self.sort_dropdown.get(), 'total')):
+                vals = (name, count, f"{total * 1000:.1f}", f"{mean * 1000:.2f}", f"{slowest * 1000:.1f}")
+                self.table.insert(parent="", index="end", values=vals)
+
+        self.total_label.configure(text=render_text(f"{stats.total_count} پرس‌وجو، {stats.total_time * 1000:.0f} میلی‌ثانیه"))
+
+    def reset(self):
+        stats.reset()
+        read_cache.reset_stats()
+        self.refresh()
+
+    def run_maintenance(self):
+        scheduler = current_scheduler()
+        if scheduler is not None:
+            scheduler.run_now()
+        self.view_dropdown.set(self._view_name('maintenance'))
+        self.refresh()
+
+    def destroy(self):
+        self.pack_forget()
+        return super().destroy()
@@ -1,11 +1,11 @@
 from customtkinter import *
 from ..panel import Panel
 from ...widgets import Item_button, Input, Btn, DropDown, render_text, create_input_fields
+from ...styles import TABLE_STYLE
 from awesometkinter.bidirender import derender_text, isarabic
 from database import session, create_new_user
 from database import remove_user_by_username, update_user_by_username, user_by_username
-from database import get_all_employee_and_manager_json, get_all_employee_and_manager_usernames
-from utilities import is_windows
+from database import get_staff_rows, StaffRow, get_all_employee_and_manager_usernames
 from tkinter import ttk
 
 
@@ -88,7 +88,7 @@ class AdminEmployeePanel(Panel):
             # Show the table and refresh its content.
             self.table.place(relheight=.9, relwidth=.8, relx=.02, rely=.05)
             self.current_view = 'list'
-            self.insert_content_to_table(self.table, get_all_employee_and_manager_json(session))
+            self.insert_content_to_table(self.table, get_staff_rows(session))
         elif view_name == 'new' and self.current_view != 'new':
             self.table.place_forget()
             self.delete_user_frame.place_forget()
@@ -100,7 +100,7 @@ class AdminEmployeePanel(Panel):
             self.new_employee_frame.place_forget()
             self.edit_user_frame.place_forget()
             # Build or update the delete user UI.
-            self.delete_user(self, get_all_employee_and_manager_json(session))
+            self.delete_user(self, get_staff_rows(session))
             self.current_view = 'delete'
         elif view_name == 'edit' and self.current_view != 'edit':
             self.table.place_forget()
@@ -110,35 +110,9 @@ class AdminEmployeePanel(Panel):
             self.current_view = 'edit'
 
     #---------------------- Setup Employee table content----------------
-    # Sets up and styles the ttk.Treeview widget used for displaying the user list.
+    # Sets up the ttk.Treeview widget used for displaying the user list (styled by interface.styles).
     def initialize_table(self, window):
-        style = ttk.Style()
-        # 'clam' theme is used on Windows for better visual compatibility.
-        if is_windows():
-            style.theme_use('clam')
-        
-        # Configure the custom style for the Treeview body.
-        style.configure("Custom1.Treeview",
-        background="#494A5F",
-        foreground="black",
-        fieldbackground="#393A4E",
-        rowheight=50,
-        borderwidth=0
-        )
-        
-        # Configure the custom style for the Treeview heading.
-        style.configure("Custom1.Treeview.Heading",
-        background="#5B5D76",
-        foreground="white",
-        font=("Helvetica", 10, "bold"),
-        relief='flat')
-        
-        # Configure the hover effect for the heading.
-        style.map("Custom1.Treeview.Heading",
-        background=[("active", "#6b6d87")],
-        foreground=[("active", "white")])
-        
-        table = ttk.Treeview(window, style="Custom1.Treeview")
+        table = ttk.Treeview(window, style=TABLE_STYLE)
         table.configure(columns=("id", "name", "lastname", "username", "phone", "national", "startDate"))
         table.configure(show="headings", selectmode="none")
         
@@ -165,13 +139,13 @@ class AdminEmployeePanel(Panel):
         
     
     # Clears the existing data from the table and inserts new content.
-    def insert_content_to_table(self, table:ttk.Treeview, content:list[dict]):
+    def insert_content_to_table(self, table:ttk.Treeview, content:list[StaffRow]):
         # Delete all existing items in the treeview.
         table.delete(*table.get_children())
         
         # Insert new rows from the content list.
         for row in content:
-            vals = (row["id"], row["name"], row["lastname"], row["username"], row["phone"], row["national_number"])
+            vals = (row.id, row.name, row.lastname, row.username, row.phone, row.national_number)
             table.insert(parent="", index=0, values=vals)
             
     #--------------------------------------------------------------------
@@ -301,7 +275,7 @@ class AdminEmployeePanel(Panel):
         username_label = CTkLabel(content_frame, text=text, text_color="white", font=(None, 15))
         username_label.grid(row=0, column=1)
         # Create a list of strings for the dropdown, including name for context.
-        combo_delete_items = ["{}:{} {}".format(user['username'], user['name'], user['lastname']) for user in users]
+        combo_delete_items = [f'{user.username}:{user.name} {user.lastname}' for user in users]
         # Recreate the dropdown to ensure the user list is always up-to-date.
         if self.delete_user_comboBox:
             self.delete_user_comboBox.destroy()
@@ -330,7 +304,7 @@ class AdminEmployeePanel(Panel):
         
         show_success_msg_callback("User was deleted")
         # Refresh the delete user UI to update the dropdown list.
-        self.delete_user(self, get_all_employee_and_manager_json(session))
+        self.delete_user(self, get_staff_rows(session))
     
     #-----------------------------------------------------------------
     
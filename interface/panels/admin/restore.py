@@ -1,7 +1,7 @@
 from customtkinter import *
 from ..panel import Panel
 from ...widgets import Btn, render_text
-from database import restore_database, session # Added session import
+from database import restore_database, ensure_schema, session # Added session import
 from utilities import is_windows
 from tkinter import filedialog
 import os # Added os import
@@ -95,6 +95,8 @@ class AdminRestorePanel(Panel):
         try:
             # Call the core restore function.
             restore_database(self.file_path, dbPath)
+            # An older backup may predate tables added since it was taken.
+            ensure_schema(session.bind)
             self.show_success_message("عملیات بازیابی با موفقیت انجام شد")
         except Exception as e:
             # Display any errors that occur during the process.
@@ -1,11 +1,11 @@
 from customtkinter import *
 from ..panel import Panel
 from ...widgets import Item_button, Input, Btn, DropDown, render_text, create_input_fields
+from ...styles import TABLE_STYLE
 from database import session
-from database import get_all_products_json, get_product_by_id, get_product_by_id_json
-from database import get_all_customers, get_customer_by_id, create_order, get_or_create_customer
-from database import ProductNotExistsException
-from utilities import is_windows
+from database import get_product_rows, get_product_by_id, get_product_by_id_json
+from database import get_customer_rows, get_customer_by_id, create_order, get_or_create_customer
+from database import ProductNotExistsException, ProductRow
 from tkinter import ttk
 
 
@@ -55,7 +55,7 @@ class EmployeeSellPanel(Panel):
             if self.sell_frame:
                 self.sell_frame.place_forget()
             # Show the table
-            self.insert_content_to_table(self.table, get_all_products_json(session))
+            self.insert_content_to_table(self.table, get_product_rows(session))
             self.table.place(relheight=.9, relwidth=.8, relx=.02, rely=.05)
             self.current_view = 'list'
         elif view_name == 'sell' and self.current_view != 'sell':
@@ -66,30 +66,7 @@ class EmployeeSellPanel(Panel):
     #--------------------------------------------------------------------
 
     def initialize_table(self, window):
-        style = ttk.Style()
-        if is_windows():
-            style.theme_use('clam')
-        
-        # Configure Treeview style
-        style.configure("Custom1.Treeview",
-        background="#494A5F",
-        foreground="black",
-        fieldbackground="#393A4E",
-        rowheight=50,
-        borderwidth=0
-        )
-        
-        style.configure("Custom1.Treeview.Heading",
-        background="#5B5D76",     # Header background color
-        foreground="white",       # Header text color
-        font=("Helvetica", 10, "bold"),
-        relief='flat')
-        
-        style.map("Custom1.Treeview.Heading",
-        background=[("active", "#6b6d87")],
-        foreground=[("active", "white")])
-        
-        table = ttk.Treeview(window, style="Custom1.Treeview")
+        table = ttk.Treeview(window, style=TABLE_STYLE)
         table.configure(columns=("id", "name", "size", "price", "quantity"))
         table.configure(show="headings", selectmode="none")
         
@@ -110,11 +87,11 @@ class EmployeeSellPanel(Panel):
         return table
     
     
-    def insert_content_to_table(self, table:ttk.Treeview, content:list[dict]):
+    def insert_content_to_table(self, table:ttk.Treeview, content:list[ProductRow]):
         table.delete(*table.get_children())
 
         for row in content:
-            vals = (row["id"], row["brand"], f"{row['size']['width']}/{row['size']['ratio']}/{row['size']['rim']}", row["price"], row["quantity"])
+            vals = (row.id, row.brand, row.size_label, row.price, row.quantity)
             table.insert(parent="", index=0, values=vals)
             
     
@@ -132,8 +109,8 @@ class EmployeeSellPanel(Panel):
         # Create input fields for selling a product
         product_label = CTkLabel(content_frame, text="Product:", text_color="white", font=(None, 15))
         product_label.grid(row=0, column=1)
-        products = get_all_products_json(session)
-        combo_items = [f'{product["id"]}:{product["brand"]}:{product["size"]["width"]}/{product["size"]["ratio"]}/{product["size"]["rim"]}' for product in products]
+        products = get_product_rows(session)
+        combo_items = [f'{product.id}:{product.brand}:{product.size_label}' for product in products]
         selected_product = StringVar()
         selected_product.set("Select Product")
         if self.sell_combobox:
@@ -148,7 +125,7 @@ class EmployeeSellPanel(Panel):
 
         create_input_fields(content_frame, render_text("تعداد:"), 3, 2, 'quantity', container=self.sell_inputs, just_english=True, just_number=True, show_err_callback=self.show_error_message)
 
-        customers = get_all_customers(session)
+        customers = get_customer_rows(session)
         self.user_info_combo_items = [f'{customer.id}:{customer.name}' for customer in customers]
         selected_customer = StringVar()
         selected_customer.set("Select Customer")
@@ -223,7 +200,8 @@ class EmployeeSellPanel(Panel):
             return
         
         customer_id, customer_name = customer_info.split(':')
-        customer_data = get_customer_by_id(session, customer_id)
+        # Only the contact details are shown, so the archived orders are not read.
+        customer_data = get_customer_by_id(session, customer_id, archived=False)
         
         if customer_data:
             self.customer_sell_inputs['customer_name'].set_placeholder_text(customer_data.name)
@@ -1,10 +1,10 @@
 from customtkinter import *
 from ..panel import Panel
 from ...widgets import Item_button, Input, Btn, DropDown, render_text, create_input_fields
-from database import session, get_all_employees_json, create_new_user
+from ...styles import TABLE_STYLE
+from database import session, get_employee_rows, StaffRow, create_new_user
 from database import remove_user_by_username, update_user_by_username, user_by_username
 from database import get_all_employee_usernames
-from utilities import is_windows
 from tkinter import ttk
 from awesometkinter.bidirender import isarabic, derender_text
 
@@ -77,7 +77,7 @@ class ManagerEmployeePanel(Panel):
             self.edit_user_frame.place_forget()
             self.table.place(relheight=.9, relwidth=.8, relx=.02, rely=.05)
             self.current_view = 'list'
-            self.insert_content_to_table(self.table, get_all_employees_json(session))
+            self.insert_content_to_table(self.table, get_employee_rows(session))
         elif view_name == 'new' and self.current_view != 'new':
             self.table.place_forget()
             self.delete_user_frame.place_forget()
@@ -88,7 +88,7 @@ class ManagerEmployeePanel(Panel):
             self.table.place_forget()
             self.new_employee_frame.place_forget()
             self.edit_user_frame.place_forget()
-            self.delete_user(self, get_all_employees_json(session))
+            self.delete_user(self, get_employee_rows(session))
             self.current_view = 'delete'
         elif view_name == 'edit' and self.current_view != 'edit':
             self.table.place_forget()
@@ -98,30 +98,7 @@ class ManagerEmployeePanel(Panel):
 
     #---------------------- Setup Employee table content----------------
     def initialize_table(self, window):
-        style = ttk.Style()
-        if is_windows():
-            style.theme_use('clam')
-        
-        # Configure Treeview style
-        style.configure("Custom1.Treeview",
-        background="#494A5F",
-        foreground="black",
-        fieldbackground="#393A4E",
-        rowheight=50,
-        borderwidth=0
-        )
-        
-        style.configure("Custom1.Treeview.Heading",
-        background="#5B5D76",     # Header background color
-        foreground="white",       # Header text color
-        font=("Helvetica", 10, "bold"),
-        relief='flat')
-        
-        style.map("Custom1.Treeview.Heading",
-        background=[("active", "#6b6d87")],
-        foreground=[("active", "white")])
-        
-        table = ttk.Treeview(window, style="Custom1.Treeview")
+        table = ttk.Treeview(window, style=TABLE_STYLE)
         table.configure(columns=("id", "name", "lastname", "username", "phone", "national", "startDate"))
         table.configure(show="headings", selectmode="none")
         
@@ -148,13 +125,13 @@ class ManagerEmployeePanel(Panel):
         return table
         
     
-    def insert_content_to_table(self, table:ttk.Treeview, content:list[dict]):
+    def insert_content_to_table(self, table:ttk.Treeview, content:list[StaffRow]):
         
         
         table.delete(*table.get_children())
         
         for row in content:
-            vals = (row["id"], row["name"], row["lastname"], row["username"], row["phone"], row["national_number"])
+            vals = (row.id, row.name, row.lastname, row.username, row.phone, row.national_number)
             
             table.insert(parent="", index=0, values=vals)
             
@@ -273,7 +250,7 @@ class ManagerEmployeePanel(Panel):
         text = render_text("نام کاربری:")
         username_label = CTkLabel(content_frame, text=text, text_color="white", font=(None, 15))
         username_label.grid(row=0, column=1)
-        combo_delete_items = ["{}:{} {}".format(user['username'], user['name'], user['lastname']) for user in users]
+        combo_delete_items = [f'{user.username}:{user.name} {user.lastname}' for user in users]
         if self.delete_user_comboBox:
             self.delete_user_comboBox.destroy()
         
@@ -297,7 +274,7 @@ class ManagerEmployeePanel(Panel):
             show_msg_callback(e)
         
         show_success_msg_callback("User was deleted")
-        self.delete_user(self, get_all_employees_json(session))
+        self.delete_user(self, get_employee_rows(session))
     
     #-----------------------------------------------------------------
     
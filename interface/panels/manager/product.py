@@ -1,10 +1,13 @@
 from customtkinter import *
 from ..panel import Panel
 from ...widgets import Item_button, Input, Btn, DropDown, render_text, create_input_fields
+from ...styles import TABLE_STYLE
 from database import session, create_product
-from database import get_all_products_json, delete_product_by_name_and_size, get_product_by_id_json, update_product_by_id
-from utilities import is_windows
-from tkinter import ttk
+from database import get_product_rows, ProductRow, delete_product_by_name_and_size, get_product_by_id_json, update_product_by_id
+from database import import_price_list, bulk_update_products, count_products_for_bulk_update
+from database import get_all_branches, get_branch_quantity
+from tkinter import ttk, filedialog
+import os
 
 class ManagerProductPanel(Panel):
     def __init__(self, root):
@@ -17,7 +20,7 @@ class ManagerProductPanel(Panel):
         self.btn_frame = CTkFrame(self, fg_color='transparent')
         self.btn_frame.place(relwidth=.2, relheight=.3, relx=1, rely=.1, anchor="ne")
         self.btn_frame.columnconfigure(0, weight=1)
-        self.btn_frame.rowconfigure((0,1,2,3), weight=1)
+        self.btn_frame.rowconfigure((0,1,2,3,4,5), weight=1)
         
         product_list_btn = Item_button(self.btn_frame, 150, 50, rtopleft=20, rbottomleft=20, color="#393A4E", hover_color="#434357", background="#494A5F")
         product_list_btn.set_text("لیست محصولات", "white", 13)
@@ -39,13 +42,24 @@ class ManagerProductPanel(Panel):
         product_update_btn.set_action(lambda e: self.toggle_view('update'))
         product_update_btn.grid(row=3,column=0 , sticky="e")
         
+        product_import_btn = Item_button(self.btn_frame, 150, 50, rtopleft=20, rbottomleft=20, color="#393A4E", hover_color="#434357", background="#494A5F")
+        product_import_btn.set_text("ورود لیست قیمت", "white", 13)
+        product_import_btn.set_action(lambda e: self.toggle_view('import'))
+        product_import_btn.grid(row=4,column=0 , sticky="e")
+        
+        product_bulk_btn = Item_button(self.btn_frame, 150, 50, rtopleft=20, rbottomleft=20, color="#393A4E", hover_color="#434357", background="#494A5F")
+        product_bulk_btn.set_text("تغییر گروهی", "white", 13)
+        product_bulk_btn.set_action(lambda e: self.toggle_view('bulk'))
+        product_bulk_btn.grid(row=5,column=0 , sticky="e")
+        
         self.edit_product_frame = None
         self.edit_product_combobox = None
+        self.edit_branch_combobox = None
         self.edit_product_inputs = {}
 
         # Create table and new product form but hide them initially
         self.table = self.initialize_table(self)
-        self.insert_content_to_table(self.table, get_all_products_json(session))
+        self.insert_content_to_table(self.table, get_product_rows(session))
         
         self.new_product_inputs: list[Input] = []
         
@@ -56,16 +70,28 @@ class ManagerProductPanel(Panel):
         self.delete_product_btn = None
         self.delete_product_combobox = None
         
+        self.import_frame = None
+        self.import_file_path = None
+        
+        self.bulk_frame = None
+        self.bulk_inputs = {}
+        
         self.product_new(self)
         self.delete_product(self)
         self.edit_product(self)
+        self.import_price_list_view(self)
+        self.bulk_update_view(self)
         self.toggle_view('list')  # Show the new product form by default
 
     # Toggle between different views
     def toggle_view(self, view_name):
+        if view_name != 'import':
+            self.import_frame.place_forget()
+        if view_name != 'bulk':
+            self.bulk_frame.place_forget()
         if view_name == 'list':
             self.table.place(relheight=.9, relwidth=.8, relx=.02, rely=.05)
-            self.insert_content_to_table(self.table, get_all_products_json(session))
+            self.insert_content_to_table(self.table, get_product_rows(session))
             self.new_product_frame.place_forget()
             self.delete_product_frame.place_forget()
             self.edit_product_frame.place_forget()
@@ -83,32 +109,21 @@ class ManagerProductPanel(Panel):
             self.table.place_forget()
             self.delete_product_frame.place_forget()
             self.edit_product(self)
+        elif view_name == 'import':
+            self.table.place_forget()
+            self.new_product_frame.place_forget()
+            self.delete_product_frame.place_forget()
+            self.edit_product_frame.place_forget()
+            self.import_frame.place(relheight=.9, relwidth=.8, relx=.02, rely=.05)
+        elif view_name == 'bulk':
+            self.table.place_forget()
+            self.new_product_frame.place_forget()
+            self.delete_product_frame.place_forget()
+            self.edit_product_frame.place_forget()
+            self.bulk_frame.place(relheight=.9, relwidth=.8, relx=.02, rely=.05)
 
     def initialize_table(self, window):
-        style = ttk.Style()
-        if is_windows():
-            style.theme_use('clam')
-        
-        # Configure Treeview style
-        style.configure("Custom1.Treeview",
-        background="#494A5F",
-        foreground="black",
-        fieldbackground="#393A4E",
-        rowheight=50,
-        borderwidth=0
-        )
-        
-        style.configure("Custom1.Treeview.Heading",
-        background="#5B5D76",     # Header background color
-        foreground="white",       # Header text color
-        font=("Helvetica", 10, "bold"),
-        relief='flat')
-        
-        style.map("Custom1.Treeview.Heading",
-        background=[("active", "#6b6d87")],
-        foreground=[("active", "white")])
-        
-        table = ttk.Treeview(window, style="Custom1.Treeview")
+        table = ttk.Treeview(window, style=TABLE_STYLE)
         table.configure(columns=("id", "name", "size", "price", "quantity"))
         table.configure(show="headings", selectmode="none")
         
@@ -129,21 +144,22 @@ class ManagerProductPanel(Panel):
         return table
     
     
-    def insert_content_to_table(self, table:ttk.Treeview, content:list[dict]):
+    def insert_content_to_table(self, table:ttk.Treeview, content:list[ProductRow]):
         table.delete(*table.get_children())
 
         for row in content:
-            vals = (row["id"], row["brand"], f"{row['size']['width']}/{row['size']['ratio']}/{row['size']['rim']}", row["price"], row["quantity"])
+            vals = (row.id, row.brand, row.size_label, row.price, row.quantity)
             table.insert(parent="", index=0, values=vals)
             
     
     
     def product_new(self, window):
+        # The form is built once; opening the view again only shows it.
         if self.new_product_frame:
-            content_frame = self.new_product_frame
-        else:
-            content_frame = CTkFrame(window, fg_color="#5B5D76")
-            self.new_product_frame = content_frame
+            self.new_product_frame.place(relheight=.9, relwidth=.8, relx=.02, rely=.05)
+            return
+        content_frame = CTkFrame(window, fg_color="#5B5D76")
+        self.new_product_frame = content_frame
             
         content_frame.place(relheight=.9, relwidth=.8, relx=.02, rely=.05)
         content_frame.rowconfigure(tuple(range(0, 8)), weight=1)
@@ -234,8 +250,9 @@ class ManagerProductPanel(Panel):
         content_frame.place(relheight=.9, relwidth=.8, relx=.02, rely=.05)
         
         # Fetch all products and populate the dropdown
-        products = get_all_products_json(session)
-        combo_delete_items = ["{}:{} {}".format(product['brand'], product['size']['width'], product['size']['ratio'], product['size']['rim']) for product in products]
+        products = get_product_rows(session)
+        # In the "brand:width/ratio/rim" form delete_product_action parses.
+        combo_delete_items = [f'{product.brand}:{product.size_label}' for product in products]
 
         if self.delete_product_combobox:
             self.delete_product_combobox.destroy()
@@ -282,8 +299,8 @@ class ManagerProductPanel(Panel):
         select_product_label = CTkLabel(content_frame, text="Product:", text_color="white", font=(None, 15))
         select_product_label.grid(row=0, column=1)
 
-        products = get_all_products_json(session)
-        combo_items = [f'{product["id"]}:{product["brand"]}:{product["size"]["width"]}/{product["size"]["ratio"]}/{product["size"]["rim"]}' for product in products]
+        products = get_product_rows(session)
+        combo_items = [f'{product.id}:{product.brand}:{product.size_label}' for product in products]
         selected_product = StringVar()
         if self.edit_product_combobox:
             self.edit_product_combobox.grid_forget()
@@ -292,6 +309,17 @@ class ManagerProductPanel(Panel):
         self.edit_product_combobox = DropDown(content_frame, values=combo_items, width=250, command=self.load_product_data)
         self.edit_product_combobox.grid(row=0, column=2)
 
+        # The quantity field is the product's stock in the chosen branch.
+        branch_label = CTkLabel(content_frame, text=render_text("شعبه:"), text_color="white", font=(None, 15))
+        branch_label.grid(row=4, column=1)
+        branch_items = [f"{branch['id']}:{branch['name']}" for branch in get_all_branches(session)]
+        if self.edit_branch_combobox:
+            self.edit_branch_combobox.grid_forget()
+            self.edit_branch_combobox.destroy()
+        self.edit_branch_combobox = DropDown(content_frame, values=branch_items, width=250,
+                                             command=lambda _: self.load_product_data(self.edit_product_combobox.get()))
+        self.edit_branch_combobox.grid(row=4, column=2)
+
         create_input_fields(content_frame, render_text("برند:"), 1, 1, 'brand',container=self.edit_product_inputs, show_err_callback=self.show_error_message)
         create_input_fields(content_frame, render_text("قیمت:"), 2, 1, 'price', just_english=True, just_number=True, container=self.edit_product_inputs, show_err_callback=self.show_error_message)
         create_input_fields(content_frame, render_text("تعداد:"), 3, 1, 'quantity', just_english=True, just_number=True, container=self.edit_product_inputs, show_err_callback=self.show_error_message)
@@ -320,7 +348,8 @@ class ManagerProductPanel(Panel):
             
             new_price = float(self.edit_product_inputs['price'].get())
             new_quantity = int(self.edit_product_inputs['quantity'].get())
-            update_product_by_id(session, product_id, new_brand_name, new_width, new_ratio, new_rim, new_quantity, new_price)
+            branch_id = self.edit_branch_combobox.get().split(':')[0]
+            update_product_by_id(session, product_id, new_brand_name, new_width, new_ratio, new_rim, new_quantity, new_price, branch_id)
             show_success_callback(f'The product information has been changed.')
             self.edit_product(self)
             for v in list(self.edit_product_inputs.values()):
@@ -329,6 +358,8 @@ class ManagerProductPanel(Panel):
             show_error_callback(e)
             
     def load_product_data(self, product_info):
+        if product_info.count(':') != 2:
+            return
         product_id, brand_name, size = product_info.split(':')
         width, ratio, rim = map(int, size.split('/'))
         product_data = get_product_by_id_json(session, product_id)
@@ -339,5 +370,119 @@ class ManagerProductPanel(Panel):
             self.edit_product_inputs['ratio'].set_placeholder_text(str(ratio))
             self.edit_product_inputs['rim'].set_placeholder_text(str(rim))
             self.edit_product_inputs['price'].set_placeholder_text(str(product_data['price']))
-            self.edit_product_inputs['quantity'].set_placeholder_text(str(product_data['quantity']))
- 
\ No newline at end of file
+            branch_id = self.edit_branch_combobox.get().split(':')[0]
+            self.edit_product_inputs['quantity'].set_placeholder_text(str(get_branch_quantity(session, branch_id, product_id)))
+ 
+
+    #-----------------PRICE LIST IMPORT-------------------------
+
+    # Builds the view used to import a supplier price list (CSV or Excel).
+    def import_price_list_view(self, window):
+        content_frame = CTkFrame(window, fg_color="#5B5D76")
+        self.import_frame = content_frame
+        content_frame.rowconfigure((0, 1), weight=1)
+        content_frame.rowconfigure(2, weight=6)
+        content_frame.columnconfigure((0, 1, 2), weight=1, uniform='a')
+
+        select_btn = Btn(content_frame, 150, 45, text="انتخاب فایل", command=self.select_price_list_file)
+        select_btn.grid(row=0, column=2)
+        self.import_file_label = CTkLabel(content_frame, text='?', text_color='#c5c6de', font=(None, 15))
+        self.import_file_label.grid(row=0, column=0, columnspan=2)
+
+        preview_btn = Btn(content_frame, 150, 45, text="پیش نمایش", command=lambda: self.import_price_list_action(dry_run=True))
+        preview_btn.grid(row=1, column=1)
+        import_btn = Btn(content_frame, 150, 45, text="ثبت", command=lambda: self.import_price_list_action(dry_run=False))
+        import_btn.grid(row=1, column=0)
+
+        # Shows the dry-run diff or the result of the import.
+        self.import_report_box = CTkTextbox(content_frame, fg_color="#45475C", text_color="white")
+        self.import_report_box.grid(row=2, column=0, columnspan=3, sticky="nsew", padx=10, pady=10)
+
+    def select_price_list_file(self):
+        selected = filedialog.askopenfilename(title="انتخاب فایل", filetypes=[("price list", "*.csv *.xlsx")])
+        if selected:
+            self.import_file_path = selected
+            self.import_file_label.configure(text=os.path.basename(selected))
+
+    def import_price_list_action(self, dry_run):
+        if not self.import_file_path:
+            self.show_error_message(render_text("فایل لیست قیمت را انتخاب کنید"))
+            return
+        try:
+            report = import_price_list(session, self.import_file_path, dry_run=dry_run)
+        except Exception as e:
+            self.show_error_message(e)
+            return
+        self.import_report_box.delete("1.0", "end")
+        self.import_report_box.insert("1.0", report.format())
+        if not dry_run:
+            self.show_success_message(report.summary())
+
+    #-----------------BULK PRICE AND STOCK UPDATE-------------------------
+
+    # Builds the view used to change the price and stock of a filtered group of products at once.
+    def bulk_update_view(self, window):
+        content_frame = CTkFrame(window, fg_color="#5B5D76")
+        self.bulk_frame = content_frame
+        content_frame.rowconfigure(tuple(range(0, 8)), weight=1)
+        content_frame.columnconfigure((1,2,3), weight=10)
+        content_frame.columnconfigure(0, weight=1)
+        content_frame.columnconfigure(4, weight=1)
+
+        # Filters: an empty field leaves that filter open.
+        create_input_fields(content_frame, render_text("برند:"), 0, 2, 'brand', container=self.bulk_inputs, show_err_callback=self.show_error_message)
+        create_input_fields(content_frame, render_text("پهنا از:"), 1, 3, 'min_width', just_english=True, just_number=True, container=self.bulk_inputs, show_err_callback=self.show_error_message)
+        create_input_fields(content_frame, render_text("تا:"), 1, 1, 'max_width', just_english=True, just_number=True, container=self.bulk_inputs, show_err_callback=self.show_error_message)
+        create_input_fields(content_frame, render_text("نسبت از:"), 2, 3, 'min_ratio', just_english=True, just_number=True, container=self.bulk_inputs, show_err_callback=self.show_error_message)
+        create_input_fields(content_frame, render_text("تا:"), 2, 1, 'max_ratio', just_english=True, just_number=True, container=self.bulk_inputs, show_err_callback=self.show_error_message)
+        create_input_fields(content_frame, render_text("رینگ از:"), 3, 3, 'min_rim', just_english=True, just_number=True, container=self.bulk_inputs, show_err_callback=self.show_error_message)
+        create_input_fields(content_frame, render_text("تا:"), 3, 1, 'max_rim', just_english=True, just_number=True, container=self.bulk_inputs, show_err_callback=self.show_error_message)
+
+        # Changes: these accept negative values, so they are not limited to digits.
+        create_input_fields(content_frame, render_text("درصد قیمت:"), 4, 3, 'price_percent', just_english=True, container=self.bulk_inputs, show_err_callback=self.show_error_message)
+        create_input_fields(content_frame, render_text("مبلغ قیمت:"), 4, 1, 'price_amount', just_english=True, container=self.bulk_inputs, show_err_callback=self.show_error_message)
+        create_input_fields(content_frame, render_text("تغییر موجودی:"), 5, 3, 'quantity_amount', just_english=True, container=self.bulk_inputs, show_err_callback=self.show_error_message)
+
+        self.bulk_count_label = CTkLabel(content_frame, text='?', text_color='#c5c6de', font=(None, 15))
+        self.bulk_count_label.grid(row=5, column=1)
+
+        preview_btn = Btn(content_frame, 150, 45, text="پیش نمایش", command=self.bulk_preview_action)
+        preview_btn.grid(row=6, column=3)
+        apply_btn = Btn(content_frame, 150, 45, text="اعمال تغییرات", command=self.bulk_update_action)
+        apply_btn.grid(row=6, column=1)
+
+    # Reads the filter fields and converts them to keyword arguments for the crud functions.
+    def _bulk_filters(self):
+        def number(key):
+            val = self.bulk_inputs[key].get().strip()
+            return int(val) if val else None
+        return {
+            'brand_name': self.bulk_inputs['brand'].get().strip() or None,
+            'width_range': (number('min_width'), number('max_width')),
+            'ratio_range': (number('min_ratio'), number('max_ratio')),
+            'rim_range': (number('min_rim'), number('max_rim')),
+        }
+
+    def bulk_preview_action(self):
+        try:
+            count = count_products_for_bulk_update(session, **self._bulk_filters())
+            self.bulk_count_label.configure(text=f"{count} products")
+        except Exception as e:
+            self.show_error_message(e)
+
+    def bulk_update_action(self):
+        def number(key, cast):
+            val = self.bulk_inputs[key].get().strip()
+            return cast(val) if val else None
+        try:
+            count = bulk_update_products(
+                session,
+                price_percent=number('price_percent', float),
+                price_amount=number('price_amount', float),
+                quantity_amount=number('quantity_amount', int),
+                **self._bulk_filters()
+            )
+            self.bulk_count_label.configure(text=f"{count} products")
+            self.show_success_message(f"{count} products were updated")
+        except Exception as e:
+            self.show_error_message(e)
@@ -1,10 +1,10 @@
 from customtkinter import *
 from ..panel import Panel
 from ...widgets import Item_button, DropDown, render_text, create_updatable_labels
+from ...styles import TABLE_STYLE
 from database import session
-from database import get_all_customers, get_customer_by_id
-from database import get_all_orders
-from utilities import is_windows
+from database import get_customer_rows, get_customer_by_id
+from database import get_order_line_rows, OrderLineRow
 from tkinter import ttk
 
 
@@ -41,7 +41,7 @@ class ManagerReportPanel(Panel):
         self.customer_report_label_total_orders = None
         # Create table 
         # self.initialize_report_table(self)
-        # self.insert_content_to_report_table(self.sell_report_table, get_all_orders(session))
+        # self.insert_content_to_report_table(self.sell_report_table, get_order_line_rows(session))
         self.customer_report_dropdown = None
         self.customer_report_table = None
         self.customer_report_labels = {}
@@ -52,7 +52,7 @@ class ManagerReportPanel(Panel):
     def toogle_view(self, view_name):
         if view_name == 'sell' and self.current_view != 'sell':
             self.initialize_report_table(self)
-            self.insert_content_to_report_table(self.sell_report_table, get_all_orders(session))
+            self.insert_content_to_report_table(self.sell_report_table, get_order_line_rows(session))
             self.customer_report_frame.place_forget()
             self.current_view = 'sell'
         elif view_name == 'customer' and self.current_view != 'customer':
@@ -63,33 +63,10 @@ class ManagerReportPanel(Panel):
         
     
     def initialize_report_table(self, window):
-        style = ttk.Style()
-        if is_windows():
-            style.theme_use('clam')
-        
-        # Configure Treeview style
-        style.configure("Custom1.Treeview",
-        background="#494A5F",
-        foreground="black",
-        fieldbackground="#393A4E",
-        rowheight=50,
-        borderwidth=0
-        )
-        
-        style.configure("Custom1.Treeview.Heading",
-        background="#5B5D76",     # Header background color
-        foreground="white",       # Header text color
-        font=("Helvetica", 10, "bold"),
-        relief='flat')
-        
-        style.map("Custom1.Treeview.Heading",
-        background=[("active", "#6b6d87")],
-        foreground=[("active", "white")])
-        
         if self.sell_report_table:
             table = self.sell_report_table
         else:
-            self.sell_report_table = ttk.Treeview(window, style="Custom1.Treeview")
+            self.sell_report_table = ttk.Treeview(window, style=TABLE_STYLE)
             table = self.sell_report_table
             
         table.configure(columns=("id", "brand", "size", "price", "customer", "date"))
@@ -114,13 +91,12 @@ class ManagerReportPanel(Panel):
         
         return table
 
-    def insert_content_to_report_table(self, table:ttk.Treeview, orders:list):
+    def insert_content_to_report_table(self, table:ttk.Treeview, lines:list[OrderLineRow]):
         table.delete(*table.get_children())
 
-        for order in orders:
-            for product in order.products:
-                vals = (order.id, product.brand, f"{product.width}/{product.ratio}/{product.rim}", product.price, order.customer.name, order.date)
-                table.insert(parent="", index=0, values=vals)
+        for line in lines:
+            vals = (line.order_id, line.brand, line.size_label, line.price, line.customer_name, line.date)
+            table.insert(parent="", index=0, values=vals)
 #---------------------------------------------------------------
 
     def customer_report(self, window):
@@ -149,7 +125,7 @@ class ManagerReportPanel(Panel):
             self.initialized_customer_report = True
             
         # Add dropdown for customer selection
-        customers = get_all_customers(session)
+        customers = get_customer_rows(session)
         combo_items = [f'{customer.id}:{customer.name}' for customer in customers]
 
         if self.customer_report_dropdown:
@@ -165,38 +141,11 @@ class ManagerReportPanel(Panel):
         
         
     def initialize_customer_report_table(self, window):
-        style = ttk.Style()
-
-        if is_windows():
-            style.theme_use('clam')
-        
-        
-        # Configure table style
-        style.configure("Custom1.Treeview",
-            background="#494A5F",
-            foreground="black",
-            fieldbackground="#393A4E",
-            rowheight=50,
-            borderwidth=0
-        )
-        
-        style.configure("Custom1.Treeview.Heading",
-            background="#5B5D76",
-            foreground="white",
-            font=("Helvetica", 10, "bold"),
-            relief='flat'
-        )
-        
-        style.map("Custom1.Treeview.Heading",
-            background=[("active", "#6b6d87")],
-            foreground=[("active", "white")]
-        )
-        
         # Create frame to hold dropdown and table
         if self.customer_report_table:
             table = self.customer_report_table
         else:
-            self.customer_report_table = ttk.Treeview(window, style="Custom1.Treeview")
+            self.customer_report_table = ttk.Treeview(window, style=TABLE_STYLE)
             table = self.customer_report_table
         
             
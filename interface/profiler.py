@@ -0,0 +1,235 @@
+import os
+import sys
+import time
+import atexit
+import heapq
+import logging
+import threading
+import tkinter
+
+
+# Set this environment variable to a file path to profile the UI, e.g.
+#     TIRESHOP_PROFILE=ui-profile.folded python main.py
+# The profile is written in the collapsed-stack format read by flamegraph.pl and speedscope.
+PROFILE_ENV_VAR = 'TIRESHOP_PROFILE'
+
+# How often (in seconds) the main thread's stack is sampled while a callback is running.
+SAMPLE_INTERVAL = 0.005
+
+# A callback running longer than this (in seconds) is reported as a stall.
+STALL_THRESHOLD = 0.05
+
+# How many of the longest stalls are kept per panel.
+STALLS_PER_PANEL = 5
+
+# The heartbeat is an 'after' job that should run every frame (~60 fps); when it
+# comes late the event loop was blocked and the user saw a frozen window.
+HEARTBEAT_INTERVAL_MS = 16
+
+logger = logging.getLogger('tireshop.ui')
+
+
+def _callable_name(func) -> str:
+    return f"{getattr(func, '__module__', None) or '?'}.{getattr(func, '__qualname__', repr(func))}"
+
+
+def _unwrap(func):
+    """Returns the application function behind a Tk callback."""
+    # after() registers a local 'callit' closure that calls the real function.
+    code = getattr(func, '__code__', None)
+    if code is not None and code.co_name == 'callit' and 'func' in code.co_freevars:
+        return func.__closure__[code.co_freevars.index('func')].cell_contents
+    # customtkinter buttons bind their own _clicked method, which calls the 'command' option.
+    command = getattr(getattr(func, '__self__', None), '_command', None)
+    if callable(command):
+        return command
+    return func
+
+
+def _panel_of(widget, func) -> str:
+    """Names the panel (or page) a callback belongs to."""
+    while widget is not None:
+        if type(widget).__module__.startswith('interface.panels.'):
+            return type(widget).__name__
+        widget = getattr(widget, 'master', None)
+    # Page classes are not widgets themselves, so fall back to the class defining the handler.
+    module = getattr(func, '__module__', None) or ''
+    if module.startswith('interface.'):
+        return getattr(func, '__qualname__', '?').split('.')[0]
+    return '(main)'
+
+
+def _stack_names(frame, stop) -> list:
+    """Returns the frame names from just below the 'stop' frame down to 'frame'."""
+    names = []
+    while frame is not None and frame is not stop:
+        code = frame.f_code
+        # Skip the closure after() puts around every job.
+        if code.co_name == 'callit' and code.co_filename == tkinter.__file__:
+            frame = frame.f_back
+            continue
+        names.append(f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+# Records how long every Tk callback (button actions, bindings, trace_add handlers
+# and 'after' jobs) blocks the event loop, and samples the stack of the slow ones.
+class UIProfiler:
+    def __init__(self, sample_interval: float = SAMPLE_INTERVAL, stall_threshold: float = STALL_THRESHOLD):
+        self.sample_interval = sample_interval
+        self.stall_threshold = stall_threshold
+        self._lock = threading.Lock()
+        self._main_thread = threading.main_thread().ident
+        # The callbacks currently running on the main thread (nested when a handler calls update()).
+        self._active = []
+        # handler -> [calls, total seconds, slowest seconds]
+        self.handlers = {}
+        # panel -> heap of the longest (seconds, handler) stalls
+        self.stalls = {}
+        # collapsed stack -> number of samples
+        self.samples = {}
+        self.late_frames = 0
+        self.worst_frame = 0.0
+        self._sampler = None
+        self._stopped = threading.Event()
+        self._original_init = None
+
+    # --- Recording ---
+
+    def wrap(self, func, widget=None):
+        """Returns a function that runs 'func' and records how long it took."""
+        target = _unwrap(func)
+        handler = _callable_name(target)
+        panel = _panel_of(widget, target)
+
+        def profiled(*args):
+            entry = (panel, handler, sys._getframe())
+            self._active.append(entry)
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                self.record(panel, handler, time.perf_counter() - started)
+                self._active.pop()
+
+        return profiled
+
+    def record(self, panel: str, handler: str, elapsed: float):
+        with self._lock:
+            stats = self.handlers.get(handler)
+            if stats is None:
+                self.handlers[handler] = [1, elapsed, elapsed]
+            else:
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] = max(stats[2], elapsed)
+            if elapsed >= self.stall_threshold:
+                stalls = self.stalls.setdefault(panel, [])
+                if len(stalls) < STALLS_PER_PANEL:
+                    heapq.heappush(stalls, (elapsed, handler))
+                else:
+                    heapq.heappushpop(stalls, (elapsed, handler))
+
+    def _sample(self):
+        # Runs on its own thread; only samples while a callback is blocking the event loop.
+        while not self._stopped.wait(self.sample_interval):
+            if not self._active:
+                continue
+            try:
+                panel, handler, wrapper_frame = self._active[0]
+            except IndexError:
+                continue
+            frame = sys._current_frames().get(self._main_thread)
+            if frame is None:
+                continue
+            # The first frame below the wrapper is the handler itself, already named by 'handler'.
+            stack = ';'.join([panel, handler] + _stack_names(frame, wrapper_frame)[1:])
+            with self._lock:
+                self.samples[stack] = self.samples.get(stack, 0) + 1
+
+    def _heartbeat(self, root, expected: float):
+        late = time.perf_counter() - expected
+        if late > self.stall_threshold:
+            self.late_frames += 1
+            self.worst_frame = max(self.worst_frame, late)
+        interval = HEARTBEAT_INTERVAL_MS / 1000
+        root.after(HEARTBEAT_INTERVAL_MS, self._heartbeat, root, time.perf_counter() + interval)
+
+    # --- Installation ---
+
+    def install(self):
+        """Wraps every Tk callback registered from now on. Call before creating the root window."""
+        profiler = self
+        original_init = tkinter.CallWrapper.__init__
+        self._original_init = original_init
+
+        # Every Python callback Tk can call (command=, bind, trace_add, after) goes through a CallWrapper.
+        def __init__(wrapper, func, subst, widget):
+            # The heartbeat measures the loop itself and is not reported as a handler.
+            if getattr(_unwrap(func), '__func__', None) is not UIProfiler._heartbeat:
+                func = profiler.wrap(func, widget)
+            original_init(wrapper, func, subst, widget)
+
+        tkinter.CallWrapper.__init__ = __init__
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+
+    def start_heartbeat(self, root):
+        root.after(HEARTBEAT_INTERVAL_MS, self._heartbeat, root, time.perf_counter() + HEARTBEAT_INTERVAL_MS / 1000)
+
+    def uninstall(self):
+        self._stopped.set()
+        if self._original_init is not None:
+            tkinter.CallWrapper.__init__ = self._original_init
+            self._original_init = None
+
+    # --- Reporting ---
+
+    def write_collapsed(self, path: str):
+        """Writes the sampled stacks as 'frame;frame;frame count' lines."""
+        with self._lock:
+            samples = sorted(self.samples.items())
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in samples:
+                f.write(f"{stack} {count}\n")
+
+    def summary(self, limit: int = 15) -> str:
+        with self._lock:
+            handlers = sorted(self.handlers.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+            stalls = {panel: sorted(entries, reverse=True) for panel, entries in self.stalls.items()}
+        lines = [f"{'handler':<70}{'calls':>8}{'total ms':>12}{'max ms':>10}"]
+        for handler, (calls, total, slowest) in handlers:
+            lines.append(f"{handler[-70:]:<70}{calls:>8}{total * 1000:>12.1f}{slowest * 1000:>10.1f}")
+        lines.append('')
+        lines.append(f"late frames: {self.late_frames} (worst {self.worst_frame * 1000:.0f} ms)")
+        for panel, entries in sorted(stalls.items(), key=lambda item: item[1][0][0], reverse=True):
+            lines.append(f"{panel}:")
+            for elapsed, handler in entries:
+                lines.append(f"    {elapsed * 1000:8.1f} ms  {handler}")
+        return '\n'.join(lines)
+
+    def dump(self, path: str):
+        """Writes the flamegraph profile to 'path' and the summary next to it."""
+        self.uninstall()
+        self.write_collapsed(path)
+        with open(os.path.splitext(path)[0] + '.txt', 'w', encoding='utf-8') as f:
+            f.write(self.summary() + '\n')
+        logger.info("UI profile written to %s", path)
+
+
+def enable_from_env():
+    """
+    Installs the profiler if TIRESHOP_PROFILE is set and dumps the profile when the application exits.
+
+    Returns:
+        The installed UIProfiler, or None when profiling is off.
+    """
+    path = os.environ.get(PROFILE_ENV_VAR)
+    if not path:
+        return None
+    profiler = UIProfiler()
+    profiler.install()
+    atexit.register(profiler.dump, path)
+    return profiler
@@ -0,0 +1,44 @@
+from tkinter import ttk
+from utilities import is_windows
+
+
+# The ttk style used by every table (Treeview) in the panels.
+TABLE_STYLE = "Custom1.Treeview"
+
+_registered = False
+
+
+# Defines all ttk styles of the application once, right after the root window is created.
+# Changing the theme or a style makes Tk restyle every existing widget, so panels only
+# refer to the style names above and never configure styles themselves.
+def register_styles(root=None):
+    global _registered
+    if _registered:
+        return
+    style = ttk.Style(root)
+    # 'clam' theme is used on Windows for better visual compatibility.
+    if is_windows():
+        style.theme_use('clam')
+
+    # Configure the custom style for the Treeview body.
+    style.configure(TABLE_STYLE,
+    background="#494A5F",
+    foreground="black",
+    fieldbackground="#393A4E",
+    rowheight=50,
+    borderwidth=0
+    )
+
+    # Configure the custom style for the Treeview heading.
+    style.configure(f"{TABLE_STYLE}.Heading",
+    background="#5B5D76",     # Header background color
+    foreground="white",       # Header text color
+    font=("Helvetica", 10, "bold"),
+    relief='flat')
+
+    # Configure the hover effect for the heading.
+    style.map(f"{TABLE_STYLE}.Heading",
+    background=[("active", "#6b6d87")],
+    foreground=[("active", "white")])
+
+    _registered = True
@@ -3,7 +3,8 @@ from .widgets import *
 from utilities import Concur
 from time import sleep
 
-from .panels import AdminEmployeePanel, AdminBackupPanel, ManagerProductPanel, ManagerEmployeePanel, ManagerReportPanel, EmployeeSellPanel, EmployeeReportPanel, ManagerDashboardPanel, AdminRestorePanel
+# Panel modules are loaded lazily, the first time a page shows them.
+from . import panels
 
 from PIL import Image
 import os
@@ -234,7 +235,7 @@ class ForgotPasswordDialog(CTkToplevel):
         try:
             # Importing here locally can help prevent circular dependencies.
             from database import session
-            from database.crud import user_by_national_id_phone
+            from database import user_by_national_id_phone
             user = user_by_national_id_phone(session, national_id, phone)
             if user:
                 self.verified_user = user
@@ -285,8 +286,8 @@ class ForgotPasswordDialog(CTkToplevel):
                 return
             try:
                 from database import session
-                from database.crud import update_user_by_username
-                update_user_by_username(session, user.user_name, password=new_pass)
+                from database import reset_password
+                reset_password(session, user.national_number, user.phone, new_pass)
                 msg_label.configure(text=render_text("رمز عبور با موفقیت تغییر کرد!"), text_color="green")
                 # Automatically close the window after a short delay on success.
                 win.after(1500, win.destroy)
@@ -315,8 +316,8 @@ class ForgotPasswordDialog(CTkToplevel):
             return
         try:
             from database import session
-            from database.crud import update_user_by_username
-            update_user_by_username(session, self.verified_user.user_name, password=new_pass)
+            from database import reset_password
+            reset_password(session, self.verified_user.national_number, self.verified_user.phone, new_pass)
             self.show_message(render_text("رمز عبور با موفقیت تغییر کرد!"), error=False)
         except Exception as e:
             self.show_message(render_text("خطا در تغییر رمز عبور:"), error=True)
@@ -448,6 +449,11 @@ class Admin_page(Page):
         backup_btn.set_text('بازیابی', fill='#FFFFFF', font_size=self.button_font_size)
         backup_btn.grid(row=4, column=0, sticky='e')
         
+        diagnostics_btn = Item_button(self.buttons_frame, 290, 64, rtopleft=15, rbottomleft=15, color=self.button_color,hover_color=self.button_hover_color,background="#5B5D76")
+        diagnostics_btn.set_action(lambda _: self.toggle_panel('diagnostics'))
+        diagnostics_btn.set_text('عیب یابی', fill='#FFFFFF', font_size=self.button_font_size)
+        diagnostics_btn.grid(row=5, column=0, sticky='e')
+        
         # This variable keeps track of which panel is currently being displayed.
         self.current_panel = None
         
@@ -458,6 +464,7 @@ class Admin_page(Page):
         self.employee_frame = None
         self.backup_frame = None
         self.restore_frame = None
+        self.diagnostics_frame = None
 
         # Display the 'users' panel by default when the admin page is first loaded.
         self.toggle_panel('users')
@@ -473,8 +480,10 @@ class Admin_page(Page):
                 self.backup_frame.destroy()
             if self.restore_frame:
                 self.restore_frame.destroy()
+            if self.diagnostics_frame:
+                self.diagnostics_frame.destroy()
             # Create and display the new panel.
-            self.employee_frame = AdminEmployeePanel(self.control_frame)
+            self.employee_frame = panels.AdminEmployeePanel(self.control_frame)
             # Update the state of the current panel.
             self.current_panel = 'users'
 
@@ -484,7 +493,9 @@ class Admin_page(Page):
                 self.employee_frame.destroy()
             if self.restore_frame:
                 self.restore_frame.destroy()
-            self.backup_frame = AdminBackupPanel(self.control_frame)
+            if self.diagnostics_frame:
+                self.diagnostics_frame.destroy()
+            self.backup_frame = panels.AdminBackupPanel(self.control_frame)
             self.current_panel = 'backup'
 
         # --- Restore Panel ---
@@ -493,9 +504,22 @@ class Admin_page(Page):
                 self.employee_frame.destroy()
             if self.backup_frame:
                 self.backup_frame.destroy()
-            self.restore_frame = AdminRestorePanel(self.control_frame)
+            if self.diagnostics_frame:
+                self.diagnostics_frame.destroy()
+            self.restore_frame = panels.AdminRestorePanel(self.control_frame)
             self.current_panel = 'restore'
 
+        # --- Diagnostics Panel ---
+        elif panel == 'diagnostics' and self.current_panel != 'diagnostics':
+            if self.employee_frame:
+                self.employee_frame.destroy()
+            if self.backup_frame:
+                self.backup_frame.destroy()
+            if self.restore_frame:
+                self.restore_frame.destroy()
+            self.diagnostics_frame = panels.AdminDiagnosticsPanel(self.control_frame)
+            self.current_panel = 'diagnostics'
+
         
         
         
@@ -576,7 +600,7 @@ class Manager_page(Page):
                 self.employee_frame.destroy()
             if self.report_frame:
                 self.report_frame.destroy()
-            self.product_frame = ManagerProductPanel(self.control_frame)
+            self.product_frame = panels.ManagerProductPanel(self.control_frame)
             self.current_panel = 'products'
         elif panel == 'employee' and self.current_panel != 'employee':
             if self.dashboard_frame:
@@ -585,7 +609,7 @@ class Manager_page(Page):
                 self.report_frame.destroy()
             if self.product_frame:
                 self.product_frame.destroy()
-            self.employee_frame = ManagerEmployeePanel(self.control_frame)
+            self.employee_frame = panels.ManagerEmployeePanel(self.control_frame)
             self.current_panel = 'employee'
         elif panel == 'report' and self.current_panel != 'report':
             if self.dashboard_frame:
@@ -594,7 +618,7 @@ class Manager_page(Page):
                 self.product_frame.destroy()
             if self.employee_frame:
                 self.employee_frame.destroy()
-            self.report_frame = ManagerReportPanel(self.control_frame)
+            self.report_frame = panels.ManagerReportPanel(self.control_frame)
             self.current_panel = 'report'
         elif panel == 'dashboard' and self.current_panel != 'dashboard':
             if self.product_frame:
@@ -603,7 +627,7 @@ class Manager_page(Page):
                 self.employee_frame.destroy()
             if self.report_frame:
                 self.report_frame.destroy()
-            self.dashboard_frame = ManagerDashboardPanel(self.control_frame)
+            self.dashboard_frame = panels.ManagerDashboardPanel(self.control_frame)
             self.current_panel = 'dashboard'
         else:
             # This case handles an invalid panel name, which can be useful for debugging.
@@ -661,14 +685,14 @@ class Employee_page(Page):
             if self.employee_report_panel:
                 self.employee_report_panel.destroy()
             # Create the sales panel.
-            self.employee_sell_panel = EmployeeSellPanel(self.control_frame)
+            self.employee_sell_panel = panels.EmployeeSellPanel(self.control_frame)
             self.current_panel = 'sell'
         elif panel == 'report' and self.current_panel != 'report':
             # If the sales panel exists, destroy it.
             if self.employee_sell_panel:
                 self.employee_sell_panel.destroy()
             # Create the report panel.
-            self.employee_report_panel = EmployeeReportPanel(self.control_frame)
+            self.employee_report_panel = panels.EmployeeReportPanel(self.control_frame)
             self.current_panel = 'report'
 
     # Destroys the main frame of the page to clean up all its widgets.
@@ -1,5 +1,8 @@
 from customtkinter import *
 from math import cos, pi, sin
+from tkinter import TclError
+from array import array
+from functools import lru_cache
 from typing import Iterator
 from awesometkinter.bidirender import add_bidi_support_for_entry, isarabic, derender_text, render_text, is_neutral
 
@@ -35,7 +38,6 @@ class Input(CTkEntry):
         self.configure(fg_color='#646691', placeholder_text_color='#9495B8', text_color='#c5c6de', border_color='#8688B0')
 
         self.char_limit = char_limit
-        self.textvariable = textvariable
         self.show_err_callback = show_err_callback # A callback function to display validation errors in the UI.
         self.err_message = err_message
         self.placeholder_text = placeholder_text
@@ -44,12 +46,12 @@ class Input(CTkEntry):
         self.just_number = just_number
         self.just_text = just_text
         
-        # Set up the validation and behavior by binding callbacks to the textvariable.
-        self._set_limit()
-        self._set_just_english()
-        self._set_justify()
-        self._set_just_number()
-        self._set_just_text()
+        # The validation rules of this input, run in this order in a single pass on every change.
+        self._rules = self._compile_rules()
+        # The id of the one 'write' trace registered on the current textvariable.
+        self.textvariable = None
+        self._trace_id = None
+        self._attach(textvariable)
         
         
     def disable(self):
@@ -59,123 +61,108 @@ class Input(CTkEntry):
         self.configure(state='normal')
     
     def set_textvariable(self, textvariable):
-        self.textvariable = textvariable
+        # Moves the validation trace to the new variable; setting the same variable again is a no-op.
+        self._attach(textvariable)
         self.configure(textvariable=textvariable)
         
         # Display the placeholder text initially if it exists.
         if self.placeholder_text:
             self.textvariable.set(self.placeholder_text)
-        self._set_limit()
-        self._set_just_english()
-        self._set_justify()
-        self._set_just_number()
-        self._set_just_text()
-        
-        
+    
+    # Builds the list of rules that apply to this input.
+    # Each rule takes the current text and returns the (possibly corrected) text
+    # and an error message, or None when the text is valid.
+    def _compile_rules(self) -> tuple:
+        rules = [self._limit_rule]
+        if self.just_english:
+            rules.append(self._english_rule)
+        else:
+            # Multilingual input adjusts its justification to the first character's language.
+            rules.append(self._justify_rule)
+        if self.just_number:
+            rules.append(self._number_rule)
+        if self.just_text:
+            rules.append(self._text_rule)
+        return tuple(rules)
+    
+    # Registers the validation trace on a textvariable, removing it from the previous one.
+    def _attach(self, textvariable):
+        if textvariable is self.textvariable and self._trace_id is not None:
+            return
+        self._detach()
+        self.textvariable = textvariable
+        if textvariable is not None:
+            self._trace_id = textvariable.trace_add('write', self._validate)
+    
+    def _detach(self):
+        if self._trace_id is not None:
+            try:
+                self.textvariable.trace_remove('write', self._trace_id)
+            except TclError:
+                # The variable's interpreter is already gone.
+                pass
+            self._trace_id = None
+    
     # This callback is triggered by trace_add whenever the entry's text is changed.
-    def _entry_update_callback(self, *k):
-        val = self.textvariable.get()
-        # Enforces the character limit by trimming the string if it's too long.
-        if len(val) > self.char_limit:
-            self.textvariable.set(val[0:-1])
-        
-            # If an error callback is provided, call it to notify the user.
-            if self.show_err_callback:
-                if self.err_message:
-                    self.show_err_callback(self.err_message)
-                else:
-                    message = render_text("بیش از حد بودن کاراکتر های وارد شده")
-                    self.show_err_callback(message)
+    def _validate(self, *k):
+        original = val = self.textvariable.get()
+        message = None
+        for rule in self._rules:
+            val, error = rule(val)
+            if error and message is None:
+                message = error
+        # Write the corrected text back once, after every rule has run.
+        if val != original:
+            self.textvariable.set(val)
+        # If an error callback is provided, call it to notify the user.
+        if message and self.show_err_callback:
+            self.show_err_callback(message)
     
-    # Binds the character limit validation to the textvariable's 'write' event.
-    def _set_limit(self):
-        self.textvariable.trace_add('write', self._entry_update_callback)
+    # Enforces the character limit by trimming the string if it's too long.
+    def _limit_rule(self, val):
+        if len(val) > self.char_limit:
+            return val[0:-1], self.err_message or render_text("بیش از حد بودن کاراکتر های وارد شده")
+        return val, None
     
-    # Callback to automatically adjust text justification based on the first character's language.
-
-    def _add_justify_for_arabic(self, *k):
-        val = self.textvariable.get()
+    # Adjusts text justification based on the first character's language.
+    def _justify_rule(self, val):
         if len(val) == 1:
             if isarabic(val):
                 self.configure(justify=RIGHT)
             else:
                 self.configure(justify=LEFT)
-                
-    # Binds the justification callback if multilingual input is allowed.
-    def _set_justify(self):
-        if not self.just_english:
-            self.textvariable.trace_add('write', self._add_justify_for_arabic)
-    def _set_just_number(self):
-        if self.just_number:
-            self.textvariable.trace_add('write', self.set_just_number)
-        
+        return val, None
     
-    def set_just_number(self, *k):
-        val = self.textvariable.get()
-        number = True
+    # Enforces that only numbers can be entered.
+    def _number_rule(self, val):
         if val:
             if not val[0].isdigit():
-                self.textvariable.set(val[1:])
-                number = False
-            
+                return val[1:], render_text("وارد کردن عدد")
             elif not val[-1].isdigit():
-                self.textvariable.set(val[:-1])
-                number = False
-                
-            if (not number) and self.show_err_callback:
-                message = render_text("وارد کردن عدد")
-                self.show_err_callback(message)
+                return val[:-1], render_text("وارد کردن عدد")
+        return val, None
         
-    # Callback to enforce that only English characters can be entered.
-    def _set_english_only(self, *k):
-        val = self.textvariable.get()
-        # Ignore the callback if the text is just the initial placeholder.
+    # Enforces that only English characters can be entered.
+    def _english_rule(self, val):
+        # Ignore the text if it is just the initial placeholder.
         if val == self.placeholder_text:
-            return
-
-        arabic = False
+            return val, None
         if val:
-            # Check if an Arabic character was just added at the beginning or end.
+            # Check if an Arabic character was just added at the beginning or end, and remove it.
             if isarabic(val[0]):
-                self.textvariable.set(val[1:]) # Remove the invalid character.
-                arabic = True
-            
+                return val[1:], render_text("وارد کردن کاراکتر انگلیسی")
             elif isarabic(val[-1]):
-                self.textvariable.set(val[:-1]) # Remove the invalid character.
-                arabic = True
-                
-            # If an invalid character was removed, show an error message.
-            if arabic and self.show_err_callback:
-                message = render_text("وارد کردن کاراکتر انگلیسی")
-                self.show_err_callback(message)
-    
-    # Binds the English-only validation callback if the 'just_english' flag is set.
-    def _set_just_english(self):
-        if self.just_english:
-            self.textvariable.trace_add('write', self._set_english_only)
-    
-    def _set_just_text(self):
-        if self.just_text:
-            self.textvariable.trace_add('write', self.set_just_text)
+                return val[:-1], render_text("وارد کردن کاراکتر انگلیسی")
+        return val, None
     
-    def set_just_text(self, *k):
-        val = self.textvariable.get()
-        
-        text = True
+    # Enforces that no digits can be entered.
+    def _text_rule(self, val):
         if val:
-            # Check if the first or last character is Arabic
             if val[0].isdigit():
-                self.textvariable.set(val[1:])
-                text = False
-            
+                return val[1:], render_text("وارد کردن کاراکتر")
             elif val[-1].isdigit():
-                self.textvariable.set(val[:-1])
-                text = False
-            
-            if not text and self.show_err_callback:
-                    message = render_text("وارد کردن کاراکتر")
-                    self.show_err_callback(message)
-        
+                return val[:-1], render_text("وارد کردن کاراکتر")
+        return val, None
     
     def set_placeholder_text(self, text:str):
         if isarabic(text):
@@ -195,6 +182,11 @@ class Input(CTkEntry):
     
     def clear(self):
         self.textvariable.set('')
+    
+    # Removes the validation trace so the variable does not keep calling into a destroyed widget.
+    def destroy(self):
+        self._detach()
+        super().destroy()
         
  # A simple subclass of CTk to create a root window, with an option for fullscreen.
 class Root(CTk):
@@ -236,31 +228,50 @@ class Item_button(CTkCanvas):
     # A static method to generate the points for a 90-degree arc (a rounded corner).
     @staticmethod
     def get_cos_sin(radius: int) -> Iterator[tuple[float, float]]:
+        arc = Item_button.corner_arc(radius)
+        for i in range(0, len(arc), 2):
+            yield arc[i], arc[i + 1]
+
+    # Returns the offsets of a rounded corner as a flat array (x0, y0, x1, y1, ...).
+    # Buttons share a handful of radii, so each arc is computed only once.
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def corner_arc(radius: int) -> array:
         # The number of steps determines the smoothness of the curve.
         steps = max(radius, 10)
+        arc = array('d')
         for i in range(steps + 1):
             angle = pi * (i / steps) * 0.5 # Angle ranges from 0 to pi/2 (90 degrees).
-            yield (cos(angle) - 1) * radius, (sin(angle) - 1) * radius
+            arc.append((cos(angle) - 1) * radius)
+            arc.append((sin(angle) - 1) * radius)
+        return arc
 
-    # Creates the polygon shape for the button with the specified corner radii.
-    def create_rounded_box(self, x1: int, y1: int, x2: int, y2: int) -> int:
+    # Returns the flat coordinate list of the rounded polygon. Every page builds
+    # many buttons of the same size, so identical polygons are computed only once.
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def rounded_box_points(x1: int, y1: int, x2: int, y2: int, rtopleft: int, rtopright: int, rbottomleft: int, rbottomright: int) -> tuple:
         points = []
-        # Get the lists of points that define the curve for each corner.
-        TR_angle_point = tuple(Item_button.get_cos_sin(self.rtopright))
-        BR_angle_point = tuple(Item_button.get_cos_sin(self.rbottomtright))
-        BL_angle_point = tuple(Item_button.get_cos_sin(self.rbottomleft))
-        TL_angle_point = tuple(Item_button.get_cos_sin(self.rtopleft))
-        
         # Calculate the absolute coordinates for the polygon by combining the corner arcs.
-        for cos_r, sin_r in TR_angle_point:
-            points.append((x2 + sin_r, y1 - cos_r))         # Top right corner
-        for cos_r, sin_r in BR_angle_point:
-            points.append((x2 + cos_r, y2 + sin_r))         # Bottom right corner
-        for cos_r, sin_r in BL_angle_point:
-            points.append((x1 - sin_r, y2 + cos_r))         # Bottom left corner
-        for cos_r, sin_r in TL_angle_point:
-            points.append((x1 - cos_r, y1 - sin_r))         # Top left corner
-        
+        for cos_r, sin_r in Item_button.get_cos_sin(rtopright):
+            points += (x2 + sin_r, y1 - cos_r)         # Top right corner
+        for cos_r, sin_r in Item_button.get_cos_sin(rbottomright):
+            points += (x2 + cos_r, y2 + sin_r)         # Bottom right corner
+        for cos_r, sin_r in Item_button.get_cos_sin(rbottomleft):
+            points += (x1 - sin_r, y2 + cos_r)         # Bottom left corner
+        for cos_r, sin_r in Item_button.get_cos_sin(rtopleft):
+            points += (x1 - cos_r, y1 - sin_r)         # Top left corner
+        return tuple(points)
+
+    # Drops the cached arcs and polygons (used by the benchmark to measure the uncached cost).
+    @staticmethod
+    def clear_geometry_cache():
+        Item_button.corner_arc.cache_clear()
+        Item_button.rounded_box_points.cache_clear()
+
+    # Creates the polygon shape for the button with the specified corner radii.
+    def create_rounded_box(self, x1: int, y1: int, x2: int, y2: int) -> int:
+        points = Item_button.rounded_box_points(x1, y1, x2, y2, self.rtopleft, self.rtopright, self.rbottomleft, self.rbottomtright)
         # Create the polygon on the canvas using the calculated points.
         return self.create_polygon(points, fill=self.color, smooth=True, joinstyle='round')
 
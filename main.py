@@ -3,11 +3,22 @@ from interface.ui import Login_page, Admin_page, Manager_page, Page, Employee_pa
 from interface.widgets import Root
 from customtkinter import *
 # Import database utilities for authentication and user management
-from database import login_permission, session, is_admin,is_manager,is_employee, user_by_username_pass, admin_exists, create_new_user
+from database import login_permission, session, is_admin,is_manager,is_employee, user_by_username_pass, admin_exists, create_new_user, ensure_schema, take_stock_snapshot_if_due
+from database import start_maintenance_scheduler
+from database import REMOTE_SERVER
+from interface.profiler import enable_from_env
+from interface.styles import register_styles
+
+# Opt-in event loop profiling (set TIRESHOP_PROFILE=<file>); must be installed before any widget exists.
+profiler = enable_from_env()
 
 # Initialize the main application window
 root = Root()
 root.title("Tire Shop")
+# Define the ttk styles once; panels only refer to them by name.
+register_styles(root)
+if profiler:
+    profiler.start_heartbeat(root)
 
 def login_action(username, password, login_page:Login_page):
     """
@@ -43,12 +54,31 @@ def logout_action(active_page:Page):
     active_page.destroy()
     Login_page(root, login_action)
     
-# Create default admin account if no admin exists in the system
-if not admin_exists(session):
-    create_new_user(session, "admin", "admin", "1234", "1234", "admin", "admin", "admin")
+def show_migration_progress(step, done, total):
+    """Show a schema upgrade's progress in the window title; the upgrade runs before anyone logs in."""
+    root.title(f"Tire Shop - upgrading the database: {step} ({done}/{total})" if done < total else "Tire Shop")
+    root.update()
+
+def prepare_database():
+    """
+    Create the tables if the schema version changed, the default admin account
+    if no admin exists in the system, and the daily stock snapshot. Then start
+    the database maintenance, which runs on its own thread while the shop is quiet.
+    """
+    ensure_schema(session.bind, progress=show_migration_progress)
+    if not admin_exists(session):
+        create_new_user(session, "admin", "admin", "1234", "1234", "admin", "admin", "admin")
+    take_stock_snapshot_if_due(session)
+    start_maintenance_scheduler(session.bind)
 
 # Start the application with the login page
 Login_page(root, login_action)
 
+# Prepare the database once the login page has been drawn; idle callbacks run in order,
+# so the window's own redraws (queued while building the page) come first.
+# A thin client terminal (TIRESHOP_SERVER set) leaves this to the server.
+if not REMOTE_SERVER:
+    root.after_idle(prepare_database)
+
 # Start the main event loop
 root.mainloop()
\ No newline at end of file
@@ -0,0 +1,8 @@
+# Headless entry point: shares one inventory between several counter terminals.
+# Example: python server.py --host 192.168.1.10 --port 8765
+# Then start each terminal with TIRESHOP_SERVER=http://192.168.1.10:8765 and TIRESHOP_SERVICE_TOKEN
+# set to the token the server keeps in database/service.token (or was given the same way).
+from database.service import main
+
+if __name__ == '__main__':
+    main()
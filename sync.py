@@ -0,0 +1,9 @@
+# Ships the changes of a branch database to the head office database.
+# Example, through a shared folder:
+#   python sync.py export --source north --dir /mnt/share/outbox
+#   TIRESHOP_DATABASE_URL=sqlite:///hq.db python sync.py apply --dir /mnt/share/outbox
+# or through a pipe: python sync.py export --source north | ssh hq python sync.py apply
+from database.sync import main
+
+if __name__ == '__main__':
+    main()
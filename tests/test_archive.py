@@ -0,0 +1,101 @@
+import datetime
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from database.models import Order, SalesRollup
+from database.crud import create_product, create_order, get_or_create_customer, get_customer_by_id, get_order_line_rows
+from database.schema import ensure_schema
+from database.archive import archive_orders, archived_years, open_archive
+from benchmarks.archive_benchmark import run
+from benchmarks.generator import ShopSpec
+
+
+class TestArchive(unittest.TestCase):
+    def test_reports_are_unchanged_by_archiving(self):
+        with tempfile.TemporaryDirectory() as folder:
+            result = run(folder, ShopSpec.preset('small', years=2, orders_per_day=4), keep_days=200)
+            self.assertEqual(sorted(os.listdir(os.path.join(folder, 'archive'))), ['orders_2023.db', 'orders_2024.db'])
+        self.assertGreater(result['archived']['orders'], 0)
+        self.assertEqual(result['before']['report'], result['after']['report'])
+        self.assertLess(result['after']['size'], result['before']['size'])
+
+    def test_archived_orders_move_and_ids_are_not_reused(self):
+        with tempfile.TemporaryDirectory() as folder:
+            engine = create_engine(f"sqlite:///{os.path.join(folder, 'shop.db')}")
+            session = sessionmaker(bind=engine)()
+            ensure_schema(engine)
+            product = create_product(session, 'Michelin', 100.0, 10, 205, 55, 16)
+            customer = get_or_create_customer(session, 'Ali', 'street', '0912', '1234567890')
+            for _ in range(3):
+                create_order(session, customer, product, 1)
+            session.execute(Order.__table__.update().values(date=datetime.date(2020, 5, 1)))
+            session.commit()
+
+            cutoff = datetime.date(2021, 1, 1)
+            self.assertEqual(archive_orders(session, cutoff)['orders'], 2)
+            # Running the job again has nothing left to do.
+            self.assertEqual(archive_orders(session, cutoff)['orders'], 0)
+            self.assertEqual(archived_years(session), [2020])
+            self.assertEqual(archived_years(session, start_date=datetime.date(2021, 1, 1)), [])
+            with open_archive(session, 2020) as conn:
+                self.assertEqual(conn.execute(select(Order.id).order_by(Order.id)).scalars().all(), [1, 2])
+            self.assertEqual(session.execute(select(Order.id)).scalars().all(), [3])
+            rollup = session.execute(select(SalesRollup.day, SalesRollup.orders, SalesRollup.revenue)).all()
+            self.assertEqual(rollup, [(datetime.date(2020, 5, 1), 2, 200.0)])
+
+            order = create_order(session, customer, product, 1)
+            self.assertEqual(order.id, 4)
+            session.close()
+            engine.dispose()
+
+    def test_lists_include_archived_orders(self):
+        with tempfile.TemporaryDirectory() as folder:
+            engine = create_engine(f"sqlite:///{os.path.join(folder, 'shop.db')}")
+            session = sessionmaker(bind=engine)()
+            ensure_schema(engine)
+            product = create_product(session, 'Michelin', 100.0, 10, 205, 55, 16)
+            customer = get_or_create_customer(session, 'Ali', 'street', '0912', '1234567890')
+            for quantity in (1, 2, 3):
+                create_order(session, customer, product, quantity)
+            session.execute(Order.__table__.update().where(Order.id == 1).values(date=datetime.date(2019, 3, 1)))
+            session.execute(Order.__table__.update().where(Order.id == 2).values(date=datetime.date(2020, 5, 1)))
+            session.commit()
+            archive_orders(session, datetime.date(2021, 1, 1))
+            self.assertEqual(archived_years(session), [2019, 2020])
+
+            lines = get_order_line_rows(session)
+            self.assertEqual([(line.order_id, line.quantity, line.customer_name) for line in lines],
+                             [(1, 1, 'Ali'), (2, 2, 'Ali'), (3, 3, 'Ali')])
+            page = get_order_line_rows(session, limit=2, order_by='-date')
+            self.assertEqual([line.order_id for line in page.items], [3, 2])
+            page = get_order_line_rows(session, after_key=page.next_key, limit=2, order_by='-date')
+            self.assertEqual(([line.order_id for line in page.items], page.next_key), ([1], None))
+            # Only the archives of the filtered years are read.
+            lines = get_order_line_rows(session, filters={'date__gte': '2020-01-01', 'date__lt': '2020-12-31'})
+            self.assertEqual([line.order_id for line in lines], [2])
+
+            customer = get_customer_by_id(session, customer.id)
+            self.assertEqual([order.id for order in customer.orders], [1, 2, 3])
+            customer = get_customer_by_id(session, customer.id)
+            self.assertEqual([order.id for order in customer.orders], [1, 2, 3])
+            self.assertEqual(sum(line.price * line.quantity for order in customer.orders for line in order.products), 600.0)
+            self.assertEqual(len(get_customer_by_id(session, customer.id, archived=False).orders), 1)
+            # The archived copies are never written back to the main database.
+            create_order(session, customer, product, 1)
+            self.assertEqual(session.execute(select(Order.id).order_by(Order.id)).scalars().all(), [3, 4])
+            session.close()
+            engine.dispose()
+
+    def test_needs_a_database_file(self):
+        engine = create_engine('sqlite://')
+        session = sessionmaker(bind=engine)()
+        with self.assertRaises(ValueError):
+            archive_orders(session, datetime.date(2021, 1, 1))
+        self.assertEqual(archived_years(session), [])
+        session.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import sessionmaker
+from database.models import BranchStock, StockAvailability, StockMovement
+from database.crud import create_product, create_order, get_or_create_customer, bulk_update_products, get_all_orders_json, get_daily_sales, update_product_by_id
+from database.branches import create_branch, get_all_branches, get_branch_quantity, get_branch_stock, transfer_stock, get_size_availability, rebuild_availability
+from database.catalog_import import import_price_list
+from database.schema import ensure_schema
+from database import InsufficientStockException, BranchNotExistsException
+
+
+class TestBranches(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.folder.name, 'shop.db')}")
+        ensure_schema(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.north = create_branch(self.session, 'North')['id']
+        self.product = create_product(self.session, 'Michelin', 100.0, 10, 205, 55, 16)
+        self.customer = get_or_create_customer(self.session, 'Ali', 'street', '0912', '1234567890')
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+        self.folder.cleanup()
+
+    def branch_quantity(self, branch_id):
+        return {row['id']: row['quantity'] for row in get_branch_stock(self.session, branch_id)}.get(self.product.id, 0)
+
+    def assert_consistent(self):
+        # Branch stock adds up to the product total, and the index matches a rebuild from scratch.
+        self.session.expire_all()
+        total = self.session.execute(select(func.sum(BranchStock.quantity)).where(BranchStock.product_id == self.product.id)).scalar()
+        self.assertEqual(total, self.product.quantity)
+        ledger = self.session.execute(select(func.sum(StockMovement.change)).where(StockMovement.product_id == self.product.id)).scalar()
+        self.assertEqual(ledger, self.product.quantity)
+        maintained = set(self.session.execute(select(StockAvailability.size_id, StockAvailability.branch_id, StockAvailability.quantity)))
+        rebuild_availability(self.session)
+        rebuilt = set(self.session.execute(select(StockAvailability.size_id, StockAvailability.branch_id, StockAvailability.quantity)))
+        self.assertEqual(maintained, rebuilt)
+
+    def test_default_branch_exists(self):
+        self.assertEqual([branch['name'] for branch in get_all_branches(self.session)], ['Main', 'North'])
+        with self.assertRaises(ValueError):
+            create_branch(self.session, 'North')
+
+    def test_sales_are_limited_to_the_branch_stock(self):
+        transfer_stock(self.session, self.product.id, 1, self.north, 4)
+        with self.assertRaises(InsufficientStockException):
+            create_order(self.session, self.customer, self.product, 5, branch_id=self.north)
+        create_order(self.session, self.customer, self.product, 3, branch_id=self.north)
+
+        self.assertEqual((self.branch_quantity(1), self.branch_quantity(self.north)), (6, 1))
+        self.assertEqual([order['branch_id'] for order in get_all_orders_json(self.session, branch_id=self.north)], [self.north])
+        self.assertEqual(get_all_orders_json(self.session, branch_id=1), [])
+        self.assertEqual(get_daily_sales(self.session, branch_id=self.north), 300.0)
+        self.assertEqual(get_daily_sales(self.session, branch_id=1), 0)
+        self.assert_consistent()
+
+    def test_transfer_is_all_or_nothing(self):
+        with self.assertRaises(InsufficientStockException):
+            transfer_stock(self.session, self.product.id, 1, self.north, 11)
+        with self.assertRaises(BranchNotExistsException):
+            transfer_stock(self.session, self.product.id, 1, 99, 1)
+        self.assertEqual((self.branch_quantity(1), self.branch_quantity(self.north)), (10, 0))
+        self.assert_consistent()
+
+    def test_quantity_edits_of_one_branch(self):
+        transfer_stock(self.session, self.product.id, 1, self.north, 8)
+        update_product_by_id(self.session, self.product.id, 'Michelin', 205, 55, 16, 5, 100.0, self.north)
+        self.assertEqual((self.branch_quantity(1), self.branch_quantity(self.north)), (2, 5))
+        self.assertEqual(get_branch_quantity(self.session, self.north, self.product.id), 5)
+        self.assertEqual(self.session.get(type(self.product), self.product.id).quantity, 7)
+        # The total is not edited while another branch holds stock, but the rest of the product is.
+        with self.assertRaises(ValueError):
+            update_product_by_id(self.session, self.product.id, 'Michelin', 205, 55, 16, 4, 100.0)
+        update_product_by_id(self.session, self.product.id, 'Michelin', 205, 55, 16, 7, 90.0)
+        with self.assertRaises(BranchNotExistsException):
+            update_product_by_id(self.session, self.product.id, 'Michelin', 205, 55, 16, 1, 90.0, 99)
+        self.assertEqual((self.branch_quantity(1), self.branch_quantity(self.north)), (2, 5))
+        self.assert_consistent()
+
+    def test_size_availability(self):
+        create_product(self.session, 'Pirelli', 120.0, 2, 205, 55, 16, branch_id=self.north)
+        transfer_stock(self.session, self.product.id, 1, self.north, 7)
+
+        availability = get_size_availability(self.session, 205, 55, 16)
+        self.assertEqual([(row['branch'], row['quantity']) for row in availability], [('North', 9), ('Main', 3)])
+        self.assertEqual([row['branch'] for row in get_size_availability(self.session, 205, 55, 16, min_quantity=5)], ['North'])
+        self.assertEqual(get_size_availability(self.session, 225, 45, 17), [])
+
+    def test_bulk_writers_keep_branches_consistent(self):
+        bulk_update_products(self.session, brand_name='Michelin', quantity_amount=-4)
+        self.assertEqual(self.branch_quantity(1), 6)
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as price_list:
+            price_list.write('brand,width,ratio,rim,price,quantity\nMichelin,205,55,16,110,9\n')
+        try:
+            import_price_list(self.session, price_list.name)
+        finally:
+            os.unlink(price_list.name)
+        self.assertEqual(self.branch_quantity(1), 9)
+        self.assert_consistent()
+
+    def test_import_does_not_replace_the_stock_of_other_branches(self):
+        transfer_stock(self.session, self.product.id, 1, self.north, 8)
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as price_list:
+            price_list.write('brand,width,ratio,rim,price,quantity\nMichelin,205,55,16,110,5\n')
+        try:
+            report = import_price_list(self.session, price_list.name)
+            self.assertEqual((report.updated, len(report.skipped)), (1, 1))
+            # Added quantities are booked on the main branch.
+            report = import_price_list(self.session, price_list.name, add_quantity=True)
+        finally:
+            os.unlink(price_list.name)
+        self.session.expire_all()
+        self.assertEqual(self.session.get(type(self.product), self.product.id).price, 110.0)
+        self.assertEqual((self.branch_quantity(1), self.branch_quantity(self.north)), (7, 8))
+        self.assert_consistent()
+
+
+class TestBranchUpgrade(unittest.TestCase):
+    def test_existing_stock_moves_to_the_main_branch(self):
+        folder = tempfile.TemporaryDirectory()
+        engine = create_engine(f"sqlite:///{os.path.join(folder.name, 'shop.db')}")
+        try:
+            # A database from schema version 3: no branches, orders and movements without a branch.
+            with engine.begin() as conn:
+                conn.execute(text('CREATE TABLE size (id INTEGER PRIMARY KEY, width INTEGER, ratio INTEGER, rim INTEGER)'))
+                conn.execute(text('CREATE TABLE product (id INTEGER PRIMARY KEY, brand_id INTEGER, size_id INTEGER, '
+                                  'price FLOAT NOT NULL, quantity INTEGER NOT NULL, version INTEGER NOT NULL DEFAULT 1)'))
+                conn.execute(text('CREATE TABLE "order" (id INTEGER PRIMARY KEY, customer_id INTEGER, date DATE)'))
+                conn.execute(text("INSERT INTO size VALUES (1, 205, 55, 16)"))
+                conn.execute(text("INSERT INTO product VALUES (1, 1, 1, 100, 4, 1)"))
+                conn.execute(text("INSERT INTO \"order\" VALUES (1, 1, '2024-01-01')"))
+                conn.execute(text('PRAGMA user_version = 3'))
+            self.assertTrue(ensure_schema(engine))
+            with engine.connect() as conn:
+                self.assertEqual(conn.execute(text('SELECT branch_id FROM "order"')).scalar(), 1)
+                self.assertEqual(conn.execute(text('SELECT branch_id, quantity FROM branch_stock')).all(), [(1, 4)])
+                self.assertEqual(conn.execute(text('SELECT size_id, branch_id, quantity FROM stock_availability')).all(), [(1, 1, 4)])
+        finally:
+            engine.dispose()
+            folder.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from database.models import Product
+from database.schema import ensure_schema
+from database.cache import ReadCache, read_cache, cached
+from database.crud import create_product, get_product_rows, get_all_products_json, get_product_by_id_json, update_product_by_id, bulk_update_products
+from database.crud import create_new_user, get_all_employee_and_manager_json, get_or_create_customer, get_all_customers_json, create_order
+
+
+class TestReadCache(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.folder.name, 'shop.db')}")
+        ensure_schema(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.product = create_product(self.session, 'Michelin', 100.0, 10, 205, 55, 16)
+        read_cache.reset_stats()
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+        self.folder.cleanup()
+
+    def counters(self, namespace):
+        return next(entry for entry in read_cache.stats() if entry['namespace'] == namespace)
+
+    def test_repeated_reads_are_served_from_the_cache(self):
+        first = get_product_rows(self.session)
+        self.assertIs(get_product_rows(self.session), first)
+        get_product_by_id_json(self.session, self.product.id)
+        get_product_by_id_json(self.session, self.product.id)
+        counters = self.counters('products')
+        self.assertEqual((counters['hits'], counters['misses']), (2, 2))
+        self.assertGreater(counters['bytes'], 0)
+
+    def test_writes_invalidate_their_namespace(self):
+        get_all_products_json(self.session)
+        update_product_by_id(self.session, self.product.id, 'Michelin', 205, 55, 16, 10, 120.0)
+        self.assertEqual(get_all_products_json(self.session)[0]['price'], 120.0)
+
+        bulk_update_products(self.session, price_amount=5)
+        self.assertEqual(get_product_by_id_json(self.session, self.product.id)['price'], 125.0)
+
+        customer = get_or_create_customer(self.session, 'Ali', 'street', '0912', '1234567890')
+        self.assertEqual(len(get_all_customers_json(self.session)), 1)
+        create_order(self.session, customer, self.product, 4)
+        self.assertEqual(get_product_by_id_json(self.session, self.product.id)['quantity'], 6)
+        # The sale did not write to the customers, so their entry survived it.
+        get_all_customers_json(self.session)
+        self.assertEqual(self.counters('customers')['hits'], 1)
+
+        self.assertEqual(get_all_employee_and_manager_json(self.session), [])
+        create_new_user(self.session, 'Sara', 'Ahmadi', '0912', '0011223344', 'employee', 'sara', 'secret')
+        self.assertEqual([user['username'] for user in get_all_employee_and_manager_json(self.session)], ['sara'])
+
+    def test_core_and_raw_writes_invalidate(self):
+        get_all_products_json(self.session)
+        self.session.commit()
+        with self.engine.begin() as conn:
+            conn.execute(Product.__table__.update().values(price=90.0))
+        self.assertEqual(get_all_products_json(self.session)[0]['price'], 90.0)
+        self.session.commit()
+        with self.engine.begin() as conn:
+            conn.execute(text('UPDATE product SET price = 80'))
+        self.assertEqual(get_all_products_json(self.session)[0]['price'], 80.0)
+
+    def test_a_read_during_the_commit_is_not_kept(self):
+        reader = sessionmaker(bind=self.engine)()
+        seen = []
+
+        # The commit event comes before the database commits; another terminal reading
+        # at that moment still gets the old price.
+        def read_while_committing(conn):
+            if not seen:
+                seen.append(get_all_products_json(reader)[0]['price'])
+                reader.commit()
+
+        event.listen(self.engine, 'commit', read_while_committing)
+        try:
+            update_product_by_id(self.session, self.product.id, 'Michelin', 205, 55, 16, 10, 120.0)
+        finally:
+            event.remove(self.engine, 'commit', read_while_committing)
+        self.assertEqual(seen, [100.0])
+        self.assertEqual(get_all_products_json(reader)[0]['price'], 120.0)
+        reader.close()
+
+    def test_uncommitted_writes_bypass_the_cache(self):
+        get_all_products_json(self.session)
+        self.product.price = 1.0
+        self.assertEqual(get_all_products_json(self.session)[0]['price'], 1.0)
+        # Flushed, but not committed.
+        self.session.flush()
+        self.assertEqual(get_product_by_id_json(self.session, self.product.id)['price'], 1.0)
+        self.session.rollback()
+        self.assertEqual(get_all_products_json(self.session)[0]['price'], 100.0)
+
+    def test_lru_eviction_memory_cap_and_ttl(self):
+        cache = ReadCache(ttl=60, max_bytes=10000, max_entries=3)
+        for key in range(4):
+            cache.get(self.engine, 'products', key, lambda: [key])
+        # The oldest entry went first.
+        cache.get(self.engine, 'products', 0, lambda: 'reloaded')
+        self.assertEqual(cache.stats()[0]['evictions'], 2)
+        self.assertEqual(cache.get(self.engine, 'products', 0, lambda: None), 'reloaded')
+
+        self.assertEqual(cache.get(self.engine, 'products', 'big', lambda: 'x' * 20000), 'x' * 20000)
+        self.assertEqual(cache.get(self.engine, 'products', 'big', lambda: 'again'), 'again')
+
+        expired = ReadCache(ttl=1e-9)
+        expired.get(self.engine, 'users', 1, lambda: 'old')
+        self.assertEqual(expired.get(self.engine, 'users', 1, lambda: 'new'), 'new')
+
+    def test_a_read_overlapping_a_write_is_not_kept(self):
+        cache = ReadCache()
+
+        def load():
+            cache.invalidate(self.engine, ['customers'])
+            return 'stale'
+
+        self.assertEqual(cache.get(self.engine, 'customers', 1, load), 'stale')
+        self.assertEqual(cache.get(self.engine, 'customers', 1, lambda: 'fresh'), 'fresh')
+
+    def test_decorated_functions_keep_the_original(self):
+        calls = []
+
+        @cached('users')
+        def read(session, value):
+            calls.append(value)
+            return value
+
+        self.assertEqual(read(self.session, 1) + read(self.session, 1) + read.uncached(self.session, 1), 3)
+        self.assertEqual(calls, [1, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
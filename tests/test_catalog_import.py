@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from database.models import Base, Product, Brand, Size, StockMovement
+from database.crud import create_product, get_all_products_json, get_or_create_customer, create_order, delete_product_by_name_and_size
+from database import catalog_import
+from database.catalog_import import import_price_list, _set_quantity
+
+
+class TestCatalogImport(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        create_product(self.session, 'Michelin', 100.0, 4, 205, 55, 16)
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.session.close()
+        self.tmp.cleanup()
+
+    def write(self, content):
+        file_path = os.path.join(self.tmp.name, 'prices.csv')
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return file_path
+
+    def test_import_creates_and_updates(self):
+        file_path = self.write("brand,size,price,qty\nMichelin,205/55R16,120,6\nPirelli,225/45R17,200,2\nPirelli,bad,1,1\n")
+        report = import_price_list(self.session, file_path, chunk_size=1)
+        self.assertEqual((report.created, report.updated, len(report.skipped)), (1, 1, 1))
+        products = {p['brand']: p for p in get_all_products_json(self.session)}
+        self.assertEqual(products['Michelin']['price'], 120)
+        self.assertEqual(products['Michelin']['quantity'], 6)
+        self.assertEqual(products['Pirelli']['size'], {'width': 225, 'ratio': 45, 'rim': 17})
+
+    def test_dry_run_writes_nothing(self):
+        file_path = self.write("Brand;Width;Ratio;Rim;Price\nMichelin;205;55;16;150\nKumho;195;65;15;90\n")
+        report = import_price_list(self.session, file_path, dry_run=True)
+        self.assertEqual((report.created, report.updated, report.new_brands), (1, 1, 1))
+        self.assertIn('~ Michelin 205/55/16 price 100.0 -> 150.0', report.diff)
+        self.assertEqual(self.session.query(Product).count(), 1)
+        self.assertEqual(self.session.query(Brand).count(), 1)
+
+    def test_add_quantity(self):
+        file_path = self.write("brand,size,price,quantity\nMichelin,205/55/16,100,3\n")
+        import_price_list(self.session, file_path, add_quantity=True)
+        self.assertEqual(get_all_products_json(self.session)[0]['quantity'], 7)
+        self.assertEqual(self.session.query(Size).count(), 1)
+
+    def ledger(self, product_id):
+        return self.session.execute(select(func.sum(StockMovement.change)).where(StockMovement.product_id == product_id)).scalar()
+
+    def test_sales_during_the_import_are_kept(self):
+        pirelli = create_product(self.session, 'Pirelli', 200.0, 10, 225, 45, 17).id
+        customer = get_or_create_customer(self.session, 'Ali', 'street', '0912', '1234567890')
+        other = sessionmaker(bind=self.engine)()
+        for add_quantity, expected in ((False, 12), (True, 22)):
+            file_path = self.write("brand,size,price,qty\nMichelin,205/55R16,120,6\nPirelli,225/45R17,210,12\n")
+            rows = catalog_import.iter_price_list(file_path)
+
+            def with_a_sale(path):
+                yield next(rows)
+                # Another terminal sells two Pirelli while the first chunk is written.
+                create_order(other, other.merge(customer), other.get(Product, pirelli), 2)
+                yield from rows
+
+            with mock.patch.object(catalog_import, 'iter_price_list', with_a_sale):
+                import_price_list(self.session, file_path, add_quantity=add_quantity, chunk_size=1)
+            self.session.expire_all()
+            self.assertEqual(self.session.get(Product, pirelli).quantity, expected)
+            self.assertEqual(self.ledger(pirelli), expected)
+        other.close()
+
+    def test_stale_quantity_is_read_again(self):
+        product = create_product(self.session, 'Pirelli', 200.0, 10, 225, 45, 17)
+        quantity, version = product.quantity, product.version
+        customer = get_or_create_customer(self.session, 'Ali', 'street', '0912', '1234567890')
+        create_order(self.session, customer, product, 3)
+        _set_quantity(self.session, product.id, 12, quantity, version)
+        self.session.commit()
+        self.assertEqual((self.session.get(Product, product.id).quantity, self.ledger(product.id)), (12, 12))
+
+    def test_deleted_product_is_restored(self):
+        delete_product_by_name_and_size(self.session, 'Michelin', 205, 55, 16)
+        file_path = self.write("brand,size,price,qty\nMichelin,205/55R16,100,3\n")
+        report = import_price_list(self.session, file_path)
+        self.assertEqual((report.created, report.updated), (0, 1))
+        self.assertEqual(report.diff, ['~ Michelin 205/55/16 restored, quantity 0 -> 3'])
+        self.assertEqual([(p['price'], p['quantity']) for p in get_all_products_json(self.session)], [(100.0, 3)])
+        self.assertEqual(self.session.query(Product).count(), 1)
+
+    def test_missing_columns(self):
+        file_path = self.write("name,cost\nMichelin,100\n")
+        with self.assertRaises(ValueError):
+            import_price_list(self.session, file_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
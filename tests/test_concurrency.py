@@ -0,0 +1,23 @@
+import os
+import tempfile
+import unittest
+
+from benchmarks.contention import run
+
+
+class TestConcurrentCheckout(unittest.TestCase):
+    def test_no_oversell_across_processes(self):
+        # 4 terminals try 10 sales each, but only 20 tires are in stock.
+        with tempfile.TemporaryDirectory() as folder:
+            report = run(os.path.join(folder, 'shop.db'), terminals=4, sales=10, stock=20)
+
+        self.assertGreaterEqual(report['final_stock'], 0)
+        self.assertEqual(report['sold'], report['initial_stock'] - report['final_stock'])
+        self.assertEqual(report['sold'] + report['refused'] + report['conflicts'], report['attempts'])
+        # Every sale has its order line and its ledger entry.
+        self.assertEqual(report['lines'], report['sold'])
+        self.assertEqual(report['ledger'], report['final_stock'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import csv
+import datetime
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database.models import Base, Customer, Order, ProductsOrder, User
+from database.crud import create_new_user
+from database.utilities import export_table_to_file, export_database_to_files, export_user_table_to_file
+from database.analytics import export_sales_history, read_columnar, sales_brands, PYARROW_AVAILABLE
+
+
+class TestExport(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(cls.engine)
+        cls.session = sessionmaker(bind=cls.engine)()
+
+        create_new_user(cls.session, 'test', 'user', '0912', '111', 'employee', 'testuser', 'testpass123')
+        customer = Customer(name='c', phone='1', address='a', national_number='22')
+        cls.session.add(customer)
+        for day in (1, 15, 28):
+            order = Order(customer=customer, date=datetime.date(2024, 2, day))
+            order.products.append(ProductsOrder(brand='B', price=10.0, width=205, ratio=55, rim=16, quantity=day))
+            cls.session.add(order)
+        cls.session.commit()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_csv_export(self):
+        count = export_table_to_file(self.session, self.tmp.name, 'order.csv', Order)
+        self.assertEqual(count, 3)
+        with open(os.path.join(self.tmp.name, 'order.csv'), encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ['id', 'customer_id', 'date', 'branch_id'])
+        self.assertEqual(len(rows), 4)
+
+    def test_wrapper_does_not_recurse(self):
+        count = export_user_table_to_file(self.session, self.tmp.name, 'user.csv')
+        self.assertEqual(count, 1)
+
+    def test_date_range_filters_order_lines(self):
+        count = export_table_to_file(self.session, self.tmp.name, 'lines.jsonl', ProductsOrder, 'jsonl',
+                                     start_date=datetime.date(2024, 2, 10), end_date=datetime.date(2024, 2, 20), batch_size=1)
+        self.assertEqual(count, 1)
+        with open(os.path.join(self.tmp.name, 'lines.jsonl'), encoding='utf-8') as f:
+            self.assertEqual(json.loads(f.readline())['quantity'], 15)
+
+    def test_whole_database_sqlite_export(self):
+        counts = export_database_to_files(self.session, self.tmp.name, 'sqlite')
+        self.assertEqual(counts['order'], 3)
+        self.assertEqual(counts['user'], 1)
+        connection = sqlite3.connect(os.path.join(self.tmp.name, 'export.db'))
+        self.assertEqual(connection.execute('SELECT COUNT(*) FROM products_order').fetchone()[0], 3)
+        connection.close()
+
+    def test_columnar_sales_history(self):
+        full_path = export_sales_history(self.session, self.tmp.name, file_format='columnar', batch_size=2,
+                                         start_date=datetime.date(2024, 2, 10))
+        columns = read_columnar(full_path)
+        self.assertEqual(columns['quantity'], [15, 28])
+        self.assertEqual(columns['brand'], ['B', 'B'])
+        self.assertEqual(sales_brands(self.session, start_date=datetime.date(2024, 2, 10)), ['B'])
+        self.assertEqual(columns['date'], [datetime.date(2024, 2, 15), datetime.date(2024, 2, 28)])
+
+    @unittest.skipUnless(PYARROW_AVAILABLE, 'pyarrow is not installed')
+    def test_arrow_file_with_several_batches(self):
+        import pyarrow.ipc
+        engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        customer = Customer(name='c', phone='1', address='a', national_number='22')
+        for day, brand in enumerate(('Michelin', 'Pirelli', 'Kumho', 'Michelin'), start=1):
+            order = Order(customer=customer, date=datetime.date(2024, 3, day))
+            order.products.append(ProductsOrder(brand=brand, price=10.0, width=205, ratio=55, rim=16, quantity=day))
+            session.add(order)
+        session.commit()
+        self.assertEqual(sales_brands(session), ['Kumho', 'Michelin', 'Pirelli'])
+        # One line per batch, each with a different brand.
+        full_path = export_sales_history(session, self.tmp.name, file_format='arrow', batch_size=1)
+        with pyarrow.ipc.open_file(full_path) as reader:
+            table = reader.read_all()
+        self.assertEqual(table.column('brand').to_pylist(), ['Michelin', 'Pirelli', 'Kumho', 'Michelin'])
+        session.close()
+        engine.dispose()
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            export_table_to_file(self.session, self.tmp.name, 'x', User, 'xml')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.session.close()
+        Base.metadata.drop_all(cls.engine)
+
+
+if __name__ == '__main__':
+    unittest.main()
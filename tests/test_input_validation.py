@@ -0,0 +1,59 @@
+import unittest
+from tkinter import StringVar, TclError
+
+try:
+    from customtkinter import CTk
+    from interface.widgets import Input, create_input_fields
+except ImportError:
+    CTk = None
+
+
+def make_root():
+    if CTk is None:
+        raise unittest.SkipTest("customtkinter is not installed")
+    try:
+        root = CTk()
+    except TclError:
+        raise unittest.SkipTest("no display available")
+    root.withdraw()
+    return root
+
+
+class TestInputValidation(unittest.TestCase):
+    def setUp(self):
+        self.root = make_root()
+        self.errors = []
+
+    def tearDown(self):
+        self.root.destroy()
+
+    def test_one_trace_across_view_toggles(self):
+        var = StringVar(self.root)
+        field = create_input_fields(self.root, 'price', 0, 0, 'price', None, just_english=True, just_number=True,
+                                    show_err_callback=self.errors.append)
+        # Opening a view again used to call set_textvariable on the same widget each time.
+        for _ in range(5):
+            field.set_textvariable(var)
+        self.assertEqual(len(var.trace_info()), 1)
+
+        var.set('12a')
+        self.assertEqual(var.get(), '12')
+        self.assertEqual(len(self.errors), 1)
+
+    def test_trace_moves_to_new_variable_and_is_removed_on_destroy(self):
+        first = StringVar(self.root)
+        second = StringVar(self.root)
+        field = Input(self.root, 15, 150, 35, None, first, char_limit=3)
+        field.set_textvariable(second)
+        self.assertEqual(len(first.trace_info()), 0)
+        self.assertEqual(len(second.trace_info()), 1)
+
+        second.set('abcd')
+        self.assertEqual(second.get(), 'abc')
+
+        field.destroy()
+        self.assertEqual(len(second.trace_info()), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
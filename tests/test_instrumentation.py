@@ -0,0 +1,49 @@
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database.connection import Base
+from database.crud import create_product, get_all_products_json
+from database.instrumentation import QueryStats, stats, instrument_engine, uninstrument_engine
+
+
+class TestQueryInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(self.engine)
+        instrument_engine(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        stats.reset()
+
+    def tearDown(self):
+        self.session.close()
+        uninstrument_engine(self.engine)
+        self.engine.dispose()
+        stats.reset()
+
+    def test_statements_are_attributed_to_crud_functions(self):
+        create_product(self.session, 'Michelin', 100.0, 4, 205, 55, 16)
+        get_all_products_json(self.session)
+
+        functions = {name: count for name, count, _, _, _ in stats.top('function', limit=50)}
+        self.assertIn('database.crud.create_product', functions)
+        self.assertIn('database.crud.get_all_products_json', functions)
+        self.assertEqual(stats.total_count, sum(functions.values()))
+        # No UI is involved in a test run.
+        self.assertEqual([name for name, *_ in stats.top('action')], ['(no UI action)'])
+
+    def test_instrumenting_twice_does_not_double_count(self):
+        instrument_engine(self.engine)
+        get_all_products_json(self.session)
+        self.assertEqual(stats.by_function['database.crud.get_all_products_json'][0], 1)
+
+    def test_slow_queries_are_kept(self):
+        local = QueryStats(slow_threshold=0.5)
+        local.record('SELECT 1', 0.01, 'f', 'a')
+        local.record('SELECT 2', 0.75, 'f', 'a')
+        self.assertEqual([entry[4] for entry in local.slow_queries], ['SELECT 2'])
+        self.assertEqual(local.top('function')[0][:2], ('f', 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import datetime
+import os
+import tempfile
+import threading
+import time
+import unittest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from database.models import Customer
+from database.schema import ensure_schema
+from database.instrumentation import stats
+from database.maintenance import run_task, due_tasks, get_maintenance_runs, MaintenanceScheduler, TASKS
+
+
+class TestMaintenance(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.folder.name, 'shop.db')}")
+        ensure_schema(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+        self.folder.cleanup()
+
+    def fill_and_delete(self):
+        with self.engine.begin() as conn:
+            conn.execute(Customer.__table__.insert(), [
+                {'name': f'c{i}', 'phone': '0', 'address': 'x' * 90, 'national_number': f'{i:010d}'} for i in range(5000)])
+            conn.execute(Customer.__table__.delete())
+
+    def pragma(self, name):
+        with self.engine.connect() as conn:
+            return conn.exec_driver_sql(f'PRAGMA {name}').scalar()
+
+    def test_vacuum_switches_to_incremental_and_frees_pages(self):
+        self.fill_and_delete()
+        self.assertGreater(self.pragma('freelist_count'), 0)
+        run = run_task(self.engine, 'vacuum')
+        self.assertEqual(run['status'], 'ok')
+        self.assertIn('switched', run['detail'])
+        self.assertEqual((self.pragma('auto_vacuum'), self.pragma('freelist_count')), (2, 0))
+
+        self.fill_and_delete()
+        run = run_task(self.engine, 'vacuum')
+        self.assertTrue(run['detail'].startswith('freed'), run['detail'])
+        self.assertEqual(self.pragma('freelist_count'), 0)
+
+    def test_optimize_and_quick_check(self):
+        self.assertEqual(run_task(self.engine, 'optimize')['detail'], 'analyzed all tables')
+        self.assertEqual(run_task(self.engine, 'optimize')['detail'], 'optimized')
+        self.assertEqual(run_task(self.engine, 'quick_check')['status'], 'ok')
+
+    def test_runs_are_logged_and_due_again_after_their_interval(self):
+        self.assertEqual(due_tasks(self.engine), list(TASKS))
+        for name in TASKS:
+            run_task(self.engine, name)
+        self.assertEqual(due_tasks(self.engine), [])
+        self.assertEqual(due_tasks(self.engine, datetime.datetime.now() + datetime.timedelta(days=2)), list(TASKS))
+        runs = get_maintenance_runs(self.session)
+        self.assertEqual([run['task'] for run in runs], list(reversed(TASKS)))
+        self.assertTrue(all(run['duration'] >= 0 for run in runs))
+
+    def test_failures_are_recorded(self):
+        # A write transaction on another connection keeps VACUUM from running.
+        blocker = create_engine(self.engine.url, connect_args={'timeout': 0})
+        self.engine.dispose()
+        self.engine = create_engine(self.engine.url, connect_args={'timeout': 0})
+        with blocker.connect() as conn:
+            conn.exec_driver_sql('BEGIN IMMEDIATE')
+            conn.exec_driver_sql("INSERT INTO brand (name) VALUES ('Kumho')")
+            run = run_task(self.engine, 'vacuum')
+            self.assertEqual(run['status'], 'failed')
+            conn.exec_driver_sql('ROLLBACK')
+        blocker.dispose()
+
+    def test_scheduler_runs_on_its_own_thread(self):
+        threads = []
+        original = TASKS['quick_check']
+
+        def recording_check(conn):
+            threads.append(threading.current_thread())
+            return original[0](conn)
+
+        TASKS['quick_check'] = (recording_check, original[1])
+        scheduler = MaintenanceScheduler(self.engine, idle_after=3600, poll_interval=0.05)
+        try:
+            scheduler.start()
+            # Not idle for an hour, so nothing runs until asked.
+            time.sleep(0.2)
+            self.assertEqual(get_maintenance_runs(self.session), [])
+            scheduler.run_now()
+            deadline = time.monotonic() + 10
+            while len(get_maintenance_runs(self.session)) < len(TASKS) and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            scheduler.stop(timeout=10)
+            TASKS['quick_check'] = original
+        self.assertEqual(len(get_maintenance_runs(self.session)), len(TASKS))
+        self.assertEqual([thread.name for thread in threads], ['database-maintenance'])
+
+    def test_background_statements_do_not_end_the_idle_window(self):
+        stats.record('SELECT 1', 0.0, 'test', 'test')
+        before = stats.last_statement_at
+        with stats.background():
+            stats.record('PRAGMA quick_check', 0.0, 'test', 'test')
+        self.assertEqual(stats.last_statement_at, before)
+
+
+if __name__ == '__main__':
+    unittest.main()
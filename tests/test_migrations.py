@@ -0,0 +1,143 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from sqlalchemy import create_engine, inspect, text, select, func, insert
+from sqlalchemy.orm import sessionmaker
+from database.models import Customer, ChangeLog, Product, Size
+from database.schema import ensure_schema, forget_schema_check, SCHEMA_VERSION
+from database.migrations import plan_migrations
+from database.crud import create_product, get_sizes_count
+from database.resolver import resolver
+from database.branches import create_branch
+from database.stock import record_stock_movement, take_stock_snapshot
+
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.folder.name, 'shop.db')}")
+        ensure_schema(self.engine)
+        with self.engine.begin() as conn:
+            conn.execute(Customer.__table__.insert(), [
+                {'name': f'c{i}', 'phone': '0', 'address': 'x', 'national_number': f'{i:010d}'} for i in range(1200)])
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.folder.cleanup()
+
+    def downgrade(self, version, statements=()):
+        with self.engine.begin() as conn:
+            for statement in statements:
+                conn.execute(text(statement))
+            conn.execute(text(f'PRAGMA user_version = {version}'))
+        forget_schema_check(self.engine)
+
+    def indexes(self, table):
+        return {index['name'] for index in inspect(self.engine).get_indexes(table)}
+
+    def test_dry_run_lists_steps_without_changing_anything(self):
+        self.downgrade(7, ['DROP INDEX ix_order_customer', 'DROP INDEX ix_products_order_order', 'DROP INDEX ix_user_type'])
+        plan = plan_migrations(self.engine)
+        self.assertEqual([(entry['version'], entry['step']) for entry in plan], [
+            (8, 'create missing tables'), (8, 'index ix_order_customer on order'),
+            (8, 'index ix_products_order_order on products_order'), (9, 'index ix_user_type on user'),
+            (10, 'merge duplicate sizes'), (10, 'index uq_size_dimensions on size'), (11, 'opening stock balances'),
+            (12, 'product.deleted column')])
+        self.assertTrue(all(entry['seconds'] > 0 for entry in plan))
+        self.assertNotIn('ix_order_customer', self.indexes('order'))
+        self.assertEqual(plan_migrations(create_engine('sqlite://'))[0]['step'], 'create missing tables')
+
+    def test_upgrade_builds_the_missing_indexes(self):
+        self.downgrade(7, ['DROP INDEX ix_order_customer', 'DROP INDEX ix_products_order_order', 'DROP INDEX ix_user_type'])
+        steps = []
+        self.assertTrue(ensure_schema(self.engine, progress=lambda step, done, total: steps.append(step)))
+        self.assertIn('ix_order_customer', self.indexes('order'))
+        self.assertIn('ix_products_order_order', self.indexes('products_order'))
+        self.assertIn('ix_user_type', self.indexes('user'))
+        self.assertEqual(steps[-3:], ['index uq_size_dimensions on size', 'opening stock balances', 'product.deleted column'])
+        self.assertEqual(plan_migrations(self.engine), [])
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(text('PRAGMA user_version')).scalar(), SCHEMA_VERSION)
+
+    def test_change_log_is_backfilled_in_chunks(self):
+        # A database from before change capture (version 5): no triggers and an empty log.
+        with self.engine.connect() as conn:
+            triggers = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'")).scalars().all()
+        self.downgrade(4, [f'DROP TRIGGER {name}' for name in triggers] + ['DELETE FROM change_log'])
+
+        reports = []
+        with mock.patch('database.migrations.BACKFILL_CHUNK', 500):
+            ensure_schema(self.engine, progress=lambda step, done, total: reports.append((step, done, total)))
+        customers = [(done, total) for step, done, total in reports if step == 'change log of the existing customer rows']
+        self.assertEqual(customers, [(500, 1200), (1000, 1200), (1200, 1200)])
+        with self.engine.connect() as conn:
+            logged = conn.execute(select(func.count()).select_from(ChangeLog).where(ChangeLog.table_name == 'customer')).scalar()
+            self.assertEqual(logged, 1200)
+            # The triggers are back.
+            conn.execute(Customer.__table__.delete().where(Customer.id == 1))
+            self.assertEqual(conn.execute(select(ChangeLog.operation).order_by(ChangeLog.id.desc())).first()[0], 'd')
+
+    def test_duplicate_sizes_are_merged(self):
+        # A database from before uq_size_dimensions, where every resolver miss added the size again.
+        self.downgrade(9, ['DROP INDEX uq_size_dimensions'])
+        session = sessionmaker(bind=self.engine)()
+        for price in (100.0, 110.0, 120.0):
+            create_product(session, f'Brand{price:.0f}', price, 4, 205, 55, 16)
+            resolver.clear()
+        create_product(session, 'Other', 90.0, 1, 185, 65, 15)
+        self.assertEqual(get_sizes_count(session), 4)
+        session.close()
+        self.assertTrue(ensure_schema(self.engine))
+
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(text('SELECT id FROM size WHERE width = 205')).scalars().all(), [1])
+            self.assertEqual(conn.execute(text('SELECT size_id FROM product ORDER BY id')).scalars().all(), [1, 1, 1, 4])
+            self.assertEqual(conn.execute(text('SELECT size_id, quantity FROM stock_availability ORDER BY size_id')).all(),
+                             [(1, 12), (4, 1)])
+        self.assertIn('uq_size_dimensions', self.indexes('size'))
+        # The resolver's INSERT ... ON CONFLICT no longer adds copies.
+        resolver.clear()
+        session = sessionmaker(bind=self.engine)()
+        create_product(session, 'Brand130', 130.0, 1, 205, 55, 16)
+        self.assertEqual(get_sizes_count(session), 2)
+        session.close()
+
+    def test_products_on_duplicate_sizes_are_merged(self):
+        self.downgrade(9, ['DROP INDEX uq_size_dimensions'])
+        session = sessionmaker(bind=self.engine)()
+        first = create_product(session, 'Michelin', 100.0, 4, 205, 55, 16)
+        north = create_branch(session, 'North')['id']
+        # The same brand on a copy of the size.
+        with self.engine.begin() as conn:
+            size_id = conn.execute(insert(Size).values(width=205, ratio=55, rim=16)).inserted_primary_key[0]
+            second = conn.execute(insert(Product).values(brand_id=first.brand_id, size_id=size_id, price=110.0, quantity=0)
+                                  ).inserted_primary_key[0]
+        record_stock_movement(session, second, 'restock', 3)
+        record_stock_movement(session, second, 'restock', 2, branch_id=north)
+        take_stock_snapshot(session)
+        first_id = first.id
+        session.close()
+        self.assertTrue(ensure_schema(self.engine))
+
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(text('SELECT id, size_id, price, quantity FROM product')).all(), [(first_id, 1, 100.0, 9)])
+            self.assertEqual(conn.execute(text('SELECT branch_id, product_id, quantity FROM branch_stock ORDER BY branch_id')).all(),
+                             [(1, first_id, 7), (north, first_id, 2)])
+            self.assertEqual(conn.execute(text('SELECT product_id, SUM(change) FROM stock_movement GROUP BY product_id')).all(),
+                             [(first_id, 9)])
+            self.assertEqual(conn.execute(text('SELECT product_id, quantity FROM stock_snapshot')).all(), [(first_id, 9)])
+            self.assertEqual(conn.execute(text('SELECT size_id, branch_id, quantity FROM stock_availability ORDER BY branch_id')).all(),
+                             [(1, 1, 7), (1, north, 2)])
+
+    def test_interrupted_upgrade_continues(self):
+        self.downgrade(7, ['DROP INDEX ix_order_customer', 'DROP INDEX ix_products_order_order'])
+        # Stopped after the first index: running again finishes the work.
+        with self.engine.begin() as conn:
+            conn.execute(text('CREATE INDEX ix_order_customer ON "order" (customer_id)'))
+        self.assertTrue(ensure_schema(self.engine))
+        self.assertIn('ix_products_order_order', self.indexes('products_order'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import datetime
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from database.schema import ensure_schema
+from database.models import Brand, Size, Product, Customer, Order
+from database.crud import get_product_rows, get_all_products, get_all_customers, get_all_orders, get_staff_rows
+from database.crud import get_order_line_rows, create_new_user, get_all_employee_and_manager
+from database.pagination import iter_pages
+from database.rows import Page
+from database.service import encode
+from database.remote import decode
+
+
+class TestPagination(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'shop.db')}")
+        ensure_schema(self.engine)
+        with self.engine.begin() as conn:
+            conn.execute(insert(Brand), [{'id': 1, 'name': 'Michelin'}, {'id': 2, 'name': 'Pirelli'}])
+            conn.execute(insert(Size), [{'id': i + 1, 'width': 205, 'ratio': 55, 'rim': 14 + i} for i in range(4)])
+            # Prices repeat, so ordering by price needs the id to break ties.
+            conn.execute(insert(Product), [{'brand_id': i % 2 + 1, 'size_id': i % 4 + 1, 'price': 100.0 * (i % 5), 'quantity': i}
+                                           for i in range(23)])
+            conn.execute(insert(Customer), [{'name': f'customer{i}', 'phone': '0912', 'address': 'street',
+                                             'national_number': f'{i:010d}'} for i in range(7)])
+            conn.execute(insert(Order), [{'date': datetime.date(2024, 1, 1) + datetime.timedelta(days=i), 'customer_id': 1,
+                                          'branch_id': 1} for i in range(10)])
+        self.session = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def _all_pages(self, function, limit, **options):
+        items, after_key, pages = [], None, 0
+        while True:
+            page = function(self.session, after_key=after_key, limit=limit, **options)
+            self.assertLessEqual(len(page.items), limit)
+            items += page.items
+            pages += 1
+            if page.next_key is None:
+                return items, pages
+            after_key = page.next_key
+
+    def test_pages_cover_the_list_once(self):
+        everything = get_product_rows(self.session)
+        self.assertEqual([row.id for row in everything], list(range(1, 24)))
+        items, pages = self._all_pages(get_product_rows, 5)
+        self.assertEqual((items, pages), (everything, 5))
+        first = get_product_rows(self.session, limit=5)
+        self.assertIsInstance(first, Page)
+        self.assertEqual(first.next_key, 5)
+
+    def test_order_by_with_ties_and_descending(self):
+        by_price = sorted(get_product_rows(self.session), key=lambda row: (-row.price, -row.id))
+        items, _ = self._all_pages(get_product_rows, 4, order_by='-price')
+        self.assertEqual(items, by_price)
+        self.assertEqual(get_product_rows(self.session, limit=4, order_by='-price').next_key, (400.0, 5))
+        products, _ = self._all_pages(get_all_products, 6, order_by='quantity')
+        self.assertEqual([product.quantity for product in products], list(range(23)))
+
+    def test_filters(self):
+        rows = get_product_rows(self.session, filters={'brand': 'Michelin', 'rim__in': [14, 16], 'price__gte': 200})
+        self.assertTrue(rows)
+        self.assertTrue(all(row.brand == 'Michelin' and row.rim in (14, 16) and row.price >= 200 for row in rows))
+        self.assertEqual(len(get_all_customers(self.session, filters={'name__startswith': 'customer'})), 7)
+        # Dates (and keys ordered by date) may be given as ISO strings, as JSON clients send them.
+        orders = get_all_orders(self.session, filters={'date__gte': '2024-01-08'})
+        self.assertEqual([order.id for order in orders], [8, 9, 10])
+        page = get_all_orders(self.session, 1, limit=3, order_by='-date', after_key=['2024-01-08', 8])
+        self.assertEqual([order.id for order in page.items], [7, 6, 5])
+        with self.assertRaises(ValueError):
+            get_product_rows(self.session, filters={'colour': 'red'})
+        with self.assertRaises(ValueError):
+            get_product_rows(self.session, filters={'price__near': 5})
+        with self.assertRaises(ValueError):
+            get_product_rows(self.session, order_by='price', after_key=3)
+        for limit in (0, -1):
+            with self.assertRaises(ValueError):
+                get_product_rows(self.session, limit=limit)
+
+    def test_staff_and_iter_pages(self):
+        create_new_user(self.session, 'Sara', 'Ahmadi', '0912', '0011223344', 'manager', 'sara', 'secret')
+        create_new_user(self.session, 'Reza', 'Karimi', '0913', '0011223355', 'employee', 'reza', 'secret')
+        self.assertEqual([user.user_name for user in get_all_employee_and_manager(self.session)], ['sara', 'reza'])
+        page = get_staff_rows(self.session, limit=1, filters={'type': 'employee'})
+        self.assertEqual(([row.username for row in page.items], page.next_key), (['reza'], None))
+        self.assertEqual(list(iter_pages(get_product_rows, self.session, page_size=7)), get_product_rows(self.session))
+        self.assertEqual(get_order_line_rows(self.session, limit=10), Page([], None))
+
+    def test_pages_survive_the_service(self):
+        page = get_product_rows(self.session, limit=3, order_by='price')
+        decoded = decode(encode(page))
+        self.assertEqual(decoded.items, page.items)
+        # The key comes back as a JSON list, which after_key accepts as well.
+        self.assertEqual(get_product_rows(self.session, limit=3, order_by='price', after_key=decoded.next_key),
+                         get_product_rows(self.session, limit=3, order_by='price', after_key=page.next_key))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import datetime
+import unittest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from database.models import Base, Brand, Size, Product, StockMovement
+from database.crud import create_product, get_all_products_json, bulk_update_products, count_products_for_bulk_update, update_product_by_id
+from database.crud import delete_product_by_name_and_size, get_product_by_id
+from database.stock import stock_at
+from database.resolver import resolver
+from database import ProductAlreadyExistsException, ProductNotExistsException
+
+
+class TestBulkUpdate(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        create_product(self.session, 'Michelin', 100.0, 5, 205, 55, 16)
+        create_product(self.session, 'Pirelli', 200.0, 1, 225, 45, 17)
+        create_product(self.session, 'Kumho', 80.0, 10, 185, 65, 15)
+
+    def tearDown(self):
+        self.session.close()
+
+    def products(self):
+        return {p['brand']: p for p in get_all_products_json(self.session)}
+
+    def test_preview_count(self):
+        self.assertEqual(count_products_for_bulk_update(self.session, rim_range=(16, None)), 2)
+        self.assertEqual(count_products_for_bulk_update(self.session, brand_name='Kumho', width_range=(180, 190)), 1)
+        self.assertEqual(count_products_for_bulk_update(self.session), 3)
+
+    def test_percentage_and_stock_change(self):
+        count = bulk_update_products(self.session, rim_range=(16, 17), price_percent=10, quantity_amount=-3)
+        self.assertEqual(count, 2)
+        products = self.products()
+        self.assertEqual(products['Michelin']['price'], 110.0)
+        self.assertEqual(products['Michelin']['quantity'], 2)
+        # Stock never goes negative.
+        self.assertEqual(products['Pirelli']['quantity'], 0)
+        self.assertEqual(products['Kumho']['price'], 80.0)
+
+    def test_absolute_change(self):
+        bulk_update_products(self.session, brand_name='Kumho', price_amount=-5)
+        self.assertEqual(self.products()['Kumho']['price'], 75.0)
+
+    def test_invalid_changes(self):
+        with self.assertRaises(ValueError):
+            bulk_update_products(self.session)
+        with self.assertRaises(ValueError):
+            bulk_update_products(self.session, price_percent=1, price_amount=1)
+
+
+class TestProductWrites(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_existing_brand_and_size_combination(self):
+        create_product(self.session, 'Michelin', 100.0, 4, 205, 55, 16)
+        create_product(self.session, 'Pirelli', 100.0, 4, 225, 45, 17)
+        # Both the brand and the size exist already, but not together.
+        create_product(self.session, 'Michelin', 120.0, 2, 225, 45, 17)
+        with self.assertRaises(ProductAlreadyExistsException):
+            create_product(self.session, 'Michelin', 120.0, 2, 225, 45, 17)
+        self.assertEqual(self.session.query(Brand).count(), 2)
+        self.assertEqual(self.session.query(Size).count(), 2)
+
+    def test_duplicate_keeps_other_pending_work(self):
+        create_product(self.session, 'Pirelli', 100.0, 4, 225, 45, 17)
+        self.session.add(Brand(name='Kumho'))
+        with self.assertRaises(ProductAlreadyExistsException):
+            create_product(self.session, 'Pirelli', 100.0, 4, 225, 45, 17)
+        self.session.commit()
+        self.assertEqual(self.session.query(Brand).filter(Brand.name == 'Kumho').count(), 1)
+
+    def test_deleted_products_keep_their_ledger(self):
+        product_id = create_product(self.session, 'Michelin', 100.0, 4, 205, 55, 16).id
+        before = datetime.datetime.now()
+        self.assertTrue(delete_product_by_name_and_size(self.session, 'Michelin', 205, 55, 16))
+        self.assertFalse(delete_product_by_name_and_size(self.session, 'Michelin', 205, 55, 16))
+        self.assertEqual(get_all_products_json(self.session), [])
+        with self.assertRaises(ProductNotExistsException):
+            get_product_by_id(self.session, product_id)
+        changes = self.session.execute(select(StockMovement.change).where(StockMovement.product_id == product_id)).scalars().all()
+        self.assertEqual(changes, [4, -4])
+        self.assertEqual(stock_at(self.session, before, product_id), 4)
+
+        # Created again, the product comes back with its history instead of a second row.
+        product = create_product(self.session, 'Michelin', 120.0, 2, 205, 55, 16)
+        self.assertEqual((product.id, product.quantity), (product_id, 2))
+        self.assertEqual(self.session.query(Product).count(), 1)
+        self.assertEqual(get_all_products_json(self.session)[0]['price'], 120.0)
+
+    def test_update_reuses_cached_ids(self):
+        product = create_product(self.session, 'Michelin', 100.0, 4, 205, 55, 16)
+        hits = resolver.hits
+        update_product_by_id(self.session, product.id, 'Michelin', 205, 55, 16, 1, 90.0)
+        self.assertEqual(resolver.hits, hits + 2)
+        update_product_by_id(self.session, product.id, 'Kumho', 195, 65, 15, 1, 90.0)
+        self.assertEqual(get_all_products_json(self.session)[0]['size'], {'width': 195, 'ratio': 65, 'rim': 15})
+
+    def test_rolled_back_rows_are_not_cached(self):
+        resolver.brand_id(self.session, 'Ghost')
+        self.session.rollback()
+        brand_id = resolver.brand_id(self.session, 'Ghost')
+        self.session.commit()
+        self.assertEqual(self.session.get(Brand, brand_id).name, 'Ghost')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import datetime
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database.schema import ensure_schema
+from database.crud import create_product, get_or_create_customer, create_order, create_new_user
+from database.crud import get_product_rows, get_product_row, get_customer_rows, get_staff_rows, get_order_line_rows
+from database.rows import ProductRow, OrderLineRow
+from database.service import encode
+from database.remote import decode
+from database.Exeptions import ProductNotExistsException
+from benchmarks.row_memory import run
+
+
+class TestRows(unittest.TestCase):
+    def test_rows_take_less_memory_and_adapters_match_to_dict(self):
+        with tempfile.TemporaryDirectory() as folder:
+            result = run(folder, rows=3000)
+        for name, entry in result.items():
+            self.assertTrue(entry['same'], name)
+            self.assertLess(entry['rows']['kept'], entry['orm']['kept'], name)
+            self.assertLess(entry['rows']['peak'], entry['orm']['peak'], name)
+
+    def test_row_queries(self):
+        with tempfile.TemporaryDirectory() as folder:
+            engine = create_engine(f"sqlite:///{os.path.join(folder, 'shop.db')}")
+            ensure_schema(engine)
+            session = sessionmaker(bind=engine)()
+            product = create_product(session, 'Michelin', 100.0, 10, 205, 55, 16)
+            customer = get_or_create_customer(session, 'Ali', 'street', '0912', '1234567890')
+            create_order(session, customer, product, 2)
+            create_new_user(session, 'Sara', 'Ahmadi', '0912', '0011223344', 'manager', 'sara', 'secret')
+            create_new_user(session, 'Reza', 'Karimi', '0913', '0011223355', 'employee', 'reza', 'secret')
+
+            self.assertEqual(get_product_rows(session), [ProductRow(1, 1, 1, 'Michelin', 205, 55, 16, 100.0, 8)])
+            self.assertEqual(get_product_row(session, 1).size_label, '205/55/16')
+            with self.assertRaises(ProductNotExistsException):
+                get_product_row(session, 2)
+            self.assertEqual([row.name for row in get_customer_rows(session)], ['Ali'])
+            self.assertEqual([row.username for row in get_staff_rows(session)], ['sara', 'reza'])
+            self.assertEqual([row.username for row in get_staff_rows(session, ('employee',))], ['reza'])
+            line, = get_order_line_rows(session)
+            self.assertEqual((line.customer_name, line.quantity, line.date), ('Ali', 2, datetime.date.today()))
+            self.assertEqual(get_order_line_rows(session, branch_id=2), [])
+            session.close()
+            engine.dispose()
+
+    def test_rows_survive_the_service(self):
+        line = OrderLineRow(1, 1, datetime.date(2024, 3, 1), 1, 1, 'Ali', 'Michelin', 205, 55, 16, 100.0, 2)
+        self.assertEqual(decode(encode([line])), [line])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine, inspect, text
+from database.schema import ensure_schema, forget_schema_check, SCHEMA_VERSION
+
+
+class TestEnsureSchema(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.url = f"sqlite:///{os.path.join(self.folder.name, 'shop.db')}"
+        self.engine = create_engine(self.url)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.folder.cleanup()
+
+    def test_creates_tables_and_stores_version(self):
+        self.assertTrue(ensure_schema(self.engine))
+        self.assertIn('product', inspect(self.engine).get_table_names())
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(text('PRAGMA user_version')).scalar(), SCHEMA_VERSION)
+
+    def test_current_schema_is_not_checked_again(self):
+        ensure_schema(self.engine)
+        # Cached for the engine in this process.
+        self.assertFalse(ensure_schema(self.engine))
+
+        # A new process (here: a new engine) only reads the stored version.
+        other = create_engine(self.url)
+        try:
+            self.assertFalse(ensure_schema(other))
+        finally:
+            other.dispose()
+
+    def test_outdated_database_is_upgraded(self):
+        ensure_schema(self.engine)
+        with self.engine.begin() as conn:
+            conn.execute(text('PRAGMA user_version = 0'))
+        forget_schema_check(self.engine)
+        self.assertTrue(ensure_schema(self.engine))
+
+    def test_product_version_column_is_added(self):
+        # A database from before schema version 3 has no product.version column.
+        with self.engine.begin() as conn:
+            conn.execute(text('CREATE TABLE product (id INTEGER PRIMARY KEY, brand_id INTEGER, size_id INTEGER, '
+                              'price FLOAT NOT NULL, quantity INTEGER NOT NULL)'))
+            conn.execute(text("INSERT INTO product VALUES (1, 1, 1, 100, 4)"))
+            conn.execute(text('PRAGMA user_version = 2'))
+        self.assertTrue(ensure_schema(self.engine))
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(text('SELECT version FROM product WHERE id = 1')).scalar(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
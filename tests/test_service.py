@@ -0,0 +1,169 @@
+import http.client
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from database import crud
+from database.models import Admin, Order, Product
+from database.remote import ServiceClient, remote_functions
+from database.service import ShopService, MAX_FAILED_LOGINS, TOKEN_HEADER
+from database.utilities import is_admin
+from database.Exeptions import InsufficientStockException, ProductNotExistsException, ServiceError, AccessDeniedException
+
+
+class TestShopService(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(self.folder.name, 'shop.db')}"
+        self.service = ShopService(('127.0.0.1', 0), url, workers=4)
+        self.thread = threading.Thread(target=self.service.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        self.client = ServiceClient(self.service.url, token=self.service.token)
+
+        with self.service.Session() as session:
+            crud.create_new_user(session, 'Ali', 'Rezaei', '0912', '1111', 'admin', 'ali', 'secret')
+            self.product_id = crud.create_product(session, 'Michelin', 100.0, 20, 205, 55, 16).id
+
+    def tearDown(self):
+        self.client.close()
+        self.service.shutdown()
+        self.service.server_close()
+        self.folder.cleanup()
+
+    def test_health(self):
+        health = self.client.health()
+        self.assertEqual(health['status'], 'ok')
+        self.assertIn('create_order', health['operations'])
+
+    def test_login_returns_user_without_password(self):
+        user = self.client.call('user_by_username_pass', 'ali', 'secret')
+        self.assertIsInstance(user, Admin)
+        self.assertTrue(is_admin(user))
+        self.assertEqual(user.name, 'Ali')
+        self.assertIsNone(user.hashed_passwd)
+        self.assertIsNone(self.client.call('user_by_username_pass', 'ali', 'wrong'))
+
+    def test_requests_need_the_token(self):
+        for token in ('', 'wrong'):
+            client = ServiceClient(self.service.url, token=token)
+            with self.assertRaises(AccessDeniedException):
+                client.call('get_all_products_json')
+            with self.assertRaises(AccessDeniedException):
+                client.batch([('get_brands_count',)])
+            client.close()
+
+    def test_staff_management_needs_a_login(self):
+        with self.assertRaises(AccessDeniedException):
+            self.client.call('create_new_user', 'Reza', 'Karimi', '0913', '3333', 'employee', 'reza', 'secret')
+        # A manager may manage employees, but not other managers or administrators.
+        self.client.call('user_by_username_pass', 'ali', 'secret')
+        self.client.call('create_new_user', 'Sara', 'Ahmadi', '0935', '4444', 'manager', 'sara', 'secret')
+        manager = ServiceClient(self.service.url, token=self.service.token)
+        manager.call('user_by_username_pass', 'sara', 'secret')
+        manager.call('create_new_user', 'Reza', 'Karimi', '0913', '3333', 'employee', 'reza', 'secret')
+        manager.call('update_user_by_username', 'reza', phone='0914')
+        for call in (('create_new_user', 'Omid', 'Rahimi', '0911', '5555', 'admin', 'omid', 'secret'),
+                     ('remove_user_by_username', 'ali')):
+            with self.assertRaises(AccessDeniedException):
+                manager.call(*call)
+        # Logging in as someone else drops the earlier login's rights.
+        manager.call('user_by_username_pass', 'reza', 'secret')
+        with self.assertRaises(AccessDeniedException):
+            manager.call('remove_user_by_username', 'reza')
+        manager.close()
+        self.client.call('remove_user_by_username', 'reza')
+
+    def test_failed_logins_are_throttled(self):
+        for _ in range(MAX_FAILED_LOGINS):
+            self.assertIsNone(self.client.call('user_by_username_pass', 'ali', 'wrong'))
+        with self.assertRaises(AccessDeniedException):
+            self.client.call('user_by_username_pass', 'ali', 'secret')
+        with self.assertRaises(AccessDeniedException):
+            self.client.call('reset_password', '1111', '0912', 'new-secret')
+
+    def test_reset_password(self):
+        self.assertFalse(self.client.call('reset_password', '1111', '0000', 'new-secret'))
+        self.assertTrue(self.client.call('reset_password', '1111', '0912', 'new-secret'))
+        self.assertIsNotNone(self.client.call('user_by_username_pass', 'ali', 'new-secret'))
+
+    def test_malformed_requests_are_answered_400(self):
+        for path, body in (('/call', []), ('/call', '"op"'), ('/batch', {'calls': [1, 'x']}), ('/batch', {'calls': {}}),
+                           ('/call', {'op': ['x']}), ('/call', {'op': 'get_brands_count', 'args': {'a': 1}})):
+            connection = http.client.HTTPConnection('127.0.0.1', self.service.server_address[1], timeout=5)
+            data = body if isinstance(body, str) else json.dumps(body)
+            connection.request('POST', path, body=data, headers={TOKEN_HEADER: self.service.token})
+            response = connection.getresponse()
+            self.assertEqual(response.status, 400, (path, body))
+            self.assertEqual(json.loads(response.read())['error']['type'], 'ServiceError')
+            connection.close()
+
+    def test_checkout(self):
+        customer = self.client.call('get_or_create_customer', 'Sara', 'Tehran', '0935', '2222')
+        product = self.client.call('get_product_by_id', self.product_id)
+        self.assertEqual(product.brand.name, 'Michelin')
+
+        order = self.client.call('create_order', customer, product, 3)
+        self.assertIsInstance(order, Order)
+        self.assertEqual([line.quantity for line in order.products], [3])
+        self.assertEqual(self.client.call('get_product_by_id_json', self.product_id)['quantity'], 17)
+
+        history = self.client.call('get_customer_by_id', customer.id)
+        self.assertEqual(sum(line.price * line.quantity for order in history.orders for line in order.products), 300.0)
+
+    def test_errors_are_raised_on_the_client(self):
+        customer = self.client.call('get_or_create_customer', 'Sara', 'Tehran', '0935', '2222')
+        product = self.client.call('get_product_by_id', self.product_id)
+        with self.assertRaises(InsufficientStockException) as raised:
+            self.client.call('create_order', customer, product, 50)
+        self.assertEqual(raised.exception.available, 20)
+        with self.assertRaises(ProductNotExistsException):
+            self.client.call('get_product_by_id', 999)
+        with self.assertRaises(ServiceError):
+            self.client.call('drop_everything')
+
+    def test_batch(self):
+        quantity, brands, missing = self.client.batch([
+            ('get_total_product_quantity',),
+            ('get_brands_count', ()),
+            ('get_product_by_id', (999,)),
+        ])
+        self.assertEqual((quantity, brands), (20, 1))
+        self.assertIsInstance(missing, ProductNotExistsException)
+
+    def test_remote_functions_keep_crud_signatures(self):
+        functions = remote_functions(self.client)
+        products = functions['get_all_products_json'](None)
+        self.assertEqual([p['id'] for p in products], [self.product_id])
+        self.assertIsInstance(functions['get_product_by_id'](None, self.product_id), Product)
+        with self.assertRaises(ServiceError):
+            functions['import_price_list'](None, 'prices.xlsx')
+
+    def test_terminals_share_one_inventory(self):
+        customer = self.client.call('get_or_create_customer', 'Sara', 'Tehran', '0935', '2222')
+        sold = []
+
+        def terminal():
+            client = ServiceClient(self.service.url, token=self.service.token)
+            for _ in range(8):
+                product = client.call('get_product_by_id', self.product_id)
+                try:
+                    client.call('create_order', customer, product, 1)
+                    sold.append(1)
+                except InsufficientStockException:
+                    pass
+            client.close()
+
+        threads = [threading.Thread(target=terminal) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(sold), 20)
+        self.assertEqual(self.client.call('get_product_by_id_json', self.product_id)['quantity'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database.schema import ensure_schema
+from database.cache import read_cache
+from database.crud import create_new_user, get_employee_rows, get_staff_rows, get_all_username, get_employees_count
+from database.crud import get_all_employee_usernames, get_all_employee_and_manager_usernames, get_all_employee_and_manager
+from benchmarks.staff_queries import run
+
+
+class TestStaffQueries(unittest.TestCase):
+    def test_set_based_queries_agree_with_the_per_type_ones(self):
+        with tempfile.TemporaryDirectory() as folder:
+            result = run(folder, users=3000, repeat=1)
+        self.assertTrue(result.pop('uses_index'))
+        for name, entry in result.items():
+            self.assertTrue(entry['same'], name)
+
+    def test_staff_lookups(self):
+        with tempfile.TemporaryDirectory() as folder:
+            engine = create_engine(f"sqlite:///{os.path.join(folder, 'shop.db')}")
+            ensure_schema(engine)
+            session = sessionmaker(bind=engine)()
+            create_new_user(session, 'Omid', 'Rahimi', '0911', '0011223300', 'admin', 'omid', 'secret')
+            create_new_user(session, 'Reza', 'Karimi', '0913', '0011223355', 'employee', 'reza', 'secret')
+            create_new_user(session, 'Sara', 'Ahmadi', '0912', '0011223344', 'manager', 'sara', 'secret')
+            create_new_user(session, 'Nima', 'Moradi', '0914', '0011223366', 'employee', 'nima', 'secret')
+
+            self.assertEqual(get_all_employee_usernames(session), ['reza', 'nima'])
+            self.assertEqual(get_all_username(session), ['reza', 'nima'])
+            self.assertEqual(get_all_employee_and_manager_usernames(session), ['reza', 'sara', 'nima'])
+            self.assertEqual([type(user).__name__ for user in get_all_employee_and_manager(session)], ['Employee', 'Manager', 'Employee'])
+            self.assertEqual(get_employees_count(session), 2)
+
+            # The employee panel reads the staff list's cache entry instead of a query of its own.
+            read_cache.reset_stats()
+            get_staff_rows(session)
+            self.assertEqual([row.username for row in get_employee_rows(session)], ['reza', 'nima'])
+            users = next(entry for entry in read_cache.stats() if entry['namespace'] == 'users')
+            self.assertEqual((users['hits'], users['misses']), (1, 1))
+            session.close()
+            engine.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()
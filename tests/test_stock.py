@@ -0,0 +1,82 @@
+import datetime
+import unittest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from database.models import Base, StockMovement, StockSnapshot, Product
+from database.crud import create_product, create_order, get_or_create_customer, update_product_by_id, bulk_update_products
+from database.stock import move_stock, record_stock_movement, get_stock_movements, take_stock_snapshot, stock_at
+from database.stock import write_opening_balances
+from database import InsufficientStockException, ProductNotExistsException
+
+
+class TestStockLedger(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.product = create_product(self.session, 'Michelin', 100.0, 10, 205, 55, 16)
+        self.customer = get_or_create_customer(self.session, 'Ali', 'street', '0912', '1234567890')
+
+    def tearDown(self):
+        self.session.close()
+
+    def ledger_total(self, product_id):
+        return self.session.execute(select(func.sum(StockMovement.change)).where(StockMovement.product_id == product_id)).scalar()
+
+    def test_every_change_is_recorded(self):
+        create_order(self.session, self.customer, self.product, 3)
+        record_stock_movement(self.session, self.product.id, 'return', 1, note='wrong size')
+        update_product_by_id(self.session, self.product.id, 'Michelin', 205, 55, 16, 20, 100.0)
+        bulk_update_products(self.session, brand_name='Michelin', quantity_amount=-5)
+
+        self.session.expire_all()
+        self.assertEqual(self.product.quantity, 15)
+        # The cached balance always equals the sum of the ledger.
+        self.assertEqual(self.ledger_total(self.product.id), 15)
+        kinds = [movement['kind'] for movement in get_stock_movements(self.session, self.product.id)]
+        self.assertEqual(kinds, ['adjustment', 'adjustment', 'return', 'sale', 'restock'])
+
+    def test_oversell_is_rejected_without_leaving_an_order(self):
+        with self.assertRaises(InsufficientStockException):
+            create_order(self.session, self.customer, self.product, 11)
+        self.assertEqual(self.product.quantity, 10)
+        self.assertEqual(self.customer.orders, [])
+        with self.assertRaises(ProductNotExistsException):
+            move_stock(self.session, 999, 'sale', -1)
+
+    def test_point_in_time_stock(self):
+        start = datetime.datetime.now()
+        record_stock_movement(self.session, self.product.id, 'sale', -4)
+        take_stock_snapshot(self.session)
+        middle = datetime.datetime.now()
+        record_stock_movement(self.session, self.product.id, 'restock', 7)
+        other = create_product(self.session, 'Pirelli', 90.0, 2, 225, 45, 17)
+
+        self.assertEqual(stock_at(self.session, start - datetime.timedelta(days=1), self.product.id), 0)
+        self.assertEqual(stock_at(self.session, middle, self.product.id), 6)
+        self.assertEqual(stock_at(self.session, datetime.datetime.now()), {self.product.id: 13, other.id: 2})
+
+    def test_snapshot_includes_the_newest_movement(self):
+        record_stock_movement(self.session, self.product.id, 'sale', -4)
+        take_stock_snapshot(self.session)
+        newest = self.session.execute(select(func.max(StockMovement.id))).scalar()
+        self.assertEqual(self.session.execute(select(StockSnapshot.last_movement_id, StockSnapshot.quantity)).one(), (newest, 6))
+
+    def test_opening_balances_of_products_from_before_the_ledger(self):
+        # A product stocked before the ledger existed: a quantity but no opening movement.
+        self.session.execute(Product.__table__.update().values(quantity=Product.quantity + 5))
+        self.session.commit()
+        self.session.execute(StockMovement.__table__.update().values(created_at=datetime.datetime(2024, 1, 1)))
+        self.session.commit()
+        record_stock_movement(self.session, self.product.id, 'sale', -3)
+
+        with self.engine.begin() as conn:
+            self.assertEqual(write_opening_balances(conn), 1)
+            self.assertEqual(write_opening_balances(conn), 0)
+        self.assertEqual(stock_at(self.session, datetime.datetime(2023, 12, 31), self.product.id), 0)
+        self.assertEqual(stock_at(self.session, datetime.datetime(2024, 1, 1), self.product.id), 15)
+        self.assertEqual(stock_at(self.session, datetime.datetime.now(), self.product.id), 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
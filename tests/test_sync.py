@@ -0,0 +1,146 @@
+import io
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import sessionmaker
+from database.models import ChangeLog, Brand
+from database.crud import create_product, create_order, get_or_create_customer, delete_product_by_name_and_size
+from database.schema import ensure_schema
+from database.sync import export_changes, apply_batch, apply_changes, get_hq_sales, hq_tables, DirectoryTransport, StreamTransport
+from database import SyncGapException
+from benchmarks.sync_throughput import run
+
+
+class _Collect:
+    # A transport that keeps the batches in memory.
+    def __init__(self):
+        self.batches = []
+
+    def send(self, data: bytes, name: str):
+        self.batches.append(data)
+
+
+class TestSync(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.engines = {}
+        self.sessions = {}
+        for name in ('north', 'south', 'hq'):
+            self.engines[name] = create_engine(f"sqlite:///{os.path.join(self.folder.name, name + '.db')}")
+            if name != 'hq':
+                ensure_schema(self.engines[name])
+            self.sessions[name] = sessionmaker(bind=self.engines[name])()
+
+    def tearDown(self):
+        for name in self.engines:
+            self.sessions[name].close()
+            self.engines[name].dispose()
+        self.folder.cleanup()
+
+    def sell(self, branch, price, quantity):
+        session = self.sessions[branch]
+        product = create_product(session, 'Michelin', price, 10, 205, 55, 16)
+        customer = get_or_create_customer(session, 'Ali', 'street', '0912', '1234567890')
+        create_order(session, customer, product, quantity)
+
+    def hq_deleted(self):
+        return self.sessions['hq'].execute(select(hq_tables['product'].c.deleted)).scalars().all()
+
+    def hq_ids(self, table):
+        return sorted(self.sessions['hq'].execute(select(hq_tables[table].c.source, hq_tables[table].c.id)).all())
+
+    def test_changes_are_captured_by_every_writer(self):
+        session = self.sessions['north']
+        session.execute(ChangeLog.__table__.delete())
+        session.commit()
+        self.sell('north', 100.0, 2)
+        delete_product_by_name_and_size(session, 'Michelin', 205, 55, 16)
+        session.execute(Brand.__table__.insert().values(name='Unused'))
+        session.execute(Brand.__table__.delete().where(Brand.name == 'Unused'))
+        session.commit()
+        logged = {(table, operation) for table, operation in session.execute(select(ChangeLog.table_name, ChangeLog.operation))}
+        self.assertTrue({('product', 'u'), ('brand', 'd'), ('customer', 'u'), ('order', 'u'), ('products_order', 'u')} <= logged)
+
+    def test_branches_are_aggregated_at_the_head_office(self):
+        self.sell('north', 100.0, 2)
+        self.sell('south', 50.0, 1)
+        outbox = DirectoryTransport(os.path.join(self.folder.name, 'outbox'))
+        export_changes(self.sessions['north'], outbox, 'north')
+        export_changes(self.sessions['south'], outbox, 'south')
+        self.assertEqual(apply_changes(self.sessions['hq'], outbox), 2)
+        self.assertEqual(os.listdir(outbox.path), [])
+
+        # The same ids from two branch databases do not collide.
+        self.assertEqual(self.hq_ids('order'), [('north', 1), ('south', 1)])
+        self.assertEqual(get_hq_sales(self.sessions['hq']), {'north': 200.0, 'south': 50.0})
+        # Everything shipped is gone from the branch's log.
+        self.assertEqual(self.sessions['north'].execute(select(ChangeLog.id)).all(), [])
+
+    def test_batches_apply_idempotently(self):
+        self.sell('north', 100.0, 2)
+        session = self.sessions['north']
+        session.execute(Brand.__table__.insert().values(name='Unused'))
+        session.commit()
+        first = _Collect()
+        export_changes(session, first, 'north')
+        # A deleted product stays, marked deleted; rows deleted for good go.
+        delete_product_by_name_and_size(session, 'Michelin', 205, 55, 16)
+        session.execute(Brand.__table__.delete().where(Brand.name == 'Unused'))
+        session.commit()
+        second = _Collect()
+        export_changes(session, second, 'north')
+
+        self.assertTrue(apply_batch(self.sessions['hq'], first.batches[0]))
+        self.assertEqual((self.hq_ids('brand'), self.hq_deleted()), ([('north', 1), ('north', 2)], [0]))
+        self.assertTrue(apply_batch(self.sessions['hq'], second.batches[0]))
+        self.assertEqual((self.hq_ids('brand'), self.hq_deleted()), ([('north', 1)], [1]))
+        # Replaying an old batch neither fails nor brings the deleted rows back.
+        self.assertFalse(apply_batch(self.sessions['hq'], first.batches[0]))
+        self.assertFalse(apply_batch(self.sessions['hq'], second.batches[0]))
+        self.assertEqual((self.hq_ids('brand'), self.hq_deleted()), ([('north', 1)], [1]))
+        self.assertEqual(get_hq_sales(self.sessions['hq']), {'north': 200.0})
+
+    def test_head_office_tables_get_new_columns(self):
+        # A head office database from before product.deleted.
+        with self.engines['hq'].begin() as conn:
+            conn.execute(text('CREATE TABLE hq_product (source VARCHAR(40), id INTEGER, brand_id INTEGER, size_id INTEGER, '
+                              'price FLOAT, quantity INTEGER, version INTEGER, PRIMARY KEY (source, id))'))
+        self.sell('north', 100.0, 2)
+        batches = _Collect()
+        export_changes(self.sessions['north'], batches, 'north')
+        self.assertTrue(apply_batch(self.sessions['hq'], batches.batches[0]))
+        self.assertEqual(self.hq_deleted(), [0])
+
+    def test_missing_batch_is_detected(self):
+        first = _Collect()
+        export_changes(self.sessions['north'], first, 'north')
+        self.sell('north', 100.0, 1)
+        second = _Collect()
+        export_changes(self.sessions['north'], second, 'north')
+        with self.assertRaises(SyncGapException):
+            apply_batch(self.sessions['hq'], second.batches[0])
+
+    def test_stream_transport(self):
+        self.sell('north', 100.0, 3)
+        stream = io.BytesIO()
+        export_changes(self.sessions['north'], StreamTransport(stream), 'north', batch_size=2)
+        stream.seek(0)
+        self.assertGreater(apply_changes(self.sessions['hq'], StreamTransport(stream)), 1)
+        self.assertEqual(get_hq_sales(self.sessions['hq']), {'north': 300.0})
+
+
+class TestSyncThroughput(unittest.TestCase):
+    def test_100k_changes_through_a_directory(self):
+        with tempfile.TemporaryDirectory() as folder:
+            report = run(folder, changes=100000)
+        self.assertGreaterEqual(report['changes'], 100000)
+        self.assertEqual(report['hq_rows'], {'customer': 50000, 'order': 25000, 'products_order': 25000})
+        self.assertEqual(report['applied_batches'], report['batches'])
+        self.assertEqual(report['remaining_log'], 0)
+        # Column lists once per table, and compression.
+        self.assertLess(report['bytes'], report['raw_bytes'] / 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
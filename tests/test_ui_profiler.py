@@ -0,0 +1,66 @@
+import os
+import time
+import tempfile
+import tkinter
+import unittest
+from interface.profiler import UIProfiler
+
+
+def busy(seconds):
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        pass
+
+
+class TestUIProfiler(unittest.TestCase):
+    # A bare Tcl interpreter runs 'after' jobs and variable traces without needing a display.
+    def setUp(self):
+        self.profiler = UIProfiler(sample_interval=0.002, stall_threshold=0.02)
+        self.profiler.install()
+        self.interp = tkinter.Tcl()
+
+    def tearDown(self):
+        self.profiler.uninstall()
+
+    def run_until(self, done):
+        while not done:
+            self.interp.tk.dooneevent()
+
+    def test_callbacks_are_timed(self):
+        done = []
+        var = tkinter.StringVar(self.interp)
+        var.trace_add('write', lambda *args: busy(0.03))
+        self.interp.after(1, busy, 0.001)
+        self.interp.after(20, lambda: done.append(True))
+        var.set('x')
+        self.run_until(done)
+
+        handlers = self.profiler.handlers
+        self.assertEqual(handlers[f'{__name__}.busy'][0], 1)
+        self.assertIn(f'{__name__}.TestUIProfiler.test_callbacks_are_timed.<locals>.<lambda>', handlers)
+        # Only the trace handler was slow enough to count as a stall.
+        stalls = self.profiler.stalls['(main)']
+        self.assertEqual(len(stalls), 1)
+        self.assertGreaterEqual(stalls[0][0], 0.03)
+
+    def test_dump_writes_collapsed_stacks(self):
+        done = []
+        self.interp.after(1, busy, 0.05)
+        self.interp.after(60, lambda: done.append(True))
+        self.run_until(done)
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'profile.folded')
+            self.profiler.dump(path)
+            with open(path, encoding='utf-8') as f:
+                lines = f.read().splitlines()
+            self.assertTrue(os.path.exists(os.path.join(folder, 'profile.txt')))
+        self.assertTrue(lines)
+        for line in lines:
+            stack, count = line.rsplit(' ', 1)
+            self.assertTrue(stack.startswith(f'(main);{__name__}.busy'))
+            self.assertGreater(int(count), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()